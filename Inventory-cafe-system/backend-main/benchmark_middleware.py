@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+Request Middleware Overhead Benchmark for Inventory Cafe System
+
+Drives RequestMetricsMiddleware directly over a minimal ASGI app (no server,
+no database) and compares it with the bare app, so the difference is the
+per-request cost of metrics, Server-Timing and sampled logging. Also times
+TimedCursor against a plain cursor. Fails if the middleware adds more than
+BUDGET_US microseconds per request:
+
+    python benchmark_middleware.py
+"""
+
+import asyncio
+import logging
+import sys
+import time
+
+from model.request_metrics import RequestMetricsMiddleware
+from model.request_timing import RequestTimings, TimedCursor
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("middleware-benchmark")
+
+REQUESTS = 50_000
+QUERIES = 200_000
+BUDGET_US = 50.0
+
+
+class Route:
+    path = "/api/inventory/inventoryproduct/{product_id}"
+
+
+ROUTE = Route()
+BODY = b'{"id": 1}'
+
+
+async def app(scope, receive, send):
+    # What the router does: record the matched route, then respond
+    scope["route"] = ROUTE
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": BODY})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+def make_scope(product_id):
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": f"/api/inventory/inventoryproduct/{product_id}",
+        "headers": [(b"host", b"127.0.0.1:8001"), (b"accept", b"application/json")],
+    }
+
+
+async def time_requests(handler) -> float:
+    """Mean microseconds per request"""
+    scopes = [make_scope(i % 500) for i in range(REQUESTS)]
+    start = time.perf_counter()
+    for scope in scopes:
+        await handler(scope, receive, send)
+    return (time.perf_counter() - start) / REQUESTS * 1_000_000
+
+
+class NullCursor:
+    def execute(self, query, params=None):
+        pass
+
+
+def time_cursor(cursor) -> float:
+    """Mean microseconds per execute()"""
+    start = time.perf_counter()
+    for _ in range(QUERIES):
+        cursor.execute("SELECT 1")
+    return (time.perf_counter() - start) / QUERIES * 1_000_000
+
+
+async def run():
+    middleware = RequestMetricsMiddleware(app)
+    # Warm up label sets, shards and caches before measuring
+    await time_requests(app)
+    await time_requests(middleware)
+
+    bare_us = min([await time_requests(app) for _ in range(3)])
+    wrapped_us = min([await time_requests(middleware) for _ in range(3)])
+    return bare_us, wrapped_us
+
+
+if __name__ == "__main__":
+    bare_us, wrapped_us = asyncio.run(run())
+    overhead_us = wrapped_us - bare_us
+    logger.info(f"Bare app: {bare_us:.2f} us/request, with middleware: {wrapped_us:.2f} us/request")
+    logger.info(f"Middleware overhead: {overhead_us:.2f} us/request (budget {BUDGET_US:.0f} us)")
+
+    plain_us = time_cursor(NullCursor())
+    timed_us = time_cursor(TimedCursor(NullCursor(), RequestTimings()))
+    logger.info(f"TimedCursor overhead: {timed_us - plain_us:.2f} us/query")
+
+    if overhead_us > BUDGET_US:
+        logger.error(f"Middleware overhead {overhead_us:.2f} us exceeds the {BUDGET_US:.0f} us budget")
+        sys.exit(1)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+"""
+Query Plan Check for Inventory Cafe System
+
+Runs EXPLAIN on the date-filtered queries behind the hot endpoints and fails
+if any of the filtered tables is read with a full scan (type = ALL). Run it
+against a database with realistic data after schema or query changes. It
+never changes the schema: with migrations pending it fails and asks for
+`python -m model.migrate up` instead of checking plans against stale indexes.
+
+    python check_query_plans.py
+"""
+
+import logging
+import sys
+from datetime import datetime, timedelta
+
+from model.db import db_connection
+from model.indexes import date_span, day_range
+from model.migrate import schema_status
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("query-plans")
+
+today = datetime.now().date()
+day_start, day_end = day_range(today)
+month_start, month_end = date_span(today - timedelta(days=30), today)
+
+# (description, query, params, tables/aliases that must use an index)
+CHECKS = [
+    (
+        "sales: beginning quantity per product for one day",
+        """
+        SELECT ip.id, COALESCE(b.beginning_quantity, 0)
+        FROM inventoryproduct ip
+        LEFT JOIN daily_beginning_quantity b ON b.product_id = ip.id AND b.quantity_date = %s
+        """,
+        (today,),
+        {"b"},
+    ),
+    (
+        "stock-in: refresh one day's beginning quantity",
+        """
+        SELECT DATE(created_at), ProductID, SUM(original_quantity)
+        FROM stock_details
+        WHERE created_at >= %s AND created_at < %s AND ProductID IN (%s)
+        GROUP BY DATE(created_at), ProductID
+        """,
+        (day_start, day_end, 1),
+        {"stock_details"},
+    ),
+    (
+        "sales: daily rollup for one day",
+        """
+        SELECT ip.id, COALESCE(r.quantity_sold, 0), COALESCE(r.remitted, 0)
+        FROM inventoryproduct ip
+        LEFT JOIN sales_daily_rollup r ON r.product_id = ip.id AND r.sale_date = %s
+        """,
+        (today,),
+        {"r"},
+    ),
+    (
+        "sales: rollup range for forecasting",
+        """
+        SELECT sale_date, SUM(remitted), SUM(quantity_sold)
+        FROM sales_daily_rollup
+        WHERE sale_date BETWEEN %s AND %s
+        GROUP BY sale_date
+        """,
+        (today - timedelta(days=30), today),
+        {"sales_daily_rollup"},
+    ),
+    (
+        "forecasting: cache data_version fingerprint",
+        """
+        SELECT COUNT(*), SUM(sale_count), SUM(quantity_sold), SUM(remitted), MAX(last_sale_at)
+        FROM sales_daily_rollup
+        WHERE sale_date BETWEEN %s AND %s
+        """,
+        (today - timedelta(days=90), today - timedelta(days=1)),
+        {"sales_daily_rollup"},
+    ),
+    (
+        "reports: low stock report",
+        """
+        SELECT id, Quantity, Threshold
+        FROM inventoryproduct
+        WHERE ProcessType = 'Ready-Made'
+          AND (Quantity <= 10 OR (Quantity <= Threshold AND Threshold > 0))
+        """,
+        (),
+        {"inventoryproduct"},
+    ),
+    (
+        "createorder: FIFO batches",
+        """
+        SELECT id, ProductID, quantity
+        FROM stock_details
+        WHERE ProductID IN (%s, %s) AND quantity > 0
+        ORDER BY created_at ASC, id ASC
+        """,
+        (1, 2),
+        {"stock_details"},
+    ),
+    (
+        "ordersummary: order history by date",
+        """
+        SELECT history_id, customer_name, total_items, total_amount, payment_method, created_at
+        FROM order_history
+        WHERE created_at >= %s AND created_at < %s
+        ORDER BY created_at DESC
+        """,
+        (month_start, month_end),
+        {"order_history"},
+    ),
+    (
+        "reports: inventory report by date",
+        """
+        SELECT ir.ReportID, ir.ProductName
+        FROM inventory_reports ir
+        WHERE ir.ReportDate >= %s AND ir.ReportDate < %s
+        """,
+        (day_start, day_end),
+        {"ir"},
+    ),
+]
+
+
+def explain(cursor, query, params):
+    cursor.execute("EXPLAIN " + query, params)
+    return cursor.fetchall()
+
+
+def check_plans():
+    failures = []
+    with db_connection() as db:
+        # The indexes under test come from migrations
+        status = schema_status(db)
+        if status.pending:
+            pending = [migration.label for migration in status.pending]
+            return [f"migrations pending: {pending}; run: python -m model.migrate up"]
+        cursor = db.cursor(dictionary=True)
+        try:
+            for description, query, params, indexed in CHECKS:
+                try:
+                    plan = explain(cursor, query, params)
+                except Exception as e:
+                    failures.append(f"{description}: EXPLAIN failed ({e})")
+                    continue
+
+                for row in plan:
+                    table = row.get("table")
+                    if table in indexed and row.get("type") == "ALL":
+                        failures.append(f"{description}: full scan on {table}")
+                    logger.info(
+                        f"{description}: table={table} type={row.get('type')} "
+                        f"key={row.get('key')} rows={row.get('rows')}"
+                    )
+        finally:
+            cursor.close()
+    return failures
+
+
+if __name__ == "__main__":
+    failures = check_plans()
+    if failures:
+        for failure in failures:
+            logger.error(failure)
+        sys.exit(1)
+    logger.info(f"All {len(CHECKS)} query plans use indexes")
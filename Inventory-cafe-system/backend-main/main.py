@@ -2,8 +2,10 @@ import os
 from fastapi import FastAPI, Request, HTTPException, Depends, Form, File, UploadFile, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
+import json
 import logging
-from fastapi.responses import FileResponse, RedirectResponse, JSONResponse
+from fastapi.responses import FileResponse, RedirectResponse, JSONResponse, Response
 import uvicorn
 from typing import List
 import time
@@ -13,16 +15,27 @@ from model.auth import AuthRouter
 from model.activity_logs import ActivityLogsRouter
 from model.users import UsersRouter
 from model.inventoryproduct import InventoryRouter
-from model.inventory_snapshot import InventorySnapshotRouter
+from model.inventory_snapshot import InventorySnapshotRouter, create_daily_inventory_snapshot
 from model.stockin import StockRouter
 from model.createorder import CreateOrderRouter
 from model.ordersummary import OrderSummaryRouter
 from model.sales import SalesRouter, start_background_task
+from model.schema import refresh_schema
+from model.change_feed import ChangeFeedRouter, prune_change_log_background
+from model.migrate import check_schema
+from model.maintenance import MaintenanceRouter
 from model.reports import ReportRouter
+from model.exports import ExportRouter
 from model.categories import CategoryRouter
 from model.suppliers import SupplierRouter
-from model.performance_metrics import PerformanceMetricsRouter, record_response_time, record_request, record_error, init_performance_metrics
-from model.db import ensure_tables_exist, init_connection_pool, start_connection_pool_cleanup, test_connection, get_db, db_transaction
+from model.performance_metrics import PerformanceMetricsRouter, init_performance_metrics
+from model.request_metrics import RequestMetricsMiddleware
+from beata_common.openmetrics import (
+    CONTENT_TYPE as OPENMETRICS_CONTENT_TYPE, REGISTRY as METRICS_REGISTRY, gauge
+)
+from model.broadcast import BroadcastHub
+from model.stock_notifier import start_stock_notifier, stop_stock_notifier
+from model.db import init_connection_pool, start_connection_pool_monitor, close_connection_pool, test_connection, get_db, db_connection
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -49,8 +62,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let browser clients read pagination cursors, catalog ETags and timings
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "ETag", "Server-Timing"],
 )
 
+# Metrics by route template, Server-Timing and sampled request logging
+app.add_middleware(RequestMetricsMiddleware)
+
 # Ensure the uploads directories exist
 os.makedirs("uploads/profile_pics", exist_ok=True)
 os.makedirs("uploads/products", exist_ok=True)  # Ensure product uploads directory exists
@@ -64,48 +82,23 @@ app.mount("/uploads/profile_pics", StaticFiles(directory="uploads/profile_pics")
 app.mount("/products", StaticFiles(directory="uploads/products"), name="products")  # Direct access to product images
 app.mount("/static", StaticFiles(directory="static"), name="static")  # Serve static HTML files
 
-# WebSocket Manager for real-time updates
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        logger.info(f"New WebSocket connection. Total connections: {len(self.active_connections)}")
-
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-            logger.info(f"WebSocket disconnected. Remaining connections: {len(self.active_connections)}")
-
-    async def broadcast(self, message: dict):
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except WebSocketDisconnect:
-                disconnected.append(connection)
-            except Exception as e:
-                logger.error(f"Error broadcasting message: {str(e)}")
-                disconnected.append(connection)
-        
-        # Clean up disconnected connections
-        for conn in disconnected:
-            if conn in self.active_connections:
-                self.disconnect(conn)
-
-# Create the connection manager instance
-manager = ConnectionManager()
+# WebSocket fan-out with per-client send queues and topic subscriptions
+manager = BroadcastHub("inventory")
+gauge("websocket_clients", "Connected /ws/inventory clients", callback=lambda: len(manager.active_connections))
 
 # WebSocket endpoint
 @app.websocket("/ws/inventory")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    # Optional ?topics=stock,product:12; without it the client gets everything
+    await manager.connect(websocket, topics=websocket.query_params.get("topics"))
     try:
         while True:
-            # Keep the connection alive and wait for any messages
-            await websocket.receive_text()
+            # Keep the connection alive; clients may send subscribe/unsubscribe messages
+            data = await websocket.receive_text()
+            try:
+                manager.handle_control(websocket, json.loads(data))
+            except (ValueError, AttributeError):
+                pass
     except WebSocketDisconnect:
         manager.disconnect(websocket)
     except Exception as e:
@@ -121,15 +114,18 @@ app.include_router(AuthRouter, prefix="/Auth")
 app.include_router(ActivityLogsRouter, tags=["Activity Logs"])
 app.include_router(UsersRouter, prefix="/api/users", tags=["Users"])
 app.include_router(InventoryRouter, prefix="/api/inventory", tags=["Inventory"])
+app.include_router(ChangeFeedRouter, prefix="/api/inventory", tags=["Inventory"])
 app.include_router(InventorySnapshotRouter, prefix="/api/inventory_snapshot", tags=["Inventory Snapshot"])
 app.include_router(StockRouter, prefix="/api/stock", tags=["Stock In"])
 app.include_router(CategoryRouter, prefix="/api/categories", tags=["Categories"])
 app.include_router(SupplierRouter, prefix="/api/suppliers", tags=["Suppliers"])
 app.include_router(SalesRouter, prefix="/api/sales", tags=["Sales"])
 app.include_router(ReportRouter, prefix="/api/reports", tags=["Reports"])
+app.include_router(ExportRouter, prefix="/api/exports", tags=["Exports"])
 app.include_router(CreateOrderRouter, prefix="/api/orders", tags=["CreateOrders"])
 app.include_router(OrderSummaryRouter, prefix="/api/ordersummary", tags=["OrderSummary"])
 app.include_router(PerformanceMetricsRouter, tags=["Performance Metrics"])
+app.include_router(MaintenanceRouter, prefix="/api/maintenance", tags=["Maintenance"])
 
 # Test database connection at startup
 @app.on_event("startup")
@@ -151,21 +147,33 @@ async def startup_event():
     logger.info(f"Server running on port 8001")
     logger.info(f"Static files served from: {os.path.abspath('uploads')}")
     
-    # Ensure all necessary database tables exist
+    # One read of schema_version; applies pending migrations (model/migrations/)
     try:
-        ensure_tables_exist()
+        check_schema()
     except Exception as e:
-        logger.error(f"Error during table setup: {e}")
-        logger.info("Continuing startup despite table setup errors")
+        logger.error(f"Error checking database schema: {e}")
+        logger.info("Continuing startup despite schema errors")
+
+    # Trim the change log behind GET /api/inventory/changes
+    asyncio.create_task(prune_change_log_background())
+
+    # Daily inventory snapshots (today's, if missing, then every midnight)
+    asyncio.create_task(create_daily_inventory_snapshot())
+
+    # Probe optional columns once, after migrations
+    try:
+        refresh_schema()
+    except Exception as e:
+        logger.error(f"Error loading schema registry: {e}")
     
     # Initialize database connection pool
     try:
         logger.info("Initializing database connection pool...")
         init_connection_pool()
         
-        # Start connection pool cleanup scheduler
-        logger.info("Starting connection pool cleanup scheduler...")
-        start_connection_pool_cleanup()
+        # Start connection pool leak monitor
+        logger.info("Starting connection pool leak monitor...")
+        start_connection_pool_monitor()
     except Exception as e:
         logger.error(f"Error initializing database services: {e}")
     
@@ -184,6 +192,12 @@ async def startup_event():
         start_background_task()
     except Exception as e:
         logger.error(f"Error starting background task: {e}")
+
+    # Coalesced stock-change webhooks to cafe-beata
+    try:
+        start_stock_notifier(asyncio.get_running_loop())
+    except Exception as e:
+        logger.error(f"Error starting stock change notifier: {e}")
     
 # Shutdown event
 @app.on_event("shutdown")
@@ -194,13 +208,17 @@ async def shutdown_event():
     # Log shutdown information
     logger.info("=== Inventory System Shutting Down ===")
     
+    # Send any pending stock-change notifications, then stop WebSocket writers
+    try:
+        await asyncio.to_thread(stop_stock_notifier)
+    except Exception as e:
+        logger.error(f"Error stopping stock change notifier: {e}")
+    await manager.close()
+
     # Clean up database connections
-    from model.db import connection_pool
     try:
-        if connection_pool is not None:
-            logger.info("Cleaning up database connection pool...")
-            connection_pool._remove_connections()
-            logger.info("Database connection pool cleaned up")
+        logger.info("Cleaning up database connection pool...")
+        close_connection_pool()
     except Exception as e:
         logger.error(f"Error cleaning up database connection pool: {e}")
     
@@ -221,50 +239,6 @@ async def profile_page():
 async def profile_redirect(user_id: int):
     return RedirectResponse(f"/profile?user_id={user_id}")
 
-# Log all incoming requests
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """Log all incoming requests for debugging and collect performance metrics"""
-    start_time = time.time()
-    
-    # Record the request for metrics
-    record_request()
-    
-    logger.info(f"Request: {request.method} {request.url}")
-    # Log headers
-    for header, value in request.headers.items():
-        logger.info(f"Header: {header}: {value}")
-    
-    try:
-        # Process the request
-        response = await call_next(request)
-        
-        # Get the origin from the request
-        origin = request.headers.get("Origin", "*")
-        
-        # Add CORS headers to response
-        response.headers["Access-Control-Allow-Origin"] = origin
-        response.headers["Access-Control-Allow-Credentials"] = "true"
-        response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-        response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization, Origin"
-        
-        # Log response status
-        logger.info(f"Response status: {response.status_code}")
-        
-        # Calculate response time and record the metric
-        response_time = (time.time() - start_time) * 1000  # Convert to milliseconds
-        endpoint = f"{request.method} {request.url.path}"
-        record_response_time(endpoint, response_time)
-        
-        return response
-    except Exception as e:
-        # Record error in metrics
-        endpoint = f"{request.method} {request.url.path}"
-        error_type = type(e).__name__
-        error_message = str(e)
-        record_error(error_type, endpoint, error_message)
-        raise
-
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -279,6 +253,21 @@ async def global_exception_handler(request: Request, exc: Exception):
 async def health_check():
     return {"status": "healthy"}
 
+# OpenMetrics exposition for Prometheus-compatible scrapers
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(content=METRICS_REGISTRY.render(), media_type=OPENMETRICS_CONTENT_TYPE)
+
+# Re-read optional columns after running migrations or update_database.py
+@app.post("/schema/refresh")
+async def schema_refresh():
+    try:
+        flags = await asyncio.to_thread(refresh_schema)
+        return {"status": "refreshed", "flags": flags.__dict__}
+    except Exception as e:
+        logger.error(f"Error refreshing schema registry: {e}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
 # Run the app
 if __name__ == "__main__":
     if not os.path.exists("uploads/products"):
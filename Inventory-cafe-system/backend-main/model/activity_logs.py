@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
-from model.db import get_db
+from model.async_db import AsyncDB, get_async_db
 import logging
 
 # Set up logging
@@ -9,7 +9,10 @@ logger = logging.getLogger("activity_logs")
 ActivityLogsRouter = APIRouter(tags=["Activity Logs"])
 
 @ActivityLogsRouter.get("/api/activity_logs", tags=["Activity Logs"])
-async def get_activity_logs(db=Depends(get_db)):
+async def get_activity_logs(adb: AsyncDB = Depends(get_async_db)):
+    return await adb.run(_get_activity_logs)
+
+def _get_activity_logs(db):
     try:
         cursor = db.cursor()
         cursor.execute("SELECT id, icon, title, time, status FROM activity_logs ORDER BY time DESC LIMIT 10")
@@ -0,0 +1,123 @@
+# model/async_db.py
+"""
+Async access to the MySQL connection pool.
+
+mysql.connector is blocking, so every call is handed to a dedicated thread
+pool sized to the connection pool. Handlers await the result instead of
+stalling the event loop, which lets concurrent requests overlap up to
+POOL_SIZE queries at a time.
+"""
+import asyncio
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from fastapi import HTTPException
+
+from model.db import POOL_SIZE, PoolTimeoutError, get_db_connection
+
+logger = logging.getLogger("inventory-system-backend")
+
+# One worker per pooled connection; extra workers would only wait on the pool
+_executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="db")
+
+
+async def run_in_db_thread(func, *args, **kwargs):
+    """
+    Run a blocking callable on the database thread pool, in a copy of the
+    caller's context (as asyncio.to_thread does) so the request's
+    RequestTimings reach the pooled cursors.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, context.run, partial(func, *args, **kwargs))
+
+
+class AsyncDB:
+    """
+    Awaitable wrapper around one pooled connection.
+
+    Simple statements use fetchall/fetchone/execute/executemany. Multi-step
+    transactions should be written as a plain function taking the connection
+    and passed to run(), so the whole transaction stays on one worker thread
+    and costs a single hop off the event loop.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    async def run(self, func, *args, **kwargs):
+        """Call func(connection, *args, **kwargs) on the database thread pool"""
+        return await run_in_db_thread(func, self.connection, *args, **kwargs)
+
+    def _fetch(self, query, params, dictionary, one):
+        cursor = self.connection.cursor(dictionary=dictionary)
+        try:
+            cursor.execute(query, params or ())
+            return cursor.fetchone() if one else cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def _execute(self, query, params, many):
+        cursor = self.connection.cursor()
+        try:
+            if many:
+                cursor.executemany(query, params)
+            else:
+                cursor.execute(query, params or ())
+            return cursor.rowcount, cursor.lastrowid
+        finally:
+            cursor.close()
+
+    async def fetchall(self, query, params=None, dictionary=False):
+        return await run_in_db_thread(self._fetch, query, params, dictionary, False)
+
+    async def fetchone(self, query, params=None, dictionary=False):
+        return await run_in_db_thread(self._fetch, query, params, dictionary, True)
+
+    async def execute(self, query, params=None):
+        """Execute a statement and return (rowcount, lastrowid)"""
+        return await run_in_db_thread(self._execute, query, params, False)
+
+    async def executemany(self, query, seq_params):
+        """Execute a statement for every parameter set and return (rowcount, lastrowid)"""
+        return await run_in_db_thread(self._execute, query, seq_params, True)
+
+    async def commit(self):
+        await run_in_db_thread(self.connection.commit)
+
+    async def rollback(self):
+        await run_in_db_thread(self.connection.rollback)
+
+
+async def _checkout():
+    try:
+        # Checkouts may wait for a free connection, so they run on the default
+        # executor and never tie up the workers that connection holders need
+        return await asyncio.to_thread(get_db_connection)
+    except PoolTimeoutError as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=503, detail="Database is busy, please retry")
+
+
+async def get_async_db():
+    """FastAPI dependency yielding an AsyncDB; the connection always goes back to the pool"""
+    connection = await _checkout()
+    try:
+        yield AsyncDB(connection)
+    finally:
+        await run_in_db_thread(connection.close)
+
+
+async def run_with_connection(func, *args, **kwargs):
+    """
+    Check out a pooled connection and call func(connection, *args, **kwargs)
+    on the database thread pool, for handlers that other handlers also call
+    directly and so can't take an AsyncDB dependency.
+    """
+    connection = await _checkout()
+    try:
+        return await run_in_db_thread(func, connection, *args, **kwargs)
+    finally:
+        await run_in_db_thread(connection.close)
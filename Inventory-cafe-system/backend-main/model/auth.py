@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel
 import bcrypt
-from .db import get_db_connection, DB_CONFIG
+from .db import DB_CONFIG
+from .async_db import run_with_connection
+from .schema import get_schema
 import logging
 
 # Set up logging
@@ -24,10 +26,12 @@ class ForgotPasswordRequest(BaseModel):
 
 @AuthRouter.post("/login/", response_model=LoginResponse)
 async def login_user(login_data: LoginRequest, request: Request):
+    return await run_with_connection(_login_user, login_data, request)
+
+def _login_user(connection, login_data: LoginRequest, request: Request):
     logger.info(f"Login attempt for user: {login_data.username}")
     
     try:
-        connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
         
         # Log for debugging
@@ -79,7 +83,6 @@ async def login_user(login_data: LoginRequest, request: Request):
         logger.info(f"Successful login for user: {login_data.username}")
         
         cursor.close()
-        connection.close()
         
         return {
             "user_id": user["id"],
@@ -96,16 +99,21 @@ async def login_user(login_data: LoginRequest, request: Request):
 
 @AuthRouter.post("/forgot-password/")
 async def forgot_password(request_data: ForgotPasswordRequest):
+    try:
+        return await run_with_connection(_forgot_password, request_data)
+    except HTTPException:
+        # Pool busy: same answer as always, for security
+        return {"message": "If your email is registered, you will receive a password reset link."}
+
+def _forgot_password(connection, request_data: ForgotPasswordRequest):
     try:
         email = request_data.email
         logger.info(f"Password reset requested for email: {email}")
         
-        connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
         
         # First check if users table has email column
-        cursor.execute("SHOW COLUMNS FROM users LIKE 'email'")
-        email_column_exists = cursor.fetchone()
+        email_column_exists = get_schema().flags.users_email
         
         if email_column_exists:
             # Check if email exists
@@ -118,7 +126,6 @@ async def forgot_password(request_data: ForgotPasswordRequest):
             user = None
         
         cursor.close()
-        connection.close()
         
         # Don't reveal if email exists or not for security
         return {"message": "If your email is registered, you will receive a password reset link."}
@@ -0,0 +1,117 @@
+# model/beginning_quantity.py
+"""
+Materialized per-day beginning quantities.
+
+The sales reports show, per product and day, the stock received that day
+(SUM of stock_details.original_quantity). `daily_beginning_quantity` holds
+one row per (quantity_date, product_id) with that sum, so GET /sales,
+/sales/daily and /sales/category-report join a few hundred rows by primary
+key instead of aggregating stock_details on every request.
+
+Every write to original_quantity refreshes the affected (day, product) rows
+in the same transaction: stock-in, PUT /inventory/beginning-quantity, and
+deleting a stock-in transaction or a product. The nightly snapshot job
+(model/inventory_snapshot.py) also rebuilds yesterday and today, which
+repairs any drift from writes made outside those paths.
+
+The table is created, and backfilled once, by migration
+0011_daily_beginning_quantity. It can be rebuilt at any time:
+
+    python -m model.beginning_quantity rebuild [--since YYYY-MM-DD | --days N]
+"""
+import argparse
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from model.db import db_connection
+from model.indexes import date_span, day_range
+
+logger = logging.getLogger("sales")
+
+# Per-day beginning quantity (params: the report date)
+BEGINNING_QUANTITY_JOIN = """
+    LEFT JOIN daily_beginning_quantity b ON b.product_id = ip.id AND b.quantity_date = %s
+"""
+
+INSERT_FROM_STOCK_DETAILS = """
+    INSERT INTO daily_beginning_quantity (quantity_date, product_id, beginning_quantity)
+    SELECT DATE(created_at), ProductID, COALESCE(SUM(original_quantity), 0)
+    FROM stock_details
+    {where}
+    GROUP BY DATE(created_at), ProductID
+"""
+
+
+def refresh_beginning_quantities(cursor, product_ids: Iterable, day):
+    """
+    Recompute `day`'s rows for the given products from stock_details. Call
+    this on the cursor that changed stock_details so both commit together.
+    """
+    product_ids = list(dict.fromkeys(product_ids))
+    if not product_ids:
+        return
+    placeholders = ", ".join(["%s"] * len(product_ids))
+    cursor.execute(
+        f"DELETE FROM daily_beginning_quantity WHERE quantity_date = %s AND product_id IN ({placeholders})",
+        (day, *product_ids)
+    )
+    cursor.execute(
+        INSERT_FROM_STOCK_DETAILS.format(
+            where=f"WHERE created_at >= %s AND created_at < %s AND ProductID IN ({placeholders})"),
+        (*day_range(day), *product_ids)
+    )
+
+
+def forget_product(cursor, product_id):
+    """Drop a deleted product's rows"""
+    cursor.execute("DELETE FROM daily_beginning_quantity WHERE product_id = %s", (product_id,))
+
+
+def rebuild_beginning_quantities(db, since=None):
+    """
+    Recompute the table from stock_details, either entirely or from `since`
+    (a date) onwards. Returns the number of rows written.
+    """
+    cursor = db.cursor()
+    try:
+        if since:
+            cursor.execute("DELETE FROM daily_beginning_quantity WHERE quantity_date >= %s", (since,))
+            where, params = "WHERE created_at >= %s", (date_span(since)[0],)
+        else:
+            cursor.execute("DELETE FROM daily_beginning_quantity")
+            where, params = "", ()
+
+        cursor.execute(INSERT_FROM_STOCK_DETAILS.format(where=where), params)
+        written = cursor.rowcount
+        db.commit()
+        return written
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the daily_beginning_quantity table")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild = subparsers.add_parser("rebuild", help="Recompute the table from stock_details")
+    rebuild.add_argument("--since", help="Only rebuild from this date (YYYY-MM-DD)")
+    rebuild.add_argument("--days", type=int, help="Only rebuild the last N days")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    since = None
+    if args.since:
+        since = datetime.strptime(args.since, "%Y-%m-%d").date()
+    elif args.days:
+        since = datetime.now().date() - timedelta(days=args.days)
+
+    with db_connection() as db:
+        written = rebuild_beginning_quantities(db, since)
+    logger.info(f"Rebuilt daily_beginning_quantity{f' from {since}' if since else ''}: {written} rows")
+
+
+if __name__ == "__main__":
+    main()
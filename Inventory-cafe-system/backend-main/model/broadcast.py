@@ -0,0 +1,36 @@
+# model/broadcast.py
+"""
+Topic mapping for /ws/inventory. The fan-out engine (per-client send queues,
+slow-client policy, subscribe/unsubscribe) is beata_common.broadcast, shared
+with the POS backend.
+
+Clients can subscribe on connect (/ws/inventory?topics=stock,product:12).
+Stock messages belong to "stock" and to "product:<id>" for every product id
+they carry; messages of unknown types go to every client.
+"""
+from typing import Optional, Set
+
+from beata_common.broadcast import BroadcastHub as _BroadcastHub
+
+TOPICS_BY_TYPE = {
+    "stock_update": "stock",
+    "stock_update_batch": "stock",
+}
+
+
+def message_topics(message: dict) -> Optional[Set[str]]:
+    """Topics a message belongs to, or None to send it to everyone"""
+    topic = TOPICS_BY_TYPE.get(message.get("type"))
+    if topic is None:
+        return None
+    topics = {topic}
+    data = message.get("data")
+    for entry in data if isinstance(data, list) else [data, message]:
+        if isinstance(entry, dict) and entry.get("product_id") is not None:
+            topics.add(f"product:{entry['product_id']}")
+    return topics
+
+
+class BroadcastHub(_BroadcastHub):
+    def message_topics(self, message: dict) -> Optional[Set[str]]:
+        return message_topics(message)
@@ -0,0 +1,187 @@
+# model/catalog_cache.py
+"""
+In-process cache of the product catalog.
+
+The catalog (inventoryproduct joined with categories) is loaded once and kept
+in memory keyed by product id, with secondary indexes by ProcessType and
+category. Every write path that touches inventoryproduct or categories calls
+invalidate_products()/invalidate_catalog() after committing; each call bumps
+the catalog version, and the changed rows are re-read with one query the next
+time the catalog is used.
+
+The version doubles as a weak ETag, so read endpoints can answer
+If-None-Match with 304 before checking out a database connection.
+"""
+import logging
+import threading
+import time
+import uuid
+
+from fastapi import Request, Response
+
+from model.async_db import run_with_connection
+
+logger = logging.getLogger("inventory")
+
+# Safety net for writes made outside this process (e.g. directly in MySQL)
+CATALOG_MAX_AGE = 300
+
+CATALOG_QUERY = """
+    SELECT
+        ip.id, ip.ProductName, ip.Quantity, ip.Price, ip.UnitPrice,
+        ip.`CategoryID (FK)` AS CategoryID, ip.ProcessType, ip.Threshold, ip.Image,
+        c.CategoryName
+    FROM inventoryproduct ip
+    LEFT JOIN categories c ON ip.`CategoryID (FK)` = c.id
+"""
+
+
+class ProductCatalog:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._products = {}
+        self._by_process_type = {}
+        self._by_category = {}
+        self._loaded_at = 0.0
+        self._stale = True
+        self._dirty = set()
+        self._version = 0
+        # Distinguishes versions across restarts so old ETags never match
+        self._generation = uuid.uuid4().hex[:8]
+
+    @property
+    def etag(self):
+        return self.etag_for(self._version)
+
+    def etag_for(self, version):
+        return f'W/"catalog-{self._generation}-{version}"'
+
+    def needs_refresh(self):
+        return self._stale or bool(self._dirty) or time.monotonic() - self._loaded_at > CATALOG_MAX_AGE
+
+    def invalidate(self, product_ids=None):
+        """Mark products (or the whole catalog when product_ids is None) as changed"""
+        if product_ids is not None:
+            product_ids = {int(pid) for pid in product_ids}
+            if not product_ids:
+                return      # Nothing changed; keep the version (and clients' ETags) as they are
+        with self._lock:
+            if product_ids is None:
+                self._stale = True
+            else:
+                self._dirty.update(product_ids)
+            self._version += 1
+
+    def _index(self, product):
+        self._by_process_type.setdefault(product["ProcessType"], set()).add(product["id"])
+        self._by_category.setdefault(product["CategoryID"], set()).add(product["id"])
+
+    def _unindex(self, product):
+        self._by_process_type.get(product["ProcessType"], set()).discard(product["id"])
+        self._by_category.get(product["CategoryID"], set()).discard(product["id"])
+
+    def refresh(self, connection):
+        """Reload whatever is stale; runs on a database thread"""
+        with self._lock:
+            version = self._version
+            full = self._stale or time.monotonic() - self._loaded_at > CATALOG_MAX_AGE
+            dirty = set() if full else set(self._dirty)
+            self._stale = False
+            self._dirty.difference_update(dirty)
+            if full:
+                self._dirty.clear()
+
+        cursor = connection.cursor(dictionary=True)
+        try:
+            if full:
+                cursor.execute(CATALOG_QUERY)
+            elif dirty:
+                ids = list(dirty)
+                placeholders = ", ".join(["%s"] * len(ids))
+                cursor.execute(f"{CATALOG_QUERY} WHERE ip.id IN ({placeholders})", ids)
+            rows = cursor.fetchall() if (full or dirty) else []
+        except Exception:
+            # Put the work back so the next caller retries it
+            with self._lock:
+                if full:
+                    self._stale = True
+                self._dirty.update(dirty)
+            raise
+        finally:
+            cursor.close()
+
+        with self._lock:
+            if full:
+                previous = self._products
+                self._products = {}
+                self._by_process_type = {}
+                self._by_category = {}
+                self._loaded_at = time.monotonic()
+            for product_id in dirty:
+                old = self._products.pop(product_id, None)
+                if old:
+                    self._unindex(old)
+            for row in rows:
+                old = self._products.get(row["id"])
+                if old:
+                    self._unindex(old)
+                self._products[row["id"]] = row
+                self._index(row)
+            if full and previous and self._products != previous:
+                # Changed behind our back (another process); hand out a new ETag
+                self._version += 1
+                version = self._version
+        return version
+
+    async def ensure_fresh(self):
+        """Refresh if needed and return the version the cached data reflects"""
+        if not self.needs_refresh():
+            return self._version
+
+        return await run_with_connection(self.refresh)
+
+    def get(self, product_id):
+        return self._products.get(int(product_id))
+
+    def all(self):
+        with self._lock:
+            return [self._products[pid] for pid in sorted(self._products)]
+
+    def by_process_type(self, process_type):
+        with self._lock:
+            return [self._products[pid] for pid in sorted(self._by_process_type.get(process_type, ()))]
+
+    def by_category(self, category_id):
+        with self._lock:
+            return [self._products[pid] for pid in sorted(self._by_category.get(category_id, ()))]
+
+
+catalog = ProductCatalog()
+
+
+def invalidate_products(*product_ids):
+    """Call after committing a write to specific inventoryproduct rows"""
+    catalog.invalidate(product_ids)
+
+
+def invalidate_catalog():
+    """Call after writes that may touch many products or category names"""
+    catalog.invalidate()
+
+
+async def check_not_modified(request: Request, response: Response):
+    """
+    Bring the catalog up to date and compare it with If-None-Match.
+    Returns a 304 response when the client's copy is current; otherwise sets
+    the ETag header on `response` and returns None. An unchanged catalog is
+    answered without touching the database.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and not catalog.needs_refresh() and if_none_match == catalog.etag:
+        return Response(status_code=304, headers={"ETag": catalog.etag})
+
+    etag = catalog.etag_for(await catalog.ensure_fresh())
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return None
@@ -1,7 +1,8 @@
 # categories.py (CRUD for categories)
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from typing import List, Optional
-from .db import get_db
+from .async_db import AsyncDB, get_async_db
+from .catalog_cache import invalidate_catalog
 import os
 import shutil
 import logging
@@ -20,8 +21,11 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 async def create_category(
     CategoryName: str = Form(...),
     Image: Optional[UploadFile] = File(None),
-    db=Depends(get_db)
+    adb: AsyncDB = Depends(get_async_db)
 ):
+    return await adb.run(_create_category, CategoryName, Image)
+
+def _create_category(db, CategoryName: str, Image: Optional[UploadFile]):
     try:
         cursor = db.cursor()
         image_path = None
@@ -57,7 +61,10 @@ async def create_category(
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 @CategoryRouter.get("/", response_model=List[dict])
-async def read_categories(db=Depends(get_db)):
+async def read_categories(adb: AsyncDB = Depends(get_async_db)):
+    return await adb.run(_read_categories)
+
+def _read_categories(db):
     try:
         cursor = db.cursor()
         query = "SELECT id, CategoryName, ImagePath FROM categories"
@@ -80,7 +87,10 @@ async def read_categories(db=Depends(get_db)):
 
 
 @CategoryRouter.get("/categories/{category_id}", response_model=dict)
-async def read_category(category_id: int, db=Depends(get_db)):
+async def read_category(category_id: int, adb: AsyncDB = Depends(get_async_db)):
+    return await adb.run(_read_category, category_id)
+
+def _read_category(db, category_id: int):
     try:
         cursor = db.cursor()
         query = "SELECT id, CategoryName, ImagePath FROM categories WHERE id = %s"
@@ -102,8 +112,11 @@ async def update_category(
     category_id: int,
     CategoryName: str = Form(...),
     Image: Optional[UploadFile] = File(None),
-    db=Depends(get_db)
+    adb: AsyncDB = Depends(get_async_db)
 ):
+    return await adb.run(_update_category, category_id, CategoryName, Image)
+
+def _update_category(db, category_id: int, CategoryName: str, Image: Optional[UploadFile]):
     try:
         cursor = db.cursor()
         query_check_category = "SELECT id FROM categories WHERE id = %s"
@@ -130,6 +143,7 @@ async def update_category(
 
         db.commit()
         cursor.close()
+        invalidate_catalog()
         return {"message": "Category updated successfully"}
     except Exception as e:
         logger.error(f"Error updating category {category_id}: {str(e)}")
@@ -137,7 +151,10 @@ async def update_category(
 
 
 @CategoryRouter.delete("/categories/{category_id}", response_model=dict)
-async def delete_category(category_id: int, db=Depends(get_db)):
+async def delete_category(category_id: int, adb: AsyncDB = Depends(get_async_db)):
+    return await adb.run(_delete_category, category_id)
+
+def _delete_category(db, category_id: int):
     try:
         cursor = db.cursor()
         query_check_category = "SELECT ImagePath FROM categories WHERE id = %s"
@@ -158,6 +175,7 @@ async def delete_category(category_id: int, db=Depends(get_db)):
         cursor.execute(query_delete_category, (category_id,))
         db.commit()
         cursor.close()
+        invalidate_catalog()
 
         return {"message": "Category deleted successfully"}
     except Exception as e:
@@ -0,0 +1,190 @@
+# model/change_feed.py
+"""
+Product change feed for incremental consumers.
+
+Triggers on inventoryproduct append to `inventory_change_log`, whose
+AUTO_INCREMENT `version` is a monotonic cursor. Consumers such as the
+cafe-beata sync call GET /api/inventory/changes?since=<version> and get the
+current rows of every product changed after that version, plus the ids of
+deleted products. A cursor of 0, or one that predates the retained log,
+yields a full snapshot with reset=true.
+
+Versions are handed out when a trigger inserts its entry but only become
+visible when the writing transaction commits, so a reader can see 12 while
+11 is still in flight. A page therefore stops at the first gap in the
+version sequence whose next entry is less than GAP_GRACE_SECONDS old: the
+gap may be an uncommitted write, and the consumer's cursor must not move
+past it. Older gaps are rolled-back writes and are skipped.
+
+`snapshot_version` is the newest log version visible in the same read as the
+product rows. Rows stamped with a higher snapshot version are never older,
+so consumers can use it to ignore out-of-order updates. The stock notifier
+stamps its webhooks the same way.
+
+Triggers catch every writer of the shared database, including the POS
+backend and manual SQL, without touching the write paths themselves. The
+table and triggers are created by migration 0006_inventory_change_log.
+"""
+import asyncio
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from beata_common.openmetrics import SYNC_DURATION
+
+from model.async_db import AsyncDB, get_async_db
+from model.db import db_connection
+from model.inventoryproduct import determine_status
+
+logger = logging.getLogger("inventory")
+
+ChangeFeedRouter = APIRouter(tags=["Inventory"])
+
+CHANGE_LOG_RETENTION_DAYS = 7
+PRUNE_INTERVAL = 6 * 60 * 60
+GAP_GRACE_SECONDS = 30     # A version missing for longer than this was rolled back
+
+PRODUCT_COLUMNS = """
+    id, ProductName, Quantity, UnitPrice, `CategoryID (FK)` AS CategoryID,
+    ProcessType, Threshold, Image
+"""
+
+
+def prune_change_log():
+    """Delete entries past the retention window, always keeping the newest one"""
+    with db_connection() as db:
+        cursor = db.cursor()
+        try:
+            # The newest entry anchors the current version for consumers
+            cursor.execute("SELECT MAX(version) FROM inventory_change_log")
+            latest = cursor.fetchone()[0]
+            if latest is None:
+                return 0
+            cursor.execute(
+                "DELETE FROM inventory_change_log WHERE changed_at < NOW() - INTERVAL %s DAY AND version < %s",
+                (CHANGE_LOG_RETENTION_DAYS, latest)
+            )
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+
+async def prune_change_log_background():
+    """Trim change log entries older than the retention window"""
+    while True:
+        try:
+            with SYNC_DURATION.time("prune_change_log"):
+                removed = await asyncio.to_thread(prune_change_log)
+            if removed:
+                logger.info(f"Pruned {removed} inventory change log entries")
+        except Exception as e:
+            logger.error(f"Error pruning inventory change log: {e}")
+        await asyncio.sleep(PRUNE_INTERVAL)
+
+
+def _product_payload(row):
+    row["Status"] = determine_status(row["Quantity"], row["ProcessType"], row["Threshold"])
+    return row
+
+
+def _committed_prefix(entries, since: int, step: int = 1):
+    """Entries before the first gap that may still be an uncommitted version"""
+    previous = since
+    for index, entry in enumerate(entries):
+        if entry["version"] > previous + step and entry["recent"]:
+            return entries[:index]
+        previous = entry["version"]
+    return entries
+
+
+def _read_entries(cursor, since: int, limit: int, step: int):
+    """Up to `limit` log entries after `since` that are safe to move the cursor past; returns (entries, has_more)"""
+    cursor.execute("""
+        SELECT version, product_id, changed_at >= NOW() - INTERVAL %s SECOND AS recent
+        FROM inventory_change_log
+        WHERE version > %s
+        ORDER BY version
+        LIMIT %s
+    """, (GAP_GRACE_SECONDS, since, limit + 1))
+    entries = cursor.fetchall()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    committed = _committed_prefix(entries, since, step)
+    if len(committed) < len(entries):
+        # Wait for the missing version; the next sync picks up from here
+        return committed, False
+    return entries, has_more
+
+
+def _read_changes(db, since: int, limit: int):
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            SELECT MIN(version) AS oldest, MAX(version) AS latest, @@auto_increment_increment AS step
+            FROM inventory_change_log
+        """)
+        bounds = cursor.fetchone()
+        oldest, latest = bounds["oldest"], bounds["latest"] or 0
+        step = bounds["step"] or 1
+
+        # Cursor missing, pruned away, or from a log that was recreated: full snapshot
+        if since <= 0 or since > latest or (oldest is not None and since < oldest - 1):
+            # The snapshot can't include versions still in flight, so the cursor resumes
+            # before them; entries after it that the snapshot already covers are resent
+            cursor.execute("""
+                SELECT version FROM inventory_change_log
+                WHERE changed_at < NOW() - INTERVAL %s SECOND
+                ORDER BY changed_at DESC, version DESC
+                LIMIT 1
+            """, (GAP_GRACE_SECONDS,))
+            settled = cursor.fetchone()
+            resume = settled["version"] if settled else max(0, (oldest or 1) - 1)
+            entries, _ = _read_entries(cursor, resume, limit, step)
+
+            cursor.execute(f"SELECT {PRODUCT_COLUMNS} FROM inventoryproduct ORDER BY id")
+            return {
+                "version": entries[-1]["version"] if entries else resume,
+                "snapshot_version": latest,
+                "reset": True,
+                "products": [_product_payload(row) for row in cursor.fetchall()],
+                "deleted": [],
+                "has_more": False
+            }
+
+        entries, has_more = _read_entries(cursor, since, limit, step)
+
+        product_ids = list(dict.fromkeys(entry["product_id"] for entry in entries))
+        products = []
+        if product_ids:
+            placeholders = ", ".join(["%s"] * len(product_ids))
+            cursor.execute(
+                f"SELECT {PRODUCT_COLUMNS} FROM inventoryproduct WHERE id IN ({placeholders}) ORDER BY id",
+                product_ids
+            )
+            products = [_product_payload(row) for row in cursor.fetchall()]
+        found = {product["id"] for product in products}
+
+        return {
+            "version": entries[-1]["version"] if entries else since,
+            "snapshot_version": latest,
+            "reset": False,
+            "products": products,
+            "deleted": [pid for pid in product_ids if pid not in found],
+            "has_more": has_more
+        }
+    finally:
+        cursor.close()
+
+
+@ChangeFeedRouter.get("/changes", response_model=dict)
+async def get_inventory_changes(
+    since: int = Query(0, ge=0, description="Last version the caller has applied"),
+    limit: int = Query(500, ge=1, le=5000),
+    adb: AsyncDB = Depends(get_async_db)
+):
+    """Products changed after `since`, with the version to pass next time"""
+    try:
+        return await adb.run(_read_changes, since, limit)
+    except Exception as e:
+        logger.error(f"Error reading inventory changes since {since}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi import APIRouter, Request, Response, Depends, HTTPException
 from typing import List, Optional
 from pydantic import BaseModel
-from model.db import get_db
+from model.async_db import AsyncDB, get_async_db
+from model.catalog_cache import catalog, check_not_modified, invalidate_products
 import logging
 from model.performance_metrics import record_transaction_time  # Import the function
+from model.sales_rollup import record_daily_sales
 import time
 
+logger = logging.getLogger("createorder")
+
 CreateOrderRouter = APIRouter(tags=["CreateOrders"])
 
 # Improved Pydantic model with default values
@@ -16,29 +20,20 @@ class CreateOrderRequest(BaseModel):
     payment_method: str  # Cash or Tally
 
 @CreateOrderRouter.get("/menu_items/all")
-async def get_all_menu_items(request: Request, db=Depends(get_db)):
+async def get_all_menu_items(request: Request, response: Response):
     """Fetch all menu items with their details."""
-    cursor = None
     try:
+        not_modified = await check_not_modified(request, response)
+        if not_modified:
+            return not_modified
+
         base_url = str(request.base_url)
-        cursor = db.cursor(dictionary=True)
-        
-        query = """
-            SELECT 
-                ip.id,
-                ip.ProductName,
-                ip.UnitPrice,
-                ip.Quantity,
-                ip.ProcessType,
-                ip.Image,       
-                c.CategoryName
-            FROM inventoryproduct ip
-            LEFT JOIN categories c ON ip.`CategoryID (FK)` = c.id
-            ORDER BY c.CategoryName, ip.ProductName
-        """
-        
-        cursor.execute(query)
-        menu_items = cursor.fetchall()
+
+        # Same order as ORDER BY c.CategoryName, ip.ProductName (NULL categories first)
+        menu_items = sorted(
+            catalog.all(),
+            key=lambda item: (item["CategoryName"] is not None, item["CategoryName"] or "", item["ProductName"] or "")
+        )
         
         # Apply infinite stock for "To Be Made" items
         return [
@@ -63,48 +58,113 @@ async def get_all_menu_items(request: Request, db=Depends(get_db)):
             status_code=500, 
             detail=f"Error fetching menu items: {str(e)}"
         )
-    finally:
-        if cursor:
-            cursor.close()
 
 @CreateOrderRouter.post("/create_order")
-async def create_order(order_data: CreateOrderRequest, db=Depends(get_db)):
+async def create_order(order_data: CreateOrderRequest, adb: AsyncDB = Depends(get_async_db)):
+    # Start timing the transaction
+    start_time = time.time()
+
+    # The whole transaction runs on one database worker thread
+    result, stocked_ids = await adb.run(_create_order_tx, order_data)
+    invalidate_products(*stocked_ids)
+
+    # End timing and record transaction time
+    execution_time_ms = (time.time() - start_time) * 1000
+    record_transaction_time("create_order", execution_time_ms)
+
+    return result
+
+def _placeholders(values):
+    return ", ".join(["%s"] * len(values))
+
+def _allocate_fifo(batches, quantity):
+    """
+    Split a quantity across batches ordered oldest first.
+    Returns [(batch_id, taken, remaining_in_batch)] or None if stock runs out.
+    """
+    allocations = []
+    remaining = quantity
+    for batch_id, batch_quantity in batches:
+        if remaining <= 0:
+            break
+        taken = min(remaining, batch_quantity)
+        allocations.append((batch_id, taken, batch_quantity - taken))
+        remaining -= taken
+    return allocations if remaining <= 0 else None
+
+def _create_order_tx(db, order_data: CreateOrderRequest):
     cursor = None
     try:
-        # Start timing the transaction
-        start_time = time.time()
-
         cursor = db.cursor()
 
         # Validate total amount
         if order_data.total_amount <= 0:
             raise HTTPException(status_code=400, detail="Total amount must be greater than zero")
 
-        total_items = 0
-
+        # Total requested per product; the same product may appear on several lines
+        requested = {}
         for item in order_data.items:
-            product_id = item["id"]
-            quantity_requested = item["quantity"]
-
-            # Fetch product details
+            product_id = int(item["id"])
+            requested[product_id] = requested.get(product_id, 0) + item["quantity"]
+        total_items = sum(requested.values())
+        product_ids = list(requested)
+
+        # Lock every product of the order in one read
+        products = {}
+        if product_ids:
             cursor.execute(
-                "SELECT Quantity, UnitPrice, ProcessType, ProductName FROM inventoryproduct WHERE id = %s",
-                (product_id,)
+                f"""
+                SELECT id, Quantity, UnitPrice, ProcessType, ProductName
+                FROM inventoryproduct
+                WHERE id IN ({_placeholders(product_ids)})
+                FOR UPDATE
+                """,
+                product_ids
             )
-            product = cursor.fetchone()
+            products = {row[0]: row[1:] for row in cursor.fetchall()}
 
+        for product_id, quantity_requested in requested.items():
+            product = products.get(product_id)
             if not product:
                 raise HTTPException(status_code=404, detail=f"Product ID {product_id} not found")
 
             current_stock, unit_price, process_type, product_name = product
-
             if process_type != "To Be Made" and quantity_requested > current_stock:
                 raise HTTPException(
                     status_code=400,
                     detail=f"Insufficient stock for {product_name} (ID {product_id})"
                 )
 
-            total_items += quantity_requested
+        # Fetch all candidate batches for stocked products, oldest first
+        stocked_ids = [pid for pid in product_ids if products[pid][2] != "To Be Made"]
+        batches = {pid: [] for pid in stocked_ids}
+        if stocked_ids:
+            cursor.execute(
+                f"""
+                SELECT id, ProductID, quantity
+                FROM stock_details
+                WHERE ProductID IN ({_placeholders(stocked_ids)}) AND quantity > 0
+                ORDER BY created_at ASC, id ASC
+                FOR UPDATE
+                """,
+                stocked_ids
+            )
+            for batch_id, product_id, batch_quantity in cursor.fetchall():
+                batches[product_id].append((batch_id, batch_quantity))
+
+        # Compute FIFO deductions before writing anything
+        batch_updates = []
+        transaction_rows = []
+        product_updates = []
+        for product_id in stocked_ids:
+            product_name = products[product_id][3]
+            allocations = _allocate_fifo(batches[product_id], requested[product_id])
+            if allocations is None:
+                raise HTTPException(status_code=400, detail=f"Insufficient stock for {product_name}")
+            for batch_id, taken, left in allocations:
+                batch_updates.append((left, batch_id))
+                transaction_rows.append((product_id, product_name, "Deduct", taken))
+            product_updates.append((requested[product_id], product_id))
 
         # Insert into `order_history`
         cursor.execute(
@@ -119,110 +179,55 @@ async def create_order(order_data: CreateOrderRequest, db=Depends(get_db)):
                 total_items
             )
         )
-        db.commit()
-
-        # Retrieve the new `history_id`
-        cursor.execute("SELECT LAST_INSERT_ID(), created_at FROM order_history ORDER BY history_id DESC LIMIT 1")
-        result = cursor.fetchone()
-        history_id, created_at = result[0], result[1]
+        history_id = cursor.lastrowid
+        cursor.execute("SELECT created_at FROM order_history WHERE history_id = %s", (history_id,))
+        created_at = cursor.fetchone()[0]
 
-        # Insert into `order_history_detail` and deduct stock
-        for item in order_data.items:
-            product_id = item["id"]
-            quantity_sold = item["quantity"]
-
-            # Fetch product details again
-            cursor.execute(
-                "SELECT Quantity, UnitPrice, ProcessType, ProductName FROM inventoryproduct WHERE id = %s",
-                (product_id,)
-            )
-            product = cursor.fetchone()
-
-            if not product:
-                raise HTTPException(status_code=404, detail=f"Product ID {product_id} not found")
-
-            current_stock, unit_price, process_type, product_name = product
+        # Order lines keep their original order and granularity
+        cursor.executemany(
+            """
+            INSERT INTO order_history_detail (order_id, product_id, product_name, quantity, product_price)
+            VALUES (%s, %s, %s, %s, %s)
+            """,
+            [
+                (history_id, int(item["id"]), products[int(item["id"])][3], item["quantity"], products[int(item["id"])][1])
+                for item in order_data.items
+            ]
+        )
 
-            # Insert order details
-            cursor.execute(
+        if batch_updates:
+            cursor.executemany("UPDATE stock_details SET quantity = %s WHERE id = %s", batch_updates)
+            cursor.executemany(
                 """
-                INSERT INTO order_history_detail (order_id, product_id, product_name, quantity, product_price)
-                VALUES (%s, %s, %s, %s, %s)
+                INSERT INTO inventory_transactions 
+                (ProductID, product_name, transaction_type, quantity, created_at)
+                VALUES (%s, %s, %s, %s, NOW())
                 """,
-                (history_id, product_id, product_name, quantity_sold, unit_price)
+                transaction_rows
             )
-
-            # Deduct stock (FIFO for "Ready-Made" items)
-            if process_type != "To Be Made":
-                remaining_quantity = quantity_sold
-
-                # Deduct stock in FIFO order
-                while remaining_quantity > 0:
-                    cursor.execute(
-                        """
-                        SELECT id, quantity 
-                        FROM stock_details 
-                        WHERE ProductID = %s AND quantity > 0 
-                        ORDER BY created_at ASC
-                        LIMIT 1
-                        """,
-                        (product_id,)
-                    )
-                    batch = cursor.fetchone()
-
-                    if not batch:
-                        raise HTTPException(status_code=400, detail=f"Insufficient stock for {product_name}")
-
-                    batch_id, batch_quantity = batch
-
-                    if remaining_quantity >= batch_quantity:
-                        # Deduct the entire batch
-                        cursor.execute(
-                            "UPDATE stock_details SET quantity = 0 WHERE id = %s",
-                            (batch_id,)
-                        )
-                        remaining_quantity -= batch_quantity
-                    else:
-                        # Deduct only the requested quantity
-                        cursor.execute(
-                            "UPDATE stock_details SET quantity = quantity - %s WHERE id = %s",
-                            (remaining_quantity, batch_id)
-                        )
-                        remaining_quantity = 0
-
-                    # Log the deduction in `inventory_transactions`
-                    cursor.execute(
-                        """
-                        INSERT INTO inventory_transactions 
-                        (ProductID, product_name, transaction_type, quantity, created_at)
-                        VALUES (%s, %s, %s, %s, NOW())
-                        """,
-                        (product_id, product_name, "Deduct", quantity_sold)
-                    )
-
-                # Update `inventoryproduct` table
-                cursor.execute(
-                    "UPDATE inventoryproduct SET Quantity = Quantity - %s WHERE id = %s",
-                    (quantity_sold, product_id)
-                )
-
-            # Update sales table
-            remitted_amount = unit_price * quantity_sold
-            cursor.execute(
-                """
-                INSERT INTO sales (product_id, quantity_sold, remitted, created_at)
-                VALUES (%s, %s, %s, NOW())
-                ON DUPLICATE KEY UPDATE 
-                    quantity_sold = quantity_sold + VALUES(quantity_sold), 
-                    remitted = remitted + VALUES(remitted)
-                """, (product_id, quantity_sold, remitted_amount)
+            cursor.executemany(
+                "UPDATE inventoryproduct SET Quantity = Quantity - %s WHERE id = %s",
+                product_updates
             )
 
-        db.commit()
+        # Update sales table and today's rollup
+        sales_rows = [
+            (product_id, quantity, products[product_id][1] * quantity)
+            for product_id, quantity in requested.items()
+        ]
+        cursor.executemany(
+            """
+            INSERT INTO sales (product_id, quantity_sold, remitted, created_at)
+            VALUES (%s, %s, %s, NOW())
+            ON DUPLICATE KEY UPDATE 
+                quantity_sold = quantity_sold + VALUES(quantity_sold), 
+                remitted = remitted + VALUES(remitted)
+            """,
+            sales_rows
+        )
+        record_daily_sales(cursor, sales_rows)
 
-        # End timing and record transaction time
-        execution_time_ms = (time.time() - start_time) * 1000
-        record_transaction_time("create_order", execution_time_ms)
+        db.commit()
 
         return {
             "message": "Order created successfully and moved to history",
@@ -230,12 +235,15 @@ async def create_order(order_data: CreateOrderRequest, db=Depends(get_db)):
             "created_at": created_at,
             "payment_method": order_data.payment_method,
             "total_items": total_items
-        }
+        }, stocked_ids
 
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         if db:
             db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to create order: {str(e)}")
     finally:
         if cursor:
-            cursor.close()
\ No newline at end of file
+            cursor.close()
@@ -1,12 +1,17 @@
 # model/db.py
 import mysql.connector
 from mysql.connector import Error
+from fastapi import HTTPException
 import logging
 import contextlib
-from functools import wraps
+from collections import deque
 import time
 import threading
-import gc
+import traceback
+import weakref
+
+from beata_common.openmetrics import POOL_CHECKOUT_TIMEOUTS, POOL_CHECKOUT_WAIT, gauge
+from model.request_timing import TimedCursor, current_timings
 
 # Set up logging
 logging.basicConfig(
@@ -23,91 +28,289 @@ DB_CONFIG = {
     "database": "cafe_beata"
 }
 
-# Connection pool
+# Connection pool settings
+POOL_SIZE = 32               # Maximum connections open at once
+CHECKOUT_TIMEOUT = 10        # Seconds to wait for a free connection before giving up
+VALIDATE_AFTER_IDLE = 30     # Ping a connection only if it sat idle longer than this
+MAX_CONNECTION_AGE = 3600    # Recycle connections older than this on return
+LEAK_THRESHOLD = 60          # Report connections held longer than this
+MONITOR_INTERVAL = 30        # Seconds between leak checks
+
+class PoolTimeoutError(Error):
+    """Raised when no connection becomes free within CHECKOUT_TIMEOUT"""
+
+
+class PooledConnection:
+    """
+    Proxy around a MySQL connection checked out from the pool.
+    close() returns the connection to the pool instead of closing it.
+    """
+
+    def __init__(self, pool, raw, checkout_stack):
+        self._pool = pool
+        self._raw = raw
+        self._checked_out_at = time.monotonic()
+        self._checkout_stack = checkout_stack
+        self._leak_reported = False
+        self._returned = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._raw, name, value)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._raw.cursor(*args, **kwargs)
+        timings = current_timings()
+        return TimedCursor(cursor, timings) if timings is not None else cursor
+
+    def close(self):
+        if not self._returned:
+            self._returned = True
+            self._pool._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # Last line of defence: a caller dropped the connection without closing it
+        if not getattr(self, "_returned", True):
+            self._returned = True
+            try:
+                self._pool._release(self, leaked=True)
+            except Exception:
+                pass
+
+
+class ConnectionPool:
+    """
+    Bounded pool of MySQL connections.
+
+    Checkouts wait up to CHECKOUT_TIMEOUT for a free slot instead of failing
+    or opening extra connections. Idle connections are only validated when
+    they have been unused for VALIDATE_AFTER_IDLE seconds, and are recycled
+    individually once they reach MAX_CONNECTION_AGE.
+    """
+
+    def __init__(self, size=POOL_SIZE, **config):
+        self.size = size
+        self.config = config
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.RLock()
+        self._idle = deque()       # (connection, created_at, last_used)
+        self._in_use = weakref.WeakValueDictionary()  # id(proxy) -> proxy, weak so leaks can be collected
+        self._created_at = {}      # id(connection) -> created_at
+        self._closed = False
+        self._stats = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "validations": 0,
+            "validation_failures": 0,
+            "leaked": 0,
+            "checkout_ms_total": 0.0,
+            "checkout_ms_max": 0.0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+        }
+        self._checkout_samples = deque(maxlen=1000)
+        self._leaks = deque(maxlen=50)
+
+    def _connect(self):
+        connection = mysql.connector.connect(**self.config)
+        connection.autocommit = False
+        now = time.monotonic()
+        with self._lock:
+            self._created_at[id(connection)] = now
+            self._stats["created"] += 1
+        return connection
+
+    def _discard(self, connection):
+        with self._lock:
+            self._created_at.pop(id(connection), None)
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def get_connection(self, timeout=CHECKOUT_TIMEOUT):
+        """Check out a connection, waiting up to `timeout` seconds for a free slot"""
+        if self._closed:
+            raise Error("Connection pool is closed")
+
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=timeout):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            POOL_CHECKOUT_TIMEOUTS.inc()
+            raise PoolTimeoutError(f"No database connection available after {timeout}s ({self.size} in use)")
+        waited = time.monotonic() - start
+        POOL_CHECKOUT_WAIT.observe(waited)
+
+        try:
+            connection = None
+            while connection is None:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    connection = self._connect()
+                    break
+
+                candidate, last_used = entry
+                if time.monotonic() - last_used > VALIDATE_AFTER_IDLE:
+                    with self._lock:
+                        self._stats["validations"] += 1
+                    try:
+                        candidate.ping(reconnect=False)
+                    except Exception:
+                        with self._lock:
+                            self._stats["validation_failures"] += 1
+                        self._discard(candidate)
+                        continue
+                connection = candidate
+        except Exception:
+            self._slots.release()
+            raise
+
+        stack = "".join(traceback.format_stack(limit=12)[:-2])
+        proxy = PooledConnection(self, connection, stack)
+
+        elapsed_ms = (time.monotonic() - start) * 1000
+        waited_ms = waited * 1000
+        with self._lock:
+            self._in_use[id(proxy)] = proxy
+            stats = self._stats
+            stats["checkouts"] += 1
+            stats["checkout_ms_total"] += elapsed_ms
+            stats["checkout_ms_max"] = max(stats["checkout_ms_max"], elapsed_ms)
+            stats["wait_ms_total"] += waited_ms
+            stats["wait_ms_max"] = max(stats["wait_ms_max"], waited_ms)
+            self._checkout_samples.append(elapsed_ms)
+        return proxy
+
+    def _release(self, proxy, leaked=False):
+        """Return a connection to the pool; called by PooledConnection.close()"""
+        connection = proxy._raw
+        with self._lock:
+            self._in_use.pop(id(proxy), None)
+            created_at = self._created_at.get(id(connection), 0)
+            if leaked:
+                self._record_leak(proxy, "garbage collected without close()")
+
+        try:
+            reusable = not self._closed and connection.is_connected()
+            if reusable and connection.in_transaction:
+                # Never hand an open transaction to the next caller
+                connection.rollback()
+            if reusable and time.monotonic() - created_at > MAX_CONNECTION_AGE:
+                with self._lock:
+                    self._stats["recycled"] += 1
+                reusable = False
+        except Exception:
+            reusable = False
+
+        if reusable:
+            with self._lock:
+                self._idle.append((connection, time.monotonic()))
+        else:
+            self._discard(connection)
+        self._slots.release()
+
+    def _record_leak(self, proxy, reason):
+        # Caller holds self._lock
+        held = time.monotonic() - proxy._checked_out_at
+        self._stats["leaked"] += 1
+        self._leaks.append({
+            "reason": reason,
+            "held_seconds": round(held, 1),
+            "detected_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "stack": proxy._checkout_stack
+        })
+        logger.warning(f"Possible connection leak ({reason}, held {held:.1f}s). Checked out at:\n{proxy._checkout_stack}")
+
+    def check_leaks(self):
+        """Report connections held longer than LEAK_THRESHOLD"""
+        now = time.monotonic()
+        with self._lock:
+            for proxy in list(self._in_use.values()):
+                if not proxy._leak_reported and now - proxy._checked_out_at > LEAK_THRESHOLD:
+                    proxy._leak_reported = True
+                    self._record_leak(proxy, f"held longer than {LEAK_THRESHOLD}s")
+
+    def stats(self):
+        """Snapshot of pool counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            samples = sorted(self._checkout_samples)
+            checkouts = stats["checkouts"] or 1
+            stats.update({
+                "size": self.size,
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "open": len(self._created_at),
+                "checkout_ms_avg": round(stats["checkout_ms_total"] / checkouts, 3),
+                "checkout_ms_p95": round(samples[int(len(samples) * 0.95) - 1], 3) if samples else 0,
+                "wait_ms_avg": round(stats["wait_ms_total"] / checkouts, 3),
+                "recent_leaks": list(self._leaks),
+            })
+        return stats
+
+    def close(self):
+        """Close idle connections and stop handing out new ones"""
+        self._closed = True
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for connection, _ in idle:
+            self._discard(connection)
+
+
 connection_pool = None
-connection_lock = threading.RLock()  # Add a lock for thread safety
-active_connections = set()  # Track active connections
-last_cleanup_time = time.time()
+connection_lock = threading.RLock()
+_monitor_timer = None
 
 def init_connection_pool():
     """Initialize the database connection pool"""
-    global connection_pool, last_cleanup_time
+    global connection_pool
     with connection_lock:
-        try:
-            if connection_pool is not None:
-                # Try to close any existing connections in the pool
-                logger.info("Cleaning up existing connection pool...")
-                try:
-                    connection_pool._remove_connections()
-                except:
-                    logger.warning("Could not clean up existing connection pool, recreating...")
-            
-            # Force garbage collection to clean up any lingering connections
-            gc.collect()
-            
-            # Create a new connection pool
-            connection_pool = mysql.connector.pooling.MySQLConnectionPool(
-                pool_name="inventory_pool",
-                pool_size=32,  # Set to maximum allowed value (32)
-                pool_reset_session=True,
-                autocommit=False,
-                **DB_CONFIG
-            )
-            
-            # Reset active connections tracking
-            active_connections.clear()
-            
-            # Reset cleanup timer
-            last_cleanup_time = time.time()
-            
-            logger.info("Database connection pool initialized successfully")
-        except Error as e:
-            logger.error(f"Error initializing database connection pool: {e}")
-            raise
+        if connection_pool is not None:
+            return connection_pool
+        connection_pool = ConnectionPool(size=POOL_SIZE, **DB_CONFIG)
+        logger.info(f"Database connection pool initialized (size={POOL_SIZE})")
+        return connection_pool
 
-def force_cleanup_connections():
-    """Force cleanup of all active connections"""
-    global active_connections
-    with connection_lock:
-        cleanup_count = 0
-        remove_list = []
-        
-        # First collect dead connections
-        for conn in active_connections:
-            try:
-                if not conn.is_connected():
-                    remove_list.append(conn)
-                    cleanup_count += 1
-            except:
-                # If we can't check, assume it's dead
-                remove_list.append(conn)
-                cleanup_count += 1
-        
-        # Then remove them from the set
-        for conn in remove_list:
-            try:
-                conn.close()
-            except:
-                pass
-            active_connections.discard(conn)
-        
-        # If we're still over 25 connections, force close the oldest
-        if len(active_connections) > 25:
-            extra_to_close = len(active_connections) - 25
-            close_list = list(active_connections)[:extra_to_close]
-            
-            for conn in close_list:
-                try:
-                    conn.close()
-                    active_connections.discard(conn)
-                    cleanup_count += 1
-                except:
-                    pass
-        
-        if cleanup_count > 0:
-            logger.info(f"Forced cleanup of {cleanup_count} connections. Active: {len(active_connections)}")
-        
-        return cleanup_count
+def _get_pool():
+    if connection_pool is None:
+        init_connection_pool()
+    return connection_pool
+
+def get_pool_stats():
+    """Return pool counters, or an empty dict if the pool isn't initialized"""
+    return connection_pool.stats() if connection_pool is not None else {}
+
+def _pool_occupancy():
+    stats = get_pool_stats()
+    return {state: stats.get(state, 0) for state in ("in_use", "idle", "open")}
+
+gauge("db_pool_connections", "Pooled database connections by state", ("state",), callback=_pool_occupancy)
+
+def close_connection_pool():
+    """Close the connection pool on shutdown"""
+    global _monitor_timer
+    if _monitor_timer is not None:
+        _monitor_timer.cancel()
+        _monitor_timer = None
+    if connection_pool is not None:
+        connection_pool.close()
+        logger.info("Database connection pool closed")
 
 def test_connection():
     """Test database connection and return True if successful, False otherwise"""
@@ -129,112 +332,27 @@ def test_connection():
         return False
 
 def get_db():
-    """Get a connection from the pool and ensure it's properly closed after use"""
-    global connection_pool, active_connections, last_cleanup_time
-    
-    # Check if we need to do periodic cleanup (every 5 seconds max)
-    current_time = time.time()
-    if current_time - last_cleanup_time > 5:
-        with connection_lock:
-            if current_time - last_cleanup_time > 5:  # Double-check after lock
-                force_cleanup_connections()
-                last_cleanup_time = current_time
-    
-    if connection_pool is None:
-        with connection_lock:
-            if connection_pool is None:  # Double-check after acquiring lock
-                init_connection_pool()
-    
-    # If we're above 28 active connections, force cleanup before continuing
-    if len(active_connections) > 28:
-        with connection_lock:
-            if len(active_connections) > 28:  # Double-check after lock
-                force_cleanup_connections()
-    
-    # Retry logic for getting a connection
-    max_retries = 5
-    retry_delay = 0.5  # seconds
-    
-    for attempt in range(max_retries):
-        try:
-            connection = connection_pool.get_connection()
-            connection.autocommit = False  # Ensure we have explicit transaction control
-            
-            # Test that the connection is actually valid
-            try:
-                cursor = connection.cursor()
-                cursor.execute("SELECT 1")
-                cursor.fetchone()
-                cursor.close()
-                
-                # Add to active connections set
-                with connection_lock:
-                    active_connections.add(connection)
-                
-                return connection
-            except Error as conn_test_error:
-                logger.warning(f"Got invalid connection from pool: {conn_test_error}")
-                try:
-                    connection.close()
-                except:
-                    pass
-                raise
-                
-        except Error as e:
-            if "pool exhausted" in str(e).lower():
-                logger.warning(f"Connection pool exhausted on attempt {attempt+1}/{max_retries}")
-                
-                # Try cleaning up before creating a direct connection
-                cleaned = force_cleanup_connections()
-                
-                # If we cleaned up some connections, try the pool again
-                if cleaned > 0 and attempt < max_retries - 1:
-                    continue
-                    
-                # If we're at the last attempt, create a direct connection
-                if attempt == max_retries - 1:
-                    logger.warning("Creating temporary direct connection due to pool exhaustion")
-                    try:
-                        temp_conn = mysql.connector.connect(**DB_CONFIG)
-                        temp_conn.autocommit = False
-                        
-                        # Add to active connections for tracking
-                        with connection_lock:
-                            active_connections.add(temp_conn)
-                            
-                        return temp_conn
-                    except Error as direct_conn_error:
-                        logger.error(f"Failed to create direct connection: {direct_conn_error}")
-            
-            if attempt < max_retries - 1:
-                logger.warning(f"Connection pool retry {attempt+1}/{max_retries}: {e}")
-                time.sleep(retry_delay)
-                # Exponential backoff
-                retry_delay *= 2
-            else:
-                logger.error(f"Error getting database connection from pool after {max_retries} retries: {e}")
-                # If all retries fail, try to re-initialize the pool
-                try:
-                    with connection_lock:
-                        init_connection_pool()
-                    connection = connection_pool.get_connection()
-                    connection.autocommit = False
-                    
-                    # Add to active connections
-                    with connection_lock:
-                        active_connections.add(connection)
-                        
-                    return connection
-                except Error as reinit_error:
-                    logger.error(f"Failed to reinitialize connection pool: {reinit_error}")
-                    raise
+    """
+    FastAPI dependency that yields a pooled connection and always returns it.
+    Runs in FastAPI's thread pool, so waiting for a free connection doesn't
+    block the event loop.
+    """
+    try:
+        connection = _get_pool().get_connection()
+    except PoolTimeoutError as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=503, detail="Database is busy, please retry")
+    try:
+        yield connection
+    finally:
+        connection.close()
 
 @contextlib.contextmanager
 def db_connection():
     """Context manager for database connections to ensure proper release"""
     connection = None
     try:
-        connection = get_db()
+        connection = get_db_connection()
         yield connection
         # If no exception occurs, commit the transaction
         try:
@@ -255,268 +373,34 @@ def db_connection():
         raise
     finally:
         if connection:
-            try:
-                # Remove from active connections set
-                with connection_lock:
-                    active_connections.discard(connection)
-                
-                connection.close()
-                logger.debug("Connection closed and returned to pool")
-            except Error as e:
-                logger.error(f"Error closing database connection: {e}")
-                # Force pool cleanup if connections are problematic
-                if "MySQL Connection not available" in str(e) or "pool exhausted" in str(e):
-                    try:
-                        with connection_lock:
-                            init_connection_pool()
-                    except:
-                        logger.error("Failed to reinitialize connection pool during cleanup")
-
-def db_transaction(func):
-    """Decorator to handle database transactions"""
-    @wraps(func)
-    async def wrapper(*args, **kwargs):
-        with db_connection() as conn:
-            # Replace the db dependency with our connection
-            for i, arg in enumerate(args):
-                if arg.__class__.__name__ == 'MySQLConnection':
-                    args = list(args)
-                    args[i] = conn
-                    args = tuple(args)
-                    break
-            else:
-                if 'db' in kwargs:
-                    kwargs['db'] = conn
-                else:
-                    kwargs['db'] = conn
-            
-            return await func(*args, **kwargs)
-    return wrapper
+            connection.close()
 
 def get_db_connection():
     """
-    Get a direct database connection (not from pool)
-    For use in functions that don't use the dependency injection pattern
-    WARNING: This bypasses the connection pool. Make sure to close the connection manually!
+    Check out a pooled connection for code that doesn't use dependency injection.
+    Call close() when done to return it to the pool.
     """
-    try:
-        # First, try to get a connection from the pool
-        if connection_pool is not None:
-            try:
-                conn = connection_pool.get_connection()
-                
-                # Add to active connections
-                with connection_lock:
-                    active_connections.add(conn)
-                    
-                return conn
-            except Error as pool_error:
-                logger.warning(f"Could not get connection from pool, creating direct connection: {pool_error}")
-        
-        # If pool is not available or failed, create direct connection
-        connection = mysql.connector.connect(**DB_CONFIG)
-        logger.warning("Direct database connection created. Ensure it's properly closed!")
-        
-        # Add to active connections
-        with connection_lock:
-            active_connections.add(connection)
-            
-        return connection
-    except Error as e:
-        logger.error(f"Error connecting to database: {e}")
-        raise
-
-def ensure_tables_exist():
-    """
-    Ensure that all necessary database tables exist
-    """
-    try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        
-        # First, ensure the database exists
-        cursor.execute("CREATE DATABASE IF NOT EXISTS cafe_beata")
-        cursor.execute("USE cafe_beata")
-        
-        # Create category table if it doesn't exist
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS category (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            CategoryName VARCHAR(100) NOT NULL,
-            CategoryType VARCHAR(50) NOT NULL,
-            Icon VARCHAR(50),
-            CreatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        
-        # Create suppliers table if it doesn't exist
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS suppliers (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            SupplierName VARCHAR(255) NOT NULL,
-            ContactPerson VARCHAR(255),
-            ContactNumber VARCHAR(20),
-            Email VARCHAR(255),
-            Address TEXT,
-            Status ENUM('Active', 'Inactive') DEFAULT 'Active',
-            CreatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        
-        # Create a category for Ready-Made products if it doesn't exist
-        cursor.execute("""
-        INSERT IGNORE INTO category (CategoryName, CategoryType, Icon)
-        VALUES ('Ready Made', 'Product', 'coffee')
-        """)
-        
-        # Check and create inventoryproduct table if it doesn't exist
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS inventoryproduct (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            ProductName VARCHAR(255) NOT NULL,
-            ItemCode VARCHAR(50) NOT NULL,
-            Description TEXT,
-            Price DECIMAL(10, 2) NOT NULL DEFAULT 0.00,
-            Quantity INT NOT NULL DEFAULT 0,
-            Threshold INT NOT NULL DEFAULT 0,
-            InStock ENUM('Yes', 'No') NOT NULL DEFAULT 'No',
-            SupplierID INT,
-            CategoryID INT,
-            ProcessType VARCHAR(50) DEFAULT 'Standard',
-            ProductImage VARCHAR(255),
-            CreatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UpdatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-        )
-        """)
-        
-        # Drop existing stock_adjustments table if it exists to avoid foreign key issues
-        cursor.execute("DROP TABLE IF EXISTS stock_adjustments")
-        
-        # Create the stock_adjustments table with simplified foreign key
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS stock_adjustments (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            product_id INT NOT NULL,
-            previous_quantity INT NOT NULL,
-            new_quantity INT NOT NULL,
-            action VARCHAR(20) NOT NULL,
-            reason TEXT,
-            adjustment_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            INDEX idx_product_id (product_id)
-        )
-        """)
-        
-        # Drop existing stockin table if it exists to avoid foreign key issues
-        cursor.execute("DROP TABLE IF EXISTS stockin")
-        
-        # Create the stockin table with simplified foreign key
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS stockin (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            ProductID INT NOT NULL,
-            Quantity INT NOT NULL,
-            UnitCost DECIMAL(10, 2) NOT NULL,
-            TotalCost DECIMAL(10, 2) NOT NULL,
-            ExpiryDate DATE,
-            InvoiceNumber VARCHAR(50),
-            StockImage VARCHAR(255),
-            Notes TEXT,
-            DateStocked TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            INDEX idx_product_id (ProductID)
-        )
-        """)
-        
-        # Create users table if it doesn't exist
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            username VARCHAR(50) NOT NULL UNIQUE,
-            password VARCHAR(255) NOT NULL,
-            role VARCHAR(20) NOT NULL DEFAULT 'cafe_staff',
-            profile_pic VARCHAR(255),
-            date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        
-        # Create report tables if they don't exist
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS inventory_reports (
-            ReportID INT AUTO_INCREMENT PRIMARY KEY,
-            ProductID INT,
-            ProductName VARCHAR(255),
-            Quantity INT,
-            UnitPrice DECIMAL(10, 2),
-            CategoryID INT,
-            Status VARCHAR(50),
-            ReportDate TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            Image VARCHAR(255)
-        )
-        """)
-        
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS stock_reports (
-            ReportID INT AUTO_INCREMENT PRIMARY KEY,
-            StockID INT,
-            StockName VARCHAR(255),
-            Quantity INT,
-            CostPrice DECIMAL(10, 2),
-            SupplierID INT,
-            Status VARCHAR(50),
-            ReportDate TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            Image VARCHAR(255)
-        )
-        """)
-        
-        # Create categories table if it doesn't exist
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS categories (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            CategoryName VARCHAR(255) NOT NULL,
-            ImagePath VARCHAR(255),
-            CreatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        
-        connection.commit()
-        logger.info("Database tables verified and created if needed")
-        
-        cursor.close()
-        connection.close()
-        
-        # Call the function to ensure users are set up
-        try:
-            from .users import ensure_users_table_exists
-            ensure_users_table_exists()
-        except Exception as e:
-            logger.error(f"Error in user setup, but continuing: {e}")
-        
-    except Error as e:
-        logger.error(f"Error ensuring tables exist: {e}")
-        # Don't re-raise, just log the error
-        # This allows the application to continue even if table setup fails
+    return _get_pool().get_connection()
 
-def cleanup_connection_pool():
-    """Periodically cleanup the connection pool to prevent stale connections"""
-    global connection_pool
-    logger.info("Running scheduled connection pool cleanup")
+def _monitor_connection_pool():
+    """Periodically report connections that have been held too long"""
+    global _monitor_timer
     try:
-        with connection_lock:
-            force_cleanup_connections()
-            if connection_pool is not None:
-                # Get all active connections and close them
-                logger.info("Reinitializing connection pool...")
-                init_connection_pool()
+        if connection_pool is not None:
+            connection_pool.check_leaks()
     except Exception as e:
-        logger.error(f"Error during connection pool cleanup: {e}")
+        logger.error(f"Error checking connection pool for leaks: {e}")
     finally:
-        # Schedule the next cleanup in 5 minutes (reduced from 10)
-        cleanup_thread = threading.Timer(300, cleanup_connection_pool)
-        cleanup_thread.daemon = True
-        cleanup_thread.start()
-
-def start_connection_pool_cleanup():
-    """Start the periodic connection pool cleanup"""
-    cleanup_thread = threading.Timer(300, cleanup_connection_pool)  # Run every 5 minutes
-    cleanup_thread.daemon = True
-    cleanup_thread.start()
-    logger.info("Connection pool cleanup scheduler started")
\ No newline at end of file
+        _monitor_timer = threading.Timer(MONITOR_INTERVAL, _monitor_connection_pool)
+        _monitor_timer.daemon = True
+        _monitor_timer.start()
+
+def start_connection_pool_monitor():
+    """Start the periodic leak check for the connection pool"""
+    global _monitor_timer
+    if _monitor_timer is not None:
+        return
+    _monitor_timer = threading.Timer(MONITOR_INTERVAL, _monitor_connection_pool)
+    _monitor_timer.daemon = True
+    _monitor_timer.start()
+    logger.info("Connection pool leak monitor started")
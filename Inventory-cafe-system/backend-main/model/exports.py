@@ -0,0 +1,289 @@
+# model/exports.py
+"""
+Streaming exports of reports and history tables as NDJSON or CSV.
+
+Rows are read from an unbuffered (server-side) cursor in chunks of
+EXPORT_CHUNK_ROWS and written to a StreamingResponse as they arrive, so
+memory stays flat regardless of result size and the first bytes go out as
+soon as MySQL starts returning rows.
+
+Each export uses its own connection outside the pool: a long download must
+not hold a pool slot (or trip the leak monitor), and a client that
+disconnects halfway leaves unread rows that are easiest to discard by
+dropping the connection.
+"""
+import csv
+import io
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Callable, Iterable, Iterator, List, Optional
+
+import mysql.connector
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from model.db import DB_CONFIG
+from model.indexes import date_span, day_range
+
+logger = logging.getLogger("inventory-system-backend")
+
+ExportRouter = APIRouter(tags=["Exports"])
+
+EXPORT_CHUNK_ROWS = 500
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _close_export_connection(connection):
+    try:
+        connection.close()
+    except Exception:
+        # Unread rows (client went away mid-export): drop the socket instead
+        try:
+            connection.shutdown()
+        except Exception:
+            pass
+
+
+def iter_rows(query: str, params=()) -> Iterator[dict]:
+    """Yield rows one at a time from an unbuffered cursor on a dedicated connection"""
+    connection = mysql.connector.connect(**DB_CONFIG)
+    try:
+        cursor = connection.cursor(dictionary=True, buffered=False)
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+            if not rows:
+                break
+            for row in rows:
+                yield {name: _value(value) for name, value in row.items()}
+        cursor.close()
+    finally:
+        _close_export_connection(connection)
+
+
+def ndjson_stream(records: Iterable[dict], name: str) -> Iterator[str]:
+    """One JSON object per line; an error after streaming started is reported as a final line"""
+    batch = []
+    try:
+        for record in records:
+            batch.append(json.dumps(record, default=str))
+            if len(batch) >= EXPORT_CHUNK_ROWS:
+                yield "\n".join(batch) + "\n"
+                batch = []
+        if batch:
+            yield "\n".join(batch) + "\n"
+    except Exception as e:
+        logger.error(f"Error streaming {name} export: {str(e)}")
+        if batch:
+            yield "\n".join(batch) + "\n"
+        yield json.dumps({"error": f"Export interrupted: {str(e)}"}) + "\n"
+
+
+def csv_stream(records: Iterable[dict], columns: List[str], name: str) -> Iterator[str]:
+    """Header first (sent before the query runs), then rows in chunks"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    yield buffer.getvalue()
+
+    def drain():
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return chunk
+
+    drain()
+    count = 0
+    try:
+        for record in records:
+            writer.writerow(record)
+            count += 1
+            if count % EXPORT_CHUNK_ROWS == 0:
+                yield drain()
+    except Exception as e:
+        logger.error(f"Error streaming {name} export: {str(e)}")
+    remainder = drain()
+    if remainder:
+        yield remainder
+
+
+def export_response(records: Iterable[dict], columns: List[str], fmt: str, name: str,
+                    nested: Optional[Callable[[Iterable[dict]], Iterable[dict]]] = None):
+    """
+    Build the StreamingResponse. `records` are flat rows (used as-is for CSV);
+    `nested` optionally reshapes them for NDJSON, e.g. grouping order lines.
+    """
+    fmt = fmt.lower()
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{fmt}'. Use ndjson or csv")
+
+    filename = f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    if fmt == "csv":
+        body = csv_stream(records, columns, name)
+    else:
+        body = ndjson_stream(nested(records) if nested else records, name)
+    return StreamingResponse(
+        body,
+        media_type=FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+def _parse_span(start_date: Optional[str], end_date: Optional[str]):
+    try:
+        return date_span(start_date, end_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+
+
+INVENTORY_REPORT_COLUMNS = [
+    "ReportID", "ProductID", "ProductName", "Quantity", "UnitPrice",
+    "CategoryID", "CategoryName", "Status", "ReportDate", "Image"
+]
+
+
+@ExportRouter.get("/inventory_report")
+def export_inventory_report(
+    date: Optional[str] = Query(None, description="Only reports from this day (YYYY-MM-DD)"),
+    format: str = Query("ndjson", description="ndjson or csv")
+):
+    """Every inventory_reports row (or one day's), newest first"""
+    query = """
+        SELECT
+            ir.ReportID, ir.ProductID, ir.ProductName, ir.Quantity, ir.UnitPrice,
+            ir.CategoryID, c.CategoryName, ir.Status, ir.ReportDate, ir.Image
+        FROM inventory_reports ir
+        LEFT JOIN categories c ON ir.CategoryID = c.id
+    """
+    params = ()
+    if date:
+        try:
+            params = day_range(date)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+        query += " WHERE ir.ReportDate >= %s AND ir.ReportDate < %s"
+    query += " ORDER BY ir.ReportDate DESC, ir.ReportID DESC"
+
+    return export_response(iter_rows(query, params), INVENTORY_REPORT_COLUMNS, format, "inventory_report")
+
+
+LOW_STOCK_COLUMNS = ["ProductID", "ProductName", "Quantity", "UnitPrice", "Threshold", "Status"]
+
+
+@ExportRouter.get("/low_stock")
+def export_low_stock(format: str = Query("ndjson", description="ndjson or csv")):
+    """Ready-Made products that are out of stock or at/below their threshold"""
+    query = """
+        SELECT
+            id AS ProductID, ProductName, Quantity,
+            CASE WHEN UnitPrice IS NULL OR UnitPrice = 0 THEN Price ELSE UnitPrice END AS UnitPrice,
+            Threshold,
+            CASE WHEN Quantity <= 0 THEN 'Out of Stock' ELSE 'Low Stock' END AS Status
+        FROM inventoryproduct
+        WHERE ProcessType = 'Ready-Made'
+          AND (Quantity <= 0 OR (Quantity <= Threshold AND Threshold > 0))
+        ORDER BY Quantity > 0, Quantity, id
+    """
+    return export_response(iter_rows(query), LOW_STOCK_COLUMNS, format, "low_stock")
+
+
+ORDER_HISTORY_COLUMNS = [
+    "history_id", "customer_name", "total_items", "total_amount", "payment_method", "created_at",
+    "product_id", "product_name", "quantity", "product_price"
+]
+ORDER_FIELDS = ORDER_HISTORY_COLUMNS[:6]
+LINE_FIELDS = ORDER_HISTORY_COLUMNS[6:]
+
+
+def _group_orders(rows: Iterable[dict]) -> Iterator[dict]:
+    """Fold consecutive order lines into one object per order with an items list"""
+    current = None
+    for row in rows:
+        if current is None or current["history_id"] != row["history_id"]:
+            if current is not None:
+                yield current
+            current = {field: row[field] for field in ORDER_FIELDS}
+            current["items"] = []
+        if row["product_id"] is not None:
+            current["items"].append({field: row[field] for field in LINE_FIELDS})
+    if current is not None:
+        yield current
+
+
+@ExportRouter.get("/order_history")
+def export_order_history(
+    start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+    format: str = Query("ndjson", description="ndjson or csv")
+):
+    """
+    Orders with their line items, newest first. NDJSON has one object per
+    order; CSV has one row per line item with the order columns repeated.
+    """
+    range_start, range_end = _parse_span(start_date, end_date)
+    query = """
+        SELECT
+            oh.history_id, oh.customer_name, oh.total_items, oh.total_amount,
+            oh.payment_method, oh.created_at,
+            d.product_id, d.product_name, d.quantity, d.product_price
+        FROM order_history oh
+        LEFT JOIN order_history_detail d ON d.order_id = oh.history_id
+        WHERE 1=1
+    """
+    params = []
+    if range_start:
+        query += " AND oh.created_at >= %s"
+        params.append(range_start)
+    if range_end:
+        query += " AND oh.created_at < %s"
+        params.append(range_end)
+    query += " ORDER BY oh.created_at DESC, oh.history_id DESC"
+
+    return export_response(
+        iter_rows(query, tuple(params)), ORDER_HISTORY_COLUMNS, format, "order_history",
+        nested=_group_orders
+    )
+
+
+STOCK_MOVEMENT_COLUMNS = ["id", "ProductID", "product_name", "transaction_type", "quantity", "created_at"]
+
+
+@ExportRouter.get("/stock_movements")
+def export_stock_movements(
+    product_id: Optional[int] = Query(None, description="Only this product"),
+    start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+    format: str = Query("ndjson", description="ndjson or csv")
+):
+    """Stock-in, deduction and adjustment history from inventory_transactions, newest first"""
+    range_start, range_end = _parse_span(start_date, end_date)
+    query = """
+        SELECT id, ProductID, product_name, transaction_type, quantity, created_at
+        FROM inventory_transactions
+        WHERE 1=1
+    """
+    params = []
+    if product_id is not None:
+        query += " AND ProductID = %s"
+        params.append(product_id)
+    if range_start:
+        query += " AND created_at >= %s"
+        params.append(range_start)
+    if range_end:
+        query += " AND created_at < %s"
+        params.append(range_end)
+    query += " ORDER BY created_at DESC, id DESC"
+
+    return export_response(iter_rows(query, tuple(params)), STOCK_MOVEMENT_COLUMNS, format, "stock_movements")
@@ -0,0 +1,171 @@
+# model/forecast_cache.py
+"""
+Cache for the forecasting endpoints.
+
+Both /forecasting/predict and /forecasting/historical-sales are computed from
+sales_daily_rollup rows for days before today, and those rows only change
+when late sales are recorded against a past day (rebuild_sales_rollup,
+manual corrections). Results are cached per (kind, param, as_of_date) and
+tagged with the data_version they were computed from: a fingerprint of the
+rollup rows for the DATA_WINDOW days before as_of_date. An entry is only
+valid for its data_version.
+
+- A request is answered from today's entry without touching the database.
+  If the entry hasn't been checked for REVALIDATE_AFTER seconds, a
+  background refresh recomputes data_version and rebuilds the entry only
+  if it moved (stale-while-revalidate). A changed fingerprint is how late
+  sales invalidate the cache, whichever process wrote them.
+- With no entry for today yet, the request waits for the computation;
+  concurrent requests for the same key share one.
+- precompute() builds today's entries for every key used the day before.
+  create_daily_inventory_snapshot() calls it right after the nightly
+  snapshot, so the first dashboard load of the day is already cached.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Set, Tuple
+
+from beata_common.openmetrics import SYNC_DURATION, counter
+
+from model.async_db import run_with_connection
+from model.forecasting import build_forecast, daily_sales_totals
+
+logger = logging.getLogger("sales")
+
+DATA_WINDOW = 90                # Longest history either endpoint reads
+REVALIDATE_AFTER = 60           # Seconds an entry is served without re-checking data_version
+DEFAULT_KEYS = {("predict", 7), ("historical", 60)}    # What the dashboard requests
+
+CACHE_LOOKUPS = counter(
+    "forecast_cache_lookups", "Forecast cache lookups by outcome (hit, stale, miss)", ("result",))
+
+DATA_VERSION_QUERY = """
+    SELECT COUNT(*), COALESCE(SUM(sale_count), 0), COALESCE(SUM(quantity_sold), 0),
+           COALESCE(SUM(remitted), 0), MAX(last_sale_at)
+    FROM sales_daily_rollup
+    WHERE sale_date BETWEEN %s AND %s
+"""
+
+
+def data_version(db, as_of: date) -> str:
+    """Fingerprint of the rollup rows any cached result for as_of can depend on"""
+    cursor = db.cursor()
+    try:
+        cursor.execute(DATA_VERSION_QUERY, (as_of - timedelta(days=DATA_WINDOW), as_of - timedelta(days=1)))
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    return hashlib.sha1(repr(tuple(row)).encode()).hexdigest()[:12]
+
+
+def historical_sales(db, days: int, as_of: date) -> list:
+    """Daily totals for the `days` days before as_of"""
+    return daily_sales_totals(db, as_of - timedelta(days=days), as_of - timedelta(days=1))
+
+
+COMPUTE = {
+    "predict": build_forecast,
+    "historical": historical_sales,
+}
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    data_version: str
+    checked_at: float           # time.monotonic() of the last data_version check
+
+
+def _load(connection, kind: str, param: int, as_of: date, known_version):
+    """Returns (data_version, value); value is None when known_version is still current"""
+    version = data_version(connection, as_of)
+    if version == known_version:
+        return version, None
+    return version, COMPUTE[kind](connection, param, as_of)
+
+
+class ForecastCache:
+    def __init__(self):
+        self._entries: Dict[Tuple[str, int, date], CacheEntry] = {}
+        self._refreshing: Dict[Tuple[str, int, date], asyncio.Task] = {}
+        self._used: Dict[date, Set[Tuple[str, int]]] = {}
+
+    async def get(self, kind: str, param: int):
+        as_of = datetime.now().date()
+        key = (kind, param, as_of)
+        self._used.setdefault(as_of, set()).add((kind, param))
+
+        entry = self._entries.get(key)
+        if entry is None:
+            CACHE_LOOKUPS.labels("miss").inc()
+            entry = await asyncio.shield(self._start_refresh(key))
+        elif time.monotonic() - entry.checked_at > REVALIDATE_AFTER:
+            CACHE_LOOKUPS.labels("stale").inc()
+            self._start_refresh(key)
+        else:
+            CACHE_LOOKUPS.labels("hit").inc()
+        return entry.value
+
+    def _start_refresh(self, key) -> asyncio.Task:
+        task = self._refreshing.get(key)
+        if task is None or task.done():
+            task = asyncio.create_task(self._refresh(key))
+            task.add_done_callback(self._retrieve_error)
+            self._refreshing[key] = task
+        return task
+
+    @staticmethod
+    def _retrieve_error(task: asyncio.Task):
+        # Already logged by _refresh; a failed background refresh keeps serving the old entry
+        if not task.cancelled():
+            task.exception()
+
+    async def _refresh(self, key) -> CacheEntry:
+        kind, param, as_of = key
+        entry = self._entries.get(key)
+        try:
+            with SYNC_DURATION.time("forecast_refresh"):
+                version, value = await run_with_connection(
+                    _load, kind, param, as_of, entry.data_version if entry else None)
+        except Exception as e:
+            logger.error(f"Error refreshing cached {kind} ({param}) for {as_of}: {e}")
+            raise
+
+        if value is None:
+            entry.checked_at = time.monotonic()
+            return entry
+        if entry is not None:
+            logger.info(f"Sales before {as_of} changed; recomputed cached {kind} ({param})")
+        entry = CacheEntry(value, version, time.monotonic())
+        self._entries[key] = entry
+        self._prune(as_of)
+        return entry
+
+    def _prune(self, today: date):
+        # Earlier days' results are never served again; keep yesterday's key usage for precompute()
+        for key in [key for key in self._entries if key[2] < today]:
+            del self._entries[key]
+        for key in [key for key, task in self._refreshing.items() if key[2] < today and task.done()]:
+            del self._refreshing[key]
+        for day in [day for day in self._used if day < today - timedelta(days=1)]:
+            del self._used[day]
+
+    async def precompute(self):
+        """Build today's entries for the keys requested yesterday (or the dashboard's defaults)"""
+        today = datetime.now().date()
+        keys = self._used.get(today - timedelta(days=1)) or DEFAULT_KEYS
+        built = 0
+        for kind, param in sorted(keys):
+            try:
+                await self._start_refresh((kind, param, today))
+                built += 1
+            except Exception:
+                continue    # Logged by _refresh; the next request will retry
+        logger.info(f"Precomputed {built} of {len(keys)} forecast cache entries for {today}")
+
+
+forecast_cache = ForecastCache()
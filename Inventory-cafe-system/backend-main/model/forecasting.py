@@ -0,0 +1,342 @@
+# model/forecasting.py
+"""
+Sales forecasting on NumPy arrays.
+
+History is read from sales_daily_rollup in one query and laid out as dense
+(products x days) matrices of quantity and revenue, zero-filled for days
+without sales. Every model below updates all products at once, one day at a
+time, so the cost is O(days) array operations regardless of SKU count:
+
+- Exponential smoothing with additive day-of-week seasonality, for products
+  that sell most days. The smoothing constant is picked per product from
+  ALPHA_GRID by in-sample one-step error, with the whole grid evaluated in
+  the same pass.
+- Croston's method (Syntetos-Boylan corrected), for intermittent demand:
+  products whose average interval between sales exceeds
+  INTERMITTENT_INTERVAL days.
+
+Each fit is backtested by refitting on all but the last BACKTEST_DAYS days
+and scoring those days. WAPE (sum |error| / sum actual) is reported per
+product and overall; MAPE only over days with sales, where it is defined.
+
+Only days before as_of are read, so results are cacheable for the whole day;
+see model/forecast_cache.py.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("sales")
+
+HISTORY_DAYS = 56               # Eight full weeks of day-of-week history
+BACKTEST_DAYS = 7
+SEASON = 7
+ALPHA_GRID = np.array([0.05, 0.1, 0.2, 0.3, 0.5])
+SEASONAL_GAMMA = 0.1
+CROSTON_ALPHA = 0.1
+INTERMITTENT_INTERVAL = 1.32    # Average days between sales above which demand is "intermittent"
+MAX_CONFIDENCE = 95
+
+HISTORY_QUERY = """
+    SELECT
+        r.product_id, r.sale_date, r.quantity_sold, r.remitted,
+        COALESCE(p.ProductName, CONCAT('Product ID: ', r.product_id)) AS product_name,
+        p.Image AS image, p.UnitPrice AS unit_price, c.CategoryName AS category_name
+    FROM sales_daily_rollup r
+    LEFT JOIN inventoryproduct p ON p.id = r.product_id
+    LEFT JOIN categories c ON c.id = p.`CategoryID (FK)`
+    WHERE r.sale_date BETWEEN %s AND %s
+"""
+
+
+@dataclass
+class SalesHistory:
+    start: date
+    product_ids: np.ndarray     # (P,)
+    quantity: np.ndarray        # (P, D) units sold per product per day
+    revenue: np.ndarray         # (P, D)
+    products: List[dict]        # Name, image, unit price and category per row
+
+    @property
+    def days(self) -> int:
+        return self.quantity.shape[1]
+
+    def dates(self, offset: int = 0, count: Optional[int] = None) -> List[date]:
+        count = self.days if count is None else count
+        return [self.start + timedelta(days=offset + i) for i in range(count)]
+
+
+def load_history(db, start: date, end: date) -> SalesHistory:
+    """Dense product x day matrices for start..end inclusive, from one query"""
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute(HISTORY_QUERY, (start, end))
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    days = (end - start).days + 1
+    index: Dict[int, int] = {}
+    products = []
+    for row in rows:
+        if row["product_id"] not in index:
+            index[row["product_id"]] = len(products)
+            products.append({
+                "id": row["product_id"],
+                "name": row["product_name"],
+                "image": row["image"],
+                "unit_price": float(row["unit_price"] or 0),
+                "category": row["category_name"] or "Uncategorized",
+            })
+
+    quantity = np.zeros((len(products), days))
+    revenue = np.zeros((len(products), days))
+    if rows:
+        product_rows = np.fromiter((index[row["product_id"]] for row in rows), dtype=np.intp, count=len(rows))
+        day_cols = np.fromiter(((row["sale_date"] - start).days for row in rows), dtype=np.intp, count=len(rows))
+        # (sale_date, product_id) is the rollup's primary key, so no cell is written twice
+        quantity[product_rows, day_cols] = [float(row["quantity_sold"] or 0) for row in rows]
+        revenue[product_rows, day_cols] = [float(row["remitted"] or 0) for row in rows]
+
+    product_ids = np.array([product["id"] for product in products], dtype=np.int64)
+    return SalesHistory(start, product_ids, quantity, revenue, products)
+
+
+def daily_sales_totals(db, start: date, end: date) -> List[dict]:
+    """Sales and items per day for start..end inclusive, days without sales omitted"""
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            SELECT
+                sale_date,
+                SUM(remitted) as daily_total,
+                SUM(quantity_sold) as items_sold
+            FROM sales_daily_rollup
+            WHERE sale_date BETWEEN %s AND %s
+            GROUP BY sale_date
+            ORDER BY sale_date ASC
+        """, (start, end))
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    return [
+        {
+            "date": row['sale_date'].strftime('%Y-%m-%d'),
+            "sales": float(row['daily_total'] or 0),
+            "items": int(row['items_sold'] or 0)
+        }
+        for row in rows
+    ]
+
+
+def seasonal_smoothing(y: np.ndarray, horizon: int, phase: int = 0,
+                       alphas: np.ndarray = ALPHA_GRID, gamma: float = SEASONAL_GAMMA) -> np.ndarray:
+    """
+    Level + additive day-of-week seasonality, fitted row-wise. `y` is
+    (P, T); returns a (P, horizon) forecast. `phase` is the weekday index of
+    column 0, so seasonal slots line up with calendar weekdays.
+    """
+    products, days = y.shape
+    if days == 0:
+        return np.zeros((products, horizon))
+    weeks = max(days // SEASON, 1)
+    head = y[:, :weeks * SEASON] if days >= SEASON else y
+
+    # Initial state from whole weeks: level = mean, season = weekday means - level
+    level0 = head.mean(axis=1)
+    season0 = np.zeros((products, SEASON))
+    if days >= SEASON:
+        season0 = head.reshape(products, weeks, SEASON).mean(axis=1) - level0[:, None]
+        season0 = np.roll(season0, phase, axis=1)   # Column k holds weekday k
+
+    # Run every alpha in the grid at once: state is (A, P)
+    a = alphas[:, None]
+    level = np.broadcast_to(level0, (len(alphas), products)).copy()
+    season = np.broadcast_to(season0, (len(alphas), products, SEASON)).copy()
+    sse = np.zeros((len(alphas), products))
+    for t in range(days):
+        slot = (phase + t) % SEASON
+        observed = y[:, t]
+        error = observed - (level + season[:, :, slot])
+        sse += error * error
+        new_level = level + a * error
+        season[:, :, slot] += gamma * (observed - new_level - season[:, :, slot])
+        level = new_level
+
+    best = sse.argmin(axis=0)                      # (P,) best alpha per product
+    rows = np.arange(products)
+    level, season = level[best, rows], season[best, rows]
+    slots = (phase + days + np.arange(horizon)) % SEASON
+    return np.maximum(level[:, None] + season[:, slots], 0.0)
+
+
+def croston(y: np.ndarray, horizon: int, alpha: float = CROSTON_ALPHA) -> np.ndarray:
+    """
+    Croston's method with the Syntetos-Boylan bias correction, fitted
+    row-wise: smoothed demand size over smoothed interval between sales.
+    Returns a flat (P, horizon) forecast of the expected daily rate.
+    """
+    products, days = y.shape
+    nonzero = y > 0
+    has_sales = nonzero.any(axis=1)
+    first = np.where(has_sales, nonzero.argmax(axis=1), 0)
+    rows = np.arange(products)
+
+    size = np.where(has_sales, y[rows, first], 0.0)
+    interval = (first + 1).astype(float)
+    since_last = np.ones(products)
+    for t in range(days):
+        sold = nonzero[:, t] & (t > first)
+        size = np.where(sold, size + alpha * (y[:, t] - size), size)
+        interval = np.where(sold, interval + alpha * (since_last - interval), interval)
+        since_last = np.where(sold, 1.0, since_last + 1.0)
+
+    rate = np.where(has_sales, (1 - alpha / 2) * size / np.maximum(interval, 1.0), 0.0)
+    return np.repeat(rate[:, None], horizon, axis=1)
+
+
+def is_intermittent(y: np.ndarray) -> np.ndarray:
+    """Average days between sales above INTERMITTENT_INTERVAL"""
+    sale_days = (y > 0).sum(axis=1)
+    return y.shape[1] / np.maximum(sale_days, 1) > INTERMITTENT_INTERVAL
+
+
+def fit_forecast(y: np.ndarray, horizon: int, phase: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Forecast every row with the model suited to it; returns (forecast, intermittent mask)"""
+    intermittent = is_intermittent(y)
+    forecast = seasonal_smoothing(y, horizon, phase)
+    if intermittent.any():
+        forecast[intermittent] = croston(y[intermittent], horizon)
+    return forecast, intermittent
+
+
+def backtest(y: np.ndarray, phase: int = 0, holdout: int = BACKTEST_DAYS) -> dict:
+    """Refit on all but the last `holdout` days and score those days"""
+    products, days = y.shape
+    if days <= holdout + SEASON:
+        return {"wape": np.full(products, np.nan), "overall_wape": None, "overall_mape": None}
+
+    train, actual = y[:, :-holdout], y[:, -holdout:]
+    predicted, _ = fit_forecast(train, holdout, phase)
+    error = np.abs(predicted - actual)
+    actual_total = actual.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        wape = np.where(actual_total > 0, error.sum(axis=1) / actual_total, np.nan)
+    sold = actual > 0
+    overall_wape = float(error.sum() / actual.sum()) if actual.sum() > 0 else None
+    overall_mape = float((error[sold] / actual[sold]).mean()) if sold.any() else None
+    return {"wape": wape, "overall_wape": overall_wape, "overall_mape": overall_mape}
+
+
+def _percent_change(new: float, old: float) -> float:
+    return round((new / old - 1) * 100, 1) if old > 0 else 0.0
+
+
+def build_forecast(db, days_ahead: int, as_of: Optional[date] = None) -> dict:
+    """
+    Forecast the `days_ahead` days starting at `as_of` (today) from the
+    HISTORY_DAYS complete days before it. Same response shape as
+    GET /api/sales/forecasting/predict has always returned, plus backtest
+    error metrics.
+    """
+    as_of = as_of or datetime.now().date()
+    end = as_of - timedelta(days=1)
+    start = end - timedelta(days=HISTORY_DAYS - 1)
+    history = load_history(db, start, end)
+
+    if not history.products:
+        return {
+            "historical_data": [],
+            "forecast_data": [],
+            "product_forecasts": [],
+            "metrics": {
+                "predicted_sales_total": 0,
+                "sales_growth_rate": 0,
+                "predicted_orders": 0,
+                "orders_growth_rate": 0,
+                "top_category": "",
+                "top_category_items": 0,
+                "wape": None,
+                "mape": None,
+                "backtest_days": BACKTEST_DAYS,
+            }
+        }
+
+    phase = start.weekday()
+    quantity = history.quantity
+    predicted_qty, intermittent = fit_forecast(quantity, days_ahead, phase)
+    scores = backtest(quantity, phase)
+
+    # Revenue at each product's realised average price over the window
+    sold_qty = quantity.sum(axis=1)
+    unit_price = np.array([product["unit_price"] for product in history.products])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avg_price = np.where(sold_qty > 0, history.revenue.sum(axis=1) / sold_qty, unit_price)
+    predicted_revenue = predicted_qty * avg_price[:, None]
+
+    # Compare with the same number of days just before as_of
+    recent = min(days_ahead, history.days)
+    current_revenue = history.revenue[:, -recent:].sum(axis=1)
+    current_items = quantity[:, -recent:].sum(axis=1)
+    product_predicted = predicted_revenue.sum(axis=1)
+
+    daily_revenue = history.revenue.sum(axis=0)
+    daily_items = quantity.sum(axis=0)
+    historical_data = [
+        {"date": day.strftime('%Y-%m-%d'), "sales": round(float(sales), 2), "items": int(items)}
+        for day, sales, items in zip(history.dates(), daily_revenue, daily_items)
+    ]
+    forecast_days = [as_of + timedelta(days=i) for i in range(days_ahead)]
+    forecast_data = [
+        {"date": day.strftime('%Y-%m-%d'), "sales": round(float(sales), 2), "items": round(float(items), 0)}
+        for day, sales, items in zip(forecast_days, predicted_revenue.sum(axis=0), predicted_qty.sum(axis=0))
+    ]
+
+    product_forecasts = []
+    for i in np.argsort(-product_predicted):
+        product = history.products[i]
+        wape = scores["wape"][i]
+        confidence = 0.0 if np.isnan(wape) else min(MAX_CONFIDENCE, max(0.0, float(1 - wape) * 100))
+        product_forecasts.append({
+            "id": product["id"],
+            "name": product["name"],
+            "image": f"/uploads/products/{product['image']}" if product["image"] else None,
+            "category": product["category"],
+            "current_sales": round(float(current_revenue[i]), 2),
+            "predicted_sales": round(float(product_predicted[i]), 2),
+            "predicted_items": round(float(predicted_qty[i].sum()), 1),
+            "growth_rate": _percent_change(float(product_predicted[i]), float(current_revenue[i])),
+            "confidence": round(confidence, 0),
+            "model": "croston" if intermittent[i] else "seasonal_smoothing",
+            "wape": None if np.isnan(wape) else round(float(wape), 3),
+        })
+
+    # Top category by predicted revenue
+    categories = np.array([product["category"] for product in history.products])
+    names, inverse = np.unique(categories, return_inverse=True)
+    category_revenue = np.bincount(inverse, weights=product_predicted)
+    top = int(category_revenue.argmax())
+
+    predicted_total = float(product_predicted.sum())
+    predicted_items = float(predicted_qty.sum())
+    metrics = {
+        "predicted_sales_total": round(predicted_total, 2),
+        "sales_growth_rate": _percent_change(predicted_total, float(current_revenue.sum())),
+        "predicted_orders": round(predicted_items, 0),
+        "orders_growth_rate": _percent_change(predicted_items, float(current_items.sum())),
+        "top_category": str(names[top]),
+        "top_category_items": int((inverse == top).sum()),
+        "wape": None if scores["overall_wape"] is None else round(scores["overall_wape"], 3),
+        "mape": None if scores["overall_mape"] is None else round(scores["overall_mape"], 3),
+        "backtest_days": BACKTEST_DAYS,
+    }
+
+    return {
+        "historical_data": historical_data,
+        "forecast_data": forecast_data,
+        "product_forecasts": product_forecasts,
+        "metrics": metrics
+    }
@@ -0,0 +1,46 @@
+# model/idempotency.py
+"""
+Request ids for write endpoints that callers retry, such as the cafe-beata
+outbox deliveries to /stock/adjust/batch.
+
+Each id is claimed with INSERT IGNORE into a `<table>(request_id, product_id)`
+key table, in the caller's transaction and before any other row is locked.
+rowcount 0 means the id is already taken: the item is a replay and must not
+be applied again. A concurrent attempt with the same id waits on the
+uncommitted key and then sees it taken (or free, if the first attempt
+rolled back). Plain inserts only take insert-intention locks, so unlike a
+locking SELECT of ids that don't exist yet, two batches inserting into the
+same gap can't deadlock each other.
+
+    replays = claim_request_ids(cursor, "stock_adjustment_requests", items)
+    ...apply the items whose index is not in replays...
+    release_request_ids(cursor, "stock_adjustment_requests", rejected_ids)
+"""
+from typing import Iterable, Sequence, Set
+
+
+def claim_request_ids(cursor, table: str, items: Sequence) -> Set[int]:
+    """
+    Claim the request_id of every item that has one (items need request_id
+    and product_id). Returns the indexes of items whose id was already
+    claimed, by an earlier request or earlier in `items`.
+    """
+    replays = set()
+    for index, item in enumerate(items):
+        if not item.request_id:
+            continue
+        cursor.execute(
+            f"INSERT IGNORE INTO {table} (request_id, product_id) VALUES (%s, %s)",
+            (item.request_id, item.product_id)
+        )
+        if cursor.rowcount == 0:
+            replays.add(index)
+    return replays
+
+
+def release_request_ids(cursor, table: str, request_ids: Iterable[str]):
+    """Drop claims for items that were rejected, so a corrected retry is not taken for a replay"""
+    request_ids = list(request_ids)
+    if request_ids:
+        placeholders = ", ".join(["%s"] * len(request_ids))
+        cursor.execute(f"DELETE FROM {table} WHERE request_id IN ({placeholders})", request_ids)
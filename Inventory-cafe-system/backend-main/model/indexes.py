@@ -0,0 +1,90 @@
+# model/indexes.py
+"""
+Managed secondary indexes and date-range helpers.
+
+ensure_indexes() compares a list of indexes against information_schema and
+adds what is missing, skipping any index whose table or columns don't exist
+in this database. It is idempotent; migrations (model/migrations/) call it
+with the indexes they add.
+
+Queries should filter timestamps with half-open ranges built by day_range()
+or date_span() instead of wrapping the column in DATE(), so these indexes
+can be used.
+"""
+import logging
+from datetime import date, datetime, time, timedelta
+
+logger = logging.getLogger("inventory-system-backend")
+
+
+def _existing_schema(cursor):
+    cursor.execute("""
+        SELECT TABLE_NAME, COLUMN_NAME
+        FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE()
+    """)
+    columns = {}
+    for table, column in cursor.fetchall():
+        columns.setdefault(table.lower(), set()).add(column.lower())
+
+    cursor.execute("""
+        SELECT DISTINCT TABLE_NAME, INDEX_NAME
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE()
+    """)
+    indexes = {(table.lower(), name.lower()) for table, name in cursor.fetchall()}
+    return columns, indexes
+
+
+def ensure_indexes(connection, indexes):
+    """
+    Create any missing index from `indexes`, a list of (table, index name,
+    columns); returns the names that were added.
+    """
+    cursor = connection.cursor()
+    created = []
+    try:
+        existing_columns, existing_indexes = _existing_schema(cursor)
+        for table, name, index_columns in indexes:
+            table_columns = existing_columns.get(table.lower())
+            if table_columns is None:
+                logger.info(f"Skipping index {name}: table {table} does not exist")
+                continue
+            missing = [c for c in index_columns if c.lower() not in table_columns]
+            if missing:
+                logger.info(f"Skipping index {name}: {table} has no column(s) {', '.join(missing)}")
+                continue
+            if (table.lower(), name.lower()) in existing_indexes:
+                continue
+
+            column_list = ", ".join(f"`{c}`" for c in index_columns)
+            cursor.execute(f"CREATE INDEX `{name}` ON `{table}` ({column_list})")
+            created.append(name)
+            logger.info(f"Created index {name} on {table} ({column_list})")
+    finally:
+        cursor.close()
+    return created
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+
+def day_range(day):
+    """[start, end) timestamps covering one calendar day"""
+    start = datetime.combine(_as_date(day), time.min)
+    return start, start + timedelta(days=1)
+
+
+def date_span(start_date=None, end_date=None):
+    """
+    [start, end) timestamps covering start_date through end_date inclusive.
+    Either bound may be None for an open-ended range.
+    """
+    start = datetime.combine(_as_date(start_date), time.min) if start_date else None
+    end = datetime.combine(_as_date(end_date), time.min) + timedelta(days=1) if end_date else None
+    return start, end
@@ -2,6 +2,10 @@ from fastapi import APIRouter, Depends, BackgroundTasks
 from typing import List, Optional
 from pydantic import BaseModel
 from model.db import get_db, db_connection
+from model.indexes import day_range
+from model.async_db import run_with_connection
+from model.beginning_quantity import rebuild_beginning_quantities
+from model.forecast_cache import forecast_cache
 from datetime import datetime, timedelta
 import logging
 import asyncio
@@ -12,62 +16,79 @@ logger = logging.getLogger("inventory_snapshot")
 
 InventorySnapshotRouter = APIRouter(tags=["Inventory Snapshot"])
 
+def ensure_daily_snapshot(db, target_date) -> int:
+    """
+    Create the inventory snapshot for target_date unless it already exists.
+    Records beginning quantity, additions, and current quantity for each
+    product; returns the number of rows created.
+    """
+    cursor = db.cursor()
+    try:
+        day_start, day_end = day_range(target_date)
+
+        # Calculate beginning quantity (quantity at the start of the day)
+        # Additions are calculated as the sum of stock added during the day
+        cursor.execute("""
+            INSERT INTO daily_inventory_snapshot 
+            (product_id, product_name, beginning_quantity, current_quantity, additions, snapshot_date, process_type)
+            SELECT 
+                ip.id AS product_id,
+                ip.ProductName AS product_name,
+                COALESCE((
+                    SELECT Quantity 
+                    FROM stock_details 
+                    WHERE ProductID = ip.id 
+                    AND created_at < %s
+                    ORDER BY created_at DESC LIMIT 1
+                ), ip.Quantity) AS beginning_quantity,
+                ip.Quantity AS current_quantity,
+                COALESCE((
+                    SELECT SUM(quantity) 
+                    FROM stock_details 
+                    WHERE ProductID = ip.id 
+                    AND created_at >= %s AND created_at < %s
+                ), 0) AS additions,
+                %s AS snapshot_date,
+                ip.ProcessType AS process_type
+            FROM inventoryproduct ip
+            WHERE NOT EXISTS (SELECT 1 FROM daily_inventory_snapshot WHERE snapshot_date = %s)
+        """, (day_start, day_start, day_end, target_date, target_date))
+        records_created = cursor.rowcount
+        db.commit()
+        return records_created
+    finally:
+        cursor.close()
+
 async def create_daily_inventory_snapshot():
     """
-    Background task to create a daily snapshot of inventory quantities.
-    Records beginning quantity, additions, and current quantity for each product.
+    Background task that keeps a daily snapshot of inventory quantities:
+    today's at startup if it is missing, then one every midnight. Snapshots
+    are only written here, never on the request path. Each run also rebuilds
+    the last two days of daily_beginning_quantity and then precomputes the
+    day's forecast cache.
     """
     while True:
         try:
-            # Get the current time
+            today = datetime.now().date()
+            records_created = await run_with_connection(ensure_daily_snapshot, today)
+            if records_created:
+                logger.info(f"Created {records_created} inventory snapshot records for {today}")
+
+            # Re-derive yesterday's and today's beginning quantities from stock_details
+            await run_with_connection(rebuild_beginning_quantities, today - timedelta(days=1))
+
+            # Yesterday is now complete; build today's forecasts before anyone asks
+            try:
+                await forecast_cache.precompute()
+            except Exception as e:
+                logger.error(f"Error precomputing forecasts: {str(e)}")
+
+            # Sleep until midnight
             now = datetime.now()
-            # Calculate time until midnight
             tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
             seconds_until_midnight = (tomorrow - now).total_seconds()
-            
-            # Sleep until midnight
             logger.info(f"Scheduling next inventory snapshot in {seconds_until_midnight} seconds")
             await asyncio.sleep(seconds_until_midnight)
-            
-            # It's now midnight, create the inventory snapshot
-            logger.info("Creating daily inventory snapshot")
-            
-            with db_connection() as db:
-                cursor = db.cursor()
-                today = datetime.now().date()
-
-                # Calculate beginning quantity (quantity at the start of the day)
-                # Additions are calculated as the sum of stock added during the day
-                cursor.execute("""
-                    INSERT INTO daily_inventory_snapshot 
-                    (product_id, product_name, beginning_quantity, current_quantity, additions, snapshot_date, process_type)
-                    SELECT 
-                        ip.id AS product_id,
-                        ip.ProductName AS product_name,
-                        COALESCE((
-                            SELECT Quantity 
-                            FROM stock_details 
-                            WHERE ProductID = ip.id 
-                            AND DATE(created_at) < %s
-                            ORDER BY created_at DESC LIMIT 1
-                        ), ip.Quantity) AS beginning_quantity,
-                        ip.Quantity AS current_quantity,
-                        COALESCE((
-                            SELECT SUM(quantity) 
-                            FROM stock_details 
-                            WHERE ProductID = ip.id 
-                            AND DATE(created_at) = %s
-                        ), 0) AS additions,
-                        %s AS snapshot_date,
-                        ip.ProcessType AS process_type
-                    FROM inventoryproduct ip
-                """, (today, today, today))
-                
-                records_created = cursor.rowcount
-                db.commit()
-                cursor.close()
-                
-                logger.info(f"Created {records_created} inventory snapshot records for {today}")
                 
         except Exception as e:
             logger.error(f"Error in create_daily_inventory_snapshot: {str(e)}")
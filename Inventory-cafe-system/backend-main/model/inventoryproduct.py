@@ -1,16 +1,22 @@
-from fastapi import Depends, HTTPException, APIRouter, Form, UploadFile, File, Request, Body
+from fastapi import Depends, HTTPException, APIRouter, Form, UploadFile, File, Request, Response, Body
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 from model.db import get_db
+from model.async_db import AsyncDB, get_async_db
+from model.catalog_cache import catalog, check_not_modified, invalidate_products
+from model.beginning_quantity import forget_product
+from model.stock_notifier import queue_stock_changes
+from model.pagination import (
+    PageParams, estimate_total_async, finish_page, keyset_where, order_by, page_params, paginate_sorted, project
+)
 import os
 import shutil
 from datetime import datetime
 from uuid import uuid4
 import mysql.connector
-import requests
 import logging
 import time
-from model.performance_metrics import record_stock_update_time, record_transaction_time
+from model.performance_metrics import record_snapshot_run, record_stock_update_time, record_transaction_time
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -92,29 +98,35 @@ def log_product_transaction(db, product_id: str, product_name: str, transaction_
         raise
 
 @InventoryRouter.get("/inventoryproducts/all", response_model=list)
-async def get_all_inventory_products(request: Request, db=Depends(get_db)):
+async def get_all_inventory_products(
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(page_params(default_limit=500))
+):
     try:
-        cursor = db.cursor()
-        base_url = str(request.base_url)
+        not_modified = await check_not_modified(request, response)
+        if not_modified:
+            return not_modified
 
-        cursor.execute("SELECT id, ProductName, Quantity, UnitPrice, `CategoryID (FK)`, ProcessType, Threshold, Image FROM inventoryproduct ORDER BY id")
-        products = cursor.fetchall()
-        cursor.close()
+        base_url = str(request.base_url)
+        products, _ = paginate_sorted(catalog.all(), page, key=lambda product: (product["id"],), response=response)
 
-        return [
+        return project([
             {
-                "ProductID": product[0],
-                "ProductName": product[1],
-                "Quantity": product[2],
-                "UnitPrice": product[3],
-                "CategoryID": product[4],
-                "ProcessType": product[5],
-                "Threshold": product[6],
-                "Status": determine_status(product[2], product[5], product[6]),
-                "Image": f"{base_url}uploads/products/{product[7]}" if product[7] else None
+                "ProductID": product["id"],
+                "ProductName": product["ProductName"],
+                "Quantity": product["Quantity"],
+                "UnitPrice": product["UnitPrice"],
+                "CategoryID": product["CategoryID"],
+                "ProcessType": product["ProcessType"],
+                "Threshold": product["Threshold"],
+                "Status": determine_status(product["Quantity"], product["ProcessType"], product["Threshold"]),
+                "Image": f"{base_url}uploads/products/{product['Image']}" if product["Image"] else None
             }
             for product in products
-        ]
+        ], page.fields)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching all inventory products: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -123,43 +135,39 @@ async def get_all_inventory_products(request: Request, db=Depends(get_db)):
 @InventoryRouter.get("/inventoryproducts/filter", response_model=list)
 async def filter_inventory_products(
     request: Request,
+    response: Response,
     process_type: Optional[str] = None,
-    threshold: Optional[int] = None,  # Optional threshold filter
-    db=Depends(get_db)
+    threshold: Optional[int] = None  # Optional threshold filter
 ):
     try:
         # Validate process type
         if process_type not in ["Ready-Made", "To Be Made"]:
             raise HTTPException(status_code=400, detail="Invalid Process Type")
 
-        cursor = db.cursor()
+        not_modified = await check_not_modified(request, response)
+        if not_modified:
+            return not_modified
+
         # Base URL for image paths
         base_url = str(request.base_url)
 
-        # Construct the SQL query
-        query = "SELECT id, ProductName, Quantity, UnitPrice, `CategoryID (FK)`, ProcessType, Threshold, Image FROM inventoryproduct WHERE ProcessType = %s"
-        params = [process_type]
+        products = catalog.by_process_type(process_type)
 
         # Add threshold filter if provided
         if threshold is not None:
-            query += " AND Threshold <= %s"
-            params.append(threshold)
-
-        cursor.execute(query, tuple(params))
-        products = cursor.fetchall()
-        cursor.close()
+            products = [p for p in products if p["Threshold"] is not None and p["Threshold"] <= threshold]
 
         return [
             {
-                "id": product[0],
-                "ProductName": product[1],
-                "Quantity": float('inf') if product[5] == "To Be Made" else product[2],
-                "UnitPrice": product[3],
-                "CategoryID": product[4],
-                "ProcessType": product[5],
-                "Threshold": product[6],
-                "Status": "Available" if product[5] == "To Be Made" else determine_status(product[2], product[5], product[6]),
-                "Image": f"{base_url}uploads/products/{product[7]}" if product[7] else None
+                "id": product["id"],
+                "ProductName": product["ProductName"],
+                "Quantity": float('inf') if product["ProcessType"] == "To Be Made" else product["Quantity"],
+                "UnitPrice": product["UnitPrice"],
+                "CategoryID": product["CategoryID"],
+                "ProcessType": product["ProcessType"],
+                "Threshold": product["Threshold"],
+                "Status": "Available" if product["ProcessType"] == "To Be Made" else determine_status(product["Quantity"], product["ProcessType"], product["Threshold"]),
+                "Image": f"{base_url}uploads/products/{product['Image']}" if product["Image"] else None
             }
             for product in products
         ]
@@ -170,26 +178,29 @@ async def filter_inventory_products(
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 @InventoryRouter.get("/inventoryproduct/{product_id}", response_model=dict)
-async def read_inventory_product(product_id: str, db=Depends(get_db)):
+async def read_inventory_product(product_id: str, request: Request, response: Response):
     try:
-        cursor = db.cursor()
-        cursor.execute("SELECT id, ProductName, Quantity, UnitPrice, `CategoryID (FK)`, ProcessType, Threshold FROM inventoryproduct WHERE id = %s", (product_id,))
-        product = cursor.fetchone()
-        cursor.close()
+        not_modified = await check_not_modified(request, response)
+        if not_modified:
+            return not_modified
+
+        product = catalog.get(product_id) if product_id.isdigit() else None
 
         if product:
             return {
-                "ProductID": product[0],
-                "ProductName": product[1],
-                "Quantity": float('inf') if product[5] == "To Be Made" else product[2],
-                "UnitPrice": product[3],
-                "CategoryID": product[4],
-                "ProcessType": product[5],
-                "Threshold": product[6],
-                "Status": "Available" if product[5] == "To Be Made" else determine_status(product[2], product[5], product[6])
+                "ProductID": product["id"],
+                "ProductName": product["ProductName"],
+                "Quantity": float('inf') if product["ProcessType"] == "To Be Made" else product["Quantity"],
+                "UnitPrice": product["UnitPrice"],
+                "CategoryID": product["CategoryID"],
+                "ProcessType": product["ProcessType"],
+                "Threshold": product["Threshold"],
+                "Status": "Available" if product["ProcessType"] == "To Be Made" else determine_status(product["Quantity"], product["ProcessType"], product["Threshold"])
             }
         
         raise HTTPException(status_code=404, detail="Product not found")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error reading inventory product {product_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -203,7 +214,7 @@ async def create_inventory_product(
     ProcessType: str = Form(...),
     Threshold: Optional[int] = Form(None),  # ✅ Threshold parameter only
     Image: Optional[UploadFile] = File(None),
-    db=Depends(get_db),
+    adb: AsyncDB = Depends(get_async_db),
 ):
     try:
         if ProcessType == "Ready-Made" and Threshold is None:
@@ -224,51 +235,54 @@ async def create_inventory_product(
         # Set status based on ProcessType and Threshold
         status = determine_status(None, ProcessType, Threshold)
 
-        # Get cursor from the connection
-        cursor = db.cursor()
-
-        # Insert product into the database with threshold
-        try:
-            cursor.execute(
-                """INSERT INTO inventoryproduct 
-                (ProductName, UnitPrice, `CategoryID (FK)`, ProcessType, Threshold, Image, Status) 
-                VALUES (%s, %s, %s, %s, %s, %s, %s)""",
-                (ProductName, UnitPrice, CategoryID, ProcessType, Threshold, image_filename, status)
-            )
-            db.commit()
-            product_id = cursor.lastrowid  # Get auto-generated ID
-        except mysql.connector.IntegrityError as e:
-            if "Duplicate entry" in str(e) and "ProductName" in str(e):
-                raise HTTPException(status_code=400, detail="A product with this name already exists.")
-            else:
-                raise
-        
-        try:
-            cursor.execute(
-                """
-                INSERT INTO product_transactions 
-                (product_id, product_name, transaction_type, process_type, unit_price, category_id)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                """, 
-                (product_id, ProductName, "Add", ProcessType, UnitPrice, CategoryID)
-            )
-            db.commit()
-        except Exception as log_error:
-            logger.warning(f"Failed to log product transaction: {log_error}")
-            
-        try:
-            log_activity_safe(
-                cursor=cursor,
-                db=db,  
-                icon="pi pi-truck",
-                title=f"New product added: {ProductName}",
-                status="Added"
-            )
-        except Exception as log_error:
-            logger.warning(f"Failed to log activity: {log_error}")
-        
-        # Close the cursor
-        cursor.close()
+        def insert_product(db):
+            cursor = db.cursor()
+            try:
+                # Insert product into the database with threshold
+                try:
+                    cursor.execute(
+                        """INSERT INTO inventoryproduct 
+                        (ProductName, UnitPrice, `CategoryID (FK)`, ProcessType, Threshold, Image, Status) 
+                        VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+                        (ProductName, UnitPrice, CategoryID, ProcessType, Threshold, image_filename, status)
+                    )
+                    db.commit()
+                    product_id = cursor.lastrowid  # Get auto-generated ID
+                except mysql.connector.IntegrityError as e:
+                    if "Duplicate entry" in str(e) and "ProductName" in str(e):
+                        raise HTTPException(status_code=400, detail="A product with this name already exists.")
+                    else:
+                        raise
+                
+                try:
+                    cursor.execute(
+                        """
+                        INSERT INTO product_transactions 
+                        (product_id, product_name, transaction_type, process_type, unit_price, category_id)
+                        VALUES (%s, %s, %s, %s, %s, %s)
+                        """, 
+                        (product_id, ProductName, "Add", ProcessType, UnitPrice, CategoryID)
+                    )
+                    db.commit()
+                except Exception as log_error:
+                    logger.warning(f"Failed to log product transaction: {log_error}")
+                    
+                try:
+                    log_activity_safe(
+                        cursor=cursor,
+                        db=db,  
+                        icon="pi pi-truck",
+                        title=f"New product added: {ProductName}",
+                        status="Added"
+                    )
+                except Exception as log_error:
+                    logger.warning(f"Failed to log activity: {log_error}")
+                return product_id
+            finally:
+                cursor.close()
+
+        product_id = await adb.run(insert_product)
+        invalidate_products(product_id)
 
         base_url = str(request.base_url)
         image_url = f"{base_url}uploads/products/{image_filename}" if image_filename else None
@@ -297,20 +311,16 @@ async def update_inventory_product(
     CategoryID: Optional[int] = Form(None),
     Threshold: Optional[int] = Form(None),  # ✅ Threshold only
     Image: Optional[UploadFile] = File(None),
-    db=Depends(get_db),
+    adb: AsyncDB = Depends(get_async_db),
 ):
     try:
         # Start measuring execution time
         start_time = time.time()
         
-        cursor = db.cursor()
-        
         # Check if product exists
-        cursor.execute("SELECT id, ProductName, Quantity, UnitPrice, `CategoryID (FK)`, ProcessType, Threshold, Image FROM inventoryproduct WHERE id = %s", (product_id,))
-        product = cursor.fetchone()
+        product = await adb.fetchone("SELECT id, ProductName, Quantity, UnitPrice, `CategoryID (FK)`, ProcessType, Threshold, Image FROM inventoryproduct WHERE id = %s", (product_id,))
         
         if not product:
-            cursor.close()
             raise HTTPException(status_code=404, detail="Product not found")
         
         # Process the image if uploaded
@@ -343,13 +353,12 @@ async def update_inventory_product(
             params.append(product_id)
             
             query = f"UPDATE inventoryproduct SET {set_clause} WHERE id = %s"
-            cursor.execute(query, params)
-            db.commit()
+            await adb.execute(query, params)
+            await adb.commit()
+            invalidate_products(product[0])
             
             # Log the activity
-            log_activity(db, "📝", f"Product {ProductName or product[1]} updated", "success")
-            
-        cursor.close()
+            await adb.run(log_activity, "📝", f"Product {ProductName or product[1]} updated", "success")
         
         # Calculate execution time and record the metrics
         execution_time = (time.time() - start_time) * 1000  # Convert to milliseconds
@@ -376,10 +385,22 @@ def log_activity_safe(cursor, db, icon: str, title: str, status: str):
         # Don't raise exception since logging failure shouldn't affect the main operation
 
 @InventoryRouter.delete("/inventoryproduct/{product_id}", response_model=dict)
-async def delete_inventory_product(product_id: str, db=Depends(get_db)):
+async def delete_inventory_product(product_id: str, adb: AsyncDB = Depends(get_async_db)):
+    try:
+        await adb.run(_delete_inventory_product, product_id)
+        invalidate_products(product_id)
+        return {"message": "Product deleted successfully"}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting inventory product: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+def _delete_inventory_product(db, product_id: str):
+    """Delete a product and its stock batches; runs on the database thread pool"""
+    cursor = db.cursor()
     try:
-        cursor = db.cursor()
-        
         # Get product details before deletion
         cursor.execute("""
             SELECT ProductName, ProcessType, UnitPrice, `CategoryID (FK)` 
@@ -389,11 +410,11 @@ async def delete_inventory_product(product_id: str, db=Depends(get_db)):
         product = cursor.fetchone()
 
         if not product:
-            cursor.close()
             raise HTTPException(status_code=404, detail="Product not found")
 
         # Delete related records
         cursor.execute("DELETE FROM stock_details WHERE ProductID = %s", (product_id,))
+        forget_product(cursor, product_id)
         cursor.execute("DELETE FROM inventoryproduct WHERE id = %s", (product_id,))
 
         # Log the transaction - use an updated approach
@@ -423,103 +444,97 @@ async def delete_inventory_product(product_id: str, db=Depends(get_db)):
         except Exception as log_error:
             logger.warning(f"Failed to log activity: {log_error}")
         
+    finally:
         cursor.close()
-        
-        return {"message": "Product deleted successfully"}
-    
-    except Exception as e:
-        logger.error(f"Error deleting inventory product: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
 
+# Rows per multi-row INSERT when writing a snapshot
+SNAPSHOT_INSERT_CHUNK = 500
+
 @InventoryRouter.post("/inventorysummary", response_model=list)
-async def post_inventory_summary(db=Depends(get_db)):
+async def post_inventory_summary(adb: AsyncDB = Depends(get_async_db)):
+    try:
+        start_time = time.time()
+        result = await adb.run(_post_inventory_summary)
+        duration_ms = (time.time() - start_time) * 1000
+        record_snapshot_run(len(result), duration_ms)
+        record_transaction_time("inventory_summary", duration_ms)
+        return result
+    except Exception as e:
+        logger.error(f"Error generating inventory summary: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error generating inventory summary: {str(e)}")
+
+def _post_inventory_summary(db):
+    """
+    Snapshot every product into inventory_reports: one SELECT, statuses
+    computed in the same pass, rows written with chunked multi-row INSERTs,
+    and the response built from the rows that were written.
+    """
+    cursor = db.cursor()
     try:
-        cursor = db.cursor()
         report_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")  
 
         cursor.execute(
             "INSERT INTO reports (ReportType, ReportName, ReportDate) VALUES (%s, %s, %s)",
             ("Daily", "Inventory Summary", report_date)
         )
-        db.commit()
-
-        cursor.execute("SELECT LAST_INSERT_ID()")
-        report_id = cursor.fetchone()[0]  
 
-        cursor.execute("SELECT id, ProductName, Quantity, UnitPrice, `CategoryID (FK)`, Image FROM inventoryproduct")
+        cursor.execute("""
+            SELECT id, ProductName, Quantity, UnitPrice, `CategoryID (FK)`, Image, ProcessType, Threshold
+            FROM inventoryproduct
+            ORDER BY id
+        """)
         products = cursor.fetchall()
 
-        for product in products:
-            product_id, product_name, quantity, unit_price, category_id, image = product
+        rows = []
+        result = []
+        for product_id, product_name, quantity, unit_price, category_id, image, process_type, threshold in products:
             quantity = quantity if quantity is not None else 0
             unit_price = unit_price if unit_price is not None else 0.0
-            
-            # Need to get the process_type for each product
-            cursor.execute("SELECT ProcessType, Threshold FROM inventoryproduct WHERE id = %s", (product_id,))
-            proc_info = cursor.fetchone()
-            process_type = proc_info[0] if proc_info else "Ready-Made"  # Default to Ready-Made if not found
-            threshold = proc_info[1] if proc_info else None
-            
             status = determine_status(quantity, process_type, threshold)
 
-            cursor.execute(
+            rows.append((report_date, product_id, product_name, quantity, unit_price, category_id, status, image))
+            result.append({
+                "id": product_id,
+                "ProductName": product_name,
+                "Quantity": quantity,
+                "UnitPrice": unit_price,
+                "CategoryID": category_id,
+                "Status": status,
+                "Image": f"/uploads/products/{image}" if image else None
+            })
+
+        for offset in range(0, len(rows), SNAPSHOT_INSERT_CHUNK):
+            cursor.executemany(
                 """
                 INSERT INTO inventory_reports 
                 (ReportDate, ProductID, ProductName, Quantity, UnitPrice, CategoryID, Status, Image) 
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
                 """,
-                (report_date, product_id, product_name, quantity, unit_price, category_id, status, image)
+                rows[offset:offset + SNAPSHOT_INSERT_CHUNK]
             )
 
         db.commit()
 
         # Log activity safely
-        try:
-            log_activity_safe(
-                cursor=cursor, 
-                db=db, 
-                icon="pi pi-chart-line", 
-                title="Inventory summary generated", 
-                status="Success"
-            )
-        except Exception as log_error:
-            logger.warning(f"Failed to log activity: {log_error}")
-
-        # Format the response
-        result = []
-        for product in products:
-            # We need to get the process_type here as well
-            product_id = product[0]
-            cursor.execute("SELECT ProcessType, Threshold FROM inventoryproduct WHERE id = %s", (product_id,))
-            proc_info = cursor.fetchone()
-            process_type = proc_info[0] if proc_info else "Ready-Made"
-            threshold = proc_info[1] if proc_info else None
-            
-            result.append({
-                "id": product[0],
-                "ProductName": product[1],
-                "Quantity": product[2] if product[2] is not None else 0,
-                "UnitPrice": product[3] if product[3] is not None else 0.0,
-                "CategoryID": product[4],
-                "Status": determine_status(product[2] if product[2] is not None else 0, process_type, threshold),
-                "Image": f"/uploads/products/{product[5]}" if product[5] else None
-            })
-        
-        cursor.close()
+        log_activity_safe(
+            cursor=cursor, 
+            db=db, 
+            icon="pi pi-chart-line", 
+            title="Inventory summary generated", 
+            status="Success"
+        )
         return result
-        
-    except Exception as e:
-        logger.error(f"Error generating inventory summary: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error generating inventory summary: {str(e)}")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
 
 @InventoryRouter.get("/activity_logs", response_model=list)
-async def get_activity_logs(db=Depends(get_db)):
+async def get_activity_logs(adb: AsyncDB = Depends(get_async_db)):
     try:
-        cursor = db.cursor()
-        cursor.execute("SELECT id, icon, title, time, status FROM activity_logs ORDER BY time DESC LIMIT 10")
-        logs = cursor.fetchall()
-        cursor.close()
+        logs = await adb.fetchall("SELECT id, icon, title, time, status FROM activity_logs ORDER BY time DESC LIMIT 10")
 
         return [
             {
@@ -536,21 +551,26 @@ async def get_activity_logs(db=Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Error fetching activity logs: {str(e)}")
 
 @InventoryRouter.get("/product_transactions", response_model=list)
-async def get_product_transactions(db=Depends(get_db)):
-    """Fetch all product transactions."""
+async def get_product_transactions(
+    response: Response,
+    page: PageParams = Depends(page_params()),
+    adb: AsyncDB = Depends(get_async_db)
+):
+    """Fetch product transactions, newest first, one page at a time."""
     try:
-        cursor = db.cursor()
-        cursor.execute("""
+        where, params = keyset_where(("pt.created_at", "pt.id"), page.cursor)
+        transactions = await adb.fetchall(f"""
             SELECT pt.id, pt.product_id, pt.product_name, pt.transaction_type, 
                    pt.process_type, pt.unit_price, pt.category_id, pt.created_at
             FROM product_transactions pt
-            ORDER BY pt.created_at DESC
-        """)
-        
-        transactions = cursor.fetchall()
-        cursor.close()
-        
-        return [
+            WHERE {where}
+            {order_by(("pt.created_at", "pt.id"))}
+            LIMIT %s
+        """, params + [page.fetch])
+        total = await estimate_total_async(adb, "product_transactions") if not page.cursor else None
+        transactions, _ = finish_page(transactions, page, key=lambda t: (t[7], t[0]), response=response, total=total)
+        
+        return project([
             {
                 "id": t[0],
                 "product_id": t[1],
@@ -562,27 +582,20 @@ async def get_product_transactions(db=Depends(get_db)):
                 "created_at": t[7].strftime("%Y-%m-%d %H:%M:%S")
             }
             for t in transactions
-        ]
+        ], page.fields)
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching transactions: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error fetching transactions: {str(e)}")
     
 @InventoryRouter.get("/total-products", response_model=dict)
-async def get_total_products(db=Depends(get_db)):
+async def get_total_products(adb: AsyncDB = Depends(get_async_db)):
     """Fetch total count of products in the inventory."""
     try:
-        # Get the cursor from the connection
-        cursor = db.cursor()
-        
         # SQL query to count all products in the inventory
-        cursor.execute("""SELECT COUNT(*) FROM inventoryproduct""")
-        
-        # Fetch the count
-        total_products = cursor.fetchone()[0]
-        
-        # Close the cursor
-        cursor.close()
+        total_products = (await adb.fetchone("""SELECT COUNT(*) FROM inventoryproduct"""))[0]
 
         # Return the result as a dictionary
         return {"total_products": total_products}
@@ -593,36 +606,19 @@ async def get_total_products(db=Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
 @InventoryRouter.get("/low-stock-total", response_model=dict)
-async def get_total_low_stock(db=Depends(get_db)):
+async def get_total_low_stock(adb: AsyncDB = Depends(get_async_db)):
     """Fetch total count of products that are in low stock, excluding 'To Be Made' products."""
     try:
-        # Get the cursor from the connection
-        cursor = db.cursor()
-        
-        # SQL query to count low stock products (not zero quantity)
-        cursor.execute("""
-            SELECT COUNT(*) 
+        # Count low stock (not zero quantity) and out of stock products in one pass
+        counts = await adb.fetchone("""
+            SELECT
+                SUM(Quantity > 0 AND Quantity <= COALESCE(Threshold, 5) AND COALESCE(Threshold, 5) > 0),
+                SUM(Quantity <= 0 OR Quantity IS NULL)
             FROM inventoryproduct
-            WHERE ProcessType = 'Ready-Made' 
-            AND Quantity > 0 AND Quantity <= COALESCE(Threshold, 5) AND COALESCE(Threshold, 5) > 0
-        """)
-        
-        # Fetch the count
-        low_stock_count = cursor.fetchone()[0] or 0
-        
-        # SQL query to count out of stock products (zero quantity)
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM inventoryproduct
-            WHERE ProcessType = 'Ready-Made' 
-            AND (Quantity <= 0 OR Quantity IS NULL)
+            WHERE ProcessType = 'Ready-Made'
         """)
-        
-        # Fetch the count
-        out_of_stock_count = cursor.fetchone()[0] or 0
-        
-        # Close the cursor
-        cursor.close()
+        low_stock_count = int(counts[0] or 0)
+        out_of_stock_count = int(counts[1] or 0)
 
         # Return the result as a dictionary - make the out_of_stock_count the main alert count
         return {
@@ -644,109 +640,31 @@ async def get_total_low_stock(db=Depends(get_db)):
             "error": str(e)
         }
 
-# Database connection function
-def get_db_connection():
-    connection = mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="Warweapons19",  # Match password from cafe-beata-main
-        database="cafe_beata"
-    )
-    return connection
-
-# Function to notify Cafe Beata of stock changes for Ready-Made products
-def notify_cafe_beata_stock_change(product_id: int) -> bool:
+# Notify Cafe Beata of stock changes for Ready-Made products. Changes are
+# coalesced and sent off the request path; see model/stock_notifier.py.
+def notify_cafe_beata_stock_change(product_id: int, broadcast: bool = True) -> bool:
     """
-    Notifies the cafe-beata system that a product's stock has changed
-    Returns True if successful, False otherwise
+    Queues a cafe-beata notification (and a /ws/inventory stock_update
+    unless broadcast=False) for a product whose stock changed.
+    Returns True once queued.
     """
     try:
-        # Get the current product details to include in the notification
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        
-        # Fetch current product details
-        cursor.execute("""
-            SELECT id, ProductName, Quantity, ProcessType, Threshold 
-            FROM inventoryproduct 
-            WHERE id = %s
-        """, [product_id])
-        
-        product = cursor.fetchone()
-        if not product:
-            logger.error(f"Product not found when trying to notify cafe-beata: product_id={product_id}")
-            cursor.close()
-            connection.close()
-            return False
-        
-        # Only notify if this is a Ready-Made product
-        if product['ProcessType'] != 'Ready-Made':
-            logger.info(f"Not notifying cafe-beata for non-Ready-Made product: product_id={product_id}")
-            cursor.close()
-            connection.close()
-            return True
-        
-        # Prepare the data to send
-        data = {
-            "product_id": product_id,
-            "product_name": product['ProductName'],
-            "quantity": product['Quantity'],
-            "status": determine_status(product['Quantity'], product['ProcessType'], product['Threshold']),
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        # Log what we're about to send
-        logger.info(f"Notifying cafe-beata of stock change: {data}")
-        
-        # Send real-time WebSocket notification
-        try:
-            import asyncio
-            from main import get_websocket_manager
-            
-            # Get the WebSocket manager
-            manager = get_websocket_manager()
-            
-            # Prepare the WebSocket message
-            ws_message = {
-                "type": "stock_update",
-                "data": data
-            }
-            
-            # Broadcast the message via WebSocket asynchronously
-            asyncio.create_task(manager.broadcast(ws_message))
-            logger.info(f"WebSocket notification sent for product {product_id}")
-        except Exception as ws_error:
-            logger.error(f"Error sending WebSocket notification: {ws_error}")
-            # Continue with webhook anyway
-        
-        # Cafe Beata webhook URL - make sure this is exactly right
-        cafe_beata_webhook_url = "http://127.0.0.1:8000/api/inventory-webhook/stock-update"
-        
-        # Send the notification with timeout
-        response = requests.post(
-            cafe_beata_webhook_url, 
-            json=data, 
-            timeout=5,
-            headers={"Content-Type": "application/json"}
-        )
-        
-        cursor.close()
-        connection.close()
-        
-        if response.status_code == 200:
-            logger.info(f"Successfully notified cafe-beata of stock change for product {product_id}")
-            return True
-        else:
-            logger.error(f"Failed to notify cafe-beata: {response.status_code} - {response.text}")
-            return False
-    except requests.exceptions.Timeout:
-        logger.error(f"Timeout connecting to cafe-beata webhook for product {product_id}")
-        return False
-    except requests.exceptions.ConnectionError:
-        logger.error(f"Connection error notifying cafe-beata webhook for product {product_id}")
+        queue_stock_changes([product_id], broadcast=broadcast)
+        return True
+    except Exception as e:
+        logger.error(f"Error queueing cafe-beata notification for product {product_id}: {e}")
         return False
+
+def notify_cafe_beata_stock_changes(products: List[dict]) -> bool:
+    """
+    Queues notifications for several changed products (rows with an id) whose
+    WebSocket message the caller has already sent.
+    """
+    try:
+        queue_stock_changes([product["id"] for product in products], broadcast=False)
+        return True
     except Exception as e:
-        logger.error(f"Error notifying cafe-beata: {e}")
+        logger.error(f"Error queueing batched cafe-beata notification: {e}")
         return False
 
 # Function to check if a product is ready-made
@@ -771,12 +689,14 @@ def is_ready_made_product(product_id: int, connection) -> bool:
 
 # Get all products
 @InventoryRouter.get("/products")
-async def get_products(process_type: Optional[str] = None):
+async def get_products(process_type: Optional[str] = None, adb: AsyncDB = Depends(get_async_db)):
     """
     Get all products or filter by process type
     """
+    return await adb.run(_get_products, process_type)
+
+def _get_products(connection, process_type: Optional[str]):
     try:
-        connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
         
         # Build the query based on the process_type filter
@@ -791,7 +711,6 @@ async def get_products(process_type: Optional[str] = None):
         products = cursor.fetchall()
         
         cursor.close()
-        connection.close()
         
         return {"success": True, "products": products}
     
@@ -801,19 +720,20 @@ async def get_products(process_type: Optional[str] = None):
 
 # Get product by ID
 @InventoryRouter.get("/products/{product_id}")
-async def get_product(product_id: int):
+async def get_product(product_id: int, adb: AsyncDB = Depends(get_async_db)):
     """
     Get a specific product by ID
     """
+    return await adb.run(_get_product, product_id)
+
+def _get_product(connection, product_id: int):
     try:
-        connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
         
         cursor.execute("SELECT * FROM inventoryproduct WHERE id = %s", [product_id])
         product = cursor.fetchone()
         
         cursor.close()
-        connection.close()
         
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
@@ -837,13 +757,16 @@ async def create_product(
     SupplierID: int = Form(...),
     CategoryID: int = Form(...),
     ProcessType: str = Form(...),
-    ProductImage: UploadFile = File(None)
+    ProductImage: UploadFile = File(None),
+    adb: AsyncDB = Depends(get_async_db)
 ):
     """
     Create a new inventory product
     """
+    return await adb.run(_create_product, ProductName, ItemCode, Description, Price, Quantity, Threshold, InStock, SupplierID, CategoryID, ProcessType, ProductImage)
+
+def _create_product(connection, ProductName, ItemCode, Description, Price, Quantity, Threshold, InStock, SupplierID, CategoryID, ProcessType, ProductImage):
     try:
-        connection = get_db_connection()
         cursor = connection.cursor()
         
         # Handle image upload if provided
@@ -876,6 +799,7 @@ async def create_product(
         
         product_id = cursor.lastrowid
         connection.commit()
+        invalidate_products(product_id)
         
         cursor.close()
         
@@ -883,7 +807,6 @@ async def create_product(
         if ProcessType.lower() in ['ready-made', 'ready made', 'ready_made', 'readymade']:
             notify_cafe_beata_stock_change(product_id)
         
-        connection.close()
         
         return {"success": True, "message": "Product created successfully", "product_id": product_id}
     
@@ -905,13 +828,16 @@ async def update_product(
     SupplierID: int = Form(...),
     CategoryID: int = Form(...),
     ProcessType: str = Form(...),
-    ProductImage: UploadFile = File(None)
+    ProductImage: UploadFile = File(None),
+    adb: AsyncDB = Depends(get_async_db)
 ):
     """
     Update an existing product
     """
+    return await adb.run(_update_product, product_id, ProductName, ItemCode, Description, Price, Quantity, Threshold, InStock, SupplierID, CategoryID, ProcessType, ProductImage)
+
+def _update_product(connection, product_id: int, ProductName, ItemCode, Description, Price, Quantity, Threshold, InStock, SupplierID, CategoryID, ProcessType, ProductImage):
     try:
-        connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
         
         # Check if product exists
@@ -920,7 +846,6 @@ async def update_product(
         
         if not existing_product:
             cursor.close()
-            connection.close()
             raise HTTPException(status_code=404, detail="Product not found")
         
         # Handle image upload if provided
@@ -953,6 +878,7 @@ async def update_product(
         ])
         
         connection.commit()
+        invalidate_products(product_id)
         
         # Check if this is a Ready-Made product or if process type changed to Ready-Made
         if (ProcessType.lower() in ['ready-made', 'ready made', 'ready_made', 'readymade'] or
@@ -960,7 +886,6 @@ async def update_product(
             notify_cafe_beata_stock_change(product_id)
         
         cursor.close()
-        connection.close()
         
         return {"success": True, "message": "Product updated successfully"}
     
@@ -970,12 +895,14 @@ async def update_product(
 
 # Delete a product
 @InventoryRouter.delete("/products/{product_id}")
-async def delete_product(product_id: int):
+async def delete_product(product_id: int, adb: AsyncDB = Depends(get_async_db)):
     """
     Delete a product
     """
+    return await adb.run(_delete_product, product_id)
+
+def _delete_product(connection, product_id: int):
     try:
-        connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
         
         # Check if product exists
@@ -984,19 +911,18 @@ async def delete_product(product_id: int):
         
         if not existing_product:
             cursor.close()
-            connection.close()
             raise HTTPException(status_code=404, detail="Product not found")
         
         # Delete the product
         cursor.execute("DELETE FROM inventoryproduct WHERE id = %s", [product_id])
         connection.commit()
+        invalidate_products(product_id)
         
         # Notify Cafe Beata if this was a Ready-Made product
         if existing_product.get('ProcessType', '').lower() in ['ready-made', 'ready made', 'ready_made', 'readymade']:
             notify_cafe_beata_stock_change(product_id)
         
         cursor.close()
-        connection.close()
         
         return {"success": True, "message": "Product deleted successfully"}
     
@@ -1005,32 +931,25 @@ async def delete_product(product_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 @InventoryRouter.get("/inventory-status", response_model=dict)
-async def get_inventory_status(db=Depends(get_db)):
+async def get_inventory_status(request: Request, response: Response):
     """Get a breakdown of inventory status with details"""
     try:
-        # Get the cursor from the connection
-        cursor = db.cursor(dictionary=True)
-        
-        # Get all Ready-Made products
-        cursor.execute("""
-            SELECT id, ProductName, Quantity, Price, UnitPrice, Threshold, ProcessType,
-            CASE 
-                WHEN Quantity <= 0 THEN 'Out of Stock'
-                WHEN Quantity <= Threshold THEN 'Low Stock'
-                ELSE 'In Stock'
-            END as Status
-            FROM inventoryproduct
-            WHERE ProcessType = 'Ready-Made'
-            ORDER BY 
-                CASE 
-                    WHEN Quantity <= 0 THEN 1
-                    WHEN Quantity <= Threshold THEN 2
-                    ELSE 3
-                END,
-                ProductName
-        """)
-        
-        products = cursor.fetchall()
+        not_modified = await check_not_modified(request, response)
+        if not_modified:
+            return not_modified
+
+        # Get all Ready-Made products, out of stock first, then low stock
+        def status_of(product):
+            quantity, threshold = product["Quantity"], product["Threshold"]
+            if quantity is not None and quantity <= 0:
+                return 'Out of Stock'
+            if quantity is not None and threshold is not None and quantity <= threshold:
+                return 'Low Stock'
+            return 'In Stock'
+
+        rank = {'Out of Stock': 1, 'Low Stock': 2, 'In Stock': 3}
+        products = [dict(product, Status=status_of(product)) for product in catalog.by_process_type('Ready-Made')]
+        products.sort(key=lambda p: (rank[p["Status"]], p["ProductName"] or ""))
         
         # Process products into categories
         out_of_stock = []
@@ -1058,9 +977,6 @@ async def get_inventory_status(db=Depends(get_db)):
             else:
                 in_stock.append(product_data)
         
-        # Close the cursor
-        cursor.close()
-        
         return {
             "out_of_stock": {
                 "count": len(out_of_stock),
@@ -1082,12 +998,48 @@ async def get_inventory_status(db=Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
 @InventoryRouter.post("/stockin/", response_model=dict)
-async def stock_in(request: StockInRequest, db=Depends(get_db)):
+async def stock_in(request: StockInRequest, adb: AsyncDB = Depends(get_async_db)):
     # Start measuring execution time
     start_time = time.time()
     
     try:
-        cursor = db.cursor()
+        product_id = request.ProductID
+        product, current_quantity, total_new_quantity, new_quantity = await adb.run(_stock_in_tx, request)
+        invalidate_products(product[0])
+        
+        # Attempt to notify Cafe Beata system about stock change
+        try:
+            notify_cafe_beata_stock_change(int(product_id))
+        except Exception as notify_e:
+            logger.warning(f"Failed to notify Cafe Beata about stock change: {notify_e}")
+        
+        # Calculate execution time and record the metrics
+        execution_time = (time.time() - start_time) * 1000  # Convert to milliseconds
+        record_stock_update_time(int(product_id), execution_time)
+        record_transaction_time("stock_in", execution_time)
+        
+        # Determine the new status based on the updated quantity and threshold
+        new_status = determine_status(new_quantity, product[3], product[4])
+        
+        return {
+            "message": "Stock added successfully",
+            "product_id": product_id,
+            "previous_quantity": current_quantity,
+            "added_quantity": total_new_quantity,
+            "new_quantity": new_quantity,
+            "status": new_status
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error adding stock: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+def _stock_in_tx(db, request: StockInRequest):
+    """Record incoming stock batches; runs on the database thread pool"""
+    cursor = db.cursor()
+    try:
         product_id = request.ProductID
         
         # Verify the product exists
@@ -1095,11 +1047,9 @@ async def stock_in(request: StockInRequest, db=Depends(get_db)):
         product = cursor.fetchone()
         
         if not product or not product[0]:
-            cursor.close()
             raise HTTPException(status_code=404, detail="Product not found")
         
         if product[3] == "To Be Made":  # Check if product is "To Be Made"
-            cursor.close()
             raise HTTPException(status_code=400, detail="Cannot add stock to 'To Be Made' products")
         
         # Update the inventory with new stock
@@ -1152,33 +1102,6 @@ async def stock_in(request: StockInRequest, db=Depends(get_db)):
         
         # Commit the transaction
         db.commit()
+        return product, current_quantity, total_new_quantity, new_quantity
+    finally:
         cursor.close()
-        
-        # Attempt to notify Cafe Beata system about stock change
-        try:
-            notify_cafe_beata_stock_change(int(product_id))
-        except Exception as notify_e:
-            logger.warning(f"Failed to notify Cafe Beata about stock change: {notify_e}")
-        
-        # Calculate execution time and record the metrics
-        execution_time = (time.time() - start_time) * 1000  # Convert to milliseconds
-        record_stock_update_time(int(product_id), execution_time)
-        record_transaction_time("stock_in", execution_time)
-        
-        # Determine the new status based on the updated quantity and threshold
-        new_status = determine_status(new_quantity, product[3], product[4])
-        
-        return {
-            "message": "Stock added successfully",
-            "product_id": product_id,
-            "previous_quantity": current_quantity,
-            "added_quantity": total_new_quantity,
-            "new_quantity": new_quantity,
-            "status": new_status
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error adding stock: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -0,0 +1,222 @@
+# model/maintenance.py
+"""
+Chunked background repair jobs.
+
+A RepairJob is an UPDATE ... JOIN over one table, applied in primary-key
+ranges of `chunk_size` keys. Each chunk is its own short transaction, so
+order writes to the table wait behind at most one chunk's row locks, never
+a table-wide update. The job's checkpoint in `maintenance_checkpoints` is
+written in the same transaction as each chunk, and the job sleeps
+`pause` seconds between chunks to let other work run. A run that is
+interrupted (restart, error) resumes from its checkpoint.
+
+A run covers keys up to MAX(key) as of its start; rows added later are left
+to the next run. job_status() reports rows updated, rows/sec, the key range
+still to scan and an ETA; GET /api/maintenance/jobs exposes it.
+
+    SALES_REPAIR = register_job(RepairJob(
+        name="...", table="sales",
+        sql="UPDATE sales s JOIN ... SET ... WHERE s.id BETWEEN %s AND %s AND ...",
+    ))
+    await run_job(SALES_REPAIR)
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional
+
+from fastapi import APIRouter, HTTPException
+
+from model.async_db import run_in_db_thread
+from model.db import db_connection
+
+logger = logging.getLogger("inventory-system-backend")
+
+MaintenanceRouter = APIRouter(tags=["Maintenance"])
+
+CHUNK_SIZE = 1000
+CHUNK_PAUSE = 0.05
+
+
+@dataclass(frozen=True)
+class RepairJob:
+    name: str
+    table: str
+    sql: str                     # Takes (low_key, high_key), both inclusive
+    key: str = "id"
+    chunk_size: int = CHUNK_SIZE
+    pause: float = CHUNK_PAUSE
+
+
+@dataclass
+class JobProgress:
+    state: str = "idle"          # idle, running, finished, failed
+    last_key: int = 0
+    max_key: int = 0
+    start_key: int = 0
+    rows_updated: int = 0
+    start_rows: int = 0          # rows_updated when this process picked the run up
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    elapsed: float = 0.0         # Seconds spent by this process on the run
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        scanned = max(self.last_key - self.start_key, 0)
+        remaining = max(self.max_key - self.last_key, 0)
+        total = max(self.max_key - self.start_key, 0)
+        keys_per_sec = scanned / self.elapsed if self.elapsed else 0.0
+        return {
+            "state": self.state,
+            "last_key": self.last_key,
+            "max_key": self.max_key,
+            "rows_updated": self.rows_updated,
+            "rows_per_sec": round((self.rows_updated - self.start_rows) / self.elapsed, 1) if self.elapsed else 0.0,
+            "remaining_keys": remaining,
+            "percent_done": round(100.0 * (total - remaining) / total, 1) if total else 100.0,
+            "eta_seconds": round(remaining / keys_per_sec, 1) if keys_per_sec else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "error": self.error,
+        }
+
+
+JOBS: Dict[str, RepairJob] = {}
+_progress: Dict[str, JobProgress] = {}
+_tasks: Dict[str, asyncio.Task] = {}
+
+
+def register_job(job: RepairJob) -> RepairJob:
+    JOBS[job.name] = job
+    _progress.setdefault(job.name, JobProgress())
+    return job
+
+
+def _begin_run(job: RepairJob) -> JobProgress:
+    """Resume an unfinished run from its checkpoint, or start a new one"""
+    with db_connection() as db:
+        cursor = db.cursor(dictionary=True)
+        try:
+            cursor.execute(
+                "SELECT last_key, max_key, rows_updated, started_at, finished_at "
+                "FROM maintenance_checkpoints WHERE job = %s",
+                (job.name,)
+            )
+            row = cursor.fetchone()
+            if row and row["started_at"] is not None and row["finished_at"] is None:
+                logger.info(f"Resuming maintenance job {job.name} after key {row['last_key']}")
+                return JobProgress("running", row["last_key"], row["max_key"], row["last_key"],
+                                   row["rows_updated"], row["rows_updated"], row["started_at"])
+
+            cursor.execute(f"SELECT COALESCE(MIN(`{job.key}`), 1) - 1 AS low, COALESCE(MAX(`{job.key}`), 0) AS high FROM `{job.table}`")
+            bounds = cursor.fetchone()
+            started_at = datetime.now()
+            cursor.execute("""
+                INSERT INTO maintenance_checkpoints (job, last_key, max_key, rows_updated, started_at, finished_at)
+                VALUES (%s, %s, %s, 0, %s, NULL)
+                ON DUPLICATE KEY UPDATE
+                    last_key = VALUES(last_key), max_key = VALUES(max_key), rows_updated = 0,
+                    started_at = VALUES(started_at), finished_at = NULL
+            """, (job.name, bounds["low"], bounds["high"], started_at))
+            return JobProgress("running", bounds["low"], bounds["high"], bounds["low"], 0, 0, started_at)
+        finally:
+            cursor.close()
+
+
+def _run_chunk(job: RepairJob, low: int, high: int, finished: bool) -> int:
+    """Repair keys low..high and move the checkpoint past them in one transaction"""
+    with db_connection() as db:
+        cursor = db.cursor()
+        try:
+            cursor.execute(job.sql, (low, high))
+            updated = cursor.rowcount
+            cursor.execute("""
+                UPDATE maintenance_checkpoints
+                SET last_key = %s, rows_updated = rows_updated + %s, finished_at = IF(%s, NOW(), NULL)
+                WHERE job = %s
+            """, (high, updated, finished, job.name))
+            return updated
+        finally:
+            cursor.close()
+
+
+def _finish_run(job: RepairJob):
+    with db_connection() as db:
+        cursor = db.cursor()
+        try:
+            cursor.execute("UPDATE maintenance_checkpoints SET finished_at = NOW() WHERE job = %s", (job.name,))
+        finally:
+            cursor.close()
+
+
+async def _run(job: RepairJob) -> dict:
+    progress = await run_in_db_thread(_begin_run, job)
+    _progress[job.name] = progress
+    try:
+        while progress.last_key < progress.max_key:
+            low = progress.last_key + 1
+            high = min(progress.last_key + job.chunk_size, progress.max_key)
+            start = time.perf_counter()
+            updated = await run_in_db_thread(_run_chunk, job, low, high, high >= progress.max_key)
+            progress.elapsed += time.perf_counter() - start
+            progress.last_key = high
+            progress.rows_updated += updated
+            await asyncio.sleep(job.pause)
+        if progress.max_key <= progress.start_key:
+            # Nothing to scan; still close the run so the next one starts fresh
+            await run_in_db_thread(_finish_run, job)
+        progress.state = "finished"
+        progress.finished_at = datetime.now()
+        logger.info(
+            f"Maintenance job {job.name} finished: {progress.rows_updated} rows updated "
+            f"in {progress.elapsed:.1f}s of database time"
+        )
+    except Exception as e:
+        progress.state = "failed"
+        progress.error = str(e)
+        logger.error(f"Maintenance job {job.name} failed after key {progress.last_key}: {e}")
+        raise
+    return progress.to_dict()
+
+
+def _retrieve_error(task: asyncio.Task):
+    # Already logged by _run; keeps unawaited failed runs from warning at exit
+    if not task.cancelled():
+        task.exception()
+
+
+def start_job(job: RepairJob) -> asyncio.Task:
+    """Start a run unless one is already in progress; returns the run's task"""
+    task = _tasks.get(job.name)
+    if task is None or task.done():
+        task = asyncio.create_task(_run(job))
+        task.add_done_callback(_retrieve_error)
+        _tasks[job.name] = task
+    return task
+
+
+async def run_job(job: RepairJob) -> dict:
+    """Run (or join the current run of) a job and return its final status"""
+    return await asyncio.shield(start_job(job))
+
+
+def job_status(name: str) -> dict:
+    return {"job": name, **_progress.get(name, JobProgress()).to_dict()}
+
+
+@MaintenanceRouter.get("/jobs")
+async def list_jobs():
+    """Progress of every registered repair job"""
+    return {"jobs": [job_status(name) for name in JOBS]}
+
+
+@MaintenanceRouter.post("/jobs/{name}/run")
+async def trigger_job(name: str):
+    """Start a repair job in the background"""
+    job = JOBS.get(name)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown maintenance job: {name}")
+    start_job(job)
+    return job_status(name)
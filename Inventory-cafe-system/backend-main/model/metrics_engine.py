@@ -0,0 +1,241 @@
+# model/metrics_engine.py
+"""
+Allocation-free building blocks for in-process metrics.
+
+- RingBuffer: preallocated array('d') of values and array('q') of epoch
+  seconds (plus an optional tag column). Appending is one slot write; old
+  samples are overwritten instead of trimmed.
+- Histogram: log-linear buckets (HDR style, ~2% relative error) in a
+  preallocated array('q'), giving p50/p95/p99 without keeping samples.
+  Histograms merge by adding buckets, so hourly and daily rollups are
+  merged sketches rather than rescans of raw data.
+- ShardedHistogram / ShardedCounter: one shard per recording thread, found
+  through a threading.local, so the hot path takes no lock and never
+  contends; readers merge the shards.
+
+Recording is O(1) everywhere. Readers may observe a sample that is being
+written concurrently, which is fine for monitoring.
+"""
+import itertools
+import math
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+# Histogram range and resolution (milliseconds)
+HISTOGRAM_MIN = 0.01
+HISTOGRAM_MAX = 600_000.0
+HISTOGRAM_PRECISION = 0.02
+_LOG_BASE = math.log1p(HISTOGRAM_PRECISION)
+HISTOGRAM_BUCKETS = int(math.log(HISTOGRAM_MAX / HISTOGRAM_MIN) / _LOG_BASE) + 2
+
+
+class RingBuffer:
+    """Fixed-capacity buffer of (epoch second, value[, tag]) samples"""
+
+    def __init__(self, capacity: int, tags: Optional[str] = None):
+        self.capacity = capacity
+        self._values = array("d", bytes(8 * capacity))
+        self._stamps = array("q", bytes(8 * capacity))
+        # 'q' stores integer tags (e.g. product ids) in an array; 'object'
+        # keeps references to existing objects such as operation names
+        if tags == "q":
+            self._tags = array("q", bytes(8 * capacity))
+        elif tags == "object":
+            self._tags = [None] * capacity
+        else:
+            self._tags = None
+        # next() on itertools.count is atomic under the GIL
+        self._counter = itertools.count()
+        self._written = 0
+
+    def append(self, value: float, tag=None):
+        index = next(self._counter)
+        slot = index % self.capacity
+        self._values[slot] = value
+        self._stamps[slot] = int(time.time())
+        if self._tags is not None:
+            self._tags[slot] = tag if tag is not None else (0 if isinstance(self._tags, array) else None)
+        self._written = index + 1
+
+    def __len__(self):
+        return min(self._written, self.capacity)
+
+    def latest(self, n: Optional[int] = None) -> List[tuple]:
+        """The newest n samples, oldest first, as (epoch, value, tag) tuples"""
+        written = self._written
+        count = len(self) if n is None else min(n, len(self))
+        samples = []
+        for index in range(written - count, written):
+            slot = index % self.capacity
+            tag = self._tags[slot] if self._tags is not None else None
+            samples.append((self._stamps[slot], self._values[slot], tag))
+        return samples
+
+    def values(self, n: Optional[int] = None) -> List[float]:
+        return [value for _, value, _ in self.latest(n)]
+
+
+def _bucket(value: float) -> int:
+    if value <= HISTOGRAM_MIN:
+        return 0
+    index = int(math.log(value / HISTOGRAM_MIN) / _LOG_BASE) + 1
+    return index if index < HISTOGRAM_BUCKETS else HISTOGRAM_BUCKETS - 1
+
+
+def _bucket_value(index: int) -> float:
+    """Representative value of a bucket (its geometric midpoint)"""
+    if index == 0:
+        return HISTOGRAM_MIN
+    return HISTOGRAM_MIN * math.exp((index - 0.5) * _LOG_BASE)
+
+
+class Histogram:
+    """Log-bucketed latency histogram; not thread-safe on its own"""
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = array("q", bytes(8 * HISTOGRAM_BUCKETS))
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, value: float):
+        self.counts[_bucket(value)] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "Histogram"):
+        if not other.count:
+            return self
+        counts = self.counts
+        for index, n in enumerate(other.counts):
+            if n:
+                counts[index] += n
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def percentile(self, p: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                # Bucket midpoints can fall outside the observed range
+                return min(max(_bucket_value(index), self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "avg": round(self.mean, 2),
+            "min": round(self.min, 2) if self.count else 0.0,
+            "max": round(self.max, 2),
+            "p50": round(self.percentile(50), 2),
+            "p95": round(self.percentile(95), 2),
+            "p99": round(self.percentile(99), 2),
+        }
+
+
+class ShardedHistogram:
+    """Histogram with a private shard per recording thread"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[Histogram] = []
+        self._lock = threading.Lock()
+
+    def _shard(self) -> Histogram:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = Histogram()
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def record(self, value: float):
+        self._shard().record(value)
+
+    def merged(self) -> Histogram:
+        with self._lock:
+            shards = list(self._shards)
+        result = Histogram()
+        for shard in shards:
+            result.merge(shard)
+        return result
+
+
+class ShardedCounter:
+    """Monotonic counter with a private cell per incrementing thread"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._cells: List[array] = []
+        self._lock = threading.Lock()
+
+    def increment(self, n: int = 1):
+        cell = getattr(self._local, "cell", None)
+        if cell is None:
+            cell = array("q", [0])
+            with self._lock:
+                self._cells.append(cell)
+            self._local.cell = cell
+        cell[0] += n
+
+    @property
+    def value(self) -> int:
+        with self._lock:
+            cells = list(self._cells)
+        return sum(cell[0] for cell in cells)
+
+
+class HistogramFamily:
+    """
+    Labelled sharded histograms (e.g. one per endpoint) with a cap on the
+    number of labels; anything past the cap is folded into `overflow_label`.
+    """
+
+    def __init__(self, max_labels: int = 256, overflow_label: str = "other"):
+        self.max_labels = max_labels
+        self.overflow_label = overflow_label
+        self._histograms: Dict[str, ShardedHistogram] = {}
+        self._lock = threading.Lock()
+
+    def get(self, label: str) -> ShardedHistogram:
+        histogram = self._histograms.get(label)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.get(label)
+                if histogram is None:
+                    if len(self._histograms) >= self.max_labels:
+                        label = self.overflow_label
+                        histogram = self._histograms.get(label)
+                    if histogram is None:
+                        histogram = ShardedHistogram()
+                        self._histograms[label] = histogram
+        return histogram
+
+    def record(self, label: str, value: float):
+        self.get(label).record(value)
+
+    def merged(self) -> Dict[str, Histogram]:
+        with self._lock:
+            items = list(self._histograms.items())
+        return {label: histogram.merged() for label, histogram in items}
@@ -0,0 +1,29 @@
+# model/migrate.py
+"""
+The inventory API's schema migrations: the numbered files in
+model/migrations/, recorded in schema_version under component "inventory".
+The runner is beata_common.migrate, shared with the POS backend.
+
+    python -m model.migrate status
+    python -m model.migrate up [--to N]
+    python -m model.migrate verify
+"""
+import os
+import sys
+
+from beata_common.migrate import MigrationRunner
+
+from model.db import db_connection
+
+COMPONENT = "inventory"
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+RUNNER = MigrationRunner(COMPONENT, MIGRATIONS_DIR, db_connection, "model.migrate", "inventory schema")
+
+schema_status = RUNNER.schema_status
+migrate = RUNNER.migrate
+check_schema = RUNNER.check_schema
+
+
+if __name__ == "__main__":
+    sys.exit(RUNNER.main())
@@ -0,0 +1,135 @@
+"""
+Baseline: the tables ensure_tables_exist() used to create at every startup.
+
+Unlike ensure_tables_exist() this no longer drops and re-creates
+stock_adjustments and stockin.
+"""
+
+TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS category (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        CategoryName VARCHAR(100) NOT NULL,
+        CategoryType VARCHAR(50) NOT NULL,
+        Icon VARCHAR(50),
+        CreatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS suppliers (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        SupplierName VARCHAR(255) NOT NULL,
+        ContactPerson VARCHAR(255),
+        ContactNumber VARCHAR(20),
+        Email VARCHAR(255),
+        Address TEXT,
+        Status ENUM('Active', 'Inactive') DEFAULT 'Active',
+        CreatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS inventoryproduct (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        ProductName VARCHAR(255) NOT NULL,
+        ItemCode VARCHAR(50) NOT NULL,
+        Description TEXT,
+        Price DECIMAL(10, 2) NOT NULL DEFAULT 0.00,
+        Quantity INT NOT NULL DEFAULT 0,
+        Threshold INT NOT NULL DEFAULT 0,
+        InStock ENUM('Yes', 'No') NOT NULL DEFAULT 'No',
+        SupplierID INT,
+        CategoryID INT,
+        ProcessType VARCHAR(50) DEFAULT 'Standard',
+        ProductImage VARCHAR(255),
+        CreatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UpdatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS stock_adjustments (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        product_id INT NOT NULL,
+        previous_quantity INT NOT NULL,
+        new_quantity INT NOT NULL,
+        action VARCHAR(20) NOT NULL,
+        reason TEXT,
+        adjustment_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_product_id (product_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS stockin (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        ProductID INT NOT NULL,
+        Quantity INT NOT NULL,
+        UnitCost DECIMAL(10, 2) NOT NULL,
+        TotalCost DECIMAL(10, 2) NOT NULL,
+        ExpiryDate DATE,
+        InvoiceNumber VARCHAR(50),
+        StockImage VARCHAR(255),
+        Notes TEXT,
+        DateStocked TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_product_id (ProductID)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        username VARCHAR(50) NOT NULL UNIQUE,
+        email VARCHAR(100) NOT NULL UNIQUE,
+        password VARCHAR(255) NOT NULL,
+        role VARCHAR(20) NOT NULL DEFAULT 'cafe_staff',
+        profile_pic VARCHAR(255),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS inventory_reports (
+        ReportID INT AUTO_INCREMENT PRIMARY KEY,
+        ProductID INT,
+        ProductName VARCHAR(255),
+        Quantity INT,
+        UnitPrice DECIMAL(10, 2),
+        CategoryID INT,
+        Status VARCHAR(50),
+        ReportDate TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        Image VARCHAR(255)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS stock_reports (
+        ReportID INT AUTO_INCREMENT PRIMARY KEY,
+        StockID INT,
+        StockName VARCHAR(255),
+        Quantity INT,
+        CostPrice DECIMAL(10, 2),
+        SupplierID INT,
+        Status VARCHAR(50),
+        ReportDate TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        Image VARCHAR(255)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS categories (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        CategoryName VARCHAR(255) NOT NULL,
+        ImagePath VARCHAR(255),
+        CreatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+]
+
+
+def upgrade(connection):
+    cursor = connection.cursor()
+    try:
+        for ddl in TABLES:
+            cursor.execute(ddl)
+        # Category for Ready-Made products
+        cursor.execute("""
+            INSERT IGNORE INTO category (CategoryName, CategoryType, Icon)
+            VALUES ('Ready Made', 'Product', 'coffee')
+        """)
+        connection.commit()
+    finally:
+        cursor.close()
@@ -0,0 +1,30 @@
+"""
+Bring older users tables up to date. This replaces the column checks in
+ensure_users_table_exists(), and the ALTER TABLE ... status that
+GET /api/users used to run inside the request.
+"""
+
+
+def _columns(cursor):
+    cursor.execute("""
+        SELECT COLUMN_NAME FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'users'
+    """)
+    return {row[0].lower() for row in cursor.fetchall()}
+
+
+def upgrade(connection):
+    cursor = connection.cursor()
+    try:
+        columns = _columns(cursor)
+        if "email" not in columns:
+            cursor.execute("ALTER TABLE users ADD COLUMN email VARCHAR(100) NULL")
+            cursor.execute("UPDATE users SET email = CONCAT(username, '@cafebeata.com') WHERE email IS NULL")
+            cursor.execute("ALTER TABLE users MODIFY email VARCHAR(100) NOT NULL UNIQUE")
+        if "created_at" not in columns:
+            cursor.execute("ALTER TABLE users ADD COLUMN created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
+        if "status" not in columns:
+            cursor.execute("ALTER TABLE users ADD COLUMN status ENUM('Active', 'Inactive') DEFAULT 'Active'")
+        connection.commit()
+    finally:
+        cursor.close()
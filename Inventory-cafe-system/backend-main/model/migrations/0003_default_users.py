@@ -0,0 +1,28 @@
+"""
+Default accounts on an empty install: admin / admin123 and staff / staff123,
+as ensure_users_table_exists() created them. Existing usernames are left
+alone.
+"""
+import bcrypt
+
+DEFAULT_USERS = [
+    ("admin", "admin@cafebeata.com", "admin123", "admin"),
+    ("staff", "staff@cafebeata.com", "staff123", "cafe_staff"),
+]
+
+
+def upgrade(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT id FROM users WHERE username = 'admin'")
+        if cursor.fetchone():
+            return
+        for username, email, password, role in DEFAULT_USERS:
+            hashed = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+            cursor.execute(
+                "INSERT IGNORE INTO users (username, email, password, role) VALUES (%s, %s, %s, %s)",
+                (username, email, hashed, role)
+            )
+        connection.commit()
+    finally:
+        cursor.close()
@@ -0,0 +1,30 @@
+"""
+sales_daily_rollup (see model/sales_rollup.py), backfilled from `sales` the
+first time.
+"""
+from model.sales_rollup import rebuild_sales_rollup
+
+ROLLUP_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS sales_daily_rollup (
+        sale_date DATE NOT NULL,
+        product_id INT NOT NULL,
+        quantity_sold INT NOT NULL DEFAULT 0,
+        remitted DECIMAL(12, 2) NOT NULL DEFAULT 0,
+        sale_count INT NOT NULL DEFAULT 0,
+        last_sale_at DATETIME NULL,
+        PRIMARY KEY (sale_date, product_id),
+        KEY idx_rollup_product_date (product_id, sale_date)
+    )
+"""
+
+
+def upgrade(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(ROLLUP_TABLE_DDL)
+        cursor.execute("SELECT 1 FROM sales_daily_rollup LIMIT 1")
+        populated = cursor.fetchone() is not None
+    finally:
+        cursor.close()
+    if not populated:
+        rebuild_sales_rollup(connection)
@@ -0,0 +1,24 @@
+"""
+Composite indexes behind the date-range queries (see model/indexes.py).
+Indexes whose table or columns don't exist in this database are skipped.
+"""
+from model.indexes import ensure_indexes
+
+# (table, index name, columns)
+INDEXES = [
+    ("inventoryproduct", "idx_inventoryproduct_stock_level", ("ProcessType", "Quantity", "Threshold")),
+    ("sales", "idx_sales_product_created", ("product_id", "created_at")),
+    ("sales", "idx_sales_created", ("created_at",)),
+    ("stock_details", "idx_stock_details_fifo", ("ProductID", "quantity", "created_at")),
+    ("stock_details", "idx_stock_details_product_created", ("ProductID", "created_at")),
+    ("order_history", "idx_order_history_created", ("created_at",)),
+    ("order_history_detail", "idx_order_history_detail_order", ("order_id",)),
+    ("inventory_transactions", "idx_inventory_transactions_product_created", ("ProductID", "created_at")),
+    ("inventory_reports", "idx_inventory_reports_date", ("ReportDate",)),
+    ("daily_inventory_snapshot", "idx_snapshot_date_product", ("snapshot_date", "product_id")),
+    ("stock_adjustments", "idx_stock_adjustments_product_date", ("product_id", "adjustment_date")),
+]
+
+
+def upgrade(connection):
+    ensure_indexes(connection, INDEXES)
@@ -0,0 +1,64 @@
+"""
+inventory_change_log and the inventoryproduct triggers that fill it, for the
+change feed in model/change_feed.py. The log is seeded with one entry so the
+current version is never 0 (0 means "no cursor").
+"""
+
+CHANGE_LOG_DDL = """
+    CREATE TABLE IF NOT EXISTS inventory_change_log (
+        version BIGINT AUTO_INCREMENT PRIMARY KEY,
+        product_id INT NOT NULL,
+        change_type VARCHAR(10) NOT NULL,
+        changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        KEY idx_change_log_changed_at (changed_at)
+    )
+"""
+
+# Updates that don't touch a synced column (e.g. UpdatedAt only) are not logged
+TRIGGERS = {
+    "trg_inventoryproduct_change_insert": """
+        CREATE TRIGGER trg_inventoryproduct_change_insert
+        AFTER INSERT ON inventoryproduct FOR EACH ROW
+        INSERT INTO inventory_change_log (product_id, change_type) VALUES (NEW.id, 'upsert')
+    """,
+    "trg_inventoryproduct_change_update": """
+        CREATE TRIGGER trg_inventoryproduct_change_update
+        AFTER UPDATE ON inventoryproduct FOR EACH ROW
+        INSERT INTO inventory_change_log (product_id, change_type)
+        SELECT NEW.id, 'upsert' FROM DUAL
+        WHERE NOT (
+            OLD.Quantity <=> NEW.Quantity
+            AND OLD.ProductName <=> NEW.ProductName
+            AND OLD.UnitPrice <=> NEW.UnitPrice
+            AND OLD.Threshold <=> NEW.Threshold
+            AND OLD.ProcessType <=> NEW.ProcessType
+            AND OLD.Image <=> NEW.Image
+            AND OLD.`CategoryID (FK)` <=> NEW.`CategoryID (FK)`
+        )
+    """,
+    "trg_inventoryproduct_change_delete": """
+        CREATE TRIGGER trg_inventoryproduct_change_delete
+        AFTER DELETE ON inventoryproduct FOR EACH ROW
+        INSERT INTO inventory_change_log (product_id, change_type) VALUES (OLD.id, 'delete')
+    """,
+}
+
+
+def upgrade(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(CHANGE_LOG_DDL)
+        cursor.execute("SELECT 1 FROM inventory_change_log LIMIT 1")
+        if cursor.fetchone() is None:
+            cursor.execute("INSERT INTO inventory_change_log (product_id, change_type) VALUES (0, 'seed')")
+        cursor.execute("""
+            SELECT TRIGGER_NAME FROM information_schema.TRIGGERS
+            WHERE TRIGGER_SCHEMA = DATABASE() AND EVENT_OBJECT_TABLE = 'inventoryproduct'
+        """)
+        existing = {row[0] for row in cursor.fetchall()}
+        for name, ddl in TRIGGERS.items():
+            if name not in existing:
+                cursor.execute(ddl)
+        connection.commit()
+    finally:
+        cursor.close()
@@ -0,0 +1,22 @@
+"""
+Progress checkpoints for the chunked repair jobs in model/maintenance.py.
+"""
+
+
+def upgrade(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS maintenance_checkpoints (
+                job VARCHAR(64) PRIMARY KEY,
+                last_key BIGINT NOT NULL DEFAULT 0,
+                max_key BIGINT NOT NULL DEFAULT 0,
+                rows_updated BIGINT NOT NULL DEFAULT 0,
+                started_at DATETIME NULL,
+                finished_at DATETIME NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            )
+        """)
+        connection.commit()
+    finally:
+        cursor.close()
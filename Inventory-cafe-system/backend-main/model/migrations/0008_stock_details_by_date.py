@@ -0,0 +1,15 @@
+"""
+Covering index for per-day aggregates over stock_details (the
+beginning-quantity derived table in the category sales report): range on
+created_at, grouped by ProductID, summing original_quantity without touching
+the rows.
+"""
+from model.indexes import ensure_indexes
+
+INDEXES = [
+    ("stock_details", "idx_stock_details_created_product", ("created_at", "ProductID", "original_quantity")),
+]
+
+
+def upgrade(connection):
+    ensure_indexes(connection, INDEXES)
@@ -0,0 +1,22 @@
+"""
+stock_adjustment_requests: request ids already applied by /stock/adjust/batch,
+written in the same transaction as the adjustment, so a caller that retries
+after a lost response (the cafe-beata outbox) can't subtract stock twice.
+"""
+
+REQUESTS_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS stock_adjustment_requests (
+        request_id VARCHAR(64) NOT NULL PRIMARY KEY,
+        product_id INT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        KEY idx_adjustment_requests_applied_at (applied_at)
+    )
+"""
+
+
+def upgrade(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(REQUESTS_TABLE_DDL)
+    finally:
+        cursor.close()
@@ -0,0 +1,22 @@
+"""
+sales_update_requests: request ids already recorded by /sales/update(/batch),
+claimed in the same transaction as the sale (see model/idempotency.py), so a
+caller that retries after a lost response can't record a sale twice.
+"""
+
+REQUESTS_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS sales_update_requests (
+        request_id VARCHAR(64) NOT NULL PRIMARY KEY,
+        product_id INT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        KEY idx_sales_update_requests_applied_at (applied_at)
+    )
+"""
+
+
+def upgrade(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(REQUESTS_TABLE_DDL)
+    finally:
+        cursor.close()
@@ -0,0 +1,27 @@
+"""
+daily_beginning_quantity (see model/beginning_quantity.py), backfilled from
+stock_details the first time.
+"""
+from model.beginning_quantity import rebuild_beginning_quantities
+
+TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS daily_beginning_quantity (
+        quantity_date DATE NOT NULL,
+        product_id INT NOT NULL,
+        beginning_quantity INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (quantity_date, product_id),
+        KEY idx_beginning_quantity_product (product_id, quantity_date)
+    )
+"""
+
+
+def upgrade(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(TABLE_DDL)
+        cursor.execute("SELECT 1 FROM daily_beginning_quantity LIMIT 1")
+        populated = cursor.fetchone() is not None
+    finally:
+        cursor.close()
+    if not populated:
+        rebuild_beginning_quantities(connection)
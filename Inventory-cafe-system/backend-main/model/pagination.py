@@ -0,0 +1,190 @@
+# model/pagination.py
+"""
+Keyset pagination, field projection and row-count estimates for list endpoints.
+
+Lists are ordered by a unique key, normally (created_at, id) newest first,
+and each page ends with an opaque cursor encoding the last key returned.
+The next page asks for rows strictly after that key, so every page is an
+index range read of `limit` rows no matter how deep the client pages.
+
+    @Router.get("/things", response_model=list)
+    async def list_things(response: Response, page: PageParams = Depends(page_params())):
+        where, params = keyset_where(("created_at", "id"), page.cursor)
+        rows = ... f"SELECT ... WHERE {where} {order_by(('created_at', 'id'))} LIMIT %s", params + [page.fetch]
+        rows, next_cursor = finish_page(rows, page, key=lambda r: (r["created_at"], r["id"]), response=response)
+        return project(rows, page.fields)
+
+Endpoints that already return a bare JSON list keep doing so and report the
+cursor and total in the X-Next-Cursor / X-Total-Count headers; endpoints
+with an envelope object add next_cursor and total to it.
+"""
+import base64
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Callable, List, Optional, Sequence, Set, Tuple
+
+from fastapi import HTTPException, Query, Response
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+
+@dataclass
+class PageParams:
+    limit: int
+    cursor: Optional[list]
+    fields: Optional[Set[str]]
+
+    @property
+    def fetch(self) -> int:
+        """Rows to ask the database for; the extra one tells us if there is a next page"""
+        return self.limit + 1
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return ["dt", value.isoformat()]
+    if isinstance(value, date):
+        return ["d", value.isoformat()]
+    if isinstance(value, Decimal):
+        return ["dec", str(value)]
+    return ["v", value]
+
+
+def _decode_value(pair):
+    kind, value = pair
+    if kind == "dt":
+        return datetime.fromisoformat(value)
+    if kind == "d":
+        return date.fromisoformat(value)
+    if kind == "dec":
+        return Decimal(value)
+    return value
+
+
+def encode_cursor(key: Sequence) -> str:
+    raw = json.dumps([_encode_value(value) for value in key], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: Optional[str]) -> Optional[list]:
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        return [_decode_value(pair) for pair in json.loads(raw)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Set[str]]:
+    if not fields:
+        return None
+    return {field.strip() for field in fields.split(",") if field.strip()} or None
+
+
+def page_params(default_limit: int = DEFAULT_LIMIT):
+    """Dependency factory for the limit/cursor/fields query parameters"""
+    def dependency(
+        limit: int = Query(default_limit, ge=1, le=MAX_LIMIT, description="Maximum rows to return"),
+        cursor: Optional[str] = Query(None, description="Cursor from the previous page"),
+        fields: Optional[str] = Query(None, description="Comma-separated fields to include"),
+    ) -> PageParams:
+        return PageParams(limit=limit, cursor=decode_cursor(cursor), fields=parse_fields(fields))
+    return dependency
+
+
+def keyset_where(columns: Sequence[str], cursor: Optional[list], descending: bool = True) -> Tuple[str, list]:
+    """
+    SQL condition selecting rows after `cursor` in ORDER BY `columns` order.
+    The leading column is also bounded on its own so MySQL can use a range
+    scan on it. Returns ("1=1", []) for the first page.
+    """
+    if not cursor:
+        return "1=1", []
+    if len(cursor) != len(columns):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+    op = "<" if descending else ">"
+    branches, params = [], []
+    for i, column in enumerate(columns):
+        parts = [f"{previous} = %s" for previous in columns[:i]] + [f"{column} {op} %s"]
+        branches.append("(" + " AND ".join(parts) + ")")
+        params.extend(cursor[:i + 1])
+    return f"{columns[0]} {op}= %s AND ({' OR '.join(branches)})", [cursor[0]] + params
+
+
+def order_by(columns: Sequence[str], descending: bool = True) -> str:
+    direction = "DESC" if descending else "ASC"
+    return "ORDER BY " + ", ".join(f"{column} {direction}" for column in columns)
+
+
+def finish_page(rows: list, page: PageParams, key: Callable, response: Optional[Response] = None,
+                total: Optional[int] = None):
+    """
+    Trim the extra look-ahead row and work out the next cursor.
+    Returns (rows, next_cursor); also sets the pagination headers on `response`.
+    """
+    next_cursor = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        next_cursor = encode_cursor(key(rows[-1]))
+
+    if response is not None:
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        if total is not None:
+            response.headers[TOTAL_COUNT_HEADER] = str(total)
+    return rows, next_cursor
+
+
+def paginate_sorted(items: list, page: PageParams, key: Callable, descending: bool = False,
+                    response: Optional[Response] = None):
+    """Keyset-paginate an in-memory list already sorted by `key`"""
+    total = len(items)
+    if page.cursor:
+        after = tuple(page.cursor)
+        if descending:
+            items = [item for item in items if tuple(key(item)) < after]
+        else:
+            items = [item for item in items if tuple(key(item)) > after]
+    return finish_page(items[:page.fetch], page, key, response=response, total=total)
+
+
+def project(items: List[dict], fields: Optional[Set[str]]) -> List[dict]:
+    """Keep only the requested fields; unknown names are ignored"""
+    if not fields:
+        return items
+    return [{name: value for name, value in item.items() if name in fields} for item in items]
+
+
+TOTAL_ESTIMATE_QUERY = """
+    SELECT TABLE_ROWS FROM information_schema.TABLES
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+"""
+
+
+def _row_count(row) -> Optional[int]:
+    if not row:
+        return None
+    value = row["TABLE_ROWS"] if isinstance(row, dict) else row[0]
+    return int(value) if value is not None else None
+
+
+def estimate_total(cursor, table: str) -> Optional[int]:
+    """
+    Approximate row count from InnoDB statistics. Much cheaper than
+    COUNT(*) on large tables; good enough for "about N results".
+    """
+    cursor.execute(TOTAL_ESTIMATE_QUERY, (table,))
+    return _row_count(cursor.fetchone())
+
+
+async def estimate_total_async(adb, table: str) -> Optional[int]:
+    """estimate_total() for handlers holding an AsyncDB"""
+    return _row_count(await adb.fetchone(TOTAL_ESTIMATE_QUERY, (table,)))
@@ -5,7 +5,10 @@ import logging
 from fastapi import APIRouter, Depends, HTTPException
 from typing import Dict, List, Optional
 import statistics
-from model.db import get_db, db_transaction
+from collections import deque
+from model.db import get_db, get_pool_stats
+from model.async_db import AsyncDB, get_async_db
+from model.metrics_engine import Histogram, HistogramFamily, RingBuffer, ShardedCounter, ShardedHistogram
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -14,261 +17,267 @@ logger = logging.getLogger("performance_metrics")
 # Create router
 PerformanceMetricsRouter = APIRouter(tags=["Performance Metrics"])
 
-# In-memory storage for metrics (will be lost on restart)
-# For production, consider adding a database table for persistent storage
-metrics_storage = {
-    "transaction_times": [],  # List of transaction execution times (ms)
-    "stock_update_times": [],  # List of stock update execution times (ms)
-    "error_rates": {
-        "total_requests": 0,
-        "failed_requests": 0,
-        "errors_by_type": {}  # Dictionary of error types and counts
-    },
-    "response_times": [],  # List of API response times (ms)
-    "database_connection_times": [],  # List of database connection times (ms)
-    "concurrent_users": 0,  # Current number of concurrent users
-    "max_concurrent_users": 0,  # Maximum concurrent users observed
-    "hourly_metrics": {},  # Hourly aggregated metrics
-    "daily_metrics": {},  # Daily aggregated metrics
-}
-
-# Lock for thread-safe access to metrics
-metrics_lock = threading.RLock()
+# In-memory metrics (lost on restart). Recording never allocates lists or
+# takes a global lock; see model/metrics_engine.py.
+RECENT_SAMPLES = 1000
+HOURLY_RETENTION = 48  # Hours of rolled-up sketches to keep
+
+transaction_times = RingBuffer(RECENT_SAMPLES, tags="object")  # tag: operation type
+stock_update_times = RingBuffer(RECENT_SAMPLES, tags="q")      # tag: product id
+snapshot_runs = RingBuffer(RECENT_SAMPLES, tags="q")           # tag: rows written
+response_times = RingBuffer(RECENT_SAMPLES, tags="object")     # tag: endpoint
+database_connection_times = RingBuffer(100)
+
+total_requests = ShardedCounter()
+failed_requests = ShardedCounter()
+endpoint_histograms = HistogramFamily(max_labels=256)
+
+
+class _HourWindow:
+    """Sketches for the hour in progress; swapped out whole at rollover"""
+
+    def __init__(self):
+        self.started = datetime.datetime.now().replace(minute=0, second=0, microsecond=0)
+        self.transactions = ShardedHistogram()
+        self.stock_updates = ShardedHistogram()
+        self.responses = ShardedHistogram()
+
+
+_hour = _HourWindow()
+hourly_sketches = {}   # hour key -> {"transactions": Histogram, ...}
+hourly_metrics = {}    # hour key -> summary dict served by the API
+
+# Errors are rare; a plain lock is fine here
+errors_lock = threading.Lock()
+errors_by_type = {}
+
+# Concurrent users gauge (not on the per-request path)
+users_lock = threading.Lock()
+concurrent_users = 0
+max_concurrent_users = 0
+
 
 def record_transaction_time(operation_type: str, execution_time_ms: float):
     """Record transaction execution time"""
-    with metrics_lock:
-        metrics_storage["transaction_times"].append({
-            "timestamp": datetime.datetime.now(),
-            "operation_type": operation_type,
-            "execution_time_ms": execution_time_ms
-        })
-        
-        # Keep only the last 1000 transaction times to limit memory usage
-        if len(metrics_storage["transaction_times"]) > 1000:
-            metrics_storage["transaction_times"] = metrics_storage["transaction_times"][-1000:]
+    transaction_times.append(execution_time_ms, operation_type)
+    _hour.transactions.record(execution_time_ms)
 
 def record_stock_update_time(product_id: int, execution_time_ms: float):
     """Record stock update execution time"""
-    with metrics_lock:
-        metrics_storage["stock_update_times"].append({
-            "timestamp": datetime.datetime.now(),
-            "product_id": product_id,
-            "execution_time_ms": execution_time_ms
-        })
-        
-        # Keep only the last 1000 update times to limit memory usage
-        if len(metrics_storage["stock_update_times"]) > 1000:
-            metrics_storage["stock_update_times"] = metrics_storage["stock_update_times"][-1000:]
+    try:
+        product_id = int(product_id)
+    except (TypeError, ValueError):
+        product_id = 0
+    stock_update_times.append(execution_time_ms, product_id)
+    _hour.stock_updates.record(execution_time_ms)
+
+def record_snapshot_run(row_count: int, execution_time_ms: float):
+    """Record an inventory summary snapshot"""
+    snapshot_runs.append(execution_time_ms, row_count)
 
 def record_error(error_type: str, endpoint: str, error_message: str):
     """Record an error occurrence"""
-    with metrics_lock:
-        metrics_storage["error_rates"]["failed_requests"] += 1
-        
-        if error_type not in metrics_storage["error_rates"]["errors_by_type"]:
-            metrics_storage["error_rates"]["errors_by_type"][error_type] = {
-                "count": 0,
-                "endpoints": {}
-            }
-        
-        metrics_storage["error_rates"]["errors_by_type"][error_type]["count"] += 1
-        
-        if endpoint not in metrics_storage["error_rates"]["errors_by_type"][error_type]["endpoints"]:
-            metrics_storage["error_rates"]["errors_by_type"][error_type]["endpoints"][endpoint] = {
-                "count": 0,
-                "recent_errors": []
-            }
-        
-        metrics_storage["error_rates"]["errors_by_type"][error_type]["endpoints"][endpoint]["count"] += 1
-        
-        # Add to recent errors list with timestamp
-        recent_error = {
+    failed_requests.increment()
+    with errors_lock:
+        by_type = errors_by_type.setdefault(error_type, {"count": 0, "endpoints": {}})
+        by_type["count"] += 1
+        by_endpoint = by_type["endpoints"].setdefault(
+            endpoint, {"count": 0, "recent_errors": deque(maxlen=10)}
+        )
+        by_endpoint["count"] += 1
+        by_endpoint["recent_errors"].append({
             "timestamp": datetime.datetime.now(),
             "message": error_message
-        }
-        
-        metrics_storage["error_rates"]["errors_by_type"][error_type]["endpoints"][endpoint]["recent_errors"].append(recent_error)
-        
-        # Keep only the last 10 recent errors per endpoint
-        if len(metrics_storage["error_rates"]["errors_by_type"][error_type]["endpoints"][endpoint]["recent_errors"]) > 10:
-            metrics_storage["error_rates"]["errors_by_type"][error_type]["endpoints"][endpoint]["recent_errors"] = metrics_storage["error_rates"]["errors_by_type"][error_type]["endpoints"][endpoint]["recent_errors"][-10:]
+        })
 
 def record_request():
     """Record a new request for calculating error rates"""
-    with metrics_lock:
-        metrics_storage["error_rates"]["total_requests"] += 1
+    total_requests.increment()
 
 def record_response_time(endpoint: str, response_time_ms: float):
     """Record API response time"""
-    with metrics_lock:
-        metrics_storage["response_times"].append({
-            "timestamp": datetime.datetime.now(),
-            "endpoint": endpoint,
-            "response_time_ms": response_time_ms
-        })
-        
-        # Keep only the last 1000 response times
-        if len(metrics_storage["response_times"]) > 1000:
-            metrics_storage["response_times"] = metrics_storage["response_times"][-1000:]
+    response_times.append(response_time_ms, endpoint)
+    endpoint_histograms.record(endpoint, response_time_ms)
+    _hour.responses.record(response_time_ms)
 
 def record_db_connection_time(connection_time_ms: float):
     """Record database connection time"""
-    with metrics_lock:
-        metrics_storage["database_connection_times"].append({
-            "timestamp": datetime.datetime.now(),
-            "connection_time_ms": connection_time_ms
-        })
-        
-        # Keep only the last 100 connection times
-        if len(metrics_storage["database_connection_times"]) > 100:
-            metrics_storage["database_connection_times"] = metrics_storage["database_connection_times"][-100:]
+    database_connection_times.append(connection_time_ms)
 
 def increment_concurrent_users():
     """Increment concurrent user count"""
-    with metrics_lock:
-        metrics_storage["concurrent_users"] += 1
-        metrics_storage["max_concurrent_users"] = max(
-            metrics_storage["max_concurrent_users"],
-            metrics_storage["concurrent_users"]
-        )
+    global concurrent_users, max_concurrent_users
+    with users_lock:
+        concurrent_users += 1
+        max_concurrent_users = max(max_concurrent_users, concurrent_users)
 
 def decrement_concurrent_users():
     """Decrement concurrent user count"""
-    with metrics_lock:
-        metrics_storage["concurrent_users"] = max(0, metrics_storage["concurrent_users"] - 1)
+    global concurrent_users
+    with users_lock:
+        concurrent_users = max(0, concurrent_users - 1)
 
 def update_hourly_metrics():
-    """Update hourly aggregated metrics"""
-    current_hour = datetime.datetime.now().replace(minute=0, second=0, microsecond=0)
-    hour_key = current_hour.strftime("%Y-%m-%d %H:00")
-    
-    with metrics_lock:
-        # Filter metrics for the current hour
-        hour_transaction_times = [
-            item["execution_time_ms"] 
-            for item in metrics_storage["transaction_times"] 
-            if item["timestamp"].replace(minute=0, second=0, microsecond=0) == current_hour
-        ]
-        
-        hour_stock_update_times = [
-            item["execution_time_ms"] 
-            for item in metrics_storage["stock_update_times"] 
-            if item["timestamp"].replace(minute=0, second=0, microsecond=0) == current_hour
-        ]
-        
-        hour_response_times = [
-            item["response_time_ms"] 
-            for item in metrics_storage["response_times"] 
-            if item["timestamp"].replace(minute=0, second=0, microsecond=0) == current_hour
-        ]
-        
-        # Calculate aggregated metrics
-        metrics_storage["hourly_metrics"][hour_key] = {
-            "avg_transaction_time": statistics.mean(hour_transaction_times) if hour_transaction_times else 0,
-            "avg_stock_update_time": statistics.mean(hour_stock_update_times) if hour_stock_update_times else 0,
-            "avg_response_time": statistics.mean(hour_response_times) if hour_response_times else 0,
-            "transaction_count": len(hour_transaction_times),
-            "stock_update_count": len(hour_stock_update_times),
-            "max_concurrent_users": metrics_storage["max_concurrent_users"]
-        }
-        
+    """
+    Close the current hour: swap in fresh sketches, then merge the old
+    window's shards into one summary. Raw samples are never rescanned.
+    """
+    global _hour, max_concurrent_users
+    window, _hour = _hour, _HourWindow()
+    hour_key = window.started.strftime("%Y-%m-%d %H:00")
+
+    sketches = {
+        "transactions": window.transactions.merged(),
+        "stock_updates": window.stock_updates.merged(),
+        "responses": window.responses.merged(),
+    }
+    with users_lock:
+        peak_users = max_concurrent_users
         # Reset max concurrent users for the next hour
-        metrics_storage["max_concurrent_users"] = metrics_storage["concurrent_users"]
+        max_concurrent_users = concurrent_users
+
+    hourly_sketches[hour_key] = sketches
+    hourly_metrics[hour_key] = {
+        "avg_transaction_time": sketches["transactions"].mean,
+        "avg_stock_update_time": sketches["stock_updates"].mean,
+        "avg_response_time": sketches["responses"].mean,
+        "p95_response_time": sketches["responses"].percentile(95),
+        "p99_response_time": sketches["responses"].percentile(99),
+        "transaction_count": sketches["transactions"].count,
+        "stock_update_count": sketches["stock_updates"].count,
+        "request_count": sketches["responses"].count,
+        "max_concurrent_users": peak_users
+    }
+    for key in sorted(hourly_sketches)[:-HOURLY_RETENTION]:
+        hourly_sketches.pop(key, None)
+        hourly_metrics.pop(key, None)
+
+def merged_hours(metric: str, hours: int = 24) -> Histogram:
+    """One sketch covering the last `hours` closed hours plus the hour in progress"""
+    result = Histogram()
+    for key in sorted(hourly_sketches)[-hours:]:
+        result.merge(hourly_sketches[key][metric])
+    return result.merge(getattr(_hour, metric).merged())
 
 def start_metrics_aggregation():
     """Start background task for aggregating metrics hourly"""
     def hourly_aggregation():
         while True:
-            try:
-                update_hourly_metrics()
-            except Exception as e:
-                logger.error(f"Error in hourly metrics aggregation: {e}")
-            
-            # Sleep until the start of the next hour
+            # Sleep until the start of the next hour, then close the one that ended
             now = datetime.datetime.now()
             next_hour = (now.replace(minute=0, second=0, microsecond=0) + 
                          datetime.timedelta(hours=1))
             seconds_to_wait = (next_hour - now).total_seconds()
             time.sleep(seconds_to_wait)
+            try:
+                update_hourly_metrics()
+            except Exception as e:
+                logger.error(f"Error in hourly metrics aggregation: {e}")
     
     aggregation_thread = threading.Thread(target=hourly_aggregation)
     aggregation_thread.daemon = True
     aggregation_thread.start()
     logger.info("Metrics aggregation background task started")
 
+def _mean(values):
+    return statistics.mean(values) if values else 0
+
+def _timestamp(epoch):
+    return datetime.datetime.fromtimestamp(epoch).isoformat()
+
 # API Endpoints
 @PerformanceMetricsRouter.get("/api/performance/metrics")
-async def get_performance_metrics(db=Depends(get_db)):
+async def get_performance_metrics():
     """Get current performance metrics"""
-    with metrics_lock:
-        # Calculate current error rate
-        total_requests = metrics_storage["error_rates"]["total_requests"]
-        failed_requests = metrics_storage["error_rates"]["failed_requests"]
-        error_rate = (failed_requests / total_requests * 100) if total_requests > 0 else 0
+    # Calculate current error rate
+    total = total_requests.value
+    failed = failed_requests.value
+    error_rate = (failed / total * 100) if total > 0 else 0
 
-        # Calculate average transaction times for the last 100 transactions
-        recent_transaction_times = [
-            item["execution_time_ms"] for item in metrics_storage["transaction_times"][-100:]
-        ] if metrics_storage["transaction_times"] else []
+    # Averages over the most recent 100 samples
+    avg_transaction_time = _mean(transaction_times.values(100))
+    avg_stock_update_time = _mean(stock_update_times.values(100))
+    avg_response_time = _mean(response_times.values(100))
 
-        avg_transaction_time = statistics.mean(recent_transaction_times) if recent_transaction_times else 0
+    # Percentiles per endpoint since startup, slowest p95 first
+    endpoints = sorted(
+        ((label, histogram.summary()) for label, histogram in endpoint_histograms.merged().items()),
+        key=lambda item: item[1]["p95"],
+        reverse=True
+    )
 
-        # Calculate average stock update times for the last 100 updates
-        recent_stock_update_times = [
-            item["execution_time_ms"] for item in metrics_storage["stock_update_times"][-100:]
-        ] if metrics_storage["stock_update_times"] else []
+    # Get the most recent hourly metrics (last 24 hours)
+    hourly_keys = sorted(hourly_metrics)[-24:]
 
-        avg_stock_update_time = statistics.mean(recent_stock_update_times) if recent_stock_update_times else 0
-
-        # Calculate average response times for the last 100 requests
-        recent_response_times = [
-            item["response_time_ms"] for item in metrics_storage["response_times"][-100:]
-        ] if metrics_storage["response_times"] else []
+    with errors_lock:
+        error_details = {
+            error_type: {
+                "count": by_type["count"],
+                "endpoints": {
+                    endpoint: {
+                        "count": by_endpoint["count"],
+                        "recent_errors": list(by_endpoint["recent_errors"])
+                    }
+                    for endpoint, by_endpoint in by_type["endpoints"].items()
+                }
+            }
+            for error_type, by_type in errors_by_type.items()
+        }
 
-        avg_response_time = statistics.mean(recent_response_times) if recent_response_times else 0
+    return {
+        "current_metrics": {
+            "error_rate": round(error_rate, 2),
+            "avg_transaction_time": round(avg_transaction_time, 2),
+            "avg_stock_update_time": round(avg_stock_update_time, 2),
+            "avg_response_time": round(avg_response_time, 2),
+            "concurrent_users": concurrent_users,
+            "max_concurrent_users": max_concurrent_users
+        },
+        "response_time_percentiles": merged_hours("responses").summary(),
+        "endpoint_percentiles": {label: summary for label, summary in endpoints[:50]},
+        "hourly_metrics": {key: hourly_metrics[key] for key in hourly_keys},
+        "error_details": {
+            "total_requests": total,
+            "failed_requests": failed,
+            "errors_by_type": error_details
+        },
+        "transaction_times": [
+            {
+                "timestamp": _timestamp(epoch),
+                "operation_type": operation_type,
+                "execution_time_ms": value
+            }
+            for epoch, value, operation_type in transaction_times.latest(10)
+        ],
+        "stock_update_times": [
+            {
+                "timestamp": _timestamp(epoch),
+                "product_id": product_id,
+                "execution_time_ms": value
+            }
+            for epoch, value, product_id in stock_update_times.latest(10)
+        ],
+        "snapshot_runs": [
+            {
+                "timestamp": _timestamp(epoch),
+                "row_count": row_count,
+                "execution_time_ms": value
+            }
+            for epoch, value, row_count in snapshot_runs.latest(10)
+        ],
+    }
 
-        # Get the most recent hourly metrics (last 24 hours)
-        hourly_keys = sorted(metrics_storage["hourly_metrics"].keys())[-24:] if metrics_storage["hourly_metrics"] else []
-        recent_hourly_metrics = {
-            key: metrics_storage["hourly_metrics"][key] for key in hourly_keys
-        }
+@PerformanceMetricsRouter.get("/api/performance/pool_stats")
+async def get_connection_pool_stats():
+    """Get connection pool counters (doesn't need a connection, so it works during exhaustion)"""
+    return get_pool_stats()
 
-        return {
-            "current_metrics": {
-                "error_rate": round(error_rate, 2),
-                "avg_transaction_time": round(avg_transaction_time, 2),
-                "avg_stock_update_time": round(avg_stock_update_time, 2),
-                "avg_response_time": round(avg_response_time, 2),
-                "concurrent_users": metrics_storage["concurrent_users"],
-                "max_concurrent_users": metrics_storage["max_concurrent_users"]
-            },
-            "hourly_metrics": recent_hourly_metrics,
-            "error_details": {
-                "total_requests": total_requests,
-                "failed_requests": failed_requests,
-                "errors_by_type": metrics_storage["error_rates"]["errors_by_type"]
-            },
-            "transaction_times": [
-                {
-                    "timestamp": t["timestamp"].isoformat() if hasattr(t["timestamp"], "isoformat") else str(t["timestamp"]),
-                    "operation_type": t["operation_type"],
-                    "execution_time_ms": t["execution_time_ms"]
-                }
-                for t in metrics_storage["transaction_times"][-10:]
-            ],
-            "stock_update_times": [
-                {
-                    "timestamp": t["timestamp"].isoformat() if hasattr(t["timestamp"], "isoformat") else str(t["timestamp"]),
-                    "product_id": t.get("product_id"),
-                    "execution_time_ms": t["execution_time_ms"]
-                }
-                for t in metrics_storage["stock_update_times"][-10:]
-            ],
-        }
 @PerformanceMetricsRouter.get("/api/performance/database_stats")
-async def get_database_stats(db=Depends(get_db)):  # Remove @db_transaction decorator
+async def get_database_stats(adb: AsyncDB = Depends(get_async_db)):
     """Get database performance statistics"""
+    return await adb.run(_get_database_stats)
+
+def _get_database_stats(db):
     try:
         # Get active connections count
         cursor = db.cursor()
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, Query 
 from typing import Dict, List, Optional
 from datetime import datetime
-from model.db import get_db
+from model.async_db import AsyncDB, get_async_db
+from model.indexes import day_range
+from model.schema import get_schema
 import traceback
 import logging
 import mysql.connector
@@ -11,6 +13,9 @@ logger = logging.getLogger("inventory-system-backend")
 
 ReportRouter = APIRouter(tags=["Reports"])
 
+# Used when no product is below its own Threshold
+DEFAULT_LOW_STOCK_THRESHOLD = 10
+
 def determine_status(quantity: int) -> str:
     """Determine stock status based on quantity."""
     if quantity == 0:
@@ -20,54 +25,11 @@ def determine_status(quantity: int) -> str:
     else:
         return "In Stock"
 
-def ensure_report_tables_exist(db_conn):
-    """Create report tables if they don't exist"""
-    try:
-        cursor = db_conn.cursor()
-        
-        # Create inventory reports table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS inventory_reports (
-            ReportID INT AUTO_INCREMENT PRIMARY KEY,
-            ProductID INT,
-            ProductName VARCHAR(255),
-            Quantity INT,
-            UnitPrice DECIMAL(10, 2),
-            CategoryID INT,
-            Status VARCHAR(50),
-            ReportDate TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            Image VARCHAR(255)
-        )
-        """)
-        
-        # Create stock reports table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS stock_reports (
-            ReportID INT AUTO_INCREMENT PRIMARY KEY,
-            StockID INT,
-            StockName VARCHAR(255),
-            Quantity INT,
-            CostPrice DECIMAL(10, 2),
-            SupplierID INT,
-            Status VARCHAR(50),
-            ReportDate TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            Image VARCHAR(255)
-        )
-        """)
-        
-        db_conn.commit()
-        cursor.close()
-        return True
-    except Exception as e:
-        logger.error(f"Error creating report tables: {str(e)}")
-        return False
-
 def generate_inventory_report(db_conn, report_date: Optional[str] = None) -> Dict:
     """Fetch all inventory data for a given report date or latest, with category names."""
     logger.info(f"Generating inventory report for: {report_date}")
 
     try:
-        ensure_report_tables_exist(db_conn)
         cursor = db_conn.cursor()
 
         # Attempt to fetch from reports table with category name join
@@ -79,9 +41,9 @@ def generate_inventory_report(db_conn, report_date: Optional[str] = None) -> Dic
                         ir.CategoryID, c.CategoryName, ir.Status, ir.ReportDate, ir.Image
                     FROM inventory_reports ir
                     LEFT JOIN categories c ON ir.CategoryID = c.id
-                    WHERE DATE(ir.ReportDate) = %s
+                    WHERE ir.ReportDate >= %s AND ir.ReportDate < %s
                     ORDER BY ir.ReportDate DESC
-                """, (report_date,))
+                """, day_range(report_date))
             else:
                 cursor.execute("""
                     SELECT 
@@ -173,8 +135,11 @@ def generate_inventory_report(db_conn, report_date: Optional[str] = None) -> Dic
 @ReportRouter.get("/inventory_report", response_model=Dict)
 async def get_inventory_report(
     date: Optional[str] = Query(None, description="Filter reports by date (YYYY-MM-DD)"),
-    db = Depends(get_db)
+    adb: AsyncDB = Depends(get_async_db)
 ):
+    return await adb.run(_get_inventory_report, date)
+
+def _get_inventory_report(db, date: Optional[str]):
     try:
         return generate_inventory_report(db, date)
     except Exception as e:
@@ -190,96 +155,61 @@ async def get_inventory_report(
 @ReportRouter.get("/low_stock_report", response_model=Dict)
 async def get_low_stock_report(
     date: Optional[str] = Query(None, description="Filter reports by date (YYYY-MM-DD)"),
-    db = Depends(get_db)
+    adb: AsyncDB = Depends(get_async_db)
 ):
     """Get a report of all products with low stock or out of stock"""
+    return await adb.run(_get_low_stock_report, date)
+
+def _get_low_stock_report(db, date: Optional[str]):
     try:
         logger.info(f"Generating low stock report")
         
-        # Query inventory products directly
+        flags = get_schema().flags
+        supplier_field = "SupplierID" if flags.inventoryproduct_supplier_id else "NULL as SupplierID"
+        image_field = "ProductImage" if flags.inventoryproduct_product_image else "NULL as ProductImage"
+
         cursor = db.cursor()
-        
         try:
-            # First check if SupplierID exists in the table
-            cursor.execute("SHOW COLUMNS FROM inventoryproduct LIKE 'SupplierID'")
-            supplierID_exists = cursor.fetchone() is not None
-            
-            # Check if ProductImage exists in the table
-            cursor.execute("SHOW COLUMNS FROM inventoryproduct LIKE 'ProductImage'")
-            productImage_exists = cursor.fetchone() is not None
-            
-            # Build the query fields based on columns that exist
-            if supplierID_exists:
-                supplier_field = "SupplierID"
-            else:
-                supplier_field = "NULL as SupplierID"
-                
-            if productImage_exists:
-                image_field = "ProductImage"
-            else:
-                image_field = "NULL as ProductImage"
-            
-            # First try to get items with zero quantity (out of stock)
+            # One read of the Ready-Made prefix of idx_inventoryproduct_stock_level;
+            # Quantity/Threshold are checked inside the index, so only matching
+            # rows are fetched. Covers both the threshold-based report and the
+            # default-threshold fallback used when nothing is under its threshold.
             cursor.execute(f"""
                 SELECT 
                     id, id, ProductName, Quantity, 
                     CASE WHEN UnitPrice IS NULL OR UnitPrice = 0 THEN Price ELSE UnitPrice END as Price,
                     {supplier_field}, 
-                    'Out of Stock' as Status,
+                    CASE 
+                        WHEN Quantity <= 0 THEN 'Out of Stock'
+                        WHEN Quantity <= Threshold AND Threshold > 0 THEN 'Low Stock'
+                        ELSE NULL
+                    END as Status,
                     NOW(), {image_field},
                     Threshold
                 FROM inventoryproduct
-                WHERE Quantity <= 0 AND ProcessType = 'Ready-Made'
-                ORDER BY id
+                WHERE ProcessType = 'Ready-Made'
+                  AND (Quantity <= {DEFAULT_LOW_STOCK_THRESHOLD} OR (Quantity <= Threshold AND Threshold > 0))
             """)
-            zero_stock_items = cursor.fetchall()
-            
-            # Then get items with low stock (based on threshold)
-            cursor.execute(f"""
-                SELECT 
-                    id, id, ProductName, Quantity, 
-                    CASE WHEN UnitPrice IS NULL OR UnitPrice = 0 THEN Price ELSE UnitPrice END as Price,
-                    {supplier_field}, 
-                    'Low Stock' as Status,
-                    NOW(), {image_field},
-                    Threshold
-                FROM inventoryproduct
-                WHERE ProcessType = 'Ready-Made' AND Quantity > 0 AND Quantity <= Threshold AND Threshold > 0
-                ORDER BY Quantity ASC
-            """)
-            low_stock_items = cursor.fetchall()
-            
-            # Combine the results
-            all_low_stock_items = zero_stock_items + low_stock_items
-            
-            # If no items found through threshold, use a default threshold of 10
-            if not all_low_stock_items:
-                cursor.execute(f"""
-                    SELECT 
-                        id, id, ProductName, Quantity, 
-                        CASE WHEN UnitPrice IS NULL OR UnitPrice = 0 THEN Price ELSE UnitPrice END as Price,
-                        {supplier_field},
-                        CASE 
-                            WHEN Quantity <= 0 THEN 'Out of Stock'
-                            WHEN Quantity <= 10 THEN 'Low Stock'
-                            ELSE 'In Stock'
-                        END as Status,
-                        NOW(), {image_field},
-                        10 as Threshold
-                    FROM inventoryproduct
-                    WHERE ProcessType = 'Ready-Made' AND Quantity <= 10
-                    ORDER BY 
-                        CASE 
-                            WHEN Quantity <= 0 THEN 0  
-                            ELSE 1
-                        END,
-                        Quantity ASC
-                """)
-                all_low_stock_items = cursor.fetchall()
-                
+            candidates = cursor.fetchall()
         except mysql.connector.Error as e:
             logger.error(f"Error querying inventoryproduct for low stock: {str(e)}")
-            all_low_stock_items = []
+            candidates = []
+
+        # Out of stock by id, then low stock by quantity
+        all_low_stock_items = sorted(
+            (row for row in candidates if row[6] is not None),
+            key=lambda row: (row[3] > 0, row[3] if row[3] > 0 else row[0])
+        )
+
+        # If no items found through threshold, use a default threshold of 10
+        if not all_low_stock_items:
+            all_low_stock_items = sorted(
+                (
+                    row[:6] + ("Out of Stock" if row[3] <= 0 else "Low Stock",) + row[7:9] + (DEFAULT_LOW_STOCK_THRESHOLD,)
+                    for row in candidates if row[3] <= DEFAULT_LOW_STOCK_THRESHOLD
+                ),
+                key=lambda row: (row[3] > 0, row[3])
+            )
             
         # If still no data, return empty response
         if not all_low_stock_items:
@@ -353,30 +283,17 @@ async def get_low_stock_report(
         }
 
 @ReportRouter.get("/debug_zero_stock", response_model=Dict)
-async def get_debug_zero_stock(db = Depends(get_db)):
+async def get_debug_zero_stock(adb: AsyncDB = Depends(get_async_db)):
     """Get detailed diagnostic information about zero quantity items"""
+    return await adb.run(_get_debug_zero_stock)
+
+def _get_debug_zero_stock(db):
     try:
         cursor = db.cursor(dictionary=True)
         
-        # Check if SupplierID exists in the table
-        cursor.execute("SHOW COLUMNS FROM inventoryproduct LIKE 'SupplierID'")
-        supplierID_exists = cursor.fetchone() is not None
-        
-        # Check if ProductImage exists in the table
-        cursor.execute("SHOW COLUMNS FROM inventoryproduct LIKE 'ProductImage'")
-        productImage_exists = cursor.fetchone() is not None
-        
-        # Build the query based on whether SupplierID exists
-        if supplierID_exists:
-            supplier_field = "SupplierID"
-        else:
-            supplier_field = "NULL as SupplierID"
-            
-        # Build image field based on whether ProductImage exists
-        if productImage_exists:
-            image_field = "ProductImage"
-        else:
-            image_field = "NULL as ProductImage"
+        flags = get_schema().flags
+        supplier_field = "SupplierID" if flags.inventoryproduct_supplier_id else "NULL as SupplierID"
+        image_field = "ProductImage" if flags.inventoryproduct_product_image else "NULL as ProductImage"
         
         # Get detailed information about zero quantity items
         cursor.execute(f"""
@@ -0,0 +1,96 @@
+# model/request_metrics.py
+"""
+Pure-ASGI request middleware: metrics, Server-Timing and sampled logging.
+
+Replaces the old @app.middleware("http") log_requests, which went through
+BaseHTTPMiddleware (an extra task and body copy per request), logged every
+header at INFO and rewrote the CORS headers CORSMiddleware already sets.
+
+- Metrics are labelled by the full route template
+  (`/api/inventory/inventoryproduct/{product_id}`), read from the scope once
+  routing has happened, so label sets stay bounded. Unmatched paths share
+  the label "unmatched".
+- Static mounts (SKIP_PREFIXES) are passed straight through.
+- Responses carry `Server-Timing: db;dur=..;desc="N queries", app;dur=..`:
+  time spent in pooled cursors (model/request_timing.py) and total handler
+  time up to the response headers, in milliseconds.
+- Request lines are logged at DEBUG for one request in LOG_SAMPLE_EVERY;
+  requests slower than SLOW_REQUEST_MS are always logged at WARNING.
+
+benchmark_middleware.py measures the per-request overhead.
+"""
+import itertools
+import logging
+import os
+import time
+
+from beata_common.openmetrics import REQUEST_ERRORS, REQUEST_LATENCY, REQUESTS_IN_FLIGHT
+
+from model.performance_metrics import record_error, record_request, record_response_time
+from model.request_timing import start_request_timings
+
+logger = logging.getLogger("inventory-system-backend")
+
+SKIP_PREFIXES = ("/uploads", "/products", "/static")
+LOG_SAMPLE_EVERY = int(os.getenv("REQUEST_LOG_SAMPLE_EVERY", "100"))
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+UNMATCHED_ROUTE = "unmatched"
+
+
+def route_template(scope) -> str:
+    """Full template of the matched route, router prefix included"""
+    # Newer FastAPI keeps included routes unprefixed and records the effective path here;
+    # older versions copy each route with the prefix already applied
+    context = (scope.get("fastapi") or {}).get("effective_route_context")
+    path = getattr(context, "path", None) or getattr(scope.get("route"), "path", None)
+    return path or UNMATCHED_ROUTE
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, app, skip_prefixes=SKIP_PREFIXES):
+        self.app = app
+        self.skip_prefixes = tuple(skip_prefixes)
+        self._sequence = itertools.count()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.skip_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        timings = start_request_timings()
+        record_request()
+        REQUESTS_IN_FLIGHT.inc()
+        if LOG_SAMPLE_EVERY and next(self._sequence) % LOG_SAMPLE_EVERY == 0 and logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Request: {scope['method']} {scope['path']} headers={dict(scope['headers'])}")
+
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                app_ms = (time.perf_counter() - start) * 1000
+                header = (
+                    f'db;dur={timings.db * 1000:.2f};desc="{timings.queries} queries", '
+                    f"app;dur={app_ms:.2f}"
+                )
+                message["headers"] = list(message.get("headers", ())) + [(b"server-timing", header.encode("latin-1"))]
+            await send(message)
+
+        method = scope["method"]
+        try:
+            await self.app(scope, receive, send_with_timing)
+        except Exception as e:
+            route = route_template(scope)
+            record_error(type(e).__name__, f"{method} {route}", str(e))
+            REQUEST_ERRORS.labels(method, route).inc()
+            raise
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            route = route_template(scope)
+            record_response_time(f"{method} {route}", elapsed_ms)
+            REQUEST_LATENCY.labels(method, route).observe(elapsed_ms / 1000)
+            if elapsed_ms >= SLOW_REQUEST_MS:
+                logger.warning(f"Slow request: {method} {scope['path']} -> {status} in {elapsed_ms:.0f} ms")
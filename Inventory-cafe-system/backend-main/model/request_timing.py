@@ -0,0 +1,86 @@
+# model/request_timing.py
+"""
+Per-request database timing for the Server-Timing header.
+
+The request middleware opens a RequestTimings for each request in a
+ContextVar. Pooled connections hand out TimedCursor wrappers while one is
+active, and these add the time spent in execute/fetch calls to it.
+asyncio.to_thread, FastAPI's thread pool and run_in_db_thread all copy the
+context into the worker thread, so queries run by sync handlers and AsyncDB
+are counted too. Outside
+a request (startup, background tasks) cursors are returned unwrapped.
+"""
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+
+class RequestTimings:
+    __slots__ = ("db", "queries")
+
+    def __init__(self):
+        self.db = 0.0
+        self.queries = 0
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def start_request_timings() -> RequestTimings:
+    timings = RequestTimings()
+    _current.set(timings)
+    return timings
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+class TimedCursor:
+    """Cursor proxy that adds query and fetch time to the request's timings"""
+
+    __slots__ = ("_cursor", "_timings")
+
+    def __init__(self, cursor, timings: RequestTimings):
+        self._cursor = cursor
+        self._timings = timings
+
+    def _timed(self, method, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            self._timings.db += time.perf_counter() - start
+
+    def execute(self, *args, **kwargs):
+        self._timings.queries += 1
+        return self._timed(self._cursor.execute, *args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        self._timings.queries += 1
+        return self._timed(self._cursor.executemany, *args, **kwargs)
+
+    def callproc(self, *args, **kwargs):
+        self._timings.queries += 1
+        return self._timed(self._cursor.callproc, *args, **kwargs)
+
+    def fetchone(self):
+        return self._timed(self._cursor.fetchone)
+
+    def fetchmany(self, *args, **kwargs):
+        return self._timed(self._cursor.fetchmany, *args, **kwargs)
+
+    def fetchall(self):
+        return self._timed(self._cursor.fetchall)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
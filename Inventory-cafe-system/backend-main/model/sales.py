@@ -1,12 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional, Dict
 from pydantic import BaseModel
-from model.db import get_db, db_connection
+from model.async_db import AsyncDB, get_async_db
+from model.sales_rollup import record_daily_sales
+from model.beginning_quantity import BEGINNING_QUANTITY_JOIN, refresh_beginning_quantities
+from model.idempotency import claim_request_ids, release_request_ids
+from model.indexes import day_range
+from beata_common.openmetrics import SYNC_DURATION
+from model.maintenance import RepairJob, register_job, run_job
+from model.forecasting import daily_sales_totals
+from model.forecast_cache import forecast_cache
 from datetime import datetime, timedelta
 import logging
 import json
 import statistics
 import asyncio
+from itertools import groupby
+from operator import itemgetter
 from fastapi.background import BackgroundTasks
 
 # Set up logging
@@ -54,6 +64,10 @@ class SalesUpdateRequest(BaseModel):
     product_id: int
     quantity_sold: int
     remitted: float
+    request_id: Optional[str] = None    # Caller's idempotency key; a repeated id is not recorded again
+
+class SalesUpdateBatchRequest(BaseModel):
+    updates: List[SalesUpdateRequest]
 
 # Historical Sales Response Model
 class HistoricalSalesResponse(BaseModel):
@@ -69,6 +83,28 @@ class ForecastResponse(BaseModel):
     product_forecasts: List[Dict]
     metrics: Dict
 
+# Sales rows missing product details, filled in from inventoryproduct in
+# chunks of primary keys (see model/maintenance.py)
+SALES_PRODUCT_DETAILS_JOB = register_job(RepairJob(
+    name="sales_product_details",
+    table="sales",
+    sql="""
+        UPDATE sales s
+        JOIN inventoryproduct ip ON s.product_id = ip.id
+        SET
+            s.product_name = ip.ProductName,
+            s.unit_price = ip.UnitPrice,
+            s.Image = ip.Image
+        WHERE s.id BETWEEN %s AND %s
+        AND (
+            s.product_name = '' OR s.product_name IS NULL
+            OR s.unit_price = 0 OR s.unit_price IS NULL
+            OR s.Image IS NULL
+        )
+    """,
+))
+FIX_SALES_INTERVAL = 6 * 60 * 60
+
 # Global variable to keep track of the background task
 background_fix_task = None
 
@@ -81,33 +117,13 @@ async def fix_sales_records_background():
     while True:
         try:
             logger.info("Running background task to fix sales records with missing data")
-            with db_connection() as db:
-                cursor = db.cursor()
-                
-                # Update sales records with missing product information
-                cursor.execute("""
-                    UPDATE sales s
-                    JOIN inventoryproduct ip ON s.product_id = ip.id
-                    SET 
-                        s.product_name = ip.ProductName,
-                        s.unit_price = ip.UnitPrice,
-                        s.Image = ip.Image
-                    WHERE 
-                        s.product_name = '' OR s.product_name IS NULL
-                        OR s.unit_price = 0 OR s.unit_price IS NULL
-                        OR s.Image IS NULL
-                """)
-                
-                records_updated = cursor.rowcount
-                db.commit()
-                
-                logger.info(f"Fixed {records_updated} sales records with missing data")
-                cursor.close()
+            with SYNC_DURATION.time("fix_sales_records"):
+                result = await run_job(SALES_PRODUCT_DETAILS_JOB)
+            logger.info(f"Fixed {result['rows_updated']} sales records with missing data")
         except Exception as e:
             logger.error(f"Error in fix_sales_records_background: {str(e)}")
         
-        # Sleep for 6 hours before running again
-        await asyncio.sleep(6 * 60 * 60)  # 6 hours in seconds
+        await asyncio.sleep(FIX_SALES_INTERVAL)
 
 # Start the background task when the module is loaded
 def start_background_task():
@@ -116,61 +132,24 @@ def start_background_task():
         background_fix_task = asyncio.create_task(fix_sales_records_background())
         logger.info("Started background task to fix sales records")
         
-def ensure_daily_snapshot(db, target_date):
-    """
-    Ensure a daily inventory snapshot exists for the given date.
-    """
-    cursor = db.cursor()
-    cursor.execute("""
-        SELECT COUNT(*) 
-        FROM daily_inventory_snapshot 
-        WHERE snapshot_date = %s
-    """, (target_date,))
-    snapshot_exists = cursor.fetchone()[0]
-
-    if not snapshot_exists:
-        cursor.execute("""
-            INSERT INTO daily_inventory_snapshot 
-            (product_id, product_name, beginning_quantity, current_quantity, additions, snapshot_date, process_type)
-            SELECT 
-                id, 
-                ProductName,
-                Quantity,
-                Quantity,
-                0,
-                %s,
-                ProcessType
-            FROM inventoryproduct
-        """, (target_date,))
-        db.commit()
-    cursor.close()
-
 # Fetch sales data
 @SalesRouter.get("/sales", response_model=List[SalesResponse])
-async def get_sales_data(db=Depends(get_db)):
+async def get_sales_data(adb: AsyncDB = Depends(get_async_db)):
     try:
-        cursor = db.cursor(dictionary=True)
         today = datetime.now().date()
 
-        cursor.execute("""
+        sales_data = await adb.fetchall(f"""
             SELECT
                 ip.id AS id,  
                 ip.ProductName, ip.UnitPrice, ip.Image,
-                COALESCE(SUM(s.quantity_sold), 0) AS total_items_sold, 
-                COALESCE(SUM(s.remitted), 0) AS total_remitted,
-                (
-                    SELECT COALESCE(SUM(sd.original_quantity), 0)
-                    FROM stock_details sd
-                    WHERE sd.ProductID = ip.id AND DATE(sd.created_at) = %s
-                ) AS beginning_quantity
+                COALESCE(r.quantity_sold, 0) AS total_items_sold, 
+                COALESCE(r.remitted, 0) AS total_remitted,
+                COALESCE(b.beginning_quantity, 0) AS beginning_quantity
             FROM inventoryproduct ip
-            LEFT JOIN sales s ON ip.id = s.product_id AND DATE(s.created_at) = %s  
-            GROUP BY ip.id, ip.ProductName, ip.UnitPrice, ip.Image
+            {BEGINNING_QUANTITY_JOIN}
+            LEFT JOIN sales_daily_rollup r ON r.product_id = ip.id AND r.sale_date = %s
             ORDER BY ip.id ASC
-        """, (today, today))
-
-        sales_data = cursor.fetchall()
-        cursor.close()
+        """, (today, today), dictionary=True)
 
         return [
             {
@@ -191,7 +170,10 @@ async def get_sales_data(db=Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
 @SalesRouter.put("/inventory/beginning-quantity")
-async def update_beginning_quantity(data: BeginningQuantityUpdate, db=Depends(get_db)):
+async def update_beginning_quantity(data: BeginningQuantityUpdate, adb: AsyncDB = Depends(get_async_db)):
+    return await adb.run(_update_beginning_quantity, data)
+
+def _update_beginning_quantity(db, data: BeginningQuantityUpdate):
     logger.info(f"Received product_name: {data.product_name}, quantity: {data.quantity}, date: {data.date}")
 
     try:
@@ -219,8 +201,8 @@ async def update_beginning_quantity(data: BeginningQuantityUpdate, db=Depends(ge
         # Check if an entry already exists for the product and date
         cursor.execute("""
             SELECT id FROM stock_details
-            WHERE ProductID = %s AND DATE(created_at) = %s
-        """, (product_id, target_date))
+            WHERE ProductID = %s AND created_at >= %s AND created_at < %s
+        """, (product_id, *day_range(target_date)))
         existing = cursor.fetchone()
 
         if existing:
@@ -234,6 +216,7 @@ async def update_beginning_quantity(data: BeginningQuantityUpdate, db=Depends(ge
                 INSERT INTO stock_details (ProductID, original_quantity, created_at)
                 VALUES (%s, %s, %s)
             """, (product_id, data.quantity, target_date))
+        refresh_beginning_quantities(cursor, [product_id], target_date)
 
         db.commit()
 
@@ -262,10 +245,8 @@ async def update_beginning_quantity(data: BeginningQuantityUpdate, db=Depends(ge
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
 @SalesRouter.get("/sales/daily", response_model=List[SalesResponse])
-async def get_daily_sales_data(date: Optional[str] = None, db=Depends(get_db)):
+async def get_daily_sales_data(date: Optional[str] = None, adb: AsyncDB = Depends(get_async_db)):
     try:
-        cursor = db.cursor(dictionary=True)
-
         target_date = datetime.now().date()
         if date:
             try:
@@ -273,25 +254,18 @@ async def get_daily_sales_data(date: Optional[str] = None, db=Depends(get_db)):
             except ValueError:
                 raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
 
-        cursor.execute("""
+        sales_data = await adb.fetchall(f"""
             SELECT 
                 ip.id, ip.ProductName, ip.UnitPrice, ip.Image,
-                COALESCE(SUM(s.quantity_sold), 0) AS total_items_sold,
-                COALESCE(SUM(s.remitted), 0) AS total_remitted,
-                MAX(s.created_at) AS created_at,
-                (
-                    SELECT COALESCE(SUM(sd.original_quantity), 0)
-                    FROM stock_details sd
-                    WHERE sd.ProductID = ip.id AND DATE(sd.created_at) = %s
-                ) AS beginning_quantity
+                COALESCE(r.quantity_sold, 0) AS total_items_sold,
+                COALESCE(r.remitted, 0) AS total_remitted,
+                r.last_sale_at AS created_at,
+                COALESCE(b.beginning_quantity, 0) AS beginning_quantity
             FROM inventoryproduct ip
-            LEFT JOIN sales s ON ip.id = s.product_id AND DATE(s.created_at) = %s
-            GROUP BY ip.id, ip.ProductName, ip.UnitPrice, ip.Image
+            {BEGINNING_QUANTITY_JOIN}
+            LEFT JOIN sales_daily_rollup r ON r.product_id = ip.id AND r.sale_date = %s
             ORDER BY created_at DESC
-        """, (target_date, target_date))
-
-        sales_data = cursor.fetchall()
-        cursor.close()
+        """, (target_date, target_date), dictionary=True)
 
         return [
             {
@@ -314,11 +288,9 @@ async def get_daily_sales_data(date: Optional[str] = None, db=Depends(get_db)):
 @SalesRouter.get("/sales/category-report", response_model=SalesReportResponse)
 async def get_sales_by_category(
     date: Optional[str] = Query(None, description="Date in YYYY-MM-DD format"),
-    db=Depends(get_db)
+    adb: AsyncDB = Depends(get_async_db)
 ):
     try:
-        cursor = db.cursor(dictionary=True)
-
         target_date = datetime.now().date()
         if date:
             try:
@@ -326,48 +298,27 @@ async def get_sales_by_category(
             except ValueError:
                 raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
 
-        ensure_daily_snapshot(db, target_date)
-
-        cursor.execute("""
+        # One pass over materialized per-day rows, grouped below in the same order
+        sales_data = await adb.fetchall(f"""
             SELECT 
                 c.CategoryName,
-                c.id AS category_id,
                 ip.id AS product_id,
                 ip.ProductName,
                 ip.UnitPrice,
-                (
-                    SELECT COALESCE(SUM(sd.original_quantity), 0)
-                    FROM stock_details sd
-                    WHERE sd.ProductID = ip.id AND DATE(sd.created_at) = %s
-                ) AS beginning_quantity,
-                COALESCE(SUM(s.quantity_sold), 0) AS quantity_sold,
-                COALESCE(SUM(s.remitted), 0) AS total_amount
+                COALESCE(b.beginning_quantity, 0) AS beginning_quantity,
+                COALESCE(r.quantity_sold, 0) AS quantity_sold,
+                COALESCE(r.remitted, 0) AS total_amount
             FROM categories c
             LEFT JOIN inventoryproduct ip ON c.id = ip.`CategoryID (FK)`
-            LEFT JOIN sales s ON ip.id = s.product_id AND DATE(s.created_at) = %s
-            GROUP BY c.id, c.CategoryName, ip.id, ip.ProductName, ip.UnitPrice
+            {BEGINNING_QUANTITY_JOIN}
+            LEFT JOIN sales_daily_rollup r ON r.product_id = ip.id AND r.sale_date = %s
             ORDER BY c.CategoryName, ip.ProductName
-        """, (target_date, target_date))
-
-        sales_data = cursor.fetchall()
-
-        overall_total = 0
-        overall_items = 0
-        categories_dict = {}
-
-        for row in sales_data:
-            category_name = row['CategoryName']
+        """, (target_date, target_date), dictionary=True)
 
-            if category_name not in categories_dict:
-                categories_dict[category_name] = {
-                    'category_name': category_name,
-                    'total_items': 0,
-                    'total_amount': 0,
-                    'products': []
-                }
-
-            if row['product_id']:
-                product_detail = {
+        categories_list = []
+        for category_name, rows in groupby(sales_data, key=itemgetter('CategoryName')):
+            products = [
+                {
                     "product_id": row['product_id'],
                     "product_name": row['ProductName'],
                     "unit_price": row['UnitPrice'],
@@ -375,132 +326,161 @@ async def get_sales_by_category(
                     "total_amount": row['total_amount'],
                     "beginning_quantity": row['beginning_quantity']
                 }
-
-                categories_dict[category_name]['products'].append(product_detail)
-                categories_dict[category_name]['total_items'] += row['quantity_sold']
-                categories_dict[category_name]['total_amount'] += row['total_amount']
-                overall_total += row['total_amount']
-                overall_items += row['quantity_sold']
-
-        categories_list = sorted([
-            {
-                "category_name": cat['category_name'],
-                "total_items": cat['total_items'],
-                "total_amount": cat['total_amount'],
-                "products": cat['products']
-            }
-            for cat in categories_dict.values()
-        ], key=lambda x: x['total_amount'], reverse=True)
+                for row in rows if row['product_id']
+            ]
+            categories_list.append({
+                "category_name": category_name,
+                "total_items": sum(map(itemgetter("quantity_sold"), products)),
+                "total_amount": sum(map(itemgetter("total_amount"), products)),
+                "products": products
+            })
+        categories_list.sort(key=itemgetter("total_amount"), reverse=True)
 
         return {
             "date": target_date.strftime('%Y-%m-%d'),
-            "overall_total": overall_total,
-            "overall_items": overall_items,
+            "overall_total": sum(map(itemgetter("total_amount"), categories_list)),
+            "overall_items": sum(map(itemgetter("total_items"), categories_list)),
             "categories": categories_list
         }
 
     except Exception as e:
         logger.error(f"Error getting sales by category: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
-    finally:
-        if cursor:
-            cursor.close()
 
 
-@SalesRouter.post("/update")
-async def update_sales(sales_update: SalesUpdateRequest, db=Depends(get_db)):
+@SalesRouter.post("/update/batch")
+async def update_sales_batch(request: SalesUpdateBatchRequest, adb: AsyncDB = Depends(get_async_db)):
+    """
+    Record many sales in one transaction. A sale whose request_id was already
+    recorded is skipped and reported as a success with duplicate=true, so
+    callers can safely retry. Returns one result per sale.
+    """
+    if not request.updates:
+        return {"success": True, "results": []}
     try:
-        cursor = db.cursor(dictionary=True)
-
-        # Get product information including name, price, and image
-        cursor.execute("""
-            SELECT id, ProductName, UnitPrice, Quantity, Image 
-            FROM inventoryproduct 
-            WHERE id = %s
-        """, (sales_update.product_id,))
-        
-        product = cursor.fetchone()
-
-        if not product:
-            cursor.close()
-            raise HTTPException(status_code=404, detail="Product not found")
+        results = await adb.run(_record_sales, request.updates)
+    except Exception as e:
+        logger.error(f"Error recording batched sales: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+    return {"success": all(result["success"] for result in results), "results": results}
 
-        available_stock = product['Quantity']
+@SalesRouter.post("/update")
+async def update_sales(sales_update: SalesUpdateRequest, adb: AsyncDB = Depends(get_async_db)):
+    return await adb.run(_update_sales, sales_update)
 
-        if available_stock < sales_update.quantity_sold:
-            cursor.close()
-            raise HTTPException(status_code=400, detail="Not enough stock available")
+def _update_sales(db, sales_update: SalesUpdateRequest):
+    try:
+        result = _record_sales(db, [sales_update])[0]
+    except Exception as e:
+        logger.error(f"Error updating sales: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+    if not result["success"]:
+        raise HTTPException(status_code=404 if result["error"] == "Product not found" else 400, detail=result["error"])
+    return {"message": "Sales updated successfully"}
 
-        # Insert into sales with product details
-        cursor.execute("""
-            INSERT INTO sales (
-                product_id, 
-                product_name, 
-                Image, 
-                quantity_sold, 
-                unit_price,
-                remitted, 
-                created_at
+def _record_sales(db, updates: List[SalesUpdateRequest]):
+    """
+    Record sales in `sales` and the daily rollup and commit; the only writer
+    of either for POS orders. Stock is not touched: the cafe-beata outbox
+    takes it through /stock/adjust/batch before delivering the sale.
+    Returns one result per update.
+    """
+    cursor = db.cursor(dictionary=True)
+    try:
+        results = [None] * len(updates)
+        replays = claim_request_ids(cursor, "sales_update_requests", updates)
+
+        product_ids = list({update.product_id for index, update in enumerate(updates) if index not in replays})
+        products = {}
+        if product_ids:
+            placeholders = ", ".join(["%s"] * len(product_ids))
+            cursor.execute(
+                f"SELECT id, ProductName, UnitPrice, Image FROM inventoryproduct WHERE id IN ({placeholders})",
+                product_ids
             )
-            VALUES (%s, %s, %s, %s, %s, %s, NOW())
-            ON DUPLICATE KEY UPDATE 
-                quantity_sold = quantity_sold + VALUES(quantity_sold), 
-                remitted = remitted + VALUES(remitted)
-        """, (
-            sales_update.product_id, 
-            product['ProductName'], 
-            product['Image'], 
-            sales_update.quantity_sold, 
-            product['UnitPrice'],
-            sales_update.remitted
-        ))
-
-        cursor.execute("""
-            UPDATE inventoryproduct 
-            SET Quantity = Quantity - %s 
-            WHERE id = %s
-        """, (sales_update.quantity_sold, sales_update.product_id))
+            products = {row["id"]: row for row in cursor.fetchall()}
+
+        sales_rows = []
+        rejected_ids = []
+        for index, update in enumerate(updates):
+            if index in replays:
+                results[index] = {"product_id": update.product_id, "success": True, "duplicate": True}
+                continue
+            product = products.get(update.product_id)
+            error = ("Product not found" if not product
+                     else "quantity_sold must be positive" if update.quantity_sold <= 0 else None)
+            if error:
+                results[index] = {"product_id": update.product_id, "success": False, "error": error}
+                rejected_ids.append(update.request_id)
+                continue
+            sales_rows.append((
+                update.product_id,
+                product['ProductName'],
+                product['Image'],
+                update.quantity_sold,
+                product['UnitPrice'],
+                update.remitted
+            ))
+            results[index] = {"product_id": update.product_id, "success": True}
+
+        for update, result in zip(updates, results):
+            if update.request_id:
+                result["request_id"] = update.request_id
+
+        if sales_rows:
+            cursor.executemany("""
+                INSERT INTO sales (
+                    product_id, 
+                    product_name, 
+                    Image, 
+                    quantity_sold, 
+                    unit_price,
+                    remitted, 
+                    created_at
+                )
+                VALUES (%s, %s, %s, %s, %s, %s, NOW())
+                ON DUPLICATE KEY UPDATE 
+                    quantity_sold = quantity_sold + VALUES(quantity_sold), 
+                    remitted = remitted + VALUES(remitted)
+            """, sales_rows)
+            record_daily_sales(cursor, [(row[0], row[3], row[5]) for row in sales_rows])
+        release_request_ids(cursor, "sales_update_requests", filter(None, rejected_ids))
 
         db.commit()
-        cursor.close()
-        return {"message": "Sales updated successfully"}
-    
-    except Exception as e:
+        return results
+    except Exception:
         db.rollback()
-        logger.error(f"Error updating sales: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+        raise
+    finally:
+        cursor.close()
 
 @SalesRouter.get("/total-sales-revenue", response_model=dict)
-async def get_total_sales_revenue():
+async def get_total_sales_revenue(adb: AsyncDB = Depends(get_async_db)):
     """Get the total sales revenue for today"""
-    with db_connection() as db:
-        cursor = None
-        try:
-            cursor = db.cursor()
-            today = datetime.now().date()  # Get today's date
+    try:
+        today = datetime.now().date()  # Get today's date
 
-            # SQL query to calculate total sales revenue for today
-            cursor.execute("""
-                SELECT COALESCE(SUM(s.remitted), 0) AS total_revenue
-                FROM sales s
-                WHERE DATE(s.created_at) = %s
-            """, (today,))
+        # SQL query to calculate total sales revenue for today
+        row = await adb.fetchone("""
+            SELECT COALESCE(SUM(r.remitted), 0) AS total_revenue
+            FROM sales_daily_rollup r
+            WHERE r.sale_date = %s
+        """, (today,))
 
-            total_revenue = cursor.fetchone()[0]
-            return {"total_sales_revenue": total_revenue}
+        return {"total_sales_revenue": row[0]}
 
-        except Exception as e:
-            logger.error(f"Error getting total sales revenue: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
-        finally:
-            if cursor:
-                cursor.close()
+    except Exception as e:
+        logger.error(f"Error getting total sales revenue: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
 @SalesRouter.get("/forecasting/historical", response_model=List[HistoricalSalesResponse])
-async def get_historical_sales_data(days: int = Query(30, ge=1, le=90), db=Depends(get_db)):
+async def get_historical_sales_data(days: int = Query(30, ge=1, le=90), adb: AsyncDB = Depends(get_async_db)):
     """
     Get historical sales data for forecasting (last N days)
     """
+    return await adb.run(_get_historical_sales_data, days)
+
+def _get_historical_sales_data(db, days: int):
     try:
         cursor = db.cursor(dictionary=True)
         
@@ -513,12 +493,12 @@ async def get_historical_sales_data(days: int = Query(30, ge=1, le=90), db=Depen
         # Get inventory system sales by day - simplify query to avoid JSON functions
         cursor.execute("""
             SELECT 
-                DATE(created_at) as sale_date,
+                sale_date,
                 SUM(remitted) as daily_total,
                 SUM(quantity_sold) as items_sold
-            FROM sales
-            WHERE DATE(created_at) BETWEEN %s AND %s
-            GROUP BY DATE(created_at)
+            FROM sales_daily_rollup
+            WHERE sale_date BETWEEN %s AND %s
+            GROUP BY sale_date
             ORDER BY sale_date ASC
         """, (start_date, end_date))
         
@@ -545,233 +525,35 @@ async def get_historical_sales_data(days: int = Query(30, ge=1, le=90), db=Depen
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
 @SalesRouter.get("/forecasting/predict", response_model=ForecastResponse)
-async def generate_sales_forecast(days_ahead: int = Query(7, ge=1, le=30), db=Depends(get_db)):
+async def generate_sales_forecast(days_ahead: int = Query(7, ge=1, le=30)):
     """
     Generate sales forecast for next N days
+
+    Per-product models are fitted in model/forecasting.py; metrics include
+    the backtest WAPE/MAPE and each product's confidence is derived from its
+    own backtest error. Served from the forecast cache (model/forecast_cache.py).
     """
     try:
-        # First, get historical data
-        cursor = db.cursor(dictionary=True)
-        
-        # Last 30 days for historical data
-        end_date = datetime.now().date()
-        start_date = end_date - timedelta(days=30)
-        
-        # Get inventory system daily sales totals - this query doesn't depend on product names
-        cursor.execute("""
-            SELECT 
-                DATE(created_at) as sale_date,
-                SUM(remitted) as daily_total,
-                SUM(quantity_sold) as items_sold
-            FROM sales
-            WHERE DATE(created_at) BETWEEN %s AND %s
-            GROUP BY DATE(created_at)
-            ORDER BY sale_date ASC
-        """, (start_date, end_date))
-        
-        daily_sales = cursor.fetchall()
-        
-        # Modified query to handle missing product data by using LEFT JOIN
-        # and COALESCE to handle NULL values
-        cursor.execute("""
-            SELECT 
-                s.product_id,
-                COALESCE(p.ProductName, CONCAT('Product ID: ', s.product_id)) as product_name,
-                p.Image as image_url,
-                SUM(s.quantity_sold) as total_quantity,
-                SUM(s.remitted) as total_sales,
-                COUNT(DISTINCT DATE(s.created_at)) as days_with_sales
-            FROM sales s
-            LEFT JOIN inventoryproduct p ON s.product_id = p.id
-            WHERE DATE(s.created_at) BETWEEN %s AND %s AND s.quantity_sold > 0
-            GROUP BY s.product_id, product_name, image_url
-            ORDER BY total_sales DESC
-        """, (start_date, end_date))
-        
-        product_sales = cursor.fetchall()
-        
-        # Close cursor
-        cursor.close()
-        
-        # Format historical data
-        historical_data = []
-        for day in daily_sales:
-            if day['sale_date']:
-                historical_data.append({
-                    "date": day['sale_date'].strftime('%Y-%m-%d'),
-                    "sales": float(day['daily_total'] if day['daily_total'] else 0),
-                    "items": int(day['items_sold'] if day['items_sold'] else 0)
-                })
-        
-        # If we have no historical data, return empty forecast
-        if len(historical_data) == 0:
-            return {
-                "historical_data": [],
-                "forecast_data": [],
-                "product_forecasts": [],
-                "metrics": {
-                    "predicted_sales_total": 0,
-                    "sales_growth_rate": 0,
-                    "predicted_orders": 0,
-                    "orders_growth_rate": 0,
-                    "top_category": "",
-                    "top_category_items": 0
-                }
-            }
-        
-        # Simple forecasting based on moving average and trend analysis
-        forecast_data = []
-        
-        # If we have enough historical data
-        if len(historical_data) >= 7:
-            # Calculate average daily sales
-            daily_amounts = [day['sales'] for day in historical_data[-7:]]  # Last 7 days
-            avg_daily_sales = sum(daily_amounts) / len(daily_amounts)
-            
-            # Calculate trend (average day-to-day change)
-            daily_changes = []
-            for i in range(1, len(daily_amounts)):
-                daily_changes.append(daily_amounts[i] - daily_amounts[i-1])
-            
-            trend = sum(daily_changes) / len(daily_changes) if daily_changes else 0
-            
-            # Forecast next N days
-            for i in range(1, days_ahead + 1):
-                forecast_date = end_date + timedelta(days=i)
-                
-                # Apply seasonality (weekday effect - weekend sales are higher)
-                weekday_factor = 1.15 if forecast_date.weekday() >= 5 else 1.0
-                
-                # Predicted sales with trend and seasonality
-                predicted_sales = (avg_daily_sales + (trend * i)) * weekday_factor
-                
-                # Ensure prediction is not negative
-                predicted_sales = max(0, predicted_sales)
-                
-                forecast_data.append({
-                    "date": forecast_date.strftime('%Y-%m-%d'),
-                    "sales": round(predicted_sales, 2),
-                    "items": round(predicted_sales / 100, 0)  # Estimated items based on average item price
-                })
-        else:
-            # Not enough data, use simple average
-            avg_daily_sales = sum(day['sales'] for day in historical_data) / len(historical_data) if historical_data else 0
-            
-            for i in range(1, days_ahead + 1):
-                forecast_date = end_date + timedelta(days=i)
-                forecast_data.append({
-                    "date": forecast_date.strftime('%Y-%m-%d'),
-                    "sales": round(avg_daily_sales, 2),
-                    "items": round(avg_daily_sales / 100, 0)
-                })
-        
-        # Generate product-level forecasts
-        product_forecasts = []
-        for product in product_sales:
-            # Only forecast products with enough sales data
-            if product['total_quantity'] > 0:
-                # Calculate daily average
-                daily_avg = product['total_sales'] / 30  # Simplified - assumes all days
-                
-                # Calculate average sales when there are sales
-                sales_day_avg = product['total_sales'] / product['days_with_sales'] if product['days_with_sales'] > 0 else 0
-                
-                # Probability of sales on any given day
-                sale_probability = product['days_with_sales'] / 30
-                
-                # Estimated growth rate (simplified model)
-                growth_rate = ((daily_avg * 7) / (daily_avg * 5)) - 1 if daily_avg > 0 else 0
-                
-                # Forecasted sales (7 day outlook)
-                forecast_sales = daily_avg * 7 * (1 + growth_rate) if daily_avg > 0 else 0
-                
-                # Confidence level (based on consistency of sales)
-                confidence = min(95, (product['days_with_sales'] / 30) * 100)
-                
-                product_forecasts.append({
-                    "id": product['product_id'],
-                    "name": product['product_name'],
-                    "image": f"/uploads/products/{product['image_url']}" if product['image_url'] else None,
-                    "current_sales": float(product['total_sales']),
-                    "predicted_sales": round(forecast_sales, 2),
-                    "growth_rate": round(growth_rate * 100, 1),
-                    "confidence": round(confidence, 0)
-                })
-        
-        # Sort by predicted sales (highest first)
-        product_forecasts.sort(key=lambda x: x['predicted_sales'], reverse=True)
-        
-        # Calculate overall metrics
-        current_total = sum(p['current_sales'] for p in product_forecasts)
-        predicted_total = sum(p['predicted_sales'] for p in product_forecasts)
-        growth_rate = ((predicted_total / current_total) - 1) * 100 if current_total > 0 else 0
-        
-        # Top category (simplified - using product name as category)
-        top_category = product_forecasts[0]['name'].split()[0] if product_forecasts else "Coffee"
-        
-        metrics = {
-            "predicted_sales_total": round(predicted_total, 2),
-            "sales_growth_rate": round(growth_rate, 1),
-            "predicted_orders": len(historical_data) * 7,  # Simplified estimate
-            "orders_growth_rate": 5.0,  # Placeholder
-            "top_category": top_category,
-            "top_category_items": len([p for p in product_forecasts if top_category in p['name']])
-        }
-        
-        return {
-            "historical_data": historical_data,
-            "forecast_data": forecast_data,
-            "product_forecasts": product_forecasts,
-            "metrics": metrics
-        }
-        
+        return await forecast_cache.get("predict", days_ahead)
+
     except Exception as e:
         logger.error(f"Error generating sales forecast: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
 @SalesRouter.get("/forecasting/historical-sales", response_model=List[dict])
-async def get_historical_sales_for_forecasting(days: int = Query(30, ge=7, le=90), db=Depends(get_db)):
+async def get_historical_sales_for_forecasting(days: int = Query(30, ge=7, le=90), adb: AsyncDB = Depends(get_async_db)):
     """
     Get historical sales data specifically for forecasting chart
-    Returns daily sales data from the sales table for the specified number of days
+    Returns daily sales data from the sales table for the specified number of days.
+    Past days come from the forecast cache; only today's totals are read live.
     """
     try:
-        cursor = db.cursor(dictionary=True)
-        
-        # Calculate date range
-        end_date = datetime.now().date()
-        start_date = end_date - timedelta(days=days)
-        
-        logger.info(f"Fetching historical sales data for forecasting from {start_date} to {end_date}")
-        
-        # Modified query to handle all cases - even if database is empty or has no data in the range
-        cursor.execute("""
-            SELECT 
-                DATE(created_at) as sale_date,
-                SUM(remitted) as daily_total,
-                SUM(quantity_sold) as items_sold
-            FROM sales
-            WHERE DATE(created_at) BETWEEN %s AND %s
-            GROUP BY DATE(created_at)
-            ORDER BY sale_date ASC
-        """, (start_date, end_date))
-        
-        sales_data = cursor.fetchall()
-        cursor.close()
-        
-        # Format the response
-        result = []
-        for day in sales_data:
-            if day['sale_date']:
-                result.append({
-                    "date": day['sale_date'].strftime('%Y-%m-%d'),
-                    "sales": float(day['daily_total'] if day['daily_total'] else 0),
-                    "items": int(day['items_sold'] if day['items_sold'] else 0)
-                })
-        
+        today = datetime.now().date()
+        result = await forecast_cache.get("historical", days)
+        result = result + await adb.run(daily_sales_totals, today, today)
+
         # If no data found, return at least one data point to prevent frontend errors
         if not result:
-            today = datetime.now().date()
             result.append({
                 "date": today.strftime('%Y-%m-%d'),
                 "sales": 0.0,
@@ -786,64 +568,21 @@ async def get_historical_sales_for_forecasting(days: int = Query(30, ge=7, le=90
 
 # Add new endpoint to update existing sales records with missing product information
 @SalesRouter.post("/update-product-details")
-async def update_sales_product_details(db=Depends(get_db)):
+async def update_sales_product_details():
     """
     Update existing sales records to include product names and details if they're missing.
-    This helps fix old sales records that don't have product information.
+    Runs the chunked sales_product_details repair job (or joins a run already
+    in progress) and returns once it has finished.
     """
     try:
-        cursor = db.cursor(dictionary=True)
-        records_updated = 0
-        
-        # Find sales records with missing product names
-        cursor.execute("""
-            SELECT s.id, s.product_id 
-            FROM sales s 
-            WHERE s.product_name IS NULL OR s.product_name = ''
-        """)
-        
-        sales_to_update = cursor.fetchall()
-        
-        if not sales_to_update:
-            return {"message": "No sales records need updating", "updated": 0}
-            
-        # Update each record with missing product information
-        for sale in sales_to_update:
-            # Get product information
-            cursor.execute("""
-                SELECT ProductName, UnitPrice, Image 
-                FROM inventoryproduct 
-                WHERE id = %s
-            """, (sale["product_id"],))
-            
-            product = cursor.fetchone()
-            
-            if product:
-                # Update the sales record with product details
-                cursor.execute("""
-                    UPDATE sales 
-                    SET 
-                        product_name = %s,
-                        unit_price = %s,
-                        Image = %s
-                    WHERE id = %s
-                """, (
-                    product["ProductName"],
-                    product["UnitPrice"],
-                    product["Image"],
-                    sale["id"]
-                ))
-                records_updated += 1
-        
-        db.commit()
-        cursor.close()
-        
+        result = await run_job(SALES_PRODUCT_DETAILS_JOB)
+        if not result["rows_updated"]:
+            return {"message": "No sales records need updating", "updated": 0, "job": result}
         return {
             "message": "Sales records updated successfully",
-            "updated": records_updated
+            "updated": result["rows_updated"],
+            "job": result
         }
-        
     except Exception as e:
-        db.rollback()
         logger.error(f"Error updating sales product details: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
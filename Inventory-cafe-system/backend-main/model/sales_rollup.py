@@ -0,0 +1,104 @@
+# model/sales_rollup.py
+"""
+Materialized daily sales totals.
+
+`sales_daily_rollup` holds one row per (sale_date, product_id) and is bumped
+in the same transaction as every write to `sales`, so reports read a few
+hundred rows instead of re-aggregating the raw table with DATE() filters.
+
+The table is created, and backfilled once, by migration
+0004_sales_daily_rollup. It can be rebuilt from `sales` at any time:
+
+    python -m model.sales_rollup rebuild [--since YYYY-MM-DD]
+"""
+import argparse
+import logging
+from datetime import datetime, timedelta
+
+from model.db import db_connection
+
+logger = logging.getLogger("sales")
+
+RECORD_SALES_SQL = """
+    INSERT INTO sales_daily_rollup
+        (sale_date, product_id, quantity_sold, remitted, sale_count, last_sale_at)
+    VALUES (CURDATE(), %s, %s, %s, 1, NOW())
+    ON DUPLICATE KEY UPDATE
+        quantity_sold = quantity_sold + VALUES(quantity_sold),
+        remitted = remitted + VALUES(remitted),
+        sale_count = sale_count + 1,
+        last_sale_at = VALUES(last_sale_at)
+"""
+
+
+def record_daily_sales(cursor, sales):
+    """
+    Add sales to today's rollup rows.
+    `sales` is an iterable of (product_id, quantity_sold, remitted); call this
+    on the cursor that wrote to `sales` so both commit together.
+    """
+    rows = [(product_id, quantity, remitted) for product_id, quantity, remitted in sales]
+    if rows:
+        cursor.executemany(RECORD_SALES_SQL, rows)
+
+
+def rebuild_sales_rollup(db, since=None):
+    """
+    Recompute the rollup from the raw `sales` table, either entirely or from
+    `since` (a date) onwards. Returns the number of rollup rows written.
+    """
+    cursor = db.cursor()
+    try:
+        if since:
+            cursor.execute("DELETE FROM sales_daily_rollup WHERE sale_date >= %s", (since,))
+            where, params = "WHERE created_at >= %s", (since,)
+        else:
+            cursor.execute("DELETE FROM sales_daily_rollup")
+            where, params = "", ()
+
+        cursor.execute(f"""
+            INSERT INTO sales_daily_rollup
+                (sale_date, product_id, quantity_sold, remitted, sale_count, last_sale_at)
+            SELECT
+                DATE(created_at),
+                product_id,
+                COALESCE(SUM(quantity_sold), 0),
+                COALESCE(SUM(remitted), 0),
+                COUNT(*),
+                MAX(created_at)
+            FROM sales
+            {where}
+            GROUP BY DATE(created_at), product_id
+        """, params)
+        written = cursor.rowcount
+        db.commit()
+        return written
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the sales_daily_rollup table")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild = subparsers.add_parser("rebuild", help="Recompute the rollup from the sales table")
+    rebuild.add_argument("--since", help="Only rebuild from this date (YYYY-MM-DD)")
+    rebuild.add_argument("--days", type=int, help="Only rebuild the last N days")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    since = None
+    if args.since:
+        since = datetime.strptime(args.since, "%Y-%m-%d").date()
+    elif args.days:
+        since = datetime.now().date() - timedelta(days=args.days)
+
+    with db_connection() as db:
+        written = rebuild_sales_rollup(db, since)
+    logger.info(f"Rebuilt sales_daily_rollup{f' from {since}' if since else ''}: {written} rows")
+
+
+if __name__ == "__main__":
+    main()
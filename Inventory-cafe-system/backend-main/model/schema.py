@@ -0,0 +1,111 @@
+# model/schema.py
+"""
+Schema capability registry.
+
+Several endpoints adapt their SQL to optional or legacy columns (users.email
+vs users.date_added, inventoryproduct.SupplierID, ...). Instead of running
+SHOW COLUMNS on every request, the live schema is read from
+information_schema once at startup and kept here. Code that changes the
+schema (ALTER TABLE, migrations) calls refresh_schema() afterwards.
+
+    from model.schema import get_schema
+    flags = get_schema().flags
+    if flags.users_email: ...
+"""
+import logging
+import threading
+from dataclasses import dataclass
+
+from model.db import db_connection
+
+logger = logging.getLogger("inventory-system-backend")
+
+
+@dataclass(frozen=True)
+class SchemaFlags:
+    """Optional columns the routers care about"""
+    users_email: bool = False
+    users_created_at: bool = False
+    users_date_added: bool = False
+    users_status: bool = False
+    inventoryproduct_supplier_id: bool = False
+    inventoryproduct_product_image: bool = False
+
+
+# flag name -> (table, column)
+FLAG_COLUMNS = {
+    "users_email": ("users", "email"),
+    "users_created_at": ("users", "created_at"),
+    "users_date_added": ("users", "date_added"),
+    "users_status": ("users", "status"),
+    "inventoryproduct_supplier_id": ("inventoryproduct", "SupplierID"),
+    "inventoryproduct_product_image": ("inventoryproduct", "ProductImage"),
+}
+
+
+class SchemaRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._columns = {}
+        self._flags = SchemaFlags()
+        self._loaded = False
+
+    def refresh(self, connection=None):
+        """Re-read tables and columns of the current database"""
+        if connection is None:
+            with db_connection() as db:
+                return self.refresh(db)
+
+        cursor = connection.cursor()
+        try:
+            cursor.execute("""
+                SELECT TABLE_NAME, COLUMN_NAME
+                FROM information_schema.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE()
+            """)
+            columns = {}
+            for table, column in cursor.fetchall():
+                columns.setdefault(table.lower(), set()).add(column.lower())
+        finally:
+            cursor.close()
+
+        flags = SchemaFlags(**{
+            name: column.lower() in columns.get(table.lower(), ())
+            for name, (table, column) in FLAG_COLUMNS.items()
+        })
+        with self._lock:
+            self._columns = columns
+            self._flags = flags
+            self._loaded = True
+        logger.info(f"Schema registry loaded: {len(columns)} tables, flags {flags}")
+        return flags
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.refresh()
+
+    @property
+    def flags(self) -> SchemaFlags:
+        self._ensure_loaded()
+        return self._flags
+
+    def has_table(self, table: str) -> bool:
+        self._ensure_loaded()
+        return table.lower() in self._columns
+
+    def has_column(self, table: str, column: str) -> bool:
+        self._ensure_loaded()
+        return column.lower() in self._columns.get(table.lower(), ())
+
+
+_registry = SchemaRegistry()
+
+
+def get_schema() -> SchemaRegistry:
+    """The process-wide registry; loads on first use if startup didn't"""
+    return _registry
+
+
+def refresh_schema(connection=None) -> SchemaFlags:
+    """Call after anything that adds or drops tables or columns"""
+    return _registry.refresh(connection)
@@ -0,0 +1,236 @@
+# model/stock_notifier.py
+"""
+Debounced, coalescing stock-change notifications to cafe-beata.
+
+Handlers used to call the cafe-beata webhook synchronously (5 s timeout)
+once per change, and cafe-beata answered each call with a sync. Now they only
+add product ids to a pending set with queue_stock_changes(). A worker thread
+flushes the set DEBOUNCE_SECONDS after the first change, or as soon as it
+holds MAX_BATCH ids. A flush:
+
+- reads every pending product in one query;
+- broadcasts one stock_update / stock_update_batch message on /ws/inventory
+  for the Ready-Made products (unless the caller already broadcast them);
+- sends one batched webhook ({"products": [...], "version": N}) with their
+  quantities, over a persistent HTTP session. `version` is the change-log
+  snapshot version (see model/change_feed.py), so cafe-beata can drop
+  webhooks that arrive out of order.
+
+Products that no longer exist are sent with only their id; cafe-beata
+answers those with a change-feed sync. A failed webhook is retried up to
+MAX_ATTEMPTS times with backoff and then dropped. The POS catches up on its
+periodic change-feed sync anyway.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, List, Optional, Set
+
+import requests
+from requests.adapters import HTTPAdapter
+from beata_common.openmetrics import OUTBOUND_LATENCY, counter
+
+from model.db import db_connection
+
+logger = logging.getLogger("inventory-system-backend")
+
+CAFE_BEATA_WEBHOOK_URL = "http://127.0.0.1:8000/api/inventory-webhook/stock-update"
+DEBOUNCE_SECONDS = 0.25
+MAX_BATCH = 200
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF = 0.5          # Seconds, doubled after each failed attempt
+REQUEST_TIMEOUT = 5
+
+NOTIFICATIONS_DROPPED = counter(
+    "stock_notifications_dropped", "Stock-change webhooks given up on after MAX_ATTEMPTS")
+
+
+class StockChangeNotifier:
+    def __init__(self, webhook_url: str = CAFE_BEATA_WEBHOOK_URL):
+        self.webhook_url = webhook_url
+        self._pending = set()
+        self._broadcast_ids = set()
+        self._first_change_at = None
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._loop = None
+        self._session = None
+
+    def start(self, loop=None):
+        """Start the worker; `loop` is the event loop WebSocket broadcasts go to"""
+        with self._condition:
+            self._loop = loop
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="stock-notifier", daemon=True)
+            self._thread.start()
+        logger.info("Stock change notifier started")
+
+    def stop(self, timeout: float = REQUEST_TIMEOUT):
+        """Flush what is pending and stop the worker"""
+        with self._condition:
+            thread = self._thread
+            self._stopping = True
+            self._condition.notify()
+        if thread is not None:
+            thread.join(timeout)
+        self._thread = None
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def queue(self, product_ids: Iterable[int], broadcast: bool = True):
+        with self._condition:
+            for product_id in product_ids:
+                self._pending.add(int(product_id))
+                if broadcast:
+                    self._broadcast_ids.add(int(product_id))
+            if self._pending and self._first_change_at is None:
+                self._first_change_at = time.monotonic()
+            self._condition.notify()
+        if self._thread is None:
+            # Not started (scripts, tests): deliver inline rather than lose the change
+            self._flush(*self._take())
+
+    def _take(self):
+        """Up to MAX_BATCH pending ids and the subset to broadcast"""
+        with self._condition:
+            batch = sorted(self._pending)[:MAX_BATCH]
+            self._pending.difference_update(batch)
+            broadcast = self._broadcast_ids.intersection(batch)
+            self._broadcast_ids.difference_update(batch)
+            self._first_change_at = time.monotonic() if self._pending else None
+            return batch, broadcast
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopping:
+                    self._condition.wait()
+                if not self._pending and self._stopping:
+                    return
+                # Debounce: wait for more changes until the window closes or the batch fills
+                while not self._stopping and len(self._pending) < MAX_BATCH:
+                    remaining = self._first_change_at + DEBOUNCE_SECONDS - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+            try:
+                self._flush(*self._take())
+            except Exception as e:
+                logger.error(f"Error flushing stock change notifications: {e}")
+
+    def _get_session(self) -> requests.Session:
+        if self._session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({"Content-Type": "application/json"})
+            self._session = session
+        return self._session
+
+    def _flush(self, product_ids: List[int], broadcast_ids: Set[int]):
+        if not product_ids:
+            return
+        from model.inventoryproduct import determine_status
+
+        placeholders = ", ".join(["%s"] * len(product_ids))
+        with db_connection() as db:
+            cursor = db.cursor(dictionary=True)
+            try:
+                # Same transaction as the product read, so the version matches the rows
+                cursor.execute("SELECT MAX(version) AS version FROM inventory_change_log")
+                version = cursor.fetchone()["version"]
+                cursor.execute(f"""
+                    SELECT id, ProductName, Quantity, ProcessType, Threshold
+                    FROM inventoryproduct
+                    WHERE id IN ({placeholders})
+                """, product_ids)
+                products = {row["id"]: row for row in cursor.fetchall()}
+            finally:
+                cursor.close()
+
+        timestamp = datetime.now().isoformat()
+        changes, webhook_updates = [], []
+        for product_id in product_ids:
+            product = products.get(product_id)
+            if product is None:
+                # Deleted: cafe-beata resolves it through the change feed
+                webhook_updates.append({"product_id": product_id, "version": version})
+                continue
+            if product["ProcessType"] != "Ready-Made":
+                continue
+            change = {
+                "product_id": product_id,
+                "product_name": product["ProductName"],
+                "quantity": product["Quantity"],
+                "status": determine_status(product["Quantity"], product["ProcessType"], product["Threshold"]),
+                "version": version,
+                "timestamp": timestamp
+            }
+            webhook_updates.append(change)
+            if product_id in broadcast_ids:
+                changes.append(change)
+
+        self._broadcast(changes)
+        if webhook_updates:
+            self._send(webhook_updates, version, timestamp)
+
+    def _broadcast(self, changes: List[dict]):
+        if not changes or self._loop is None:
+            return
+        try:
+            from main import get_websocket_manager
+            manager = get_websocket_manager()
+            if len(changes) == 1:
+                message = {"type": "stock_update", "data": changes[0]}
+            else:
+                message = {"type": "stock_update_batch", "data": changes}
+            self._loop.call_soon_threadsafe(manager.publish, message)
+        except Exception as e:
+            logger.error(f"Error sending WebSocket notification: {e}")
+
+    def _send(self, updates: List[dict], version: Optional[int], timestamp: str) -> bool:
+        payload = {"products": updates, "version": version, "timestamp": timestamp}
+        delay = RETRY_BACKOFF
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                with OUTBOUND_LATENCY.time("cafe-beata", "stock_webhook_batch"):
+                    response = self._get_session().post(self.webhook_url, json=payload, timeout=REQUEST_TIMEOUT)
+                if response.status_code == 200:
+                    logger.info(f"Notified cafe-beata of {len(updates)} stock changes")
+                    return True
+                error = f"{response.status_code} - {response.text}"
+            except requests.exceptions.RequestException as e:
+                error = str(e)
+            logger.warning(f"Stock change webhook attempt {attempt}/{MAX_ATTEMPTS} failed: {error}")
+            if attempt < MAX_ATTEMPTS and not self._stopping:
+                time.sleep(delay)
+                delay *= 2
+        logger.error(f"Giving up on stock change webhook for {len(updates)} products")
+        NOTIFICATIONS_DROPPED.inc(len(updates))
+        return False
+
+
+_notifier = StockChangeNotifier()
+
+
+def start_stock_notifier(loop=None):
+    _notifier.start(loop)
+
+
+def stop_stock_notifier():
+    _notifier.stop()
+
+
+def queue_stock_changes(product_ids: Iterable[int], broadcast: bool = True):
+    """
+    Schedule a cafe-beata notification for these products; never blocks on
+    the network. Pass broadcast=False if the caller already sent its own
+    WebSocket message for the change.
+    """
+    _notifier.queue(product_ids, broadcast)
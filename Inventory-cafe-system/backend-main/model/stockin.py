@@ -1,15 +1,21 @@
-from fastapi import Depends, HTTPException, APIRouter, Form, UploadFile, File, Request
+from fastapi import Depends, HTTPException, APIRouter, Form, UploadFile, File, Request, Response
 from typing import List, Optional
 from pydantic import BaseModel
-from model.db import get_db, db_transaction, db_connection
-from model.performance_metrics import record_stock_update_time
+
+from model.async_db import AsyncDB, get_async_db
+from model.beginning_quantity import refresh_beginning_quantities
+from model.catalog_cache import invalidate_products
+from model.idempotency import claim_request_ids, release_request_ids
+from model.pagination import PageParams, finish_page, keyset_where, order_by, page_params, project
+from model.performance_metrics import record_stock_update_time, record_transaction_time
 from datetime import datetime
+import asyncio
 import logging
 import os
 import time
 import shutil
 import uuid
-from model.inventoryproduct import notify_cafe_beata_stock_change, is_ready_made_product
+from model.inventoryproduct import notify_cafe_beata_stock_change, notify_cafe_beata_stock_changes, is_ready_made_product
 
 StockRouter = APIRouter(tags=["Stock In"])
 
@@ -30,8 +36,10 @@ logger = logging.getLogger(__name__)
 
 
 @StockRouter.post("/stockin/")
-@db_transaction
-async def stock_in(request: StockInRequest, db=Depends(get_db)):
+async def stock_in(request: StockInRequest, adb: AsyncDB = Depends(get_async_db)):
+    return await adb.run(_stock_in, request)
+
+def _stock_in(db, request: StockInRequest):
     try:
         cursor = db.cursor()
 
@@ -58,8 +66,11 @@ async def stock_in(request: StockInRequest, db=Depends(get_db)):
             total_quantity_added += stock.quantity
 
         cursor.execute("UPDATE inventoryproduct SET Quantity = Quantity + %s WHERE id = %s", (total_quantity_added, product_id))
+        if process_type and process_type.lower() == "ready-made":
+            refresh_beginning_quantities(cursor, [product_id], datetime.now().date())
 
         db.commit()
+        invalidate_products(product_id)
 
         # End timing and record it
         execution_time_ms = (time.time() - start_time) * 1000
@@ -76,8 +87,10 @@ async def stock_in(request: StockInRequest, db=Depends(get_db)):
 
 
 @StockRouter.get("/stockin/{product_id}", response_model=dict)
-@db_transaction
-async def get_product_details(product_id: str, request = None, db=Depends(get_db)):
+async def get_product_details(product_id: str, adb: AsyncDB = Depends(get_async_db)):
+    return await adb.run(_get_product_details, product_id)
+
+def _get_product_details(db, product_id: str):
     """Get product details with consistent remaining quantity."""
     cursor = None
     try:
@@ -131,12 +144,14 @@ async def get_product_details(product_id: str, request = None, db=Depends(get_db
         logger.error(f"Error in get_product_details: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
     finally:
-        if cursor and cursor != db.cursor():
+        if cursor:
             cursor.close()
 
 @StockRouter.get("/stockdetails/{product_id}", response_model=dict)
-@db_transaction
-async def get_stock_details(product_id: str, db=Depends(get_db)):
+async def get_stock_details(product_id: str, adb: AsyncDB = Depends(get_async_db)):
+    return await adb.run(_get_stock_details, product_id)
+
+def _get_stock_details(db, product_id: str):
     """Get detailed stock info with remaining quantity and basic product details."""
     try:
         cursor = db.cursor()
@@ -289,17 +304,19 @@ async def get_stock_details(product_id: str, db=Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
 @StockRouter.delete("/stockdetails/{product_id}/{TransactionID}")
-@db_transaction
-async def delete_stock_transaction(product_id: str, TransactionID: int, db=Depends(get_db)):
+async def delete_stock_transaction(product_id: str, TransactionID: int, adb: AsyncDB = Depends(get_async_db)):
     """
     Delete a stock-in transaction and revert inventory quantity.
     """
+    return await adb.run(_delete_stock_transaction, product_id, TransactionID)
+
+def _delete_stock_transaction(db, product_id: str, TransactionID: int):
     try:
         cursor = db.cursor(dictionary=True)
 
         # Step 1: Verify the transaction exists
         cursor.execute("""
-            SELECT id, ProductID, transaction_type, quantity
+            SELECT id, ProductID, transaction_type, quantity, created_at
             FROM stock_details
             WHERE id = %s AND ProductID = %s
         """, (TransactionID, product_id))
@@ -327,8 +344,11 @@ async def delete_stock_transaction(product_id: str, TransactionID: int, db=Depen
 
         # Step 4: Delete the stock-in record
         cursor.execute("DELETE FROM stock_details WHERE id = %s", (TransactionID,))
+        if transaction["created_at"]:
+            refresh_beginning_quantities(cursor, [transaction["ProductID"]], transaction["created_at"].date())
 
         db.commit()
+        invalidate_products(product_id)
 
         return {
             "message": f"Stock-in transaction {TransactionID} deleted successfully.",
@@ -344,11 +364,13 @@ async def delete_stock_transaction(product_id: str, TransactionID: int, db=Depen
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
     
 @StockRouter.delete("/stockout/{TransactionID}")
-@db_transaction
-async def delete_stock_out_transaction(TransactionID: int, db=Depends(get_db)):
+async def delete_stock_out_transaction(TransactionID: int, adb: AsyncDB = Depends(get_async_db)):
     """
     Delete a stock out/deducted transaction by its ID and update the product quantity.
     """
+    return await adb.run(_delete_stock_out_transaction, TransactionID)
+
+def _delete_stock_out_transaction(db, TransactionID: int):
     try:
         cursor = db.cursor(dictionary=True)
 
@@ -377,6 +399,7 @@ async def delete_stock_out_transaction(TransactionID: int, db=Depends(get_db)):
         """, (quantity, product_id))
 
         db.commit()
+        invalidate_products(product_id)
 
         return {
             "message": f"Stock out transaction {TransactionID} deleted successfully",
@@ -393,23 +416,26 @@ async def delete_stock_out_transaction(TransactionID: int, db=Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
     
 @StockRouter.get("/inventory-transactions", response_model=list)
-@db_transaction
-async def get_inventory_transactions(db=Depends(get_db)):
-    """Fetch all inventory transactions, including stock-in and deducted."""
-    cursor = None
+async def get_inventory_transactions(
+    response: Response,
+    page: PageParams = Depends(page_params()),
+    adb: AsyncDB = Depends(get_async_db)
+):
+    """Fetch inventory transactions (stock-in and deducted), newest first, one page at a time."""
     try:
-        cursor = db.cursor(dictionary=True)
-        cursor.execute("""
+        where, params = keyset_where(("created_at", "id"), page.cursor)
+        transactions = await adb.fetchall(f"""
             SELECT id, product_name, transaction_type, quantity, created_at
             FROM inventory_transactions
             WHERE transaction_type IN ('Add', 'StockIn', 'Deduct')  -- Include all transaction types
-            ORDER BY created_at DESC LIMIT 100
-        """)
-        
-        transactions = cursor.fetchall()
+              AND {where}
+            {order_by(("created_at", "id"))}
+            LIMIT %s
+        """, params + [page.fetch], dictionary=True)
+        transactions, _ = finish_page(transactions, page, key=lambda t: (t["created_at"], t["id"]), response=response)
         
         # Format the transactions data
-        return [
+        return project([
             {
                 "id": t["id"],
                 "product_name": t["product_name"],
@@ -418,22 +444,23 @@ async def get_inventory_transactions(db=Depends(get_db)):
                 "created_at": t["created_at"].strftime("%Y-%m-%d %H:%M:%S") if t["created_at"] else None
             }
             for t in transactions
-        ]
+        ], page.fields)
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching inventory transactions: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error fetching transactions: {str(e)}")
-    finally:
-        if cursor and cursor != db.cursor():
-            cursor.close()
 
 # Get all stock records
 @StockRouter.get("/records")
-@db_transaction
-async def get_stock_records(db=Depends(get_db)):
+async def get_stock_records(adb: AsyncDB = Depends(get_async_db)):
     """
     Get all stock records
     """
+    return await adb.run(_get_stock_records)
+
+def _get_stock_records(db):
     try:
         cursor = db.cursor(dictionary=True)
         
@@ -471,13 +498,16 @@ async def add_stock(
     ExpiryDate: Optional[str] = Form(None),
     InvoiceNumber: str = Form(...),
     StockImage: Optional[UploadFile] = File(None),
-    Notes: Optional[str] = Form(None)
+    Notes: Optional[str] = Form(None),
+    adb: AsyncDB = Depends(get_async_db)
 ):
     """
     Add a new stock record and update product quantity
     """
+    return await adb.run(_add_stock, ProductID, Quantity, UnitCost, TotalCost, ExpiryDate, InvoiceNumber, StockImage, Notes)
+
+def _add_stock(connection, ProductID, Quantity, UnitCost, TotalCost, ExpiryDate, InvoiceNumber, StockImage, Notes):
     try:
-        connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
         
         # Handle image upload if provided
@@ -523,13 +553,13 @@ async def add_stock(
         """, [ProductID])
         
         connection.commit()
+        invalidate_products(ProductID)
         
         # Check if this is a Ready-Made product and notify cafe-beata
         if is_ready_made_product(ProductID, connection):
             notify_cafe_beata_stock_change(ProductID)
         
         cursor.close()
-        connection.close()
         
         return {"success": True, "message": "Stock added successfully"}
     
@@ -537,16 +567,178 @@ async def add_stock(
         print(f"Error adding stock: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+class StockAdjustmentItem(BaseModel):
+    product_id: int
+    action: str
+    quantity: int
+    reason: str
+    request_id: Optional[str] = None    # Caller's idempotency key; a repeated id is not applied again
+
+
+class StockAdjustmentBatchRequest(BaseModel):
+    adjustments: List[StockAdjustmentItem]
+
+
+# Adjust stock for many products in one transaction
+# Registered before /adjust/{product_id} so "batch" is not parsed as a product id
+@StockRouter.post("/adjust/batch")
+async def adjust_stock_batch(request: StockAdjustmentBatchRequest, adb: AsyncDB = Depends(get_async_db)):
+    """
+    Apply many stock adjustments in a single transaction.
+    Adjustments to the same product are applied in request order.
+    An adjustment whose request_id was already applied is skipped and
+    reported as a success with duplicate=true, so callers can safely retry.
+    Returns one result per adjustment.
+    """
+    start_time = time.time()
+    try:
+        if not request.adjustments:
+            return {"success": True, "results": []}
+
+        results, changed = await adb.run(_apply_stock_adjustments, request.adjustments)
+        invalidate_products(*changed)
+
+        if changed:
+            # Send one WebSocket message for the whole batch
+            try:
+                from main import get_websocket_manager
+                manager = get_websocket_manager()
+                timestamp = datetime.now().isoformat()
+                await manager.broadcast({
+                    "type": "stock_update_batch",
+                    "data": [
+                        {
+                            "product_id": pid,
+                            "product_name": product["ProductName"],
+                            "quantity": product["Quantity"],
+                            "status": "Out of Stock" if product["Quantity"] <= 0 else "Low Stock" if product["Quantity"] <= (product["Threshold"] or 5) else "In Stock",
+                            "timestamp": timestamp
+                        }
+                        for pid, product in changed.items()
+                    ]
+                })
+            except Exception as ws_error:
+                logger.error(f"Error sending WebSocket notification: {ws_error}")
+
+            # And one queued webhook call to cafe-beata for the Ready-Made products
+            notify_cafe_beata_stock_changes(list(changed.values()))
+
+        execution_time_ms = (time.time() - start_time) * 1000
+        record_transaction_time("adjust_stock_batch", execution_time_ms)
+
+        return {
+            "success": all(result["success"] for result in results),
+            "results": results
+        }
+
+    except Exception as e:
+        logger.error(f"Error applying batched stock adjustments: {e}")
+        raise HTTPException(status_code=500, detail=f"Error applying batched stock adjustments: {str(e)}")
+
+def _apply_stock_adjustments(db, adjustments: List[StockAdjustmentItem]):
+    """
+    Apply the adjustments with set-based statements and commit.
+    Returns (per-item results, {product_id: product row after the change}).
+    """
+    cursor = db.cursor(dictionary=True)
+    try:
+        results = [None] * len(adjustments)
+
+        # Claim request ids before locking products; replays are skipped below
+        replays = claim_request_ids(cursor, "stock_adjustment_requests", adjustments)
+        product_ids = list({item.product_id for index, item in enumerate(adjustments) if index not in replays})
+
+        # Lock every affected product with one query
+        products = {}
+        if product_ids:
+            placeholders = ", ".join(["%s"] * len(product_ids))
+            cursor.execute(f"""
+                SELECT id, ProductName, Quantity, ProcessType, Threshold
+                FROM inventoryproduct
+                WHERE id IN ({placeholders})
+                FOR UPDATE
+            """, product_ids)
+            products = {row["id"]: row for row in cursor.fetchall()}
+
+        adjustment_rows = []
+        rejected_ids = []
+        changed = {}
+        for index, item in enumerate(adjustments):
+            if index in replays:
+                results[index] = {"product_id": item.product_id, "success": True, "duplicate": True}
+                continue
+
+            product = products.get(item.product_id)
+            if not product:
+                results[index] = {"product_id": item.product_id, "success": False, "error": "Product not found"}
+                rejected_ids.append(item.request_id)
+                continue
+            if item.action not in ("add", "subtract", "set") or item.quantity is None or item.quantity < 0:
+                results[index] = {
+                    "product_id": item.product_id,
+                    "success": False,
+                    "error": "Invalid action. Use 'add', 'subtract', or 'set' with a non-negative quantity"
+                }
+                rejected_ids.append(item.request_id)
+                continue
+
+            current_quantity = product["Quantity"] or 0
+            if item.action == "add":
+                new_quantity = current_quantity + item.quantity
+            elif item.action == "subtract":
+                new_quantity = max(0, current_quantity - item.quantity)  # Prevent negative quantity
+            else:
+                new_quantity = item.quantity
+
+            product["Quantity"] = new_quantity
+            changed[item.product_id] = product
+            adjustment_rows.append((item.product_id, current_quantity, new_quantity, item.action, item.reason))
+            results[index] = {
+                "product_id": item.product_id,
+                "success": True,
+                "previous_quantity": current_quantity,
+                "new_quantity": new_quantity
+            }
+
+        for item, result in zip(adjustments, results):
+            if item.request_id:
+                result["request_id"] = item.request_id
+
+        if changed:
+            # One UPDATE for all products, one multi-row INSERT for the audit trail
+            case_sql = " ".join(["WHEN %s THEN %s"] * len(changed))
+            case_params = [value for pid, product in changed.items() for value in (pid, product["Quantity"])]
+            id_placeholders = ", ".join(["%s"] * len(changed))
+            cursor.execute(
+                f"UPDATE inventoryproduct SET Quantity = CASE id {case_sql} END WHERE id IN ({id_placeholders})",
+                case_params + list(changed.keys())
+            )
+            cursor.executemany("""
+                INSERT INTO stock_adjustments
+                (product_id, previous_quantity, new_quantity, action, reason, adjustment_date)
+                VALUES (%s, %s, %s, %s, %s, NOW())
+            """, adjustment_rows)
+        release_request_ids(cursor, "stock_adjustment_requests", filter(None, rejected_ids))
+
+        db.commit()
+        logger.info(f"Applied {len(adjustment_rows)} stock adjustments across {len(changed)} products")
+        return results, changed
+
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
 # Adjust stock (increase or decrease)
 @StockRouter.post("/adjust/{product_id}")
-@db_transaction
 async def adjust_stock(
     product_id: int,
     action: str = Form(None),  # Make Form parameters optional
     quantity: int = Form(None),
     reason: str = Form(None),
     request: Request = None,  # Add request parameter to handle JSON
-    db=Depends(get_db)  # Add db dependency
+    adb: AsyncDB = Depends(get_async_db)
 ):
     """
     Adjust stock level for a product
@@ -565,69 +757,37 @@ async def adjust_stock(
         if not all([action, quantity, reason]):
             logger.error(f"Missing required parameters: action={action}, quantity={quantity}, reason={reason}")
             raise HTTPException(status_code=400, detail="Missing required parameters")
-            
-        cursor = db.cursor(dictionary=True)
-        
-        # Check if product exists
-        cursor.execute("SELECT * FROM inventoryproduct WHERE id = %s", [product_id])
-        product = cursor.fetchone()
-        
-        if not product:
-            logger.error(f"Product not found: product_id={product_id}")
-            raise HTTPException(status_code=404, detail="Product not found")
-        
-        current_quantity = product.get('Quantity', 0)
-        new_quantity = current_quantity
-        
-        # Calculate new quantity based on action
-        if action == 'add':
-            new_quantity = current_quantity + quantity
-        elif action == 'subtract':
-            new_quantity = max(0, current_quantity - quantity)  # Prevent negative quantity
-        elif action == 'set':
-            new_quantity = quantity
-        else:
+
+        if action not in ("add", "subtract", "set"):
             logger.error(f"Invalid action: {action}")
             raise HTTPException(status_code=400, detail="Invalid action. Use 'add', 'subtract', or 'set'")
         
-        logger.info(f"Adjusting stock: product_id={product_id}, current_quantity={current_quantity}, new_quantity={new_quantity}, action={action}")
-        
-        # Update product quantity
-        cursor.execute("""
-        UPDATE inventoryproduct
-        SET Quantity = %s
-        WHERE id = %s
-        """, [new_quantity, product_id])
-        
-        # Log the number of rows affected
-        rows_affected = cursor.rowcount
-        logger.info(f"Database update complete: rows_affected={rows_affected}")
-        
-        if rows_affected == 0:
-            logger.warning(f"No rows were updated in the database for product_id={product_id}")
-        
-        # Add stock adjustment record
-        cursor.execute("""
-        INSERT INTO stock_adjustments
-        (product_id, previous_quantity, new_quantity, action, reason, adjustment_date)
-        VALUES (%s, %s, %s, %s, %s, NOW())
-        """, [product_id, current_quantity, new_quantity, action, reason])
+        # Same transaction path as the batch endpoint, with a single item
+        results, changed = await adb.run(
+            _apply_stock_adjustments,
+            [StockAdjustmentItem(product_id=product_id, action=action, quantity=quantity, reason=reason)]
+        )
+        invalidate_products(*changed)
+        result = results[0]
+        if not result["success"]:
+            logger.error(f"Stock adjustment rejected: product_id={product_id}, error={result['error']}")
+            status_code = 404 if result["error"] == "Product not found" else 400
+            raise HTTPException(status_code=status_code, detail=result["error"])
+
+        product = changed[product_id]
+        current_quantity = result["previous_quantity"]
+        new_quantity = result["new_quantity"]
+        logger.info(f"Adjusted stock: product_id={product_id}, current_quantity={current_quantity}, new_quantity={new_quantity}, action={action}")
         
         # Send real-time WebSocket notification
         try:
-            import asyncio
-            import sys
-            import os
-            
-            # Add the parent directory to sys.path to import main
-            sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
             from main import get_websocket_manager
             
             # Get the WebSocket manager
             manager = get_websocket_manager()
             
             # Prepare the WebSocket message
-            stock_status = "Out of Stock" if new_quantity <= 0 else "Low Stock" if new_quantity <= product.get('Threshold', 5) else "In Stock"
+            stock_status = "Out of Stock" if new_quantity <= 0 else "Low Stock" if new_quantity <= (product.get('Threshold') or 5) else "In Stock"
             
             ws_message = {
                 "type": "stock_update",
@@ -649,39 +809,36 @@ async def adjust_stock(
             logger.error(f"Error sending WebSocket notification: {ws_error}")
             # Continue with the regular process
         
-        # Check if this is a Ready-Made product and notify cafe-beata
-        is_ready = is_ready_made_product(product_id, db)
-        logger.info(f"Product is_ready_made: {is_ready}")
-        
-        if is_ready:
-            notify_result = notify_cafe_beata_stock_change(product_id)
-            logger.info(f"Notification to cafe-beata result: {notify_result}")
-        
-        # Verify that the update was successful by querying the database again
-        cursor.execute("SELECT Quantity FROM inventoryproduct WHERE id = %s", [product_id])
-        verification = cursor.fetchone()
-        logger.info(f"Verification query result: {verification}")
+        # Notify cafe-beata about Ready-Made products (the change is already committed)
+        process_type = (product.get('ProcessType') or '').lower()
+        if process_type in ['ready-made', 'ready made', 'ready_made', 'readymade']:
+            # The stock_update message was already broadcast above
+            notify_cafe_beata_stock_change(product_id, broadcast=False)
         
         return {
             "success": True, 
             "message": f"Stock {action}ed successfully",
             "previous_quantity": current_quantity,
             "new_quantity": new_quantity,
-            "verification_quantity": verification['Quantity'] if verification else None
+            "verification_quantity": new_quantity
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error adjusting stock: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 # Get stock movement history for a product
 @StockRouter.get("/history/{product_id}")
-async def get_stock_history(product_id: int):
+async def get_stock_history(product_id: int, adb: AsyncDB = Depends(get_async_db)):
     """
     Get stock movement history for a specific product
     """
+    return await adb.run(_get_stock_history, product_id)
+
+def _get_stock_history(connection, product_id: int):
     try:
-        connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
         
         # Check if product exists
@@ -690,7 +847,6 @@ async def get_stock_history(product_id: int):
         
         if not product:
             cursor.close()
-            connection.close()
             raise HTTPException(status_code=404, detail="Product not found")
         
         # Get stock in records
@@ -718,7 +874,6 @@ async def get_stock_history(product_id: int):
         history.sort(key=lambda x: x['date'], reverse=True)
         
         cursor.close()
-        connection.close()
         
         return {"success": True, "product": product, "history": history}
     
@@ -730,13 +885,16 @@ async def get_stock_history(product_id: int):
 @StockRouter.put("/min-level/{product_id}")
 async def update_min_stock_level(
     product_id: int,
-    min_stock_level: int = Form(...)
+    min_stock_level: int = Form(...),
+    adb: AsyncDB = Depends(get_async_db)
 ):
     """
     Update the minimum stock level (threshold) for a product
     """
+    return await adb.run(_update_min_stock_level, product_id, min_stock_level)
+
+def _update_min_stock_level(connection, product_id: int, min_stock_level: int):
     try:
-        connection = get_db_connection()
         cursor = connection.cursor()
         
         # Update threshold
@@ -748,9 +906,9 @@ async def update_min_stock_level(
         
         affected_rows = cursor.rowcount
         connection.commit()
+        invalidate_products(product_id)
         
         cursor.close()
-        connection.close()
         
         if affected_rows == 0:
             raise HTTPException(status_code=404, detail="Product not found")
@@ -763,12 +921,14 @@ async def update_min_stock_level(
 
 # Get low stock alerts
 @StockRouter.get("/alerts")
-async def get_low_stock_alerts():
+async def get_low_stock_alerts(adb: AsyncDB = Depends(get_async_db)):
     """
     Get products that are below their threshold levels
     """
+    return await adb.run(_get_low_stock_alerts)
+
+def _get_low_stock_alerts(connection):
     try:
-        connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
         
         cursor.execute("""
@@ -782,7 +942,6 @@ async def get_low_stock_alerts():
         low_stock_products = cursor.fetchall()
         
         cursor.close()
-        connection.close()
         
         return {"success": True, "low_stock_products": low_stock_products}
     
@@ -796,13 +955,16 @@ async def update_stock_from_cafe(
     product_id: int,
     action: str = Form(...),  # 'add', 'subtract', or 'set'
     quantity: int = Form(...),
-    reason: str = Form(...)
+    reason: str = Form(...),
+    adb: AsyncDB = Depends(get_async_db)
 ):
     """
     Handle stock updates from the cafe system
     """
+    return await adb.run(_update_stock_from_cafe, product_id, action, quantity, reason)
+
+def _update_stock_from_cafe(connection, product_id: int, action: str, quantity: int, reason: str):
     try:
-        connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
         
         # Check if product exists
@@ -811,7 +973,6 @@ async def update_stock_from_cafe(
         
         if not product:
             cursor.close()
-            connection.close()
             raise HTTPException(status_code=404, detail="Product not found")
         
         current_quantity = product.get('Quantity', 0)
@@ -826,7 +987,6 @@ async def update_stock_from_cafe(
             new_quantity = quantity
         else:
             cursor.close()
-            connection.close()
             raise HTTPException(status_code=400, detail="Invalid action. Use 'add', 'subtract', or 'set'")
         
         # Update product quantity
@@ -845,8 +1005,8 @@ async def update_stock_from_cafe(
         """, [product_id, current_quantity, new_quantity, action, reason])
         
         connection.commit()
+        invalidate_products(product_id)
         cursor.close()
-        connection.close()
         
         return {
             "success": True, 
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Form
 from typing import List
-from .db import get_db, db_transaction
+from .async_db import AsyncDB, get_async_db
 from datetime import datetime
 
 SupplierRouter = APIRouter(tags=["Suppliers"])
@@ -16,13 +16,15 @@ def log_activity(db, icon: str, title: str, status: str):
 
 
 @SupplierRouter.post("/suppliers/", response_model=dict)
-@db_transaction
 async def create_supplier(
     suppliername: str = Form(..., min_length=1, max_length=255),  
     contactinfo: str = Form(..., min_length=1, max_length=20),    
     email: str = Form(...),  
-    db=Depends(get_db)
+    adb: AsyncDB = Depends(get_async_db)
 ):
+    return await adb.run(_create_supplier, suppliername, contactinfo, email)
+
+def _create_supplier(db, suppliername: str, contactinfo: str, email: str):
     try:
         cursor = db.cursor()
         query = "INSERT INTO suppliers (suppliername, contactinfo, email) VALUES (%s, %s, %s)"
@@ -42,8 +44,10 @@ async def create_supplier(
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 @SupplierRouter.get("/", response_model=List[dict])
-@db_transaction
-async def read_suppliers(db=Depends(get_db)):
+async def read_suppliers(adb: AsyncDB = Depends(get_async_db)):
+    return await adb.run(_read_suppliers)
+
+def _read_suppliers(db):
     cursor = db.cursor()
     query = "SELECT id, suppliername, contactinfo, email FROM suppliers"
     cursor.execute(query)
@@ -51,8 +55,10 @@ async def read_suppliers(db=Depends(get_db)):
     return suppliers
 
 @SupplierRouter.get("/suppliers/{supplier_id}", response_model=dict)
-@db_transaction
-async def read_supplier(supplier_id: int, db=Depends(get_db)):
+async def read_supplier(supplier_id: int, adb: AsyncDB = Depends(get_async_db)):
+    return await adb.run(_read_supplier, supplier_id)
+
+def _read_supplier(db, supplier_id: int):
     cursor = db.cursor()
     query = "SELECT id, suppliername, contactinfo, email FROM suppliers WHERE id = %s"
     cursor.execute(query, (supplier_id,))
@@ -62,14 +68,16 @@ async def read_supplier(supplier_id: int, db=Depends(get_db)):
     raise HTTPException(status_code=404, detail="Supplier not found")
 
 @SupplierRouter.put("/suppliers/{supplier_id}", response_model=dict)
-@db_transaction
 async def update_supplier(
     supplier_id: int,
     suppliername: str = Form(...),
     contactinfo: str = Form(...),
     email: str = Form(...),
-    db=Depends(get_db)
+    adb: AsyncDB = Depends(get_async_db)
 ):
+    return await adb.run(_update_supplier, supplier_id, suppliername, contactinfo, email)
+
+def _update_supplier(db, supplier_id: int, suppliername: str, contactinfo: str, email: str):
     cursor = db.cursor()
     query_check_supplier = "SELECT suppliername FROM suppliers WHERE id = %s"
     cursor.execute(query_check_supplier, (supplier_id,))
@@ -86,8 +94,10 @@ async def update_supplier(
     return {"message": "Supplier updated successfully"}
 
 @SupplierRouter.delete("/suppliers/{supplier_id}", response_model=dict)
-@db_transaction
-async def delete_supplier(supplier_id: int, db=Depends(get_db)):
+async def delete_supplier(supplier_id: int, adb: AsyncDB = Depends(get_async_db)):
+    return await adb.run(_delete_supplier, supplier_id)
+
+def _delete_supplier(db, supplier_id: int):
     cursor = db.cursor()
     query_check_supplier = "SELECT suppliername FROM suppliers WHERE id = %s"
     cursor.execute(query_check_supplier, (supplier_id,))
@@ -110,8 +120,10 @@ async def delete_supplier(supplier_id: int, db=Depends(get_db)):
 
 
 @SupplierRouter.get("/activity_logs", response_model=List[dict])
-@db_transaction
-async def get_supplier_activity_logs(db=Depends(get_db)):
+async def get_supplier_activity_logs(adb: AsyncDB = Depends(get_async_db)):
+    return await adb.run(_get_supplier_activity_logs)
+
+def _get_supplier_activity_logs(db):
     cursor = db.cursor()
     query = """
     SELECT id, icon, status, title, time
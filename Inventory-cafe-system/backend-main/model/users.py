@@ -7,7 +7,9 @@ import uuid
 from datetime import datetime
 import logging
 import bcrypt
-from .db import get_db_connection, get_db
+from .async_db import run_with_connection
+from .schema import get_schema
+from .pagination import PageParams, estimate_total, finish_page, keyset_where, order_by, page_params, project
 from fastapi.responses import JSONResponse
 from urllib.parse import urljoin
 
@@ -52,62 +54,51 @@ class UserProfile(BaseModel):
     joined: Optional[str] = None
 
 @UsersRouter.get("/")
-async def get_all_users():
-    """Get all users"""
+async def get_all_users(page: PageParams = Depends(page_params())):
+    """Get users, newest first, one page at a time"""
+    return await run_with_connection(_get_all_users, page)
+
+def _get_all_users(connection, page: PageParams):
     try:
-        connection = get_db()
         cursor = connection.cursor(dictionary=True)
         
         # First check if the users table has email and created_at columns
-        cursor.execute("SHOW COLUMNS FROM users LIKE 'email'")
-        email_column_exists = cursor.fetchone()
+        email_column_exists = get_schema().flags.users_email
         
-        cursor.execute("SHOW COLUMNS FROM users LIKE 'created_at'")
-        created_at_column_exists = cursor.fetchone()
+        created_at_column_exists = get_schema().flags.users_created_at
         
-        cursor.execute("SHOW COLUMNS FROM users LIKE 'status'")
-        status_column_exists = cursor.fetchone()
-
-        if not status_column_exists:
-            logger.info("Adding status column to users table")
-            cursor.execute("""
-            ALTER TABLE users 
-            ADD COLUMN status ENUM('Active', 'Inactive') DEFAULT 'Active'
-            """)
-    
-        cursor.execute("SHOW COLUMNS FROM users LIKE 'date_added'")
-        date_added_column_exists = cursor.fetchone()
+        date_added_column_exists = get_schema().flags.users_date_added
         
         # Build the query based on available columns
         if email_column_exists and created_at_column_exists:
             # New schema
-            query = """
-            SELECT id, username, email, role, profile_pic, created_at, status
-            FROM users
-            ORDER BY created_at DESC
-            """
+            select = "SELECT id, username, email, role, profile_pic, created_at, status FROM users"
+            sort_columns = ("created_at", "id")
         elif date_added_column_exists:
             # Legacy schema
-            query = """
-            SELECT id, username, '' as email, role, profile_pic, date_added as created_at
-            FROM users
-            ORDER BY date_added DESC
-            """
+            select = "SELECT id, username, '' as email, role, profile_pic, date_added as created_at FROM users"
+            sort_columns = ("date_added", "id")
         else:
             # Fallback
-            query = """
-            SELECT id, username, '' as email, role, profile_pic, NOW() as created_at
-            FROM users
-            """
+            select = "SELECT id, username, '' as email, role, profile_pic, NOW() as created_at FROM users"
+            sort_columns = ("id",)
+
+        where, params = keyset_where(sort_columns, page.cursor)
+        query = f"{select} WHERE {where} {order_by(sort_columns)} LIMIT %s"
             
-        cursor.execute(query)
+        cursor.execute(query, params + [page.fetch])
         users = cursor.fetchall()
+        total = estimate_total(cursor, "users") if not page.cursor else None
         
         cursor.close()
-        connection.close()
-        
-        return {"success": True, "users": users}
+
+        users, next_cursor = finish_page(
+            users, page, key=lambda user: tuple(user["id"] if column == "id" else user["created_at"] for column in sort_columns)
+        )
+        return {"success": True, "users": project(users, page.fields), "next_cursor": next_cursor, "total": total}
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting users: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -115,29 +106,18 @@ async def get_all_users():
 @UsersRouter.get("/{user_id}")
 async def get_user_by_id(user_id: int):
     """Get user by ID"""
+    return await run_with_connection(_get_user_by_id, user_id)
+
+def _get_user_by_id(connection, user_id: int):
     try:
-        connection = get_db()
         cursor = connection.cursor(dictionary=True)
         
         # First check if the users table has email and created_at columns
-        cursor.execute("SHOW COLUMNS FROM users LIKE 'email'")
-        email_column_exists = cursor.fetchone()
+        email_column_exists = get_schema().flags.users_email
         
-        cursor.execute("SHOW COLUMNS FROM users LIKE 'created_at'")
-        created_at_column_exists = cursor.fetchone()
+        created_at_column_exists = get_schema().flags.users_created_at
         
-        cursor.execute("SHOW COLUMNS FROM users LIKE 'status'")
-        status_column_exists = cursor.fetchone()
-
-        if not status_column_exists:
-            logger.info("Adding status column to users table")
-            cursor.execute("""
-            ALTER TABLE users 
-            ADD COLUMN status ENUM('Active', 'Inactive') DEFAULT 'Active'
-         """)
-            
-        cursor.execute("SHOW COLUMNS FROM users LIKE 'date_added'")
-        date_added_column_exists = cursor.fetchone()
+        date_added_column_exists = get_schema().flags.users_date_added
         
         # Build the query based on available columns
         if email_column_exists and created_at_column_exists:
@@ -166,7 +146,6 @@ async def get_user_by_id(user_id: int):
         user = cursor.fetchone()
         
         cursor.close()
-        connection.close()
         
         if not user:
             raise HTTPException(status_code=404, detail=f"User with ID {user_id} not found")
@@ -197,12 +176,12 @@ async def create_user(
     """
     Create a new user with support for both form data and JSON
     """
-    connection = None
+    return await run_with_connection(_create_user, request, username, password, email, role, profile_pic, user_data)
+
+def _create_user(connection, request: Request, username, password, email, role, profile_pic, user_data):
     cursor = None
     
     try:
-        # Get connection from pool
-        connection = get_db()
         cursor = connection.cursor()
         
         # Determine if this is a form submission or JSON
@@ -268,12 +247,10 @@ async def create_user(
                 # Continue without profile picture if error occurs
         
         # Check if the 'email' column exists in the users table
-        cursor.execute("SHOW COLUMNS FROM users LIKE 'email'")
-        email_column_exists = cursor.fetchone()
+        email_column_exists = get_schema().flags.users_email
         
         # Check if the 'created_at' column exists in the users table
-        cursor.execute("SHOW COLUMNS FROM users LIKE 'created_at'")
-        created_at_column_exists = cursor.fetchone()
+        created_at_column_exists = get_schema().flags.users_created_at
         
         # Insert the new user with appropriate columns
         if email_column_exists and created_at_column_exists:
@@ -315,11 +292,9 @@ async def create_user(
         raise HTTPException(status_code=500, detail=f"Error creating user: {str(e)}")
         
     finally:
-        # Close cursor and connection
+        # Close cursor; the connection goes back to the pool in run_with_connection
         if cursor:
             cursor.close()
-        if connection:
-            connection.close()
 
 @UsersRouter.put("/{user_id}")
 async def update_user(
@@ -331,8 +306,10 @@ async def update_user(
     profile_pic: Optional[UploadFile] = File(None)
 ):
     """Update an existing user with support for both form data and JSON"""
+    return await run_with_connection(_update_user, user_id, username, email, role, status, profile_pic)
+
+def _update_user(connection, user_id: int, username, email, role, status, profile_pic):
     try:
-        connection = get_db()
         cursor = connection.cursor()
         
         # Check if user exists
@@ -384,7 +361,6 @@ async def update_user(
         connection.commit()
         
         cursor.close()
-        connection.close()
         
         return {
             "success": True,
@@ -407,8 +383,10 @@ async def options_update_user(user_id: int):
 @UsersRouter.delete("/{user_id}")
 async def delete_user(user_id: int):
     """Delete a user"""
+    return await run_with_connection(_delete_user, user_id)
+
+def _delete_user(connection, user_id: int):
     try:
-        connection = get_db()
         cursor = connection.cursor()
         
         # Check if user exists
@@ -423,7 +401,6 @@ async def delete_user(user_id: int):
         connection.commit()
         
         cursor.close()
-        connection.close()
         
         return {
             "success": True,
@@ -440,11 +417,11 @@ async def delete_user(user_id: int):
 @UsersRouter.post("/{user_id}/profile-pic")
 async def upload_profile_pic(user_id: int, profile_pic: UploadFile = File(...), request: Request = None):
     """Upload a profile picture for a user"""
-    connection = None
+    return await run_with_connection(_upload_profile_pic, user_id, profile_pic, request)
+
+def _upload_profile_pic(connection, user_id: int, profile_pic: UploadFile, request: Request):
     cursor = None
     try:
-        # Use connection pool instead of direct connection
-        connection = get_db()
         cursor = connection.cursor()
         
         # Check if user exists
@@ -519,144 +496,6 @@ async def upload_profile_pic(user_id: int, profile_pic: UploadFile = File(...),
             except:
                 pass
                 
-        if connection:
-            try:
-                connection.close()
-            except:
-                pass
-
-# Ensure users table exists
-def ensure_users_table_exists():
-    """Ensure the users table exists and has the correct structure"""
-    try:
-        connection = get_db()
-        cursor = connection.cursor()
-        
-        # First check if the users table exists
-        cursor.execute("SHOW TABLES LIKE 'users'")
-        table_exists = cursor.fetchone()
-        
-        if not table_exists:
-            # Create users table if it doesn't exist
-            logger.info("Creating users table from scratch")
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(50) NOT NULL UNIQUE,
-                email VARCHAR(100) NOT NULL UNIQUE,
-                password VARCHAR(255) NOT NULL,
-                role VARCHAR(20) NOT NULL DEFAULT 'cafe_staff',
-                profile_pic VARCHAR(255),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """)
-        else:
-            # Table exists, check if it has the email column
-            cursor.execute("SHOW COLUMNS FROM users LIKE 'email'")
-            email_column_exists = cursor.fetchone()
-            
-            if not email_column_exists:
-                logger.info("Adding email column to users table")
-                try:
-                    # Add email column
-                    cursor.execute("""
-                    ALTER TABLE users 
-                    ADD COLUMN email VARCHAR(100) NULL
-                    """)
-                    
-                    # Update existing rows with default email
-                    cursor.execute("""
-                    UPDATE users 
-                    SET email = CONCAT(username, '@cafebeata.com') 
-                    WHERE email IS NULL
-                    """)
-                    
-                    # Now make it NOT NULL
-                    cursor.execute("""
-                    ALTER TABLE users 
-                    MODIFY email VARCHAR(100) NOT NULL UNIQUE
-                    """)
-                except Exception as e:
-                    logger.warning(f"Could not add email column: {e}")
-                    # If we can't add the column, we'll need to adapt our code
-                    # to work without it
-            
-            # Check if it has created_at column
-            cursor.execute("SHOW COLUMNS FROM users LIKE 'created_at'")
-            created_at_exists = cursor.fetchone()
-            
-            if not created_at_exists:
-                logger.info("Adding created_at column to users table")
-                try:
-                    cursor.execute("""
-                    ALTER TABLE users 
-                    ADD COLUMN created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    """)
-                except Exception as e:
-                    logger.warning(f"Could not add created_at column: {e}")
-                    # If we can't add the column, we'll adapt
-        
-        # Check if admin user exists
-        # If email column doesn't exist, we'll just check by username
-        admin_exists = False
-        try:
-            cursor.execute("SELECT id FROM users WHERE username = 'admin'")
-            admin_exists = cursor.fetchone()
-        except Exception as e:
-            logger.warning(f"Error checking for admin user: {e}")
-        
-        if not admin_exists:
-            logger.info("Creating admin user")
-            # Create admin user with default password 'admin123'
-            hashed_password = bcrypt.hashpw('admin123'.encode('utf-8'), bcrypt.gensalt())
-            
-            try:
-                # Try to insert with email field
-                cursor.execute("""
-                INSERT INTO users (username, email, password, role)
-                VALUES ('admin', 'admin@cafebeata.com', %s, 'admin')
-                """, (hashed_password.decode('utf-8'),))
-            except Exception as e:
-                logger.warning(f"Error inserting admin with email: {e}")
-                try:
-                    # Try without email field if it doesn't exist
-                    cursor.execute("""
-                    INSERT INTO users (username, password, role)
-                    VALUES ('admin', %s, 'admin')
-                    """, (hashed_password.decode('utf-8'),))
-                except Exception as e2:
-                    logger.error(f"Failed to create admin user: {e2}")
-            
-            # Create a test cafe staff user
-            staff_password = bcrypt.hashpw('staff123'.encode('utf-8'), bcrypt.gensalt())
-            
-            try:
-                # Try to insert with email field
-                cursor.execute("""
-                INSERT INTO users (username, email, password, role)
-                VALUES ('staff', 'staff@cafebeata.com', %s, 'cafe_staff')
-                """, (staff_password.decode('utf-8'),))
-            except Exception as e:
-                logger.warning(f"Error inserting staff with email: {e}")
-                try:
-                    # Try without email field if it doesn't exist
-                    cursor.execute("""
-                    INSERT INTO users (username, password, role)
-                    VALUES ('staff', %s, 'cafe_staff')
-                    """, (staff_password.decode('utf-8'),))
-                except Exception as e2:
-                    logger.error(f"Failed to create staff user: {e2}")
-        
-        connection.commit()
-        cursor.close()
-        connection.close()
-        
-        logger.info("Users table verified")
-        
-    except Exception as e:
-        logger.error(f"Error ensuring users table exists: {str(e)}")
-        # Don't re-raise, just log the error
-        # This allows the application to continue even if user setup fails
 
 # Add these compatibility routes at the end of the file
 @UsersRouter.get("/users/{user_id}")
@@ -698,7 +537,9 @@ async def get_current_user_profile_compat(request: Request):
 @UsersRouter.get("/profile")
 async def get_current_user_profile(request: Request):
     """Get the current user's profile"""
-    connection = None
+    return await run_with_connection(_get_current_user_profile, request)
+
+def _get_current_user_profile(connection, request: Request):
     cursor = None
     try:
         # Get the user ID from the Authorization header or session
@@ -708,19 +549,14 @@ async def get_current_user_profile(request: Request):
         if not user_id:
             raise HTTPException(status_code=401, detail="Unauthorized. User ID is required.")
         
-        # Use the connection pool instead of direct connection
-        connection = get_db()
         cursor = connection.cursor(dictionary=True)
         
         # First check if the users table has email and created_at columns
-        cursor.execute("SHOW COLUMNS FROM users LIKE 'email'")
-        email_column_exists = cursor.fetchone() is not None
+        email_column_exists = get_schema().flags.users_email
         
-        cursor.execute("SHOW COLUMNS FROM users LIKE 'created_at'")
-        created_at_column_exists = cursor.fetchone() is not None
+        created_at_column_exists = get_schema().flags.users_created_at
         
-        cursor.execute("SHOW COLUMNS FROM users LIKE 'date_added'")
-        date_added_column_exists = cursor.fetchone() is not None
+        date_added_column_exists = get_schema().flags.users_date_added
         
         # Build the query based on available columns
         if email_column_exists and created_at_column_exists:
@@ -794,9 +630,4 @@ async def get_current_user_profile(request: Request):
             except:
                 pass
                 
-        if connection:
-            try:
-                connection.close()
-            except:
-                pass
 
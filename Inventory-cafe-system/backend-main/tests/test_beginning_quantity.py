@@ -0,0 +1,94 @@
+"""
+daily_beginning_quantity kept up to date by refresh_beginning_quantities()
+must equal what rebuild_beginning_quantities() derives from stock_details.
+The statements run against in-memory SQLite tables, with %s rewritten to ?;
+run with `python -m pytest tests` from backend-main.
+"""
+import sqlite3
+from datetime import date, datetime
+
+import pytest
+
+from model.beginning_quantity import forget_product, rebuild_beginning_quantities, refresh_beginning_quantities
+
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+
+
+class SQLiteCursor:
+    def __init__(self, connection):
+        self._cursor = connection.cursor()
+        self.rowcount = 0
+
+    def execute(self, query, params=()):
+        self._cursor.execute(query.replace("%s", "?"), params)
+        self.rowcount = self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteDB:
+    def __init__(self):
+        self.connection = sqlite3.connect(":memory:")
+        self.connection.executescript("""
+            CREATE TABLE stock_details (id INTEGER PRIMARY KEY, ProductID INTEGER, original_quantity INTEGER,
+                                        created_at TEXT);
+            CREATE TABLE daily_beginning_quantity (quantity_date TEXT, product_id INTEGER, beginning_quantity INTEGER,
+                                                   PRIMARY KEY (quantity_date, product_id));
+        """)
+
+    def cursor(self, dictionary=False):
+        return SQLiteCursor(self.connection)
+
+    def commit(self):
+        self.connection.commit()
+
+    def rollback(self):
+        self.connection.rollback()
+
+    def stock_in(self, product_id, quantity, created_at):
+        cursor = self.cursor()
+        cursor.execute("INSERT INTO stock_details (ProductID, original_quantity, created_at) VALUES (%s, %s, %s)",
+                       (product_id, quantity, created_at))
+        refresh_beginning_quantities(cursor, [product_id], created_at.date())
+        self.commit()
+
+    def table(self):
+        return sorted(self.connection.execute("SELECT * FROM daily_beginning_quantity"))
+
+
+@pytest.fixture
+def db():
+    db = SQLiteDB()
+    yield db
+    db.connection.close()
+
+
+def test_refreshed_rows_match_a_rebuild(db):
+    db.stock_in(1, 10, datetime(2026, 3, 1, 8, 0))
+    db.stock_in(1, 5, datetime(2026, 3, 1, 23, 59))
+    db.stock_in(2, 7, datetime(2026, 3, 1, 9, 30))
+    db.stock_in(1, 4, datetime(2026, 3, 2, 0, 0))
+
+    # Deleting a stock-in row, as DELETE /stockdetails/{product_id}/{id} does
+    cursor = db.cursor()
+    cursor.execute("DELETE FROM stock_details WHERE id = %s", (2,))
+    refresh_beginning_quantities(cursor, [1], date(2026, 3, 1))
+    db.commit()
+
+    incremental = db.table()
+    assert incremental == [("2026-03-01", 1, 10), ("2026-03-01", 2, 7), ("2026-03-02", 1, 4)]
+
+    rebuild_beginning_quantities(db)
+    assert db.table() == incremental
+    rebuild_beginning_quantities(db, since=date(2026, 3, 2))
+    assert db.table() == incremental
+
+
+def test_deleted_product_is_forgotten(db):
+    db.stock_in(1, 10, datetime(2026, 3, 1, 8, 0))
+    db.stock_in(2, 3, datetime(2026, 3, 1, 8, 0))
+
+    forget_product(db.cursor(), 1)
+    assert db.table() == [("2026-03-01", 2, 3)]
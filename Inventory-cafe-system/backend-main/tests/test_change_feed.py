@@ -0,0 +1,35 @@
+"""
+Gap handling in the change feed: the cursor must not move past a version
+that may still be uncommitted. Run with `python -m pytest tests` from
+backend-main.
+"""
+from model.change_feed import _committed_prefix
+
+
+def entries(*versions, recent=True):
+    return [{"version": version, "product_id": 1, "recent": recent} for version in versions]
+
+
+def test_contiguous_versions_are_all_returned():
+    page = entries(11, 12, 13)
+    assert _committed_prefix(page, 10) == page
+
+
+def test_stops_before_a_recent_gap():
+    page = entries(11, 13, 14)
+    assert [entry["version"] for entry in _committed_prefix(page, 10)] == [11]
+
+
+def test_recent_gap_right_after_the_cursor_returns_nothing():
+    assert _committed_prefix(entries(12, 13), 10) == []
+
+
+def test_old_gap_is_a_rollback_and_is_skipped():
+    page = entries(11, 13, recent=False) + entries(14)
+    assert _committed_prefix(page, 10) == page
+
+
+def test_auto_increment_step_is_not_a_gap():
+    page = entries(12, 14, 16)
+    assert _committed_prefix(page, 10, step=2) == page
+    assert [entry["version"] for entry in _committed_prefix(entries(12, 16), 10, step=2)] == [12]
@@ -0,0 +1,75 @@
+"""
+ensure_indexes() against a stub cursor that answers the two
+information_schema queries; run with `python -m pytest tests` from
+backend-main.
+"""
+from model.indexes import ensure_indexes
+
+
+class StubCursor:
+    def __init__(self, columns, indexes):
+        self.columns = columns
+        self.indexes = indexes
+        self.executed = []
+        self._result = []
+
+    def execute(self, query, params=None):
+        self.executed.append(query)
+        if "information_schema.COLUMNS" in query:
+            self._result = self.columns
+        elif "information_schema.STATISTICS" in query:
+            self._result = self.indexes
+        else:
+            self._result = []
+
+    def fetchall(self):
+        return self._result
+
+    def close(self):
+        pass
+
+
+class StubConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self):
+        return self._cursor
+
+
+def run(indexes, columns, existing=()):
+    cursor = StubCursor(columns, list(existing))
+    created = ensure_indexes(StubConnection(cursor), indexes)
+    ddl = [q for q in cursor.executed if q.startswith("CREATE INDEX")]
+    return created, ddl
+
+
+SALES_COLUMNS = [("sales", "id"), ("Sales", "Product_ID"), ("sales", "created_at")]
+
+
+def test_creates_missing_index():
+    created, ddl = run([("sales", "idx_sales_product_created", ("product_id", "created_at"))], SALES_COLUMNS)
+    assert created == ["idx_sales_product_created"]
+    assert ddl == ["CREATE INDEX `idx_sales_product_created` ON `sales` (`product_id`, `created_at`)"]
+
+
+def test_skips_existing_index_case_insensitively():
+    created, ddl = run(
+        [("sales", "idx_sales_created", ("created_at",))],
+        SALES_COLUMNS,
+        existing=[("SALES", "IDX_SALES_CREATED")],
+    )
+    assert created == [] and ddl == []
+
+
+def test_skips_missing_table_and_columns():
+    created, ddl = run(
+        [
+            ("stock_adjustments", "idx_stock_adjustments_product_date", ("product_id", "adjustment_date")),
+            ("sales", "idx_sales_missing", ("product_id", "remitted")),
+            ("sales", "idx_sales_created", ("created_at",)),
+        ],
+        SALES_COLUMNS,
+    )
+    assert created == ["idx_sales_created"]
+    assert len(ddl) == 1
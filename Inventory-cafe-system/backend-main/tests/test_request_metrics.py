@@ -0,0 +1,60 @@
+"""
+Route labels used for per-route metrics and Server-Timing: two routers
+included under different prefixes with the same sub-path must not share a
+label.
+"""
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+import model.request_metrics as request_metrics
+from model.request_metrics import RequestMetricsMiddleware
+
+
+@pytest.fixture
+def labels(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(request_metrics, "record_response_time", lambda endpoint, ms: recorded.append(endpoint))
+    return recorded
+
+
+def make_app():
+    users, categories = APIRouter(), APIRouter()
+
+    @users.get("/")
+    async def list_users():
+        return []
+
+    @users.get("/{user_id}")
+    async def get_user(user_id: int):
+        return {}
+
+    @categories.get("/")
+    async def list_categories():
+        return []
+
+    app = FastAPI()
+    app.add_middleware(RequestMetricsMiddleware)
+    app.include_router(users, prefix="/api/users")
+    app.include_router(categories, prefix="/api/categories")
+
+    @app.get("/")
+    async def root():
+        return {}
+
+    return app
+
+
+def test_prefixed_routers_get_distinct_labels(labels):
+    client = TestClient(make_app())
+    for path in ("/api/users/", "/api/categories/", "/", "/api/users/7", "/api/users/8", "/nope"):
+        client.get(path)
+
+    assert labels == [
+        "GET /api/users/",
+        "GET /api/categories/",
+        "GET /",
+        "GET /api/users/{user_id}",
+        "GET /api/users/{user_id}",
+        "GET unmatched",
+    ]
@@ -0,0 +1,141 @@
+"""
+/sales/update keeps `sales` and `sales_daily_rollup` in step: the rollup it
+maintains incrementally must equal what rebuild_sales_rollup() recomputes
+from `sales`. Runs against an in-memory stand-in for the three tables
+involved; run with `python -m pytest tests` from backend-main.
+"""
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from model.sales import SalesUpdateRequest, _record_sales, _update_sales
+from model.sales_rollup import rebuild_sales_rollup
+
+
+class FakeSalesDB:
+    """inventoryproduct, sales and sales_daily_rollup, for the statements these paths run"""
+
+    def __init__(self, products):
+        self.products = products
+        self.sales = []
+        self.rollup = {}
+        self.request_ids = set()
+        self.committed = 0
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.committed += 1
+
+    def rollback(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rowcount = 0
+        self._result = []
+
+    def execute(self, query, params=()):
+        db = self.db
+        query = " ".join(query.split())
+        if query.startswith("SELECT id, ProductName") and "FROM inventoryproduct" in query:
+            self._result = [dict(db.products[pid]) for pid in params if pid in db.products]
+        elif query.startswith("INSERT IGNORE INTO sales_update_requests"):
+            self.rowcount = 0 if params[0] in db.request_ids else 1
+            db.request_ids.add(params[0])
+        elif query.startswith("DELETE FROM sales_update_requests"):
+            db.request_ids.difference_update(params)
+        elif query.startswith("DELETE FROM sales_daily_rollup"):
+            db.rollup.clear()
+        elif query.startswith("INSERT INTO sales_daily_rollup") and "FROM sales" in query:
+            for sale in db.sales:
+                row = db.rollup.setdefault((sale["created_at"].date(), sale["product_id"]), [0, 0.0, 0])
+                row[0] += sale["quantity_sold"]
+                row[1] += sale["remitted"]
+                row[2] += 1
+            self.rowcount = len(db.rollup)
+        elif query.startswith("UPDATE inventoryproduct"):
+            raise AssertionError("/sales/update must not change stock")
+        else:
+            raise AssertionError(f"Unexpected query: {query}")
+
+    def executemany(self, query, rows):
+        if query.split()[:3] == ["INSERT", "INTO", "sales"]:
+            for product_id, _, _, quantity, _, remitted in rows:
+                self.db.sales.append({"product_id": product_id, "quantity_sold": quantity, "remitted": remitted,
+                                      "created_at": datetime.now()})
+            return
+        assert "INSERT INTO sales_daily_rollup" in query
+        for product_id, quantity, remitted in rows:
+            row = self.db.rollup.setdefault((datetime.now().date(), product_id), [0, 0.0, 0])
+            row[0] += quantity
+            row[1] += remitted
+            row[2] += 1
+
+    def fetchall(self):
+        return self._result
+
+    def close(self):
+        pass
+
+
+def product(pid, quantity=1):
+    return {"id": pid, "ProductName": f"P{pid}", "UnitPrice": 25.0, "Quantity": quantity, "Image": None}
+
+
+def test_incremental_rollup_matches_rebuild_for_a_completed_order():
+    # Stock is already at 1: the stock-adjust delivery took it before the sale arrives
+    db = FakeSalesDB({1: product(1), 2: product(2)})
+
+    # One completed order with three lines, delivered as the outbox sends them
+    for product_id, quantity in ((1, 2), (2, 1), (1, 3)):
+        _update_sales(db, SalesUpdateRequest(product_id=product_id, quantity_sold=quantity, remitted=quantity * 25.0))
+
+    incremental = {key: list(row) for key, row in db.rollup.items()}
+    rebuild_sales_rollup(db)
+
+    assert incremental == db.rollup
+    today = datetime.now().date()
+    assert db.rollup[(today, 1)] == [5, 125.0, 2]
+    assert db.products[1]["Quantity"] == 1
+
+
+def test_rejections_keep_their_status_code():
+    db = FakeSalesDB({1: product(1)})
+    with pytest.raises(HTTPException) as missing:
+        _update_sales(db, SalesUpdateRequest(product_id=9, quantity_sold=1, remitted=25.0))
+    assert missing.value.status_code == 404
+
+    with pytest.raises(HTTPException) as invalid:
+        _update_sales(db, SalesUpdateRequest(product_id=1, quantity_sold=0, remitted=0))
+    assert invalid.value.status_code == 400
+    assert db.sales == [] and db.rollup == {}
+
+
+def sale(product_id, quantity, request_id=None):
+    return SalesUpdateRequest(product_id=product_id, quantity_sold=quantity, remitted=quantity * 25.0,
+                              request_id=request_id)
+
+
+def test_replayed_batch_is_recorded_once():
+    db = FakeSalesDB({1: product(1), 2: product(2)})
+    batch = [sale(1, 2, "r-1"), sale(2, 1, "r-2")]
+
+    _record_sales(db, batch)
+    results = _record_sales(db, batch + [sale(1, 1, "r-3")])
+
+    assert [result.get("duplicate", False) for result in results] == [True, True, False]
+    assert len(db.sales) == 3
+    assert db.rollup[(datetime.now().date(), 1)] == [3, 75.0, 2]
+
+
+def test_rejected_sale_releases_its_request_id():
+    db = FakeSalesDB({})
+    results = _record_sales(db, [sale(9, 1, "r-9")])
+
+    assert results == [{"product_id": 9, "success": False, "error": "Product not found", "request_id": "r-9"}]
+    assert db.request_ids == set() and db.sales == []
@@ -0,0 +1,63 @@
+"""
+Server-Timing `db` duration for a route that queries through AsyncDB: the
+pooled cursor runs on the database executor and must still add its time to
+the request's RequestTimings.
+"""
+import re
+import time
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from model.async_db import AsyncDB, get_async_db
+from model.db import PooledConnection
+from model.request_metrics import RequestMetricsMiddleware
+
+QUERY_SECONDS = 0.02
+
+
+class SlowCursor:
+    def execute(self, query, params=None):
+        time.sleep(QUERY_SECONDS)
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+class RawConnection:
+    def cursor(self, *args, **kwargs):
+        return SlowCursor()
+
+
+class StubPool:
+    def _release(self, connection, leaked=False):
+        pass
+
+
+async def stub_async_db():
+    yield AsyncDB(PooledConnection(StubPool(), RawConnection(), checkout_stack=None))
+
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(RequestMetricsMiddleware)
+    app.dependency_overrides[get_async_db] = stub_async_db
+
+    @app.get("/rows")
+    async def rows(adb: AsyncDB = Depends(get_async_db)):
+        return {"rows": await adb.fetchall("SELECT 1")}
+
+    return app
+
+
+def test_async_db_route_reports_db_time():
+    response = TestClient(make_app()).get("/rows")
+    assert response.status_code == 200
+
+    match = re.search(r'db;dur=([\d.]+);desc="(\d+) queries"', response.headers["server-timing"])
+    assert match, response.headers["server-timing"]
+    assert float(match.group(1)) >= QUERY_SECONDS * 1000 * 0.9
+    assert int(match.group(2)) == 1
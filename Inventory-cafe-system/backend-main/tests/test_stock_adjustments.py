@@ -0,0 +1,103 @@
+"""
+_apply_stock_adjustments() request-id handling against a stub cursor that
+keeps product quantities and applied request ids in memory; run with
+`python -m pytest tests` from backend-main.
+"""
+from model.stockin import StockAdjustmentItem, _apply_stock_adjustments
+
+
+class StubCursor:
+    def __init__(self, products, applied):
+        self.products = products
+        self.applied = applied
+        self.updates = 0
+        self.executed = []
+        self.rowcount = 0
+        self._result = []
+
+    def execute(self, query, params=None):
+        self.executed.append(query.split()[0] + " " + ("requests" if "_requests" in query else "products"))
+        if "FROM inventoryproduct" in query:
+            self._result = [dict(self.products[pid]) for pid in params if pid in self.products]
+        elif query.startswith("INSERT IGNORE INTO stock_adjustment_requests"):
+            self.rowcount = 0 if params[0] in self.applied else 1
+            self.applied.add(params[0])
+        elif query.startswith("DELETE FROM stock_adjustment_requests"):
+            self.applied.difference_update(params)
+        elif query.startswith("UPDATE inventoryproduct"):
+            self.updates += 1
+            pairs = params[:len(params) // 3 * 2]
+            for pid, quantity in zip(pairs[::2], pairs[1::2]):
+                self.products[pid]["Quantity"] = quantity
+        else:
+            self._result = []
+
+    def executemany(self, query, rows):
+        pass
+
+    def fetchall(self):
+        return self._result
+
+    def close(self):
+        pass
+
+
+class StubConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self, dictionary=False):
+        return self._cursor
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def product(pid, quantity):
+    return {"id": pid, "ProductName": f"P{pid}", "Quantity": quantity, "ProcessType": "Ready-Made", "Threshold": 5}
+
+
+def subtract(pid, quantity, request_id=None):
+    return StockAdjustmentItem(product_id=pid, action="subtract", quantity=quantity, reason="test",
+                               request_id=request_id)
+
+
+def test_retried_request_ids_are_applied_once():
+    cursor = StubCursor({1: product(1, 10), 2: product(2, 10)}, set())
+    db = StubConnection(cursor)
+
+    _apply_stock_adjustments(db, [subtract(1, 3, "r-1"), subtract(2, 4, "r-2")])
+    results, changed = _apply_stock_adjustments(db, [subtract(1, 3, "r-1"), subtract(2, 1, "r-3")])
+
+    assert cursor.products[1]["Quantity"] == 7
+    assert cursor.products[2]["Quantity"] == 5
+    assert results[0] == {"product_id": 1, "success": True, "duplicate": True, "request_id": "r-1"}
+    assert results[1]["request_id"] == "r-3" and results[1]["new_quantity"] == 5
+    assert list(changed) == [2]
+
+
+def test_repeated_request_id_within_a_batch():
+    cursor = StubCursor({1: product(1, 10)}, set())
+    results, _ = _apply_stock_adjustments(StubConnection(cursor), [subtract(1, 2, "r-1"), subtract(1, 2, "r-1")])
+
+    assert cursor.products[1]["Quantity"] == 8
+    assert [result.get("duplicate", False) for result in results] == [False, True]
+
+
+def test_rejections_carry_the_request_id():
+    cursor = StubCursor({}, set())
+    results, changed = _apply_stock_adjustments(StubConnection(cursor), [subtract(9, 1, "r-9")])
+
+    assert results == [{"product_id": 9, "success": False, "error": "Product not found", "request_id": "r-9"}]
+    assert changed == {} and cursor.applied == set()
+
+
+def test_request_ids_are_claimed_before_products_are_locked():
+    cursor = StubCursor({1: product(1, 10)}, set())
+    _apply_stock_adjustments(StubConnection(cursor), [subtract(1, 2, "r-1")])
+
+    assert cursor.executed[:2] == ["INSERT requests", "SELECT products"]
+    assert not any(q == "SELECT requests" for q in cursor.executed)
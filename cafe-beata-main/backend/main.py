@@ -1,5 +1,5 @@
 from fastapi import FastAPI, HTTPException, File, UploadFile, WebSocket, WebSocketDisconnect
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from fastapi.middleware.cors import CORSMiddleware
 import mysql.connector
 from mysql.connector import Error
@@ -22,7 +22,7 @@ import string
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import smtplib
 import jwt
 from datetime import datetime, timedelta
@@ -36,6 +36,46 @@ import logging
 import sys
 import requests
 import urllib.parse
+import time
+from utils.outbound_queue import (
+    KIND_SALES_UPDATE,
+    KIND_STOCK_ADJUST,
+    enqueue_inventory_updates,
+    get_outbox_stats,
+    notify_worker as notify_outbound_worker,
+    start_outbound_worker,
+    stop_outbound_worker,
+)
+from utils.db_pool import (
+    PoolTimeoutError,
+    check_health as check_db_health,
+    close_pool,
+    get_connection as get_pooled_connection,
+    get_pool,
+    pooled_connection,
+    run_db,
+)
+from utils.schema import get_schema, refresh_schema
+from utils.migrate import check_schema
+from utils.pagination import PageParams, estimate_total, finish_page, keyset_where, order_by, page_params, project
+from utils.broadcast import BroadcastHub
+from beata_common.openmetrics import (
+    CONTENT_TYPE as OPENMETRICS_CONTENT_TYPE,
+    OUTBOUND_LATENCY,
+    REGISTRY as METRICS_REGISTRY,
+    REQUEST_ERRORS,
+    REQUEST_LATENCY,
+    REQUESTS_IN_FLIGHT,
+    SYNC_DURATION,
+    gauge,
+)
+from utils.inventory_changes import (
+    apply_changes as apply_inventory_changes,
+    fetch_changes as fetch_inventory_changes,
+    load_cursor as load_inventory_cursor,
+    stale_items,
+    write_item_stocks,
+)
 
 load_dotenv()
 
@@ -87,6 +127,29 @@ app.add_middleware(
     expose_headers=["Content-Type"],
 )
 
+# Request latency by route template and in-flight count, exported on /metrics
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    REQUESTS_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    try:
+        return await call_next(request)
+    except Exception:
+        route = request.scope.get("route")
+        REQUEST_ERRORS.labels(request.method, getattr(route, "path", None) or "unmatched").inc()
+        raise
+    finally:
+        REQUESTS_IN_FLIGHT.dec()
+        route = request.scope.get("route")
+        REQUEST_LATENCY.labels(request.method, getattr(route, "path", None) or "unmatched").observe(
+            time.perf_counter() - start
+        )
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """OpenMetrics exposition for Prometheus-compatible scrapers"""
+    return Response(content=METRICS_REGISTRY.render(), media_type=OPENMETRICS_CONTENT_TYPE)
+
 class ResetPasswordRequest(BaseModel):
     email: str
 
@@ -124,14 +187,15 @@ def send_reset_email(to_email, reset_url):
 import mysql.connector
 
 @app.post("/request-password-reset")
-async def request_password_reset(request: ResetPasswordRequest, background_tasks: BackgroundTasks):
+def request_password_reset(request: ResetPasswordRequest, background_tasks: BackgroundTasks):
     email = request.email
 
     # Connect to the database and check if the email exists
-    connection = get_db_connection()
-    cursor = connection.cursor()
-    cursor.execute("SELECT email FROM userso WHERE email = %s", (email,))
-    user = cursor.fetchone()
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT email FROM userso WHERE email = %s", (email,))
+        user = cursor.fetchone()
+        cursor.close()
 
     if user is None:
         raise HTTPException(status_code=400, detail="Email not found")
@@ -154,7 +218,7 @@ async def reset_password_page(token: str):
     
 
 @app.post("/reset-password/{token}")
-async def reset_password_with_token(token: str, reset_data: ResetPassword):
+def reset_password_with_token(token: str, reset_data: ResetPassword):
     print(f"Received token: {token}")  # Debugging: print received token
     
     try:
@@ -173,10 +237,11 @@ async def reset_password_with_token(token: str, reset_data: ResetPassword):
         # Proceed with updating the password in the database
         hashed_new_password = bcrypt.hashpw(reset_data.newPassword.encode('utf-8'), bcrypt.gensalt())
 
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        cursor.execute("UPDATE userso SET password = %s WHERE email = %s", (hashed_new_password, email))
-        connection.commit()
+        with pooled_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("UPDATE userso SET password = %s WHERE email = %s", (hashed_new_password, email))
+            connection.commit()
+            cursor.close()
 
         return {"message": "Password reset successfully!"}
 
@@ -191,32 +256,17 @@ async def reset_password_with_token(token: str, reset_data: ResetPassword):
 
 # Database connection function
 def get_db_connection():
-    db_config = {
-        "host": os.getenv("DB_HOST", "127.0.0.1"),
-        "user": os.getenv("DB_USER", "root"),
-        "password": os.getenv("DB_PASSWORD", ""),  # Empty password or remove this line if no password is used
-        "database": os.getenv("DB_NAME", "cafe_beata"),
-        "port": int(os.getenv("DB_PORT", "3306"))
-    }
-
+    """
+    Check out a pooled connection. Callers close() it as before, which now
+    returns it to the pool; use pooled_connection() for guaranteed release.
+    """
     try:
-        connection = mysql.connector.connect(**db_config)
-        if connection.is_connected():
-            return connection
-        else:
-            print("Database connection failed: Not connected")
-            return None
+        return get_pooled_connection()
+    except PoolTimeoutError as e:
+        logger.error(f"Database pool exhausted: {e}")
+        return None
     except Error as e:
         print(f"Database connection error: {e}")
-        # Try once more with no password as fallback
-        try:
-            db_config["password"] = ""
-            connection = mysql.connector.connect(**db_config)
-            if connection.is_connected():
-                print("Connected with fallback (empty password)")
-                return connection
-        except Error as fallback_error:
-            print(f"Fallback connection error: {fallback_error}")
         return None
 
 @app.get("/")
@@ -245,7 +295,7 @@ class UserProfile(BaseModel):
     about_me: str
 
 @app.post("/register")
-async def register(user: User):
+def register(user: User):
     print(f"Received user data: {user}")  # Debugging: print the received user data
     if not user.email.endswith("@uic.edu.ph"):
         raise HTTPException(status_code=400, detail="Email must be the UIC EMAIL address")
@@ -278,7 +328,7 @@ async def register(user: User):
 
 
 @app.post("/check-username")
-async def check_username(request: dict):
+def check_username(request: dict):
     username = request.get("username")
     
     # Connect to the database and check if the username already exists
@@ -296,7 +346,7 @@ async def check_username(request: dict):
 
 
 @app.post("/login")
-async def login(user: UserLogin):
+def login(user: UserLogin):
     connection = get_db_connection()
     if connection is None:
         raise HTTPException(status_code=500, detail="Database connection failed")
@@ -321,7 +371,7 @@ async def login(user: UserLogin):
 
 
 @app.post("/reset-password")
-async def reset_password(reset_data: ResetPassword):
+def reset_password(reset_data: ResetPassword):
     connection = get_db_connection()
     if connection is None:
         raise HTTPException(status_code=500, detail="Database connection failed")
@@ -349,7 +399,7 @@ async def reset_password(reset_data: ResetPassword):
 
 
 @app.get("/profile/{email}")
-async def get_profile(email: str):
+def get_profile(email: str):
     # URL decode the email parameter if it contains encoded characters
     email = urllib.parse.unquote(email)
     
@@ -379,7 +429,7 @@ async def get_profile(email: str):
 
 
 @app.put("/profile/{email}")
-async def update_profile(
+def update_profile(
     email: str,
     username: str = Form(...),
     course: str = Form(None),  # Changed from required to optional
@@ -420,7 +470,7 @@ async def update_profile(
 
 
 @app.post("/profile/upload-avatar/{email}")
-async def upload_avatar(email: str, avatar: UploadFile = File(...)):
+def upload_avatar(email: str, avatar: UploadFile = File(...)):
     # URL decode the email parameter if it contains encoded characters
     email = urllib.parse.unquote(email)
     
@@ -468,50 +518,74 @@ class Order(BaseModel):
     status: str
 
 
-@app.get("/orders")
-async def get_orders(status: Optional[str] = "pending", customer_name: Optional[str] = None):
-    connection = get_db_connection()
-    if connection is None:
-        # Return empty results instead of throwing an error
-        return {"orders": [], "error": "Database connection failed"}
-    
-    try:
-        cursor = connection.cursor(dictionary=True)
-
-        if customer_name:
-            cursor.execute("SELECT * FROM orderso WHERE customer_name = %s AND status = %s", (customer_name, status))
-        else:
-            cursor.execute("SELECT * FROM orderso WHERE status = %s", (status,))  # Fetch orders by status
+def _fetch_orders(connection, status, customer_name, page):
+    # Oldest first (queue order); orderso has no timestamp, so the id is the key
+    where, params = keyset_where(("id",), page.cursor, descending=False)
+    query = f"SELECT * FROM orderso WHERE status = %s AND {where}"
+    params = [status] + params
+    if customer_name:
+        query += " AND customer_name = %s"
+        params.append(customer_name)
+    query += f" {order_by(('id',), descending=False)} LIMIT %s"
+    params.append(page.fetch)
 
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(query, params)
         orders = cursor.fetchall()
-
-        for order in orders:
-            try:
-                if isinstance(order["items"], str):  
-                    order["items"] = json.loads(order["items"])  
-            except json.JSONDecodeError:
-                order["items"] = []  
-
+    finally:
         cursor.close()
-        connection.close()
 
-        return {"orders": orders}
+    orders, next_cursor = finish_page(orders, page, key=lambda order: (order["id"],))
+    for order in orders:
+        try:
+            if isinstance(order["items"], str):
+                order["items"] = json.loads(order["items"])
+        except json.JSONDecodeError:
+            order["items"] = []
+    return orders, next_cursor
+
+@app.get("/orders")
+async def get_orders(
+    status: Optional[str] = "pending",
+    customer_name: Optional[str] = None,
+    page: PageParams = Depends(page_params())
+):
+    try:
+        orders, next_cursor = await run_db(_fetch_orders, status, customer_name, page)
+        return {"orders": project(orders, page.fields), "next_cursor": next_cursor}
+    except Error as e:
+        # Return empty results instead of throwing an error
+        print(f"Error fetching orders: {str(e)}")
+        return {"orders": [], "error": "Database connection failed"}
     except Exception as e:
         # Log the error and return an empty result
         print(f"Error fetching orders: {str(e)}")
-        try:
-            if connection and connection.is_connected():
-                connection.close()
-        except:
-            pass
         return {"orders": [], "error": f"Error fetching orders: {str(e)}"}
 
 @app.put("/orders/{order_id}")
 async def update_order_status(order_id: str, status_update: OrderStatusUpdate):
-    connection = get_db_connection()
-    if connection is None:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-
+    # The connection goes back to the pool before any broadcast
+    stock_broadcasts = await run_db(_update_order_status, order_id, status_update)
+
+    if status_update.status == "completed":
+        # Let the outbox worker pick up the queued inventory calls right away
+        notify_outbound_worker()
+        for message in stock_broadcasts:
+            await manager.broadcast(message)
+
+    # Broadcast the status update to all connected clients
+    await manager.broadcast({
+        "type": "order_status_update",
+        "order_id": order_id,
+        "status": status_update.status,
+        "timestamp": datetime.now().isoformat()
+    })
+
+    return {"message": f"Order {order_id} marked as {status_update.status}"}
+
+def _update_order_status(connection, order_id: str, status_update: OrderStatusUpdate):
+    """Update the order and queue its inventory calls; returns the stock broadcasts to send"""
     cursor = connection.cursor(dictionary=True, buffered=True)
 
     try:
@@ -529,209 +603,108 @@ async def update_order_status(order_id: str, status_update: OrderStatusUpdate):
         cursor.execute("UPDATE orderso SET status = %s WHERE id = %s", (status_update.status, order_id))
 
         # If marking as completed, handle stock reduction
+        stock_broadcasts = []
         if status_update.status == "completed":
             try:
                 items = json.loads(order["items"]) if isinstance(order["items"], str) else order["items"]
                 print(f"Processing items for stock update: {items}")
-                
+
+                # Look up every item of the order in one round trip
+                names = list({item["name"] for item in items})
+                item_rows = {}
+                if names:
+                    placeholders = ", ".join(["%s"] * len(names))
+                    cursor.execute(
+                        f"SELECT id, external_source, external_id, name FROM itemso WHERE name IN ({placeholders})",
+                        names
+                    )
+                    for row in cursor.fetchall():
+                        item_rows.setdefault(row["name"], row)
+
+                stock_rows = {}
+                item_ids = [row["id"] for row in item_rows.values()]
+                if item_ids:
+                    placeholders = ", ".join(["%s"] * len(item_ids))
+                    cursor.execute(
+                        f"SELECT item_id, quantity, min_stock_level FROM item_stocks WHERE item_id IN ({placeholders})",
+                        item_ids
+                    )
+                    stock_rows = {row["item_id"]: row for row in cursor.fetchall()}
+
+                # Inventory calls are queued in this transaction and sent by the outbox worker
+                outbox_entries = []
+
                 for item in items:
                     try:
-                        print(f"Processing item: {item}")
-                        cursor.execute("SELECT id, external_source, external_id FROM itemso WHERE name = %s", (item["name"],))
-                        item_result = cursor.fetchone()
-                        
-                        if item_result:
-                            item_id = item_result["id"]
-                            quantity_to_reduce = item["quantity"]
-                            
-                            # Check if item stock exists
-                            cursor.execute("SELECT quantity FROM item_stocks WHERE item_id = %s", (item_id,))
-                            stock_result = cursor.fetchone()
-                            
-                            if stock_result:
-                                # Update existing stock - no result set to consume with UPDATE
-                                cursor.execute(
-                                    "UPDATE item_stocks SET quantity = GREATEST(0, quantity - %s) WHERE item_id = %s",
-                                    (quantity_to_reduce, item_id)
-                                )
-                                print(f"Updated stock for item {item_id}, reduced by {quantity_to_reduce}")
-
-                                # If this item is from the inventory system, notify it about the stock change
-                                if item_result["external_source"] == "inventory" and item_result["external_id"]:
-                                    try:
-                                        # First broadcast the local update to ensure UI refreshes quickly
-                                        await manager.broadcast({
-                                            "type": "stock_update",
-                                            "item_id": item_id,
-                                            "new_quantity": max(0, stock_result.get('quantity', 0) - quantity_to_reduce),
-                                            "min_stock_level": stock_result.get('min_stock_level', 5),
-                                            "timestamp": datetime.now().isoformat()
-                                        })
-                                        
-                                        # Make request to inventory system using JSON data with proper error handling
-                                        inventory_url = f"http://127.0.0.1:8001/api/stock/adjust/{item_result['external_id']}"
-                                        inventory_data = {
-                                            "action": "subtract",
-                                            "quantity": quantity_to_reduce,
-                                            "reason": f"Order {order_id} completed"
-                                        }
-                                        print(f"Sending inventory update to: {inventory_url}")
-                                        print(f"Inventory update data: {inventory_data}")
-                                        
-                                        # Set a timeout to avoid hanging if the inventory system is down
-                                        inventory_response = requests.post(
-                                            inventory_url,
-                                            json=inventory_data,
-                                            headers={"Content-Type": "application/json"},
-                                            timeout=5  # 5 second timeout
-                                        )
-                                        
-                                        print(f"Inventory system response: {inventory_response.status_code} - {inventory_response.text}")
-                                        
-                                        if inventory_response.status_code == 200:
-                                            print(f"Successfully updated inventory for item {item_result['external_id']}")
-                                            
-                                            # Also send a webhook notification to trigger UI refresh
-                                            try:
-                                                webhook_response = requests.post(
-                                                    "http://127.0.0.1:8001/api/inventory-webhook/stock-update",
-                                                    json={"product_id": item_result['external_id']},
-                                                    headers={"Content-Type": "application/json"},
-                                                    timeout=5
-                                                )
-                                                print(f"Webhook notification response: {webhook_response.status_code} - {webhook_response.text}")
-                                            except Exception as webhook_error:
-                                                print(f"Error sending webhook notification: {str(webhook_error)}")
-                                        else:
-                                            print(f"Failed to update inventory system: {inventory_response.text}")
-                                            # Log the error but don't fail the order
-                                            logger.error(f"Failed to update inventory system for order {order_id}: {inventory_response.text}")
-                                    except requests.exceptions.Timeout:
-                                        print(f"Timeout connecting to inventory system")
-                                        logger.error(f"Timeout connecting to inventory system for order {order_id}")
-                                    except requests.exceptions.ConnectionError:
-                                        print(f"Connection error to inventory system")
-                                        logger.error(f"Connection error to inventory system for order {order_id}")
-                                    except Exception as inv_error:
-                                        print(f"Error updating inventory system: {str(inv_error)}")
-                                        # Log the error but don't fail the order
-                                        logger.error(f"Error updating inventory system for order {order_id}: {str(inv_error)}")
-                            else:
-                                # Item exists but no stock record found - create one with 0 quantity
-                                print(f"No stock record found for item {item_id}, creating with 0 quantity")
-                                cursor.execute(
-                                    "INSERT INTO item_stocks (item_id, quantity, min_stock_level) VALUES (%s, 0, 1)",
-                                    (item_id,)
-                                )
-                        else:
+                        item_result = item_rows.get(item["name"])
+                        if not item_result:
                             print(f"Item not found in database: {item['name']}")
+                            continue
+
+                        item_id = item_result["id"]
+                        quantity_to_reduce = item["quantity"]
+                        stock_result = stock_rows.get(item_id)
+                        from_inventory = item_result["external_source"] == "inventory" and item_result["external_id"]
+
+                        if stock_result:
+                            cursor.execute(
+                                "UPDATE item_stocks SET quantity = GREATEST(0, quantity - %s) WHERE item_id = %s",
+                                (quantity_to_reduce, item_id)
+                            )
+                            new_quantity = max(0, stock_result["quantity"] - quantity_to_reduce)
+                            # Keep later items of the same name consistent within this order
+                            stock_result["quantity"] = new_quantity
+                            print(f"Updated stock for item {item_id}, reduced by {quantity_to_reduce}")
+
+                            if from_inventory:
+                                stock_broadcasts.append({
+                                    "type": "stock_update",
+                                    "item_id": item_id,
+                                    "new_quantity": new_quantity,
+                                    "min_stock_level": stock_result.get("min_stock_level") or 5,
+                                    "timestamp": datetime.now().isoformat()
+                                })
+                                outbox_entries.append((
+                                    KIND_STOCK_ADJUST,
+                                    item_result["external_id"],
+                                    {"quantity": quantity_to_reduce}
+                                ))
+                        else:
+                            # Item exists but no stock record found - create one with 0 quantity
+                            print(f"No stock record found for item {item_id}, creating with 0 quantity")
+                            cursor.execute(
+                                "INSERT INTO item_stocks (item_id, quantity, min_stock_level) VALUES (%s, 0, 1)",
+                                (item_id,)
+                            )
+                            stock_rows[item_id] = {"item_id": item_id, "quantity": 0, "min_stock_level": 1}
+
+                        if from_inventory:
+                            # The inventory system writes the sale to `sales` and its daily rollup
+                            # when the outbox delivers this; nothing here touches those tables
+                            quantity_sold = item["quantity"]
+                            remitted = quantity_sold * item.get("price", 0)
+                            product_id = item_result["external_id"]
+
+                            outbox_entries.append((
+                                KIND_SALES_UPDATE,
+                                product_id,
+                                {"quantity": quantity_sold, "remitted": remitted}
+                            ))
                     except Exception as item_error:
                         print(f"Error processing item {item.get('name', 'unknown')}: {str(item_error)}")
                         # Continue processing other items
-                
-                # ADDED: Update the sales table for each item in the order
-                try:
-                    print("Updating sales records in inventory system...")
-                    for item in items:
-                        try:
-                            # Get item information
-                            cursor.execute("SELECT id, external_source, external_id, name FROM itemso WHERE name = %s", (item["name"],))
-                            item_result = cursor.fetchone()
-                            
-                            if item_result and item_result["external_source"] == "inventory" and item_result["external_id"]:
-                                # Calculate remitted amount (price * quantity)
-                                quantity_sold = item["quantity"]
-                                unit_price = item.get("price", 0)
-                                remitted = quantity_sold * unit_price
-                                product_id = item_result["external_id"]
-                                
-                                print(f"Adding sales record for product ID {product_id}: {quantity_sold} units at {unit_price} each")
-                                
-                                # Option 1: Direct database update (since both systems share the same database)
-                                try:
-                                    # Get product details from inventory system
-                                    cursor.execute("""
-                                        SELECT ProductName, Image, UnitPrice FROM inventoryproduct 
-                                        WHERE id = %s
-                                    """, (product_id,))
-                                    product_data = cursor.fetchone()
-                                    
-                                    if product_data:
-                                        product_name = product_data.get("ProductName", item_result["name"])
-                                        image = product_data.get("Image", None)
-                                        db_unit_price = product_data.get("UnitPrice", unit_price)
-                                        
-                                        # Insert or update sales record
-                                        cursor.execute("""
-                                            INSERT INTO sales (
-                                                product_id, 
-                                                product_name, 
-                                                Image, 
-                                                quantity_sold, 
-                                                unit_price,
-                                                remitted, 
-                                                created_at
-                                            )
-                                            VALUES (%s, %s, %s, %s, %s, %s, NOW())
-                                            ON DUPLICATE KEY UPDATE 
-                                                quantity_sold = quantity_sold + VALUES(quantity_sold), 
-                                                remitted = remitted + VALUES(remitted)
-                                        """, (
-                                            product_id, 
-                                            product_name, 
-                                            image, 
-                                            quantity_sold, 
-                                            db_unit_price,
-                                            remitted
-                                        ))
-                                        print(f"Sales record updated for {product_name} (ID: {product_id})")
-                                except Exception as sales_db_error:
-                                    print(f"Error directly updating sales table: {str(sales_db_error)}")
-                                
-                                # Option 2: API call to inventory system (as fallback)
-                                try:
-                                    # Call the inventory API to update sales
-                                    sales_url = "http://127.0.0.1:8001/api/sales/update"
-                                    sales_data = {
-                                        "product_id": int(product_id),
-                                        "quantity_sold": quantity_sold,
-                                        "remitted": remitted
-                                    }
-                                    
-                                    sales_response = requests.post(
-                                        sales_url,
-                                        json=sales_data,
-                                        headers={"Content-Type": "application/json"},
-                                        timeout=5
-                                    )
-                                    
-                                    if sales_response.status_code == 200:
-                                        print(f"Successfully updated sales via API for item {product_id}")
-                                    else:
-                                        print(f"Failed to update sales via API: {sales_response.text}")
-                                except Exception as sales_api_error:
-                                    print(f"Error updating sales via API: {str(sales_api_error)}")
-                        except Exception as item_sales_error:
-                            print(f"Error processing sales for item {item.get('name', 'unknown')}: {str(item_sales_error)}")
-                except Exception as sales_error:
-                    print(f"Error updating sales records: {str(sales_error)}")
-                    # Don't fail the order status update if sales update fails
+
+                enqueue_inventory_updates(cursor, order_id, outbox_entries)
             except Exception as items_error:
                 print(f"Error processing order items: {str(items_error)}")
                 # Don't fail the order status update if stock update fails
         
         connection.commit()
+        return stock_broadcasts
 
-        # Broadcast the status update to all connected clients
-        await manager.broadcast({
-            "type": "order_status_update",
-            "order_id": order_id,
-            "status": status_update.status,
-            "timestamp": datetime.now().isoformat()
-        })
-
-        return {"message": f"Order {order_id} marked as {status_update.status}"}
-
+    except HTTPException:
+        connection.rollback()
+        raise
     except Exception as e:
         connection.rollback()
         print(f"Error updating order status: {str(e)}")
@@ -740,43 +713,16 @@ async def update_order_status(order_id: str, status_update: OrderStatusUpdate):
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
-        connection.close()
-
 
-# WebSocket Manager for handling multiple connections
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        print(f"New WebSocket connection. Total connections: {len(self.active_connections)}")
-
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-        print(f"WebSocket disconnected. Remaining connections: {len(self.active_connections)}")
-
-    async def broadcast(self, message: dict):
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except WebSocketDisconnect:
-                disconnected.append(connection)
-            except Exception as e:
-                print(f"Error broadcasting message: {str(e)}")
-                disconnected.append(connection)
-        
-        # Clean up disconnected connections
-        for conn in disconnected:
-            self.disconnect(conn)
-
-manager = ConnectionManager()
+# WebSocket fan-out with per-client send queues and topic subscriptions
+manager = BroadcastHub("orders")
+gauge("websocket_clients", "Connected /ws/orders clients", callback=lambda: len(manager.active_connections))
 
 @app.websocket("/ws/orders")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    # Optional ?topics=orders,stock,item:12; without it the client gets everything
+    await manager.connect(websocket, topics=websocket.query_params.get("topics"))
     try:
         while True:
             # Keep the connection alive and wait for any messages
@@ -786,6 +732,10 @@ async def websocket_endpoint(websocket: WebSocket):
             try:
                 message = json.loads(data)
                 
+                # Topic subscription changes
+                if manager.handle_control(websocket, message):
+                    continue
+
                 # Handle user notifications from admin
                 if message.get('type') == 'user_notification':
                     # Forward the message to all connected clients
@@ -808,10 +758,17 @@ async def websocket_endpoint(websocket: WebSocket):
 
 @app.post("/orders")
 async def create_order(order: Order):
-    connection = get_db_connection()
-    if connection is None:
-        raise HTTPException(status_code=500, detail="Database connection failed")
+    order_data = await run_db(_create_order, order)
+
+    # Broadcast the new order to all connected clients
+    await manager.broadcast({
+        "type": "new_order",
+        "order": order_data
+    })
+
+    return {"message": "Order created successfully", "order_id": order_data["id"]}
 
+def _create_order(connection, order: Order):
     cursor = connection.cursor()
 
     try:
@@ -856,14 +813,7 @@ async def create_order(order: Order):
             "status": order.status,
             "created_at": datetime.now().isoformat()
         }
-
-        # Broadcast the new order to all connected clients
-        await manager.broadcast({
-            "type": "new_order",
-            "order": order_data
-        })
-
-        return {"message": "Order created successfully", "order_id": formatted_order_id}
+        return order_data
 
     except Exception as e:
         connection.rollback()
@@ -871,16 +821,22 @@ async def create_order(order: Order):
 
     finally:
         cursor.close()
-        connection.close()
+
+def _fetch_order(connection, order_id):
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT * FROM orderso WHERE id = %s", (order_id,))
+        return cursor.fetchone()
+    finally:
+        cursor.close()
 
 @app.get("/orders/{order_id}")
 async def get_order_details(order_id: int):
-    connection = get_db_connection()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM orderso WHERE id = %s", (order_id,))
-    order = cursor.fetchone()
-    cursor.close()
-    connection.close()
+    try:
+        order = await run_db(_fetch_order, order_id)
+    except Exception as e:
+        logger.error(f"Error fetching order {order_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Error fetching order: {str(e)}")
 
     if order:
         try:
@@ -894,22 +850,21 @@ async def get_order_details(order_id: int):
 
 # Item Management Endpoints
 @app.get('/api/items')
-async def get_items():
+def get_items():
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        
-        # Include external_source field to identify inventory items
-        cursor.execute("""
-            SELECT 
-                id, name, price, category, image, external_source, external_id 
-            FROM 
-                itemso
-        """)
-        
-        items = cursor.fetchall()
-        cursor.close()
-        connection.close()
+        with pooled_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            try:
+                # Include external_source field to identify inventory items
+                cursor.execute("""
+                    SELECT 
+                        id, name, price, category, image, external_source, external_id 
+                    FROM 
+                        itemso
+                """)
+                items = cursor.fetchall()
+            finally:
+                cursor.close()
         
         # Add a debug log for items from the inventory system
         inventory_items = [item for item in items if item.get('external_source') == 'inventory']
@@ -923,22 +878,42 @@ async def get_items():
 @app.post('/api/items')
 async def add_item(name: str = Form(...), price: float = Form(...), category: str = Form(None), image: UploadFile = File(...)):
     try:
-        # Save image file
-        filename = secure_filename(image.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{timestamp}_{filename}"
-        
-        # Ensure upload directory exists
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
-        
-        file_path = os.path.join(UPLOAD_DIR, filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
+        item_id, image_path = await run_db(_add_item, name, price, category, image)
         
-        image_path = f"/uploads/avatars/{filename}"
+        # Broadcast menu update
+        await manager.broadcast({
+            "type": "menu_update",
+            "action": "add",
+            "item": {
+                "id": item_id,
+                "name": name,
+                "price": price,
+                "category": category,
+                "image": image_path
+            }
+        })
         
-        connection = get_db_connection()
-        cursor = connection.cursor()
+        return {"message": "Item added successfully", "image_path": image_path, "id": item_id}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _add_item(connection, name: str, price: float, category: str, image: UploadFile):
+    # Save image file
+    filename = secure_filename(image.filename)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f"{timestamp}_{filename}"
+    
+    # Ensure upload directory exists
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    
+    file_path = os.path.join(UPLOAD_DIR, filename)
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(image.file, buffer)
+    
+    image_path = f"/uploads/avatars/{filename}"
+    
+    cursor = connection.cursor()
+    try:
         cursor.execute(
             "INSERT INTO itemso (name, price, image, category) VALUES (%s, %s, %s, %s)",
             (name, price, image_path, category)
@@ -954,13 +929,25 @@ async def add_item(name: str = Form(...), price: float = Form(...), category: st
         )
         
         connection.commit()
+        return item_id, image_path
+    finally:
         cursor.close()
-        connection.close()
+
+@app.put('/api/items/{item_id}')
+async def update_item(
+    item_id: int,
+    name: str = Form(...),
+    price: float = Form(...),
+    category: str = Form(None),
+    image: UploadFile = File(None)
+):
+    try:
+        image_path = await run_db(_update_item, item_id, name, price, category, image)
         
         # Broadcast menu update
         await manager.broadcast({
             "type": "menu_update",
-            "action": "add",
+            "action": "update",
             "item": {
                 "id": item_id,
                 "name": name,
@@ -970,22 +957,15 @@ async def add_item(name: str = Form(...), price: float = Form(...), category: st
             }
         })
         
-        return {"message": "Item added successfully", "image_path": image_path, "id": item_id}
+        return {"message": "Item updated successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.put('/api/items/{item_id}')
-async def update_item(
-    item_id: int,
-    name: str = Form(...),
-    price: float = Form(...),
-    category: str = Form(None),
-    image: UploadFile = File(None)
-):
+def _update_item(connection, item_id: int, name: str, price: float, category: str, image: Optional[UploadFile]):
+    """Returns the new image path, or None when the image was kept"""
+    image_path = None
+    cursor = connection.cursor()
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        
         if image:
             # Save new image
             filename = secure_filename(image.filename)
@@ -1017,32 +997,29 @@ async def update_item(
             )
         
         connection.commit()
+        return image_path
+    finally:
         cursor.close()
-        connection.close()
+
+@app.delete('/api/items/{item_id}')
+async def delete_item(item_id: int):
+    try:
+        await run_db(_delete_item, item_id)
         
         # Broadcast menu update
         await manager.broadcast({
             "type": "menu_update",
-            "action": "update",
-            "item": {
-                "id": item_id,
-                "name": name,
-                "price": price,
-                "category": category,
-                "image": image_path if image else None
-            }
+            "action": "delete",
+            "item_id": item_id
         })
         
-        return {"message": "Item updated successfully"}
+        return {"message": "Item deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.delete('/api/items/{item_id}')
-async def delete_item(item_id: int):
+def _delete_item(connection, item_id: int):
+    cursor = connection.cursor()
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        
         # Get the image path before deleting
         cursor.execute("SELECT image FROM itemso WHERE id = %s", (item_id,))
         item = cursor.fetchone()
@@ -1059,23 +1036,12 @@ async def delete_item(item_id: int):
         # Then delete the item
         cursor.execute("DELETE FROM itemso WHERE id = %s", (item_id,))
         connection.commit()
+    finally:
         cursor.close()
-        connection.close()
-        
-        # Broadcast menu update
-        await manager.broadcast({
-            "type": "menu_update",
-            "action": "delete",
-            "item_id": item_id
-        })
-        
-        return {"message": "Item deleted successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
 
 # Category Management Endpoints
 @app.get('/api/categories')
-async def get_categories():
+def get_categories():
     try:
         connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
@@ -1095,29 +1061,7 @@ async def add_category(
     icon: str = Form(...)
 ):
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        
-        # Check if category already exists
-        cursor.execute("SELECT id FROM categorieso WHERE name = %s", (name,))
-        if cursor.fetchone():
-            cursor.close()
-            raise HTTPException(status_code=400, detail="Category already exists")
-        
-        # Validate type
-        if type not in ['drinks', 'food', 'ready_made']:
-            cursor.close()
-            raise HTTPException(status_code=400, detail="Invalid category type")
-        
-        # Insert new category
-        cursor.execute(
-            "INSERT INTO categorieso (name, type, icon) VALUES (%s, %s, %s)",
-            (name, type, icon)
-        )
-        connection.commit()
-        
-        new_category_id = cursor.lastrowid
-        cursor.close()
+        new_category_id = await run_db(_add_category, name, type, icon)
         
         # Broadcast category update via WebSocket
         await manager.broadcast({
@@ -1144,31 +1088,32 @@ async def add_category(
         print(f"Error adding category: {e}")
         raise HTTPException(status_code=500, detail="Failed to add category")
 
-@app.delete('/api/categories/{category_id}')
-async def delete_category(category_id: int):
+def _add_category(connection, name: str, type: str, icon: str):
+    cursor = connection.cursor()
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
+        # Check if category already exists
+        cursor.execute("SELECT id FROM categorieso WHERE name = %s", (name,))
+        if cursor.fetchone():
+            raise HTTPException(status_code=400, detail="Category already exists")
         
-        # Check if category exists
-        cursor.execute("SELECT name FROM categorieso WHERE id = %s", (category_id,))
-        category = cursor.fetchone()
-        if not category:
-            cursor.close()
-            raise HTTPException(status_code=404, detail="Category not found")
-        
-        category_name = category[0]
-        
-        # Check if category is in use
-        cursor.execute("SELECT id FROM itemso WHERE category = %s", (category_name,))
-        if cursor.fetchone():
-            cursor.close()
-            raise HTTPException(status_code=400, detail="Cannot delete category that has items")
+        # Validate type
+        if type not in ['drinks', 'food', 'ready_made']:
+            raise HTTPException(status_code=400, detail="Invalid category type")
         
-        # Delete category
-        cursor.execute("DELETE FROM categorieso WHERE id = %s", (category_id,))
+        # Insert new category
+        cursor.execute(
+            "INSERT INTO categorieso (name, type, icon) VALUES (%s, %s, %s)",
+            (name, type, icon)
+        )
         connection.commit()
+        return cursor.lastrowid
+    finally:
         cursor.close()
+
+@app.delete('/api/categories/{category_id}')
+async def delete_category(category_id: int):
+    try:
+        category_name = await run_db(_delete_category, category_id)
         
         # Broadcast category update via WebSocket
         await manager.broadcast({
@@ -1185,6 +1130,30 @@ async def delete_category(category_id: int):
         print(f"Error deleting category: {e}")
         raise HTTPException(status_code=500, detail="Failed to delete category")
 
+def _delete_category(connection, category_id: int):
+    """Returns the deleted category's name"""
+    cursor = connection.cursor()
+    try:
+        # Check if category exists
+        cursor.execute("SELECT name FROM categorieso WHERE id = %s", (category_id,))
+        category = cursor.fetchone()
+        if not category:
+            raise HTTPException(status_code=404, detail="Category not found")
+        
+        category_name = category[0]
+        
+        # Check if category is in use
+        cursor.execute("SELECT id FROM itemso WHERE category = %s", (category_name,))
+        if cursor.fetchone():
+            raise HTTPException(status_code=400, detail="Cannot delete category that has items")
+        
+        # Delete category
+        cursor.execute("DELETE FROM categorieso WHERE id = %s", (category_id,))
+        connection.commit()
+        return category_name
+    finally:
+        cursor.close()
+
 @app.put('/api/categories/{category_id}')
 async def update_category(
     category_id: int,
@@ -1193,14 +1162,42 @@ async def update_category(
     icon: str = Form(...)
 ):
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
+        old_name = await run_db(_update_category, category_id, name, type, icon)
         
+        # Broadcast category update via WebSocket
+        await manager.broadcast({
+            "type": "category_update",
+            "action": "update",
+            "category": {
+                "id": category_id,
+                "name": name,
+                "type": type,
+                "icon": icon,
+                "old_name": old_name
+            }
+        })
+        
+        return {
+            "id": category_id,
+            "name": name,
+            "type": type,
+            "icon": icon,
+            "message": "Category updated successfully"
+        }
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        print(f"Error updating category: {e}")
+        raise HTTPException(status_code=500, detail="Failed to update category")
+
+def _update_category(connection, category_id: int, name: str, type: str, icon: str):
+    """Returns the category's previous name"""
+    cursor = connection.cursor()
+    try:
         # Check if category exists
         cursor.execute("SELECT name FROM categorieso WHERE id = %s", (category_id,))
         category = cursor.fetchone()
         if not category:
-            cursor.close()
             raise HTTPException(status_code=404, detail="Category not found")
             
         old_name = category[0]
@@ -1208,12 +1205,10 @@ async def update_category(
         # Check if new name already exists (excluding current category)
         cursor.execute("SELECT id FROM categorieso WHERE name = %s AND id != %s", (name, category_id))
         if cursor.fetchone():
-            cursor.close()
             raise HTTPException(status_code=400, detail="Category name already exists")
         
         # Validate type
         if type not in ['drinks', 'food', 'ready_made']:
-            cursor.close()
             raise HTTPException(status_code=400, detail="Invalid category type")
         
         # Update category
@@ -1229,33 +1224,9 @@ async def update_category(
         )
         
         connection.commit()
+        return old_name
+    finally:
         cursor.close()
-        
-        # Broadcast category update via WebSocket
-        await manager.broadcast({
-            "type": "category_update",
-            "action": "update",
-            "category": {
-                "id": category_id,
-                "name": name,
-                "type": type,
-                "icon": icon,
-                "old_name": old_name
-            }
-        })
-        
-        return {
-            "id": category_id,
-            "name": name,
-            "type": type,
-            "icon": icon,
-            "message": "Category updated successfully"
-        }
-    except HTTPException as he:
-        raise he
-    except Exception as e:
-        print(f"Error updating category: {e}")
-        raise HTTPException(status_code=500, detail="Failed to update category")
 
 # Stock Management Models
 class StockUpdate(BaseModel):
@@ -1267,20 +1238,32 @@ class MinStockLevel(BaseModel):
     min_stock_level: int
 
 # Stock Management Endpoints
-@app.get('/api/stocks')
-async def get_stocks():
+def _fetch_stocks(connection, page):
+    where, params = keyset_where(("s.id",), page.cursor, descending=False)
+    cursor = connection.cursor(dictionary=True)
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT s.*, i.name as item_name, i.category 
             FROM item_stocks s 
             JOIN itemso i ON s.item_id = i.id
-        """)
+            WHERE {where}
+            {order_by(("s.id",), descending=False)}
+            LIMIT %s
+        """, params + [page.fetch])
         stocks = cursor.fetchall()
+        total = estimate_total(cursor, "item_stocks") if not page.cursor else None
+    finally:
         cursor.close()
-        connection.close()
-        return {"success": True, "items": stocks}
+    stocks, next_cursor = finish_page(stocks, page, key=lambda stock: (stock["id"],))
+    return stocks, next_cursor, total
+
+@app.get('/api/stocks')
+async def get_stocks(page: PageParams = Depends(page_params(default_limit=500))):
+    try:
+        stocks, next_cursor, total = await run_db(_fetch_stocks, page)
+        return {"success": True, "items": project(stocks, page.fields), "next_cursor": next_cursor, "total": total}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1294,26 +1277,9 @@ async def create_stock_record(request: dict):
         if not item_id:
             raise HTTPException(status_code=400, detail="Item ID is required")
             
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        
-        # Check if stock record already exists
-        cursor.execute("SELECT item_id FROM item_stocks WHERE item_id = %s", (item_id,))
-        if cursor.fetchone():
-            cursor.close()
-            connection.close()
+        if not await run_db(_create_stock_record, item_id, quantity, min_stock_level):
             return {"success": False, "message": "Stock record already exists for this item"}
         
-        # Create new stock record
-        cursor.execute(
-            "INSERT INTO item_stocks (item_id, quantity, min_stock_level) VALUES (%s, %s, %s)",
-            (item_id, quantity, min_stock_level)
-        )
-        
-        connection.commit()
-        cursor.close()
-        connection.close()
-        
         # Broadcast stock update
         await manager.broadcast({
             "type": "stock_update",
@@ -1328,22 +1294,42 @@ async def create_stock_record(request: dict):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _create_stock_record(connection, item_id, quantity, min_stock_level) -> bool:
+    """False when the item already has a stock record"""
+    cursor = connection.cursor()
+    try:
+        # Check if stock record already exists
+        cursor.execute("SELECT item_id FROM item_stocks WHERE item_id = %s", (item_id,))
+        if cursor.fetchone():
+            return False
+        
+        # Create new stock record
+        cursor.execute(
+            "INSERT INTO item_stocks (item_id, quantity, min_stock_level) VALUES (%s, %s, %s)",
+            (item_id, quantity, min_stock_level)
+        )
+        
+        connection.commit()
+        return True
+    finally:
+        cursor.close()
+
 @app.put('/api/stocks/{item_id}/update')
 async def update_stock(item_id: int, stock_update: StockUpdate):
-    connection = None
-    try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
+    # The connection goes back to the pool before the broadcast
+    stock_message = await run_db(_update_stock, item_id, stock_update)
+
+    # Broadcast stock update via WebSocket
+    await manager.broadcast(stock_message)
 
+    return {"success": True, "new_quantity": stock_message["new_quantity"]}
+
+def _update_stock(connection, item_id: int, stock_update: StockUpdate):
+    """Applies the update and returns the stock_update message to broadcast"""
+    cursor = connection.cursor()
+    try:
         # First check if the tables exist
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM information_schema.tables 
-            WHERE table_schema = 'cafe_beata' 
-            AND table_name IN ('item_stocks', 'stock_transactions', 'stock_alerts')
-        """)
-        tables_count = cursor.fetchone()[0]
-        if tables_count < 3:
+        if not get_schema().stock_tables:
             raise HTTPException(status_code=500, detail="Required database tables are missing")
 
         # First get current stock and item details
@@ -1428,8 +1414,7 @@ async def update_stock(item_id: int, stock_update: StockUpdate):
         connection.commit()
         print("Transaction committed successfully")
 
-        # Broadcast stock update via WebSocket
-        await manager.broadcast({
+        return {
             "type": "stock_update",
             "item_id": item_id,
             "item_name": item_name,
@@ -1437,26 +1422,19 @@ async def update_stock(item_id: int, stock_update: StockUpdate):
             "new_quantity": new_quantity,
             "min_stock_level": min_stock_level,
             "alert_type": alert_type
-        })
-
-        return {"success": True, "new_quantity": new_quantity}
-    except HTTPException as he:
-        if connection:
-            connection.rollback()
-        raise he
+        }
+    except HTTPException:
+        connection.rollback()
+        raise
     except Exception as e:
-        if connection:
-            connection.rollback()
+        connection.rollback()
         print(f"Unexpected error in stock update: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        if connection:
-            cursor.close()
-            connection.close()
-            print("Database connection closed")
+        cursor.close()
 
 @app.put('/api/stocks/{item_id}/min-level')
-async def update_min_stock_level(item_id: int, min_stock: MinStockLevel):
+def update_min_stock_level(item_id: int, min_stock: MinStockLevel):
     try:
         connection = get_db_connection()
         cursor = connection.cursor()
@@ -1474,7 +1452,7 @@ async def update_min_stock_level(item_id: int, min_stock: MinStockLevel):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get('/api/stocks/alerts')
-async def get_stock_alerts():
+def get_stock_alerts():
     try:
         connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
@@ -1491,111 +1469,6 @@ async def get_stock_alerts():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-def create_stock_tables():
-    """Create necessary tables for stock management if they don't exist"""
-    connection = None
-    try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        
-        # First check if the itemso table has the external_source and external_id columns
-        cursor.execute("""
-            SELECT COUNT(*) FROM information_schema.columns 
-            WHERE table_schema = 'cafe_beata' 
-            AND table_name = 'itemso' 
-            AND column_name = 'external_source'
-        """)
-        if cursor.fetchone()[0] == 0:
-            # Add external_source and external_id columns to the itemso table
-            cursor.execute("""
-                ALTER TABLE itemso 
-                ADD COLUMN external_source VARCHAR(50) NULL, 
-                ADD COLUMN external_id VARCHAR(50) NULL,
-                ADD COLUMN last_updated DATETIME NULL
-            """)
-            print("Added external_source and external_id columns to itemso table")
-        
-        # Check if item_stocks table exists
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM information_schema.tables 
-            WHERE table_schema = 'cafe_beata' 
-            AND table_name = 'item_stocks'
-        """)
-        
-        if cursor.fetchone()[0] == 0:
-            # Create item_stocks table
-            cursor.execute("""
-                CREATE TABLE item_stocks (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    item_id INT NOT NULL,
-                    quantity INT NOT NULL DEFAULT 0,
-                    min_stock_level INT NOT NULL DEFAULT 0,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                    FOREIGN KEY (item_id) REFERENCES itemso(id) ON DELETE CASCADE
-                )
-            """)
-            print("Created item_stocks table")
-        
-        # Check if stock_transactions table exists
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM information_schema.tables 
-            WHERE table_schema = 'cafe_beata' 
-            AND table_name = 'stock_transactions'
-        """)
-        
-        if cursor.fetchone()[0] == 0:
-            # Create stock_transactions table
-            cursor.execute("""
-                CREATE TABLE stock_transactions (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    item_id INT NOT NULL,
-                    quantity INT NOT NULL,
-                    previous_quantity INT NOT NULL,
-                    new_quantity INT NOT NULL,
-                    transaction_type ENUM('Add', 'Subtract', 'Set') NOT NULL,
-                    reason TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    user_id INT,
-                    FOREIGN KEY (item_id) REFERENCES itemso(id) ON DELETE CASCADE
-                )
-            """)
-            print("Created stock_transactions table")
-        
-        # Check if stock_alerts table exists
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM information_schema.tables 
-            WHERE table_schema = 'cafe_beata' 
-            AND table_name = 'stock_alerts'
-        """)
-        
-        if cursor.fetchone()[0] == 0:
-            # Create stock_alerts table
-            cursor.execute("""
-                CREATE TABLE stock_alerts (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    item_id INT NOT NULL,
-                    alert_type ENUM('low_stock', 'out_of_stock') NOT NULL,
-                    status ENUM('new', 'acknowledged', 'resolved') NOT NULL DEFAULT 'new',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    acknowledged_at TIMESTAMP NULL,
-                    resolved_at TIMESTAMP NULL,
-                    FOREIGN KEY (item_id) REFERENCES itemso(id) ON DELETE CASCADE
-                )
-            """)
-            print("Created stock_alerts table")
-            
-        connection.commit()
-    except Exception as e:
-        print(f"Error creating stock tables: {e}")
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
-
 # Background tasks
 background_tasks = set()
 
@@ -1606,7 +1479,8 @@ async def sync_inventory_products_background():
             # Sync every 1 minute instead of 5 minutes
             await asyncio.sleep(60)
             try:
-                await sync_inventory_products()
+                with SYNC_DURATION.time("inventory_products"):
+                    await sync_inventory_products()
                 print(f"[{datetime.now()}] Auto-synced inventory products")
             except Exception as e:
                 print(f"[{datetime.now()}] Error in auto-sync: {e}")
@@ -1618,6 +1492,17 @@ async def startup_event():
     # Start background task for periodic stock synchronization
     logger.info("Starting background stock sync task...")
     try:
+        # One read of schema_version; applies pending migrations (utils/migrations/)
+        try:
+            check_schema()
+        except Exception as e:
+            logger.error(f"Error checking database schema: {e}")
+        # Probe the schema once, after migrations
+        try:
+            refresh_schema()
+        except Exception as e:
+            logger.error(f"Error loading schema registry: {e}")
+
         # Use asyncio.create_task instead of adding to the background_tasks set
         asyncio.create_task(background_stock_sync())
         logger.info("Background stock sync task started")
@@ -1631,6 +1516,12 @@ async def startup_event():
         except Exception as e:
             logger.error(f"Error initializing inventory WebSocket connection: {e}")
             # This shouldn't block the app from starting
+
+        # Drain queued inventory updates from completed orders
+        try:
+            start_outbound_worker(get_db_connection)
+        except Exception as e:
+            logger.error(f"Error starting inventory outbox worker: {e}")
     except Exception as e:
         logger.error(f"Error starting background tasks: {e}")
         # This shouldn't block the app from starting
@@ -1639,6 +1530,30 @@ async def startup_event():
 async def shutdown_event():
     for task in background_tasks:
         task.cancel()
+    await manager.close()
+    await stop_outbound_worker()
+    close_pool()
+
+@app.get('/api/db/health')
+async def db_health():
+    """Round-trip a query through the connection pool"""
+    health = await asyncio.to_thread(check_db_health)
+    if health["status"] != "healthy":
+        return JSONResponse(status_code=503, content=health)
+    return health
+
+@app.get('/api/db/pool-stats')
+async def db_pool_stats():
+    """Checkout counts, wait times and occupancy of the connection pool"""
+    return get_pool().stats()
+
+@app.get('/api/inventory-outbox/status')
+async def inventory_outbox_status():
+    """Queue depth of pending inventory updates from completed orders"""
+    try:
+        return await asyncio.to_thread(get_outbox_stats)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading outbox status: {str(e)}")
 
 @app.get('/api/sync-inventory-products')
 async def sync_inventory_products():
@@ -1646,16 +1561,24 @@ async def sync_inventory_products():
     Synchronize Ready-Made products from the inventory system to the cafe-beata menu
     """
     try:
-        # Connect to the database
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        
-        # Log all available products and their process types for debugging
-        cursor.execute("SELECT id, ProductName, ProcessType, Status FROM inventoryproduct")
-        all_products = cursor.fetchall()
-        print(f"Available products in inventory: {len(all_products)}")
-        print(f"Process types found: {set([p.get('ProcessType') for p in all_products])}")
-        
+        result, menu_changed = await run_db(_sync_inventory_products)
+    except Exception as e:
+        print(f"Error syncing inventory products: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    # If items were added or updated, send a WebSocket notification to refresh menus
+    if menu_changed:
+        await manager.broadcast({
+            "type": "menu_update",
+            "message": f"Menu updated with items from inventory system"
+        })
+
+    return result
+
+def _sync_inventory_products(connection):
+    """Returns the response body and whether the menu changed"""
+    cursor = connection.cursor(dictionary=True)
+    try:
         # Get ONLY Ready-Made products from the inventory system - CASE SENSITIVE check
         cursor.execute("""
             SELECT id, ProductName, UnitPrice, Image, Quantity, Threshold, ProcessType, Status 
@@ -1682,7 +1605,7 @@ async def sync_inventory_products():
                 # Delete any inventory products that no longer match the ProcessType
                 cursor.execute("DELETE FROM itemso WHERE external_source = 'inventory'")
                 connection.commit()
-                return {"success": False, "message": "No Ready-Made products found in inventory system. Cleared existing inventory items."}
+                return {"success": False, "message": "No Ready-Made products found in inventory system. Cleared existing inventory items."}, False
         
         print(f"Found {len(inventory_products)} Ready-Made products to import")
         if inventory_products:
@@ -1810,25 +1733,16 @@ async def sync_inventory_products():
         removed_count = cursor.rowcount
         
         connection.commit()
-        
-        # If items were added or updated, send a WebSocket notification to refresh menus
-        if added_count > 0 or updated_count > 0 or removed_count > 0:
-            await manager.broadcast({
-                "type": "menu_update",
-                "message": f"Menu updated with items from inventory system"
-            })
             
         return {
             "success": True,
             "message": f"Synchronized inventory products: {added_count} added, {updated_count} updated, {removed_count} removed"
-        }
-    except Exception as e:
-        print(f"Error syncing inventory products: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        }, added_count > 0 or updated_count > 0 or removed_count > 0
     finally:
-        if connection:
-            cursor.close()
-            connection.close()
+        cursor.close()
+
+# Last Ready-Made product list fetched from the inventory system and its ETag
+_inventory_catalog = {"etag": None, "products": None}
 
 @app.get("/api/sync-inventory-stocks")
 async def sync_inventory_stocks():
@@ -1836,13 +1750,28 @@ async def sync_inventory_stocks():
     Syncs stock levels from the inventory system to the cafe system for all Ready-Made products.
     This is used by the webhook handler and background task.
     """
-    connection = None
-    
     try:
-        # Get a database connection
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
+        result, updated_count = await run_db(_sync_inventory_stocks)
+    except Exception as e:
+        logger.error(f"Error syncing inventory stock levels: {str(e)}")
+        return {"success": False, "message": f"Error syncing inventory stock levels: {str(e)}"}
+
+    if updated_count > 0:
+        logger.info(f"Synchronized {updated_count} inventory products.")
         
+        # Send WebSocket notification about stock update to refresh clients
+        await manager.broadcast({
+            "type": "inventory_sync_complete",
+            "updated_count": updated_count,
+            "timestamp": datetime.now().isoformat()
+        })
+
+    return result
+
+def _sync_inventory_stocks(connection):
+    """Returns the response body and how many stock rows were written"""
+    cursor = connection.cursor(dictionary=True)
+    try:
         logger.info("Starting inventory stock sync...")
         
         # 1. Get all external products that we need to sync from the cafe-beata database
@@ -1855,23 +1784,35 @@ async def sync_inventory_stocks():
         
         if not local_items:
             logger.info("No inventory items found to sync")
-            return {"success": True, "message": "No inventory items found to sync"}
+            return {"success": True, "message": "No inventory items found to sync"}, 0
         
         logger.info(f"Found {len(local_items)} inventory items to sync")
         
         # 2. Make a request to the inventory system to get current stock levels for ready-made products
         try:
-            inventory_response = requests.get(
-                "http://127.0.0.1:8001/api/inventory/inventoryproducts/filter?process_type=Ready-Made",
-                timeout=5
-            )
+            # Revalidate against the inventory catalog's ETag; an unchanged
+            # catalog comes back as an empty 304 and we reuse our last copy
+            headers = {}
+            if _inventory_catalog["etag"] and _inventory_catalog["products"] is not None:
+                headers["If-None-Match"] = _inventory_catalog["etag"]
+            with OUTBOUND_LATENCY.time("inventory", "ready_made_products"):
+                inventory_response = requests.get(
+                    "http://127.0.0.1:8001/api/inventory/inventoryproducts/filter?process_type=Ready-Made",
+                    headers=headers,
+                    timeout=5
+                )
             
-            if inventory_response.status_code != 200:
+            if inventory_response.status_code == 304:
+                inventory_products = _inventory_catalog["products"]
+                logger.info("Inventory catalog unchanged; reusing cached Ready-Made products")
+            elif inventory_response.status_code != 200:
                 logger.error(f"Failed to fetch inventory products: {inventory_response.status_code} - {inventory_response.text}")
-                return {"success": False, "message": f"Failed to fetch inventory products: {inventory_response.status_code}"}
-                
-            inventory_products = inventory_response.json()
-            logger.info(f"Fetched {len(inventory_products)} Ready-Made products from inventory system")
+                return {"success": False, "message": f"Failed to fetch inventory products: {inventory_response.status_code}"}, 0
+            else:
+                inventory_products = inventory_response.json()
+                _inventory_catalog["etag"] = inventory_response.headers.get("ETag")
+                _inventory_catalog["products"] = inventory_products
+                logger.info(f"Fetched {len(inventory_products)} Ready-Made products from inventory system")
             
             # Create a lookup dictionary for faster access
             inventory_lookup = {str(product['id']): product for product in inventory_products}
@@ -1917,144 +1858,224 @@ async def sync_inventory_stocks():
             
             connection.commit()
             
-            if updated_count > 0:
-                logger.info(f"Synchronized {updated_count} inventory products.")
-                
-                # Send WebSocket notification about stock update to refresh clients
-                await manager.broadcast({
-                    "type": "inventory_sync_complete",
-                    "updated_count": updated_count,
-                    "timestamp": datetime.now().isoformat()
-                })
-            
             return {
                 "success": True,
                 "message": f"Synchronized inventory stock levels: {updated_count} updated. {out_of_sync_count} products need full sync."
-            }
+            }, updated_count
             
         except requests.exceptions.RequestException as e:
             logger.error(f"Error connecting to inventory system: {str(e)}")
-            return {"success": False, "message": f"Error connecting to inventory system: {str(e)}"}
+            return {"success": False, "message": f"Error connecting to inventory system: {str(e)}"}, 0
         
-    except Exception as e:
-        logger.error(f"Error syncing inventory stock levels: {str(e)}")
-        if connection:
-            connection.rollback()
-        return {"success": False, "message": f"Error syncing inventory stock levels: {str(e)}"}
+    except Exception:
+        connection.rollback()
+        raise
     finally:
-        if connection:
-            cursor.close()
-            connection.close()
+        cursor.close()
+
+# Only one change-feed sync runs at a time; overlapping triggers wait their turn
+_inventory_changes_lock = asyncio.Lock()
+
+@app.get("/api/sync-inventory-changes")
+async def sync_inventory_changes():
+    """
+    Apply inventory changes since the last stored cursor. Only products that
+    changed are fetched and written; a full product sync runs only when the
+    set of Ready-Made products itself changed.
+    """
+    async with _inventory_changes_lock:
+        applied = 0
+        menu_changed = False
+        try:
+            with SYNC_DURATION.time("inventory_changes"), pooled_connection() as connection:
+                since = await asyncio.to_thread(load_inventory_cursor, connection)
+                while True:
+                    feed = await asyncio.to_thread(fetch_inventory_changes, since)
+                    levels, page_menu_changed = await asyncio.to_thread(apply_inventory_changes, connection, feed)
+                    menu_changed = menu_changed or page_menu_changed
+                    applied += len(levels)
+                    since = feed["version"]
+
+                    for item_id, (quantity, min_stock_level) in levels.items():
+                        await manager.broadcast({
+                            "type": "stock_update",
+                            "item_id": item_id,
+                            "new_quantity": quantity,
+                            "min_stock_level": min_stock_level,
+                            "timestamp": datetime.now().isoformat()
+                        })
+                    if not feed.get("has_more"):
+                        break
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error connecting to inventory system: {str(e)}")
+            return {"success": False, "message": f"Error connecting to inventory system: {str(e)}"}
+        except Exception as e:
+            logger.error(f"Error applying inventory changes: {str(e)}")
+            return {"success": False, "message": f"Error applying inventory changes: {str(e)}"}
+
+        if applied:
+            logger.info(f"Applied inventory changes to {applied} items (version {since})")
+        if menu_changed:
+            logger.info("Ready-Made products were added or removed; running product sync")
+            try:
+                with SYNC_DURATION.time("inventory_products"):
+                    await sync_inventory_products()
+            except HTTPException as e:
+                logger.error(f"Product sync after inventory changes failed: {e.detail}")
+
+        return {"success": True, "version": since, "updated_count": applied, "menu_changed": menu_changed}
+
+# Webhooks ask for a reconciliation only when they can't be applied inline.
+# At most one reconciliation runs and at most one more is pending: triggers
+# that arrive while one is running just mark it pending.
+_reconcile_state = {"running": False, "pending": False}
+
+def request_inventory_reconcile():
+    if _reconcile_state["running"]:
+        _reconcile_state["pending"] = True
+        return
+    _reconcile_state["running"] = True
+    asyncio.create_task(_run_inventory_reconcile())
+
+async def _run_inventory_reconcile():
+    try:
+        while True:
+            _reconcile_state["pending"] = False
+            try:
+                await sync_inventory_changes()
+            except Exception as e:
+                logger.error(f"Inventory reconciliation failed: {e}")
+            if not _reconcile_state["pending"]:
+                break
+    finally:
+        _reconcile_state["running"] = False
+
+class InventoryStockUpdate(BaseModel):
+    product_id: int
+    product_name: Optional[str] = None
+    quantity: Optional[int] = None
+    status: Optional[str] = None
+    version: Optional[int] = None
+    timestamp: Optional[str] = None
+
+class InventoryStockWebhook(BaseModel):
+    products: List[InventoryStockUpdate]
+    version: Optional[int] = None
+    timestamp: Optional[str] = None
 
 # Add a webhook endpoint for the inventory system to call when stock changes
 @app.post("/api/inventory-webhook/stock-update")
-async def inventory_webhook_stock_update(request: Request, background_tasks: BackgroundTasks):
+async def inventory_webhook_stock_update(request: Request):
     """
-    Webhook endpoint for inventory system to call when stock changes
+    Webhook endpoint for inventory system to call when stock changes.
+    Accepts a single product update or a batch as {"products": [...], "version": N}.
+    Updates carrying a quantity are written directly in one upsert; updates
+    not newer than the stored stock version are ignored. A change-feed
+    reconciliation is requested only for products the payload couldn't
+    resolve (no quantity, deleted, or not on the menu yet).
     """
     try:
-        # Get the data from the request
         data = await request.json()
-        
-        # Log what we received
-        print(f"Received inventory webhook data: {data}")
-        
-        # Verify webhook (basic validation)
-        if "product_id" not in data:
-            print("Invalid webhook data, missing product_id")
+        try:
+            if isinstance(data, dict) and isinstance(data.get("products"), list):
+                payload = InventoryStockWebhook(**data)
+            else:
+                payload = InventoryStockWebhook(products=[data])
+        except (ValidationError, TypeError) as e:
+            logger.warning(f"Invalid inventory webhook data: {e}")
             return {"success": False, "message": "Invalid webhook data, missing product_id"}
-            
-        # Extract the data
-        product_id = data.get("product_id")
-        product_name = data.get("product_name")
-        quantity = data.get("quantity")
-        status = data.get("status")
-        
-        # Log detailed information
-        print(f"Processing stock update for product: {product_id}, name: {product_name}, quantity: {quantity}, status: {status}")
-        
-        # If detailed data is provided, update the item directly
-        if product_name and quantity is not None:
-            connection = get_db_connection()
-            if connection is None:
-                print("Database connection failed in webhook handler")
-                return {"success": False, "message": "Database connection failed"}
+        if not payload.products:
+            return {"success": False, "message": "Invalid webhook data, no products"}
 
-            cursor = connection.cursor(dictionary=True)
-            
+        logger.info(f"Received inventory webhook for {len(payload.products)} products (version {payload.version})")
+
+        # Only updates carrying detailed data can be applied directly
+        detailed = [update for update in payload.products if update.quantity is not None]
+        needs_reconcile = len(detailed) < len(payload.products)
+        applied, stale, broadcasts = 0, 0, []
+
+        if detailed:
             try:
-                # Check if the external item exists in our system
-                cursor.execute(
-                    "SELECT id FROM itemso WHERE external_id = %s AND external_source = 'inventory'", 
-                    (product_id,)
-                )
-                item_result = cursor.fetchone()
-                
-                if item_result:
-                    local_item_id = item_result["id"]
-                    print(f"Found local item ID {local_item_id} for inventory product {product_id}")
-                    
-                    # Get minimum stock level if it exists
-                    cursor.execute("SELECT min_stock_level FROM item_stocks WHERE item_id = %s", (local_item_id,))
-                    stock_level_result = cursor.fetchone()
-                    min_stock_level = 5  # Default
-                    if stock_level_result:
-                        min_stock_level = stock_level_result.get('min_stock_level', 5)
-                    
-                    # Update the stock quantity
-                    cursor.execute(
-                        "UPDATE item_stocks SET quantity = %s WHERE item_id = %s",
-                        (quantity, local_item_id)
-                    )
-                    
-                    rows_affected = cursor.rowcount
-                    if rows_affected > 0:
-                        print(f"Updated {rows_affected} rows for item {local_item_id}")
-                        
-                        # Immediate broadcast to all connected clients for fast UI refresh
-                        asyncio.create_task(manager.broadcast({
-                            "type": "stock_update",
-                            "item_id": local_item_id,
-                            "new_quantity": quantity,
-                            "min_stock_level": min_stock_level,
-                            "timestamp": datetime.now().isoformat()
-                        }))
-                    else:
-                        print(f"No stock record existed for item {local_item_id}, creating one")
-                        # If no stock record exists, create one
-                        cursor.execute(
-                            "INSERT INTO item_stocks (item_id, quantity, min_stock_level) VALUES (%s, %s, %s) ON DUPLICATE KEY UPDATE quantity = VALUES(quantity)",
-                            (local_item_id, quantity, min_stock_level)
-                        )
-                        
-                        # Broadcast this new stock record too
-                        asyncio.create_task(manager.broadcast({
-                            "type": "stock_update",
-                            "item_id": local_item_id,
-                            "new_quantity": quantity,
-                            "min_stock_level": min_stock_level,
-                            "timestamp": datetime.now().isoformat()
-                        }))
-                    
-                    connection.commit()
-                    print(f"Successfully updated stock for item {local_item_id} to {quantity}")
-                else:
-                    print(f"External product {product_id} not found in local system")
+                applied, stale, broadcasts, unresolved = await run_db(_apply_webhook_stock, detailed, payload.version)
+                needs_reconcile = needs_reconcile or unresolved
+            except PoolTimeoutError:
+                print("Database connection failed in webhook handler")
+                return {"success": False, "message": "Database connection failed"}
             except Exception as e:
-                print(f"Error updating item stock in webhook: {str(e)}")
-                connection.rollback()
-            finally:
-                cursor.close()
-                connection.close()
-        
-        # Schedule a full stock sync in the background for consistency
-        asyncio.create_task(sync_inventory_stocks())
-        
-        return {"success": True, "message": "Stock update processed"}
+                logger.error(f"Error updating item stock in webhook: {str(e)}")
+                needs_reconcile = True
+
+            # Immediate broadcast to all connected clients for fast UI refresh
+            for message in broadcasts:
+                manager.publish(message)
+
+        if needs_reconcile:
+            request_inventory_reconcile()
+
+        return {
+            "success": True,
+            "message": "Stock update processed",
+            "applied": applied,
+            "stale": stale,
+            "reconcile": needs_reconcile
+        }
     except Exception as e:
-        print(f"Error in inventory webhook: {e}")
+        logger.error(f"Error in inventory webhook: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _apply_webhook_stock(connection, detailed, payload_version):
+    """
+    Write the webhook's detailed updates; returns (applied, stale, broadcasts,
+    unresolved) where unresolved means some product isn't on the menu yet.
+    """
+    applied, stale, broadcasts, unresolved = 0, 0, [], False
+    cursor = connection.cursor(dictionary=True)
+    try:
+        # Resolve all local items and their stock rows in one query
+        product_ids = [str(update.product_id) for update in detailed]
+        placeholders = ", ".join(["%s"] * len(product_ids))
+        cursor.execute(
+            f"""
+            SELECT i.id, i.external_id, s.min_stock_level, s.source_version
+            FROM itemso i
+            LEFT JOIN item_stocks s ON s.item_id = i.id
+            WHERE i.external_source = 'inventory' AND i.external_id IN ({placeholders})
+            """,
+            product_ids
+        )
+        local_items = {str(row["external_id"]): row for row in cursor.fetchall()}
+
+        # Group by version so each group is one versioned upsert
+        by_version = {}
+        for update in detailed:
+            item = local_items.get(str(update.product_id))
+            if not item:
+                unresolved = True
+                continue
+            version = update.version if update.version is not None else payload_version
+            if stale_items({item["id"]: item["source_version"]}, version):
+                stale += 1
+                continue
+            min_stock_level = item["min_stock_level"] or 5  # Default
+            by_version.setdefault(version, {})[item["id"]] = (update.quantity, min_stock_level)
+            broadcasts.append({
+                "type": "stock_update",
+                "item_id": item["id"],
+                "new_quantity": update.quantity,
+                "min_stock_level": min_stock_level,
+                "timestamp": datetime.now().isoformat()
+            })
+
+        for version, levels in by_version.items():
+            applied += write_item_stocks(cursor, levels, version)
+        connection.commit()
+        return applied, stale, broadcasts, unresolved
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
 # Create a background task to sync stock levels periodically
 async def background_stock_sync():
     """
@@ -2064,8 +2085,8 @@ async def background_stock_sync():
     while True:
         try:
             # Run stock sync
-            logger.info("Running scheduled inventory stock sync")
-            await sync_inventory_stocks()
+            logger.info("Running scheduled inventory change sync")
+            await sync_inventory_changes()
             
             # Wait for 5 minutes
             await asyncio.sleep(300)  # 300 seconds = 5 minutes
@@ -2081,50 +2102,30 @@ async def sync_specific_inventory_product(product_id: int):
     """
     logger.info(f"Syncing specific inventory product: {product_id}")
     try:
-        connection = get_db_connection()
-        if connection is None:
-            logger.error("Database connection failed")
-            return False
-            
-        cursor = connection.cursor(dictionary=True)
-        
+        from utils.inventory_client import get_inventory_product
+
         # Check if this product exists in our system
-        cursor.execute(
-            "SELECT id, name FROM itemso WHERE external_id = %s AND external_source = 'inventory'", 
-            (product_id,)
-        )
-        
-        item_result = cursor.fetchone()
+        item_result = await run_db(_find_inventory_item, product_id)
         
         if not item_result:
             logger.info(f"Product {product_id} not found in cafe-beata, attempting to fetch and create it")
             # This product isn't in our system yet, we need to fetch it and create it
-            from utils.inventory_client import get_inventory_product
             
             # Fetch the product details from inventory
             inventory_product = await get_inventory_product(product_id)
             
             if not inventory_product or not inventory_product.get("success"):
                 logger.error(f"Failed to fetch product {product_id} from inventory")
-                cursor.close()
-                connection.close()
                 return False
                 
             # Create the product in our system
             await sync_inventory_products()  # This will create the product if it doesn't exist
             
             # Check again if the product exists now
-            cursor.execute(
-                "SELECT id, name FROM itemso WHERE external_id = %s AND external_source = 'inventory'", 
-                (product_id,)
-            )
-            
-            item_result = cursor.fetchone()
+            item_result = await run_db(_find_inventory_item, product_id)
             
             if not item_result:
                 logger.error(f"Product {product_id} still not found after sync attempt")
-                cursor.close()
-                connection.close()
                 return False
         
         # At this point, we have the item in our database
@@ -2132,13 +2133,10 @@ async def sync_specific_inventory_product(product_id: int):
         logger.info(f"Found local item ID {local_item_id} for inventory product {product_id}")
         
         # Fetch the latest stock information from inventory
-        from utils.inventory_client import get_inventory_product
         product_data = await get_inventory_product(product_id)
         
         if not product_data or not product_data.get("success"):
             logger.error(f"Failed to fetch updated product data for {product_id}")
-            cursor.close()
-            connection.close()
             return False
             
         # Extract product details
@@ -2146,6 +2144,38 @@ async def sync_specific_inventory_product(product_id: int):
         quantity = product.get("Quantity", 0)
         threshold = product.get("Threshold", 5)
         
+        await run_db(_write_item_stock, item_result, quantity, threshold)
+        
+        # Broadcast the stock update to all connected clients
+        await manager.broadcast({
+            "type": "stock_update",
+            "item_id": local_item_id,
+            "new_quantity": quantity,
+            "min_stock_level": threshold,
+            "timestamp": datetime.now().isoformat()
+        })
+        
+        return True
+        
+    except Exception as e:
+        logger.error(f"Error syncing specific inventory product {product_id}: {e}")
+        return False
+
+def _find_inventory_item(connection, product_id: int):
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            "SELECT id, name FROM itemso WHERE external_id = %s AND external_source = 'inventory'", 
+            (product_id,)
+        )
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+
+def _write_item_stock(connection, item_result, quantity, threshold):
+    local_item_id = item_result["id"]
+    cursor = connection.cursor(dictionary=True)
+    try:
         # Update the stock in our database
         cursor.execute("SELECT quantity FROM item_stocks WHERE item_id = %s", (local_item_id,))
         stock_result = cursor.fetchone()
@@ -2166,20 +2196,5 @@ async def sync_specific_inventory_product(product_id: int):
             logger.info(f"Created new stock record for {item_result['name']} (ID: {local_item_id}) with quantity {quantity}")
         
         connection.commit()
-        
-        # Broadcast the stock update to all connected clients
-        await manager.broadcast({
-            "type": "stock_update",
-            "item_id": local_item_id,
-            "new_quantity": quantity,
-            "min_stock_level": threshold,
-            "timestamp": datetime.now().isoformat()
-        })
-        
+    finally:
         cursor.close()
-        connection.close()
-        return True
-        
-    except Exception as e:
-        logger.error(f"Error syncing specific inventory product {product_id}: {e}")
-        return False
\ No newline at end of file
@@ -0,0 +1,61 @@
+"""
+Versioned item_stocks writes applied out of order. write_item_stocks()'s
+upsert runs against an in-memory SQLite item_stocks table, with the MySQL
+spellings (%s, VALUES(), IF(), ON DUPLICATE KEY) rewritten to SQLite's.
+Run with `python -m pytest tests` from cafe-beata-main/backend.
+"""
+import re
+import sqlite3
+
+import pytest
+
+from utils.inventory_changes import stale_items, write_item_stocks
+
+
+class SQLiteCursor:
+    def __init__(self, connection):
+        self._cursor = connection.cursor()
+
+    def execute(self, query, params=()):
+        query = query.replace("%s", "?").replace("IF(", "IIF(")
+        query = query.replace("ON DUPLICATE KEY UPDATE", "ON CONFLICT(item_id) DO UPDATE SET")
+        query = re.sub(r"VALUES\((\w+)\)", r"excluded.\1", query)
+        self._cursor.execute(query, params)
+
+
+@pytest.fixture
+def stocks():
+    connection = sqlite3.connect(":memory:")
+    connection.execute(
+        "CREATE TABLE item_stocks (item_id INTEGER PRIMARY KEY, quantity INTEGER, "
+        "min_stock_level INTEGER, source_version INTEGER)"
+    )
+    cursor = SQLiteCursor(connection)
+
+    def write(levels, version):
+        write_item_stocks(cursor, levels, version)
+        return {row[0]: row[1:] for row in connection.execute("SELECT * FROM item_stocks ORDER BY item_id")}
+
+    yield write
+    connection.close()
+
+
+def test_late_and_repeated_versions_do_not_overwrite(stocks):
+    stocks({1: (10, 5), 2: (4, 5)}, 7)
+
+    # A webhook read at version 5 arrives after the feed applied version 7
+    assert stocks({1: (99, 5)}, 5) == {1: (10, 5, 7), 2: (4, 5, 7)}
+
+    # A second delivery at the stored version is a no-op, even with other data
+    assert stocks({1: (3, 1), 2: (0, 1)}, 7) == {1: (10, 5, 7), 2: (4, 5, 7)}
+
+    # Newer versions and unversioned writes still apply
+    assert stocks({1: (8, 5)}, 8) == {1: (8, 5, 8), 2: (4, 5, 7)}
+    assert stocks({2: (6, 5)}, None) == {1: (8, 5, 8), 2: (6, 5, 7)}
+
+
+def test_stale_items_matches_the_upsert():
+    stored = {1: 7, 2: 6, 3: None}
+    assert stale_items(stored, 7) == {1}
+    assert stale_items(stored, 6) == {1, 2}
+    assert stale_items(stored, None) == set()
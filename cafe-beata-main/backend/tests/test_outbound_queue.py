@@ -0,0 +1,148 @@
+"""
+Outbox delivery against a fake inventory system that applies batch items
+once per request_id, the way /stock/adjust/batch and /sales/update/batch
+do. Run with `python -m pytest tests` from cafe-beata-main/backend.
+"""
+import pytest
+import requests
+
+import utils.outbound_queue as outbound_queue
+from utils.outbound_queue import KIND_SALES_UPDATE, KIND_STOCK_ADJUST, MAX_ATTEMPTS
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.reason = "Fake"
+        self._body = body or {}
+        self.text = str(self._body)
+
+    def json(self):
+        return self._body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} {self.reason}")
+
+
+class FakeInventory:
+    """Applies each request_id once; `lose_response` drops the reply after applying"""
+
+    def __init__(self, products):
+        self.stock = dict(products)
+        self.sales = []
+        self.applied = set()
+        self.calls = []
+        self.lose_response = False
+        self.status_code = 200
+
+    def post(self, url, json, timeout):
+        path = url.split("/api", 1)[1]
+        self.calls.append(path)
+        if self.status_code != 200:
+            return FakeResponse(self.status_code, {"detail": "nope"})
+
+        results = []
+        for item in next(iter(json.values())):
+            result = {"product_id": item["product_id"], "request_id": item["request_id"], "success": True}
+            if item["product_id"] not in self.stock:
+                result.update(success=False, error="Product not found")
+            elif item["request_id"] in self.applied:
+                result["duplicate"] = True
+            else:
+                self.applied.add(item["request_id"])
+                if path == "/stock/adjust/batch":
+                    self.stock[item["product_id"]] -= item["quantity"]
+                else:
+                    self.sales.append((item["product_id"], item["quantity_sold"]))
+            results.append(result)
+
+        if self.lose_response:
+            self.lose_response = False
+            raise requests.Timeout("read timed out")
+        return FakeResponse(200, {"results": results})
+
+
+class FakeOutbox:
+    def __init__(self, rows):
+        self.rows = {row["id"]: dict(row, status="pending") for row in rows}
+
+    def claim(self):
+        return [dict(row) for row in self.rows.values() if row["status"] == "pending"]
+
+    def mark_done(self, ids):
+        for row_id in ids:
+            self.rows[row_id]["status"] = "done"
+
+    def mark_failed(self, ids, attempts, error, rejected=False):
+        for row_id in ids:
+            row = self.rows[row_id]
+            row["attempts"] = attempts + 1
+            row["status"] = "failed" if rejected or row["attempts"] >= MAX_ATTEMPTS else "pending"
+            row["error"] = error
+
+
+def outbox_row(row_id, kind, product_id, quantity):
+    payload = {"quantity": quantity, "remitted": quantity * 25.0}
+    return {"id": row_id, "kind": kind, "product_id": str(product_id), "order_id": "A1",
+            "payload": payload, "attempts": 0}
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    def install(rows, products):
+        outbox, inventory = FakeOutbox(rows), FakeInventory(products)
+        monkeypatch.setattr(outbound_queue, "_claim_batch", outbox.claim)
+        monkeypatch.setattr(outbound_queue, "_mark_done", outbox.mark_done)
+        monkeypatch.setattr(outbound_queue, "_mark_failed", outbox.mark_failed)
+        monkeypatch.setattr(outbound_queue, "_get_session", lambda: inventory)
+        return outbox, inventory
+    return install
+
+
+ORDER = [
+    outbox_row(1, KIND_STOCK_ADJUST, 5, 2),
+    outbox_row(2, KIND_SALES_UPDATE, 5, 2),
+    outbox_row(3, KIND_STOCK_ADJUST, 5, 1),
+    outbox_row(4, KIND_SALES_UPDATE, 5, 1),
+]
+
+
+def test_stock_is_delivered_before_sales_one_item_per_row(queue):
+    outbox, inventory = queue(ORDER, {5: 10})
+    outbound_queue._drain_once()
+
+    assert inventory.calls == ["/stock/adjust/batch", "/sales/update/batch"]
+    assert inventory.stock[5] == 7
+    assert inventory.sales == [(5, 2), (5, 1)]
+    assert {row["status"] for row in outbox.rows.values()} == {"done"}
+
+
+def test_retry_after_a_lost_response_is_not_applied_twice(queue):
+    outbox, inventory = queue(ORDER, {5: 10})
+    inventory.lose_response = True
+    outbound_queue._drain_once()
+    assert [outbox.rows[row_id]["status"] for row_id in (1, 3)] == ["pending", "pending"]
+
+    outbound_queue._drain_once()
+    assert inventory.stock[5] == 7
+    assert inventory.sales == [(5, 2), (5, 1)]
+    assert {row["status"] for row in outbox.rows.values()} == {"done"}
+
+
+def test_rejections_are_dead_lettered_and_server_errors_retried(queue):
+    outbox, inventory = queue([outbox_row(1, KIND_STOCK_ADJUST, 9, 1), outbox_row(2, KIND_SALES_UPDATE, 5, 1)],
+                              {5: 10})
+    outbound_queue._drain_once()
+    assert outbox.rows[1]["status"] == "failed" and outbox.rows[1]["error"] == "Product not found"
+    assert outbox.rows[2]["status"] == "done"
+
+    outbox, inventory = queue([outbox_row(1, KIND_SALES_UPDATE, 5, 1)], {5: 10})
+    inventory.status_code = 422
+    outbound_queue._drain_once()
+    assert outbox.rows[1]["status"] == "failed" and outbox.rows[1]["attempts"] == 1
+
+    outbox, inventory = queue([outbox_row(1, KIND_SALES_UPDATE, 5, 1)], {5: 10})
+    inventory.status_code = 500
+    outbound_queue._drain_once()
+    assert outbox.rows[1]["status"] == "pending"
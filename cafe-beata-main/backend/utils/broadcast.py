@@ -0,0 +1,38 @@
+"""
+Topic mapping for /ws/orders. The fan-out engine (per-client send queues,
+slow-client policy, subscribe/unsubscribe) is beata_common.broadcast, shared
+with the inventory API.
+
+Clients can subscribe on connect (/ws/orders?topics=orders,stock,item:12).
+Messages belong to their type's topic and to "item:<id>" when they carry an
+item id; messages of unknown types go to every client.
+"""
+from typing import Optional, Set
+
+from beata_common.broadcast import BroadcastHub as _BroadcastHub
+
+TOPICS_BY_TYPE = {
+    "new_order": "orders",
+    "order_status_update": "orders",
+    "stock_update": "stock",
+    "inventory_sync_complete": "stock",
+    "menu_update": "menu",
+    "category_update": "menu",
+    "user_notification": "notifications",
+}
+
+
+def message_topics(message: dict) -> Optional[Set[str]]:
+    """Topics a message belongs to, or None to send it to everyone"""
+    topic = TOPICS_BY_TYPE.get(message.get("type"))
+    if topic is None:
+        return None
+    topics = {topic}
+    if message.get("item_id") is not None:
+        topics.add(f"item:{message['item_id']}")
+    return topics
+
+
+class BroadcastHub(_BroadcastHub):
+    def message_topics(self, message: dict) -> Optional[Set[str]]:
+        return message_topics(message)
@@ -0,0 +1,296 @@
+"""
+Database connection pool for the cafe-beata backend
+
+Handlers used to open a fresh MySQL connection per request. This module
+keeps a bounded pool of connections instead, hands them out through a
+proxy whose close() returns them to the pool, and provides context
+managers that guarantee release on every path.
+
+Pool sizing is read from the environment:
+    DB_POOL_SIZE            maximum open connections (default 16)
+    DB_POOL_TIMEOUT         seconds to wait for a free connection (default 10)
+    DB_POOL_VALIDATE_AFTER  idle seconds before a connection is pinged (default 30)
+    DB_POOL_MAX_AGE         seconds before a connection is recycled (default 3600)
+"""
+import asyncio
+import contextlib
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import deque
+
+import mysql.connector
+from mysql.connector import Error
+from beata_common.openmetrics import POOL_CHECKOUT_TIMEOUTS, POOL_CHECKOUT_WAIT, gauge
+
+logger = logging.getLogger("cafe-beata-backend")
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+POOL_SIZE = _env_int("DB_POOL_SIZE", 16)
+POOL_TIMEOUT = _env_int("DB_POOL_TIMEOUT", 10)
+VALIDATE_AFTER_IDLE = _env_int("DB_POOL_VALIDATE_AFTER", 30)
+MAX_CONNECTION_AGE = _env_int("DB_POOL_MAX_AGE", 3600)
+
+
+def db_config():
+    """Connection settings, read from the same variables as before pooling"""
+    return {
+        "host": os.getenv("DB_HOST", "127.0.0.1"),
+        "user": os.getenv("DB_USER", "root"),
+        "password": os.getenv("DB_PASSWORD", ""),
+        "database": os.getenv("DB_NAME", "cafe_beata"),
+        "port": int(os.getenv("DB_PORT", "3306"))
+    }
+
+
+class PoolTimeoutError(Error):
+    """Raised when no connection becomes free within POOL_TIMEOUT"""
+
+
+class PooledConnection:
+    """Proxy for a checked-out connection; close() returns it to the pool"""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._checked_out_at = time.monotonic()
+        self._returned = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._raw, name, value)
+
+    def close(self):
+        if not self._returned:
+            self._returned = True
+            self._pool._release(self)
+
+    def __del__(self):
+        # A handler dropped the connection without closing it (e.g. on an exception path)
+        if not getattr(self, "_returned", True):
+            self._returned = True
+            try:
+                self._pool._release(self, leaked=True)
+            except Exception:
+                pass
+
+
+class ConnectionPool:
+    """Bounded pool with idle-time validation and per-connection recycling"""
+
+    def __init__(self, size, config):
+        self.size = size
+        self.config = config
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.RLock()
+        self._idle = deque()   # (connection, last_used)
+        self._in_use = weakref.WeakValueDictionary()
+        self._created_at = {}
+        self._stats = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "validation_failures": 0,
+            "leaked": 0,
+            "checkout_ms_total": 0.0,
+            "checkout_ms_max": 0.0,
+            "wait_ms_total": 0.0,
+        }
+
+    def _connect(self):
+        connection = mysql.connector.connect(**self.config)
+        with self._lock:
+            self._created_at[id(connection)] = time.monotonic()
+            self._stats["created"] += 1
+        return connection
+
+    def _discard(self, connection):
+        with self._lock:
+            self._created_at.pop(id(connection), None)
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def get_connection(self, timeout=POOL_TIMEOUT):
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=timeout):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            POOL_CHECKOUT_TIMEOUTS.inc()
+            raise PoolTimeoutError(f"No database connection available after {timeout}s ({self.size} in use)")
+        waited = time.monotonic() - start
+        POOL_CHECKOUT_WAIT.observe(waited)
+
+        try:
+            connection = None
+            while connection is None:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    connection = self._connect()
+                    break
+                candidate, last_used = entry
+                if time.monotonic() - last_used > VALIDATE_AFTER_IDLE:
+                    try:
+                        candidate.ping(reconnect=False)
+                    except Exception:
+                        with self._lock:
+                            self._stats["validation_failures"] += 1
+                        self._discard(candidate)
+                        continue
+                connection = candidate
+        except Exception:
+            self._slots.release()
+            raise
+
+        proxy = PooledConnection(self, connection)
+        elapsed_ms = (time.monotonic() - start) * 1000
+        with self._lock:
+            self._in_use[id(proxy)] = proxy
+            self._stats["checkouts"] += 1
+            self._stats["checkout_ms_total"] += elapsed_ms
+            self._stats["checkout_ms_max"] = max(self._stats["checkout_ms_max"], elapsed_ms)
+            self._stats["wait_ms_total"] += waited * 1000
+        return proxy
+
+    def _release(self, proxy, leaked=False):
+        connection = proxy._raw
+        with self._lock:
+            self._in_use.pop(id(proxy), None)
+            created_at = self._created_at.get(id(connection), 0)
+            if leaked:
+                self._stats["leaked"] += 1
+                logger.warning("Database connection was not closed by its handler; returned to pool")
+
+        try:
+            reusable = connection.is_connected()
+            if reusable and connection.in_transaction:
+                connection.rollback()
+            if reusable and time.monotonic() - created_at > MAX_CONNECTION_AGE:
+                with self._lock:
+                    self._stats["recycled"] += 1
+                reusable = False
+        except Exception:
+            reusable = False
+
+        if reusable:
+            with self._lock:
+                self._idle.append((connection, time.monotonic()))
+        else:
+            self._discard(connection)
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            checkouts = stats["checkouts"] or 1
+            stats.update({
+                "size": self.size,
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "open": len(self._created_at),
+                "checkout_ms_avg": round(stats["checkout_ms_total"] / checkouts, 3),
+                "wait_ms_avg": round(stats["wait_ms_total"] / checkouts, 3),
+            })
+        return stats
+
+    def close(self):
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for connection, _ in idle:
+            self._discard(connection)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(POOL_SIZE, db_config())
+                logger.info(f"Database connection pool created (size={POOL_SIZE})")
+    return _pool
+
+
+def _pool_occupancy():
+    stats = _pool.stats() if _pool is not None else {}
+    return {state: stats.get(state, 0) for state in ("in_use", "idle", "open")}
+
+
+gauge("db_pool_connections", "Pooled database connections by state", ("state",), callback=_pool_occupancy)
+
+
+def get_connection():
+    """Check out a pooled connection; call close() to return it"""
+    return get_pool().get_connection()
+
+
+@contextlib.contextmanager
+def pooled_connection():
+    """Check out a connection and always return it, even if the block raises"""
+    connection = get_connection()
+    try:
+        yield connection
+    finally:
+        connection.close()
+
+
+async def run_db(func, *args, **kwargs):
+    """
+    Run func(connection, *args, **kwargs) in a worker thread with a pooled
+    connection, so blocking queries don't stall the event loop.
+    """
+    def call():
+        with pooled_connection() as connection:
+            return func(connection, *args, **kwargs)
+    return await asyncio.to_thread(call)
+
+
+def check_health():
+    """Round-trip a query through the pool and report the pool state"""
+    start = time.monotonic()
+    try:
+        with pooled_connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            finally:
+                cursor.close()
+        status = "healthy"
+        error = None
+    except Exception as e:
+        status = "unhealthy"
+        error = str(e)
+    return {
+        "status": status,
+        "error": error,
+        "latency_ms": round((time.monotonic() - start) * 1000, 2),
+        "pool": get_pool().stats()
+    }
+
+
+def close_pool():
+    if _pool is not None:
+        _pool.close()
+        logger.info("Database connection pool closed")
@@ -0,0 +1,168 @@
+"""
+Incremental stock sync from the inventory change feed
+
+Instead of pulling the whole Ready-Made catalog and rewriting item_stocks row
+by row, the POS keeps a cursor into the inventory system's change feed
+(GET /api/inventory/changes?since=<version>) and applies only the products
+that changed since the last run. The stock writes and the new cursor are
+committed in one transaction, so a crash never skips or half-applies a batch.
+
+Stock writes are versioned. Both the change feed and the stock webhook carry
+the inventory change-log version their rows were read at, and item_stocks
+keeps the highest one applied in `source_version`. write_item_stocks() is a
+single INSERT ... ON DUPLICATE KEY UPDATE that only applies rows strictly
+newer than what is stored: a late webhook can't roll a quantity back, and a
+redelivery at the stored version is a no-op.
+
+inventory_sync_state and item_stocks.source_version come from migrations
+0002 and 0003 in utils/migrations/.
+"""
+import logging
+from typing import Dict, Optional, Set, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from beata_common.openmetrics import OUTBOUND_LATENCY
+
+logger = logging.getLogger("cafe-beata-backend")
+
+INVENTORY_API_URL = "http://127.0.0.1:8001/api"
+CURSOR_NAME = "inventory_products"
+PAGE_SIZE = 500
+REQUEST_TIMEOUT = 5
+
+_session = None
+
+
+def _get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _session = session
+    return _session
+
+
+def load_cursor(connection, name: str = CURSOR_NAME) -> int:
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT version FROM inventory_sync_state WHERE name = %s", (name,))
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    finally:
+        cursor.close()
+
+
+def fetch_changes(since: int) -> dict:
+    """One page of the inventory change feed"""
+    with OUTBOUND_LATENCY.time("inventory", "change_feed"):
+        response = _get_session().get(
+            f"{INVENTORY_API_URL}/inventory/changes",
+            params={"since": since, "limit": PAGE_SIZE},
+            timeout=REQUEST_TIMEOUT
+        )
+    response.raise_for_status()
+    return response.json()
+
+
+# The incoming row is newer than the stored one (unversioned writes always apply)
+_NEWER = "(VALUES(source_version) IS NULL OR source_version IS NULL OR VALUES(source_version) > source_version)"
+
+
+def write_item_stocks(cursor, levels: Dict[int, Tuple[int, int]], version: Optional[int] = None) -> int:
+    """
+    Set stock for many items in one statement. `levels` maps item_id to
+    (quantity, min_stock_level); `version` is the inventory change-log
+    version the levels were read at. Items whose stored source_version is
+    the same or newer keep their stock. Returns the number of items sent.
+    """
+    if not levels:
+        return 0
+
+    values = ", ".join(["(%s, %s, %s, %s)"] * len(levels))
+    params = [v for item_id, (quantity, min_level) in levels.items() for v in (item_id, quantity, min_level, version)]
+    # source_version must be assigned last: the IF()s above compare against the old value
+    cursor.execute(
+        f"""
+        INSERT INTO item_stocks (item_id, quantity, min_stock_level, source_version)
+        VALUES {values}
+        ON DUPLICATE KEY UPDATE
+            quantity = IF({_NEWER}, VALUES(quantity), quantity),
+            min_stock_level = IF({_NEWER}, VALUES(min_stock_level), min_stock_level),
+            source_version = IF({_NEWER}, COALESCE(VALUES(source_version), source_version), source_version)
+        """,
+        params
+    )
+    return len(levels)
+
+
+def stale_items(stored: Dict[int, Optional[int]], version: Optional[int]) -> Set[int]:
+    """Items whose stored source_version is the same as or newer than `version`"""
+    if version is None:
+        return set()
+    return {item_id for item_id, stored_version in stored.items()
+            if stored_version is not None and stored_version >= version}
+
+
+def apply_changes(connection, feed: dict, name: str = CURSOR_NAME):
+    """
+    Apply one page of the change feed and advance the cursor in the same
+    transaction. Returns ({item_id: (quantity, min_stock_level)}, menu_changed),
+    where menu_changed means products were added, removed or changed type and
+    the menu itself needs a product sync.
+    """
+    cursor = connection.cursor(dictionary=True)
+    try:
+        products = {str(product["id"]): product for product in feed.get("products", [])}
+        deleted = {str(product_id) for product_id in feed.get("deleted", [])}
+
+        # Menu items mapped to these products (all of them on a full snapshot)
+        local_items = {}
+        external_ids = list(products) + list(deleted)
+        if feed.get("reset"):
+            cursor.execute("SELECT id, external_id FROM itemso WHERE external_source = 'inventory'")
+            local_items = {str(row["external_id"]): row["id"] for row in cursor.fetchall()}
+        elif external_ids:
+            placeholders = ", ".join(["%s"] * len(external_ids))
+            cursor.execute(
+                f"SELECT id, external_id FROM itemso WHERE external_source = 'inventory' AND external_id IN ({placeholders})",
+                external_ids
+            )
+            local_items = {str(row["external_id"]): row["id"] for row in cursor.fetchall()}
+
+        levels = {}
+        menu_changed = False
+        for external_id, product in products.items():
+            ready_made = product.get("ProcessType") == "Ready-Made"
+            item_id = local_items.get(external_id)
+            if item_id is None:
+                menu_changed = menu_changed or ready_made
+                continue
+            if not ready_made:
+                menu_changed = True
+                continue
+            levels[item_id] = (product.get("Quantity") or 0, product.get("Threshold") or 0)
+
+        if any(external_id in local_items for external_id in deleted):
+            menu_changed = True
+        if feed.get("reset") and any(external_id not in products for external_id in local_items):
+            menu_changed = True
+
+        # snapshot_version: the newest change the product rows reflect (older feeds only send version)
+        write_item_stocks(cursor, levels, feed.get("snapshot_version", feed["version"]))
+        cursor.execute(
+            """
+            INSERT INTO inventory_sync_state (name, version) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE version = VALUES(version)
+            """,
+            (name, feed["version"])
+        )
+        connection.commit()
+        return levels, menu_changed
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
@@ -10,6 +10,7 @@ import asyncio
 from datetime import datetime
 import websockets
 from websockets.exceptions import ConnectionClosed
+from beata_common.openmetrics import OUTBOUND_LATENCY
 
 logger = logging.getLogger("cafe-beata-backend")
 
@@ -76,6 +77,15 @@ async def handle_inventory_messages():
                         from main import sync_specific_inventory_product
                         asyncio.create_task(sync_specific_inventory_product(product_id))
                         logger.info(f"Triggered sync for product {product_id}")
+                
+                # Batched adjustments arrive as one message listing every product
+                elif data.get("type") == "stock_update_batch":
+                    from main import sync_specific_inventory_product
+                    for product_data in data.get("data", []):
+                        product_id = product_data.get("product_id")
+                        if product_id:
+                            asyncio.create_task(sync_specific_inventory_product(product_id))
+                    logger.info(f"Triggered sync for {len(data.get('data', []))} products")
             except json.JSONDecodeError:
                 logger.error(f"Received invalid JSON from inventory: {message}")
             except Exception as process_error:
@@ -126,7 +136,8 @@ async def get_inventory_product(product_id: int) -> Optional[Dict[str, Any]]:
         url = f"{INVENTORY_BASE_URL}/inventory/inventoryproduct/{product_id}"
         logger.info(f"Fetching product {product_id} from inventory at: {url}")
         
-        response = requests.get(url, timeout=5)
+        with OUTBOUND_LATENCY.time("inventory", "get_product"):
+            response = requests.get(url, timeout=5)
         
         if response.status_code == 200:
             return {"success": True, "product": response.json()}
@@ -146,7 +157,8 @@ async def get_ready_made_products() -> Optional[Dict[str, Any]]:
         url = f"{INVENTORY_BASE_URL}/inventory/inventoryproducts/filter?process_type=Ready-Made"
         logger.info(f"Fetching Ready-Made products from inventory at: {url}")
         
-        response = requests.get(url, timeout=5)
+        with OUTBOUND_LATENCY.time("inventory", "ready_made_products"):
+            response = requests.get(url, timeout=5)
         
         if response.status_code == 200:
             logger.info(f"Successfully fetched {len(response.json())} Ready-Made products from inventory")
@@ -0,0 +1,28 @@
+"""
+The POS backend's schema migrations: the numbered files in
+utils/migrations/, recorded in schema_version under component "cafe-beata".
+The runner is beata_common.migrate, shared with the inventory API.
+
+    python -m utils.migrate status
+    python -m utils.migrate up [--to N]
+    python -m utils.migrate verify
+"""
+import os
+import sys
+
+from beata_common.migrate import MigrationRunner
+
+from utils.db_pool import pooled_connection
+
+COMPONENT = "cafe-beata"
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+RUNNER = MigrationRunner(COMPONENT, MIGRATIONS_DIR, pooled_connection, "utils.migrate", "cafe-beata schema")
+
+schema_status = RUNNER.schema_status
+migrate = RUNNER.migrate
+check_schema = RUNNER.check_schema
+
+
+if __name__ == "__main__":
+    sys.exit(RUNNER.main())
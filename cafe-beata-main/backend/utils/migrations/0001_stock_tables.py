@@ -0,0 +1,68 @@
+"""
+Stock tables and the itemso columns that link menu items to inventory
+products. These used to be created by create_stock_tables().
+"""
+
+TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS item_stocks (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        item_id INT NOT NULL,
+        quantity INT NOT NULL DEFAULT 0,
+        min_stock_level INT NOT NULL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        FOREIGN KEY (item_id) REFERENCES itemso(id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS stock_transactions (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        item_id INT NOT NULL,
+        quantity INT NOT NULL,
+        previous_quantity INT NOT NULL,
+        new_quantity INT NOT NULL,
+        transaction_type ENUM('Add', 'Subtract', 'Set') NOT NULL,
+        reason TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        user_id INT,
+        FOREIGN KEY (item_id) REFERENCES itemso(id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS stock_alerts (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        item_id INT NOT NULL,
+        alert_type ENUM('low_stock', 'out_of_stock') NOT NULL,
+        status ENUM('new', 'acknowledged', 'resolved') NOT NULL DEFAULT 'new',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        acknowledged_at TIMESTAMP NULL,
+        resolved_at TIMESTAMP NULL,
+        FOREIGN KEY (item_id) REFERENCES itemso(id) ON DELETE CASCADE
+    )
+    """,
+]
+
+ITEMSO_COLUMNS = {
+    "external_source": "VARCHAR(50) NULL",
+    "external_id": "VARCHAR(50) NULL",
+    "last_updated": "DATETIME NULL",
+}
+
+
+def upgrade(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT COLUMN_NAME FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'itemso'
+        """)
+        existing = {row[0].lower() for row in cursor.fetchall()}
+        for column, definition in ITEMSO_COLUMNS.items():
+            if column not in existing:
+                cursor.execute(f"ALTER TABLE itemso ADD COLUMN {column} {definition}")
+        for ddl in TABLES:
+            cursor.execute(ddl)
+        connection.commit()
+    finally:
+        cursor.close()
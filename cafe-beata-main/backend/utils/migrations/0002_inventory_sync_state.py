@@ -0,0 +1,18 @@
+"""
+Cursors for the incremental inventory sync (utils/inventory_changes.py).
+"""
+
+
+def upgrade(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS inventory_sync_state (
+                name VARCHAR(64) PRIMARY KEY,
+                version BIGINT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            )
+        """)
+        connection.commit()
+    finally:
+        cursor.close()
@@ -0,0 +1,39 @@
+"""
+Versioned stock writes (write_item_stocks in utils/inventory_changes.py):
+item_stocks.source_version, plus the unique key on item_id that the upsert
+needs. Duplicate stock rows for an item are collapsed to the newest one
+first.
+"""
+import logging
+
+logger = logging.getLogger("cafe-beata-backend")
+
+
+def upgrade(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = 'item_stocks' AND column_name = 'source_version'
+        """)
+        if cursor.fetchone()[0] == 0:
+            cursor.execute("ALTER TABLE item_stocks ADD COLUMN source_version BIGINT NULL")
+            logger.info("Added source_version column to item_stocks")
+
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = 'item_stocks'
+            AND column_name = 'item_id' AND non_unique = 0 AND seq_in_index = 1
+        """)
+        if cursor.fetchone()[0] == 0:
+            cursor.execute("""
+                DELETE older FROM item_stocks older
+                JOIN item_stocks newer ON newer.item_id = older.item_id AND newer.id > older.id
+            """)
+            if cursor.rowcount:
+                logger.warning(f"Removed {cursor.rowcount} duplicate item_stocks rows")
+            cursor.execute("ALTER TABLE item_stocks ADD UNIQUE KEY uq_item_stocks_item (item_id)")
+            logger.info("Added unique key on item_stocks.item_id")
+        connection.commit()
+    finally:
+        cursor.close()
@@ -0,0 +1,30 @@
+"""
+Outbox of inventory updates from completed orders (utils/outbound_queue.py).
+"""
+
+
+def upgrade(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS inventory_outbox (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                kind VARCHAR(32) NOT NULL,
+                product_id VARCHAR(50) NOT NULL,
+                order_id VARCHAR(20),
+                payload JSON NOT NULL,
+                status ENUM('pending', 'sending', 'done', 'failed') NOT NULL DEFAULT 'pending',
+                attempts INT NOT NULL DEFAULT 0,
+                next_attempt_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                claim_token CHAR(36) NULL,
+                claimed_at DATETIME NULL,
+                last_error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                INDEX idx_outbox_due (status, next_attempt_at),
+                INDEX idx_outbox_claim (claim_token)
+            )
+        """)
+        connection.commit()
+    finally:
+        cursor.close()
@@ -0,0 +1,365 @@
+"""
+Durable outbound queue for inventory propagation
+
+Order completion used to call the inventory system synchronously for every
+line item. Those calls now go into the `inventory_outbox` table inside the
+same transaction as the order update, and a background worker drains the
+table with a pooled HTTP session. Each drain sends one batch call per kind,
+stock adjustments first, then sales. Rows are not coalesced: every item
+carries its outbox row id as request_id, so the inventory system skips
+rows it already applied when a retry follows a lost response. Failed
+deliveries are retried with exponential backoff, except for requests the
+inventory system rejected (4xx, or a per-item error), which can't succeed
+on retry and are marked 'failed' straight away.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from beata_common.openmetrics import OUTBOUND_LATENCY
+
+logger = logging.getLogger("cafe-beata-backend")
+
+INVENTORY_API_URL = "http://127.0.0.1:8001/api"
+
+# Worker tuning
+BATCH_SIZE = 200           # Rows claimed per drain cycle
+POLL_INTERVAL = 5          # Seconds between drains when nobody wakes the worker
+MAX_ATTEMPTS = 8           # Rows are marked 'failed' after this many attempts
+BASE_BACKOFF = 2           # Seconds; doubled for every failed attempt
+MAX_BACKOFF = 300          # Cap the backoff at 5 minutes
+STALE_CLAIM_MINUTES = 5    # Claims older than this are returned to 'pending'
+REQUEST_TIMEOUT = 5
+
+KIND_STOCK_ADJUST = "stock_adjust"
+KIND_SALES_UPDATE = "sales_update"
+REQUEST_ID_PREFIX = "cafe-beata-outbox-"    # Outbox row id -> request_id of the inventory batch item
+RETRYABLE_CLIENT_ERRORS = (408, 429)
+
+_connection_factory: Optional[Callable] = None
+_worker_task: Optional[asyncio.Task] = None
+_wakeup: Optional[asyncio.Event] = None
+_session: Optional[requests.Session] = None
+
+
+def _get_session() -> requests.Session:
+    """Return the shared HTTP session, creating it on first use"""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({"Content-Type": "application/json"})
+        _session = session
+    return _session
+
+
+def enqueue_inventory_updates(cursor, order_id: str, entries: List[Tuple[str, str, Dict]]):
+    """
+    Queue outbound inventory calls using the caller's cursor.
+
+    `entries` is a list of (kind, product_id, payload) tuples. The rows only
+    become visible to the worker once the caller commits, so the order update
+    and its outbound work succeed or fail together.
+    """
+    if not entries:
+        return
+    cursor.executemany(
+        """
+        INSERT INTO inventory_outbox (kind, product_id, order_id, payload)
+        VALUES (%s, %s, %s, %s)
+        """,
+        [(kind, str(product_id), order_id, json.dumps(payload)) for kind, product_id, payload in entries]
+    )
+
+
+def notify_worker():
+    """Wake the worker so freshly committed rows are sent right away"""
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+class DeliveryRejected(Exception):
+    """The inventory system refused the request; retrying it won't help"""
+
+
+def _raise_for_status(response: requests.Response):
+    if 400 <= response.status_code < 500 and response.status_code not in RETRYABLE_CLIENT_ERRORS:
+        raise DeliveryRejected(f"{response.status_code} {response.reason}: {response.text[:200]}")
+    response.raise_for_status()
+
+
+def _backoff_seconds(attempts: int) -> int:
+    return min(MAX_BACKOFF, BASE_BACKOFF * (2 ** max(0, attempts - 1)))
+
+
+def _claim_batch() -> List[Dict]:
+    """Claim due rows for this worker and return them"""
+    connection = _connection_factory()
+    if connection is None:
+        return []
+    cursor = connection.cursor(dictionary=True)
+    try:
+        token = str(uuid.uuid4())
+        cursor.execute("""
+            UPDATE inventory_outbox
+            SET status = 'sending', claim_token = %s, claimed_at = NOW()
+            WHERE status = 'pending' AND next_attempt_at <= NOW()
+            ORDER BY id
+            LIMIT %s
+        """, (token, BATCH_SIZE))
+        connection.commit()
+        if cursor.rowcount == 0:
+            return []
+        cursor.execute("""
+            SELECT id, kind, product_id, order_id, payload, attempts
+            FROM inventory_outbox
+            WHERE claim_token = %s
+            ORDER BY id
+        """, (token,))
+        rows = cursor.fetchall()
+        for row in rows:
+            if isinstance(row["payload"], (str, bytes, bytearray)):
+                row["payload"] = json.loads(row["payload"])
+        return rows
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def _release_stale_claims():
+    """Return rows left in 'sending' by a crashed worker to the queue"""
+    connection = _connection_factory()
+    if connection is None:
+        return
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            UPDATE inventory_outbox
+            SET status = 'pending', claim_token = NULL
+            WHERE status = 'sending' AND claimed_at < NOW() - INTERVAL %s MINUTE
+        """, (STALE_CLAIM_MINUTES,))
+        connection.commit()
+        if cursor.rowcount:
+            logger.info(f"Released {cursor.rowcount} stale outbox claims")
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def _stock_adjustment(row: Dict) -> Dict:
+    return {
+        "product_id": int(row["product_id"]),
+        "action": "subtract",
+        "quantity": int(row["payload"].get("quantity", 0)),
+        "reason": f"Order {row['order_id']} completed"
+    }
+
+
+def _sales_update(row: Dict) -> Dict:
+    return {
+        "product_id": int(row["product_id"]),
+        "quantity_sold": int(row["payload"].get("quantity", 0)),
+        "remitted": float(row["payload"].get("remitted", 0))
+    }
+
+
+# kind -> (batch endpoint, list field, item builder, latency label), in delivery order
+BATCH_DELIVERIES = {
+    KIND_STOCK_ADJUST: ("/stock/adjust/batch", "adjustments", _stock_adjustment, "stock_adjust_batch"),
+    KIND_SALES_UPDATE: ("/sales/update/batch", "updates", _sales_update, "sales_update_batch"),
+}
+
+
+def _deliver_batch(kind: str, rows: List[Dict]) -> Dict[int, Optional[str]]:
+    """
+    Send every claimed row of one kind in a single call to its batch endpoint,
+    each tagged with its outbox id as request_id.
+    Returns outbox id -> error message (None on success); ids missing from
+    the response are left out.
+    """
+    path, field, build, label = BATCH_DELIVERIES[kind]
+    items = [dict(build(row), request_id=f"{REQUEST_ID_PREFIX}{row['id']}") for row in rows]
+    with OUTBOUND_LATENCY.time("inventory", label):
+        response = _get_session().post(
+            f"{INVENTORY_API_URL}{path}",
+            json={field: items},
+            timeout=REQUEST_TIMEOUT
+        )
+    _raise_for_status(response)
+
+    outcome = {}
+    for result in response.json().get("results", []):
+        request_id = str(result.get("request_id") or "")
+        if not request_id.startswith(REQUEST_ID_PREFIX):
+            continue
+        outcome[int(request_id[len(REQUEST_ID_PREFIX):])] = (
+            None if result.get("success") else result.get("error", "Rejected")
+        )
+    return outcome
+
+
+def _mark_done(ids: List[int]):
+    connection = _connection_factory()
+    if connection is None:
+        return
+    cursor = connection.cursor()
+    try:
+        placeholders = ", ".join(["%s"] * len(ids))
+        cursor.execute(
+            f"UPDATE inventory_outbox SET status = 'done', claim_token = NULL, last_error = NULL WHERE id IN ({placeholders})",
+            ids
+        )
+        connection.commit()
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def _mark_failed(ids: List[int], attempts: int, error: str, rejected: bool = False):
+    """Schedule a retry, or give up once MAX_ATTEMPTS is reached or the request was rejected"""
+    connection = _connection_factory()
+    if connection is None:
+        return
+    cursor = connection.cursor()
+    try:
+        attempts += 1
+        status = "failed" if rejected or attempts >= MAX_ATTEMPTS else "pending"
+        placeholders = ", ".join(["%s"] * len(ids))
+        cursor.execute(
+            f"""
+            UPDATE inventory_outbox
+            SET status = %s, attempts = %s, claim_token = NULL, last_error = %s,
+                next_attempt_at = NOW() + INTERVAL %s SECOND
+            WHERE id IN ({placeholders})
+            """,
+            [status, attempts, error[:1000], _backoff_seconds(attempts)] + ids
+        )
+        connection.commit()
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def _settle(kind: str, rows: List[Dict]):
+    """Deliver one kind's rows and record each row's outcome"""
+    try:
+        outcome = _deliver_batch(kind, rows)
+        rejected = True     # Per-item errors are the inventory system's answer, not a transient failure
+    except DeliveryRejected as e:
+        logger.error(f"Batched {kind} rejected: {e}")
+        outcome, rejected = {row["id"]: str(e) for row in rows}, True
+    except Exception as e:
+        logger.error(f"Batched {kind} failed: {e}")
+        outcome, rejected = {row["id"]: str(e) for row in rows}, False
+
+    done = [row["id"] for row in rows if row["id"] in outcome and outcome[row["id"]] is None]
+    if done:
+        _mark_done(done)
+    for row in rows:
+        if row["id"] not in outcome:
+            _mark_failed([row["id"]], row["attempts"], "Missing from batch response")
+        elif outcome[row["id"]] is not None:
+            _mark_failed([row["id"]], row["attempts"], outcome[row["id"]], rejected=rejected)
+
+
+def _drain_once() -> int:
+    """Claim and deliver one batch. Returns the number of rows handled."""
+    rows = _claim_batch()
+    if not rows:
+        return 0
+
+    by_kind: Dict[str, List[Dict]] = {}
+    for row in rows:
+        by_kind.setdefault(row["kind"], []).append(row)
+    logger.info(f"Draining {len(rows)} outbox rows: "
+                + ", ".join(f"{len(kind_rows)} {kind}" for kind, kind_rows in by_kind.items()))
+
+    for kind in [kind for kind in by_kind if kind not in BATCH_DELIVERIES]:
+        logger.error(f"Unknown outbox kind: {kind}")
+        _mark_failed([row["id"] for row in by_kind[kind]], 0, f"Unknown outbox kind: {kind}", rejected=True)
+
+    for kind in BATCH_DELIVERIES:
+        kind_rows = by_kind.get(kind)
+        if kind_rows:
+            _settle(kind, kind_rows)
+
+    return len(rows)
+
+
+async def _worker_loop():
+    """Drain the outbox until cancelled"""
+    try:
+        await asyncio.to_thread(_release_stale_claims)
+    except Exception as e:
+        logger.error(f"Error releasing stale outbox claims: {e}")
+
+    while True:
+        try:
+            handled = await asyncio.to_thread(_drain_once)
+            if handled >= BATCH_SIZE:
+                # There is probably more waiting, go straight to the next batch
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error draining inventory outbox: {e}")
+
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+
+
+def start_outbound_worker(connection_factory: Callable) -> asyncio.Task:
+    """Start the drain worker (the table comes from migration 0004_inventory_outbox)"""
+    global _connection_factory, _worker_task, _wakeup
+    _connection_factory = connection_factory
+
+    if _worker_task is None or _worker_task.done():
+        _wakeup = asyncio.Event()
+        _worker_task = asyncio.create_task(_worker_loop())
+        logger.info("Inventory outbox worker started")
+    return _worker_task
+
+
+async def stop_outbound_worker():
+    """Cancel the worker and close the HTTP session"""
+    global _worker_task, _session
+    if _worker_task is not None:
+        _worker_task.cancel()
+        try:
+            await _worker_task
+        except asyncio.CancelledError:
+            pass
+        _worker_task = None
+    if _session is not None:
+        _session.close()
+        _session = None
+
+
+def get_outbox_stats() -> Dict:
+    """Return queue depth per status for monitoring"""
+    connection = _connection_factory() if _connection_factory else None
+    if connection is None:
+        return {}
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT status, COUNT(*) FROM inventory_outbox GROUP BY status")
+        counts = {row[0]: row[1] for row in cursor.fetchall()}
+        cursor.execute("SELECT MIN(created_at) FROM inventory_outbox WHERE status = 'pending'")
+        oldest = cursor.fetchone()[0]
+        return {
+            "counts": counts,
+            "oldest_pending": oldest.isoformat() if isinstance(oldest, datetime) else None
+        }
+    finally:
+        cursor.close()
+        connection.close()
@@ -0,0 +1,132 @@
+"""
+Keyset pagination for the POS list endpoints
+
+Same scheme as the inventory API's model/pagination.py: rows are ordered by
+a unique key, each page carries an opaque cursor holding the last key, and
+the next page reads strictly after it, so response size and query cost stay
+constant however large the table grows. Responses are envelope objects here,
+so next_cursor and total go into the body.
+"""
+import base64
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Callable, List, Optional, Sequence, Set, Tuple
+
+from fastapi import HTTPException, Query
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+@dataclass
+class PageParams:
+    limit: int
+    cursor: Optional[list]
+    fields: Optional[Set[str]]
+
+    @property
+    def fetch(self) -> int:
+        """Rows to request; the extra one tells us whether a next page exists"""
+        return self.limit + 1
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return ["dt", value.isoformat()]
+    if isinstance(value, date):
+        return ["d", value.isoformat()]
+    if isinstance(value, Decimal):
+        return ["dec", str(value)]
+    return ["v", value]
+
+
+def _decode_value(pair):
+    kind, value = pair
+    if kind == "dt":
+        return datetime.fromisoformat(value)
+    if kind == "d":
+        return date.fromisoformat(value)
+    if kind == "dec":
+        return Decimal(value)
+    return value
+
+
+def encode_cursor(key: Sequence) -> str:
+    raw = json.dumps([_encode_value(value) for value in key], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: Optional[str]) -> Optional[list]:
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        return [_decode_value(pair) for pair in json.loads(raw)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+def page_params(default_limit: int = DEFAULT_LIMIT):
+    """Dependency factory for the limit/cursor/fields query parameters"""
+    def dependency(
+        limit: int = Query(default_limit, ge=1, le=MAX_LIMIT),
+        cursor: Optional[str] = Query(None),
+        fields: Optional[str] = Query(None, description="Comma-separated fields to include"),
+    ) -> PageParams:
+        wanted = {field.strip() for field in fields.split(",") if field.strip()} if fields else None
+        return PageParams(limit=limit, cursor=decode_cursor(cursor), fields=wanted or None)
+    return dependency
+
+
+def keyset_where(columns: Sequence[str], cursor: Optional[list], descending: bool = True) -> Tuple[str, list]:
+    """SQL condition for rows after `cursor` in ORDER BY `columns` order"""
+    if not cursor:
+        return "1=1", []
+    if len(cursor) != len(columns):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+    op = "<" if descending else ">"
+    branches, params = [], []
+    for i, column in enumerate(columns):
+        parts = [f"{previous} = %s" for previous in columns[:i]] + [f"{column} {op} %s"]
+        branches.append("(" + " AND ".join(parts) + ")")
+        params.extend(cursor[:i + 1])
+    return f"{columns[0]} {op}= %s AND ({' OR '.join(branches)})", [cursor[0]] + params
+
+
+def order_by(columns: Sequence[str], descending: bool = True) -> str:
+    direction = "DESC" if descending else "ASC"
+    return "ORDER BY " + ", ".join(f"{column} {direction}" for column in columns)
+
+
+def finish_page(rows: list, page: PageParams, key: Callable):
+    """Drop the look-ahead row; returns (rows, next_cursor)"""
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        return rows, encode_cursor(key(rows[-1]))
+    return rows, None
+
+
+def project(items: List[dict], fields: Optional[Set[str]]) -> List[dict]:
+    """Keep only the requested fields; unknown names are ignored"""
+    if not fields:
+        return items
+    return [{name: value for name, value in item.items() if name in fields} for item in items]
+
+
+def estimate_total(cursor, table: str) -> Optional[int]:
+    """Approximate row count from InnoDB statistics instead of COUNT(*)"""
+    cursor.execute(
+        """
+        SELECT TABLE_ROWS FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        """,
+        (table,)
+    )
+    row = cursor.fetchone()
+    if not row:
+        return None
+    value = row["TABLE_ROWS"] if isinstance(row, dict) else row[0]
+    return int(value) if value is not None else None
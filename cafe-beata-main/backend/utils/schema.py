@@ -0,0 +1,78 @@
+"""
+Schema capability registry for the POS backend
+
+Tables and columns of the cafe_beata database are read from
+information_schema once at startup and cached here, so request handlers can
+check for optional tables without a round trip. Anything that creates or
+alters tables calls refresh_schema() afterwards.
+"""
+import logging
+import threading
+
+from utils.db_pool import pooled_connection
+
+logger = logging.getLogger("cafe-beata-backend")
+
+# Tables update_stock and the stock endpoints depend on
+STOCK_TABLES = ("item_stocks", "stock_transactions", "stock_alerts")
+
+
+class SchemaRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._columns = {}
+        self._loaded = False
+
+    def refresh(self, connection=None):
+        if connection is None:
+            with pooled_connection() as pooled:
+                return self.refresh(pooled)
+
+        cursor = connection.cursor()
+        try:
+            cursor.execute("""
+                SELECT TABLE_NAME, COLUMN_NAME
+                FROM information_schema.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE()
+            """)
+            columns = {}
+            for table, column in cursor.fetchall():
+                columns.setdefault(table.lower(), set()).add(column.lower())
+        finally:
+            cursor.close()
+
+        with self._lock:
+            self._columns = columns
+            self._loaded = True
+        logger.info(f"Schema registry loaded: {len(columns)} tables")
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.refresh()
+
+    def has_table(self, table: str) -> bool:
+        self._ensure_loaded()
+        return table.lower() in self._columns
+
+    def has_tables(self, *tables: str) -> bool:
+        return all(self.has_table(table) for table in tables)
+
+    def has_column(self, table: str, column: str) -> bool:
+        self._ensure_loaded()
+        return column.lower() in self._columns.get(table.lower(), ())
+
+    @property
+    def stock_tables(self) -> bool:
+        return self.has_tables(*STOCK_TABLES)
+
+
+_registry = SchemaRegistry()
+
+
+def get_schema() -> SchemaRegistry:
+    return _registry
+
+
+def refresh_schema(connection=None):
+    """Call after anything that adds or drops tables or columns"""
+    _registry.refresh(connection)
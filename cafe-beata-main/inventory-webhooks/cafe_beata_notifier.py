@@ -8,6 +8,7 @@ Installation:
 1. Copy this file to your inventory system backend
 2. Import the functions in your model/inventoryproduct.py file (already done in this project)
 3. Call notify_cafe_beata_stock_change after updating products or adjusting stock
+4. Call flush_pending_notifications on shutdown so queued changes are sent
 """
 
 import requests
@@ -15,6 +16,8 @@ import logging
 from datetime import datetime
 import json
 import os
+import threading
+import time
 
 # Set up logging
 logging.basicConfig(
@@ -50,42 +53,90 @@ def is_ready_made_product(product_id, mysql_connection):
         logger.error(f"Error checking if product {product_id} is Ready-Made: {e}")
         return False
 
-def notify_cafe_beata_stock_change(product_id):
+# Changes are collected and sent as one batched webhook per debounce window
+DEBOUNCE_SECONDS = 0.25
+MAX_BATCH = 200
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF = 0.5
+
+_pending = {}
+_pending_lock = threading.Lock()
+_flush_timer = None
+_session = None
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        _session.headers.update({"Content-Type": "application/json"})
+    return _session
+
+
+def notify_cafe_beata_stock_change(product_id, quantity=None, product_name=None, status=None):
     """
-    Notifies the cafe-beata system that a product's stock has changed
-    Returns True if successful, False otherwise
+    Queues a notification that a product's stock has changed. Changes made
+    within DEBOUNCE_SECONDS of each other (or until MAX_BATCH products) are
+    sent to cafe-beata as one {"products": [...]} webhook from a timer thread,
+    so the caller never waits on the network. Pass the new quantity when you
+    have it; cafe-beata re-syncs products sent without one.
+    Returns True once queued.
     """
-    try:
-        data = {
-            "product_id": product_id,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        logger.info(f"Notifying cafe-beata of stock change for product {product_id}")
-        
-        # Add timeout to prevent hanging if Cafe Beata is down
-        response = requests.post(
-            CAFE_BEATA_WEBHOOK_URL, 
-            json=data, 
-            timeout=5,
-            headers={"Content-Type": "application/json"}
-        )
-        
-        if response.status_code == 200:
-            logger.info(f"Successfully notified cafe-beata of stock change for product {product_id}")
-            return True
-        else:
+    global _flush_timer
+    update = {"product_id": product_id}
+    if quantity is not None and product_name:
+        update.update({"product_name": product_name, "quantity": quantity})
+        if status:
+            update["status"] = status
+
+    with _pending_lock:
+        _pending[product_id] = update
+        flush_now = len(_pending) >= MAX_BATCH
+        if _flush_timer is None and not flush_now:
+            _flush_timer = threading.Timer(DEBOUNCE_SECONDS, flush_pending_notifications)
+            _flush_timer.daemon = True
+            _flush_timer.start()
+
+    if flush_now:
+        threading.Thread(target=flush_pending_notifications, daemon=True).start()
+    return True
+
+
+def flush_pending_notifications():
+    """
+    Sends everything queued so far; call it on shutdown too.
+    Returns True if the webhook succeeded or nothing was pending.
+    """
+    global _flush_timer
+    with _pending_lock:
+        updates = list(_pending.values())
+        _pending.clear()
+        if _flush_timer is not None:
+            _flush_timer.cancel()
+            _flush_timer = None
+    if not updates:
+        return True
+
+    payload = {"products": updates, "timestamp": datetime.now().isoformat()}
+    delay = RETRY_BACKOFF
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            response = _get_session().post(CAFE_BEATA_WEBHOOK_URL, json=payload, timeout=5)
+            if response.status_code == 200:
+                logger.info(f"Notified cafe-beata of {len(updates)} stock changes")
+                return True
             logger.error(f"Failed to notify cafe-beata: {response.status_code} - {response.text}")
-            return False
-    except requests.exceptions.ConnectionError:
-        logger.error(f"Connection error notifying cafe-beata: Cafe Beata system might be down")
-        return False
-    except requests.exceptions.Timeout:
-        logger.error(f"Timeout notifying cafe-beata: Request took too long")
-        return False
-    except Exception as e:
-        logger.error(f"Error notifying cafe-beata: {e}")
-        return False
+        except requests.exceptions.ConnectionError:
+            logger.error(f"Connection error notifying cafe-beata: Cafe Beata system might be down")
+        except requests.exceptions.Timeout:
+            logger.error(f"Timeout notifying cafe-beata: Request took too long")
+        except Exception as e:
+            logger.error(f"Error notifying cafe-beata: {e}")
+        if attempt < MAX_ATTEMPTS:
+            time.sleep(delay)
+            delay *= 2
+    logger.error(f"Giving up on notifying cafe-beata of {len(updates)} stock changes")
+    return False
 
 def get_product_details(product_id, mysql_connection):
     """
@@ -0,0 +1,8 @@
+"""
+Code shared by the inventory API (Inventory-cafe-system/backend-main) and the
+POS backend (cafe-beata-main/backend):
+
+    beata_common.openmetrics   metrics registry and GET /metrics rendering
+    beata_common.broadcast     WebSocket fan-out engine
+    beata_common.migrate       versioned schema migration runner
+"""
@@ -0,0 +1,187 @@
+"""
+WebSocket fan-out with per-client send queues and topic subscriptions.
+
+broadcast() serializes a message once and pushes the text into a bounded
+queue per client; each client has its own writer task draining its queue.
+A slow tablet therefore only delays itself. When a client's queue is full,
+the oldest pending message is dropped. Under the "disconnect" policy, or
+after MAX_CONSECUTIVE_DROPS drops with no successful send, the client is
+disconnected instead.
+
+Clients receive every message unless they subscribe to topics, either on
+connect (?topics=stock,product:12) or later by sending
+{"type": "subscribe", "topics": [...]} / {"type": "unsubscribe", ...}.
+Each backend subclasses BroadcastHub with its own message_topics(); messages
+it doesn't map go to every client.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, Iterable, Optional, Set
+
+from fastapi import WebSocket
+
+from beata_common.openmetrics import BROADCAST_LATENCY, counter
+
+logger = logging.getLogger(__name__)
+
+SEND_QUEUE_SIZE = 256
+MAX_CONSECUTIVE_DROPS = 512
+DROP_OLDEST = "drop_oldest"
+DISCONNECT = "disconnect"
+
+MESSAGES_DROPPED = counter(
+    "websocket_messages_dropped", "Messages dropped from full per-client WebSocket send queues")
+SLOW_CLIENTS_DISCONNECTED = counter(
+    "websocket_slow_clients_disconnected", "WebSocket clients disconnected for falling behind")
+
+
+def parse_topics(value) -> Optional[Set[str]]:
+    """Topics from a comma-separated string or a list; None means everything"""
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    topics = {str(topic).strip() for topic in value if str(topic).strip()}
+    return topics or None
+
+
+class _Client:
+    __slots__ = ("websocket", "topics", "queue", "writer", "dropped")
+
+    def __init__(self, websocket: WebSocket, topics: Optional[Set[str]], queue_size: int):
+        self.websocket = websocket
+        self.topics = topics
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.writer = None
+        self.dropped = 0
+
+    def wants(self, topics: Optional[Set[str]]) -> bool:
+        return self.topics is None or topics is None or not self.topics.isdisjoint(topics)
+
+
+class BroadcastHub:
+    """
+    Fan-out for one WebSocket endpoint. Subclasses map messages to topics by
+    overriding message_topics(); the base class sends everything to everyone.
+    """
+
+    def __init__(self, name: str, queue_size: int = SEND_QUEUE_SIZE, policy: str = DROP_OLDEST):
+        self.name = name
+        self.queue_size = queue_size
+        self.policy = policy
+        self._clients: Dict[WebSocket, _Client] = {}
+
+    def message_topics(self, message: dict) -> Optional[Set[str]]:
+        """Topics a message belongs to, or None to send it to everyone"""
+        return None
+
+    @property
+    def active_connections(self):
+        return list(self._clients)
+
+    async def connect(self, websocket: WebSocket, topics: Optional[Iterable[str]] = None):
+        await websocket.accept()
+        client = _Client(websocket, parse_topics(topics), self.queue_size)
+        client.writer = asyncio.create_task(self._drain(client))
+        self._clients[websocket] = client
+        logger.info(f"New {self.name} WebSocket connection. Total connections: {len(self._clients)}")
+        return client
+
+    def disconnect(self, websocket: WebSocket):
+        """Forget a client and stop its writer; safe to call more than once"""
+        client = self._clients.pop(websocket, None)
+        if client is None:
+            return
+        if client.writer is not None and client.writer is not asyncio.current_task():
+            client.writer.cancel()
+        logger.info(f"{self.name} WebSocket disconnected. Remaining connections: {len(self._clients)}")
+
+    def subscribe(self, websocket: WebSocket, topics: Iterable[str]):
+        client = self._clients.get(websocket)
+        if client is not None:
+            added = parse_topics(topics) or set()
+            client.topics = added if client.topics is None else client.topics | added
+
+    def unsubscribe(self, websocket: WebSocket, topics: Iterable[str]):
+        client = self._clients.get(websocket)
+        if client is not None and client.topics is not None:
+            client.topics -= parse_topics(topics) or set()
+
+    def handle_control(self, websocket: WebSocket, message: dict) -> bool:
+        """Apply a subscribe/unsubscribe message from a client; False if it wasn't one"""
+        kind = message.get("type")
+        if kind == "subscribe":
+            self.subscribe(websocket, message.get("topics") or ())
+        elif kind == "unsubscribe":
+            self.unsubscribe(websocket, message.get("topics") or ())
+        else:
+            return False
+        return True
+
+    async def broadcast(self, message: dict, topics: Optional[Iterable[str]] = None) -> int:
+        """Queue a message for every interested client; returns how many it was queued for"""
+        queued = self.publish(message, topics)
+        # Let writers run between back-to-back broadcasts so a burst from one
+        # handler doesn't overflow the queues of clients that are keeping up
+        await asyncio.sleep(0)
+        return queued
+
+    def publish(self, message: dict, topics: Optional[Iterable[str]] = None) -> int:
+        """broadcast() for code that isn't a coroutine; never waits on a client"""
+        if not self._clients:
+            return 0
+        start = time.perf_counter()
+        targets = set(topics) if topics is not None else self.message_topics(message)
+        # Same encoding as WebSocket.send_json, done once for all clients
+        data = json.dumps(message, separators=(",", ":"), ensure_ascii=False, default=str)
+        queued = 0
+        for client in list(self._clients.values()):
+            if client.wants(targets) and self._enqueue(client, data):
+                queued += 1
+        BROADCAST_LATENCY.observe(time.perf_counter() - start)
+        return queued
+
+    def _enqueue(self, client: _Client, data: str) -> bool:
+        queue = client.queue
+        if queue.full():
+            if self.policy == DISCONNECT or client.dropped >= MAX_CONSECUTIVE_DROPS:
+                self._evict(client)
+                return False
+            queue.get_nowait()
+            client.dropped += 1
+            MESSAGES_DROPPED.inc()
+        queue.put_nowait(data)
+        return True
+
+    def _evict(self, client: _Client):
+        logger.warning(f"Disconnecting slow {self.name} WebSocket client ({client.queue.qsize()} messages pending)")
+        SLOW_CLIENTS_DISCONNECTED.inc()
+        self.disconnect(client.websocket)
+        asyncio.create_task(self._close(client.websocket))
+
+    async def _close(self, websocket: WebSocket):
+        try:
+            # 1013: try again later
+            await websocket.close(code=1013)
+        except Exception:
+            pass
+
+    async def _drain(self, client: _Client):
+        queue = client.queue
+        try:
+            while True:
+                data = await queue.get()
+                await client.websocket.send_text(data)
+                client.dropped = 0
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error sending to {self.name} WebSocket client: {str(e)}")
+            self.disconnect(client.websocket)
+
+    async def close(self):
+        """Stop every writer task (shutdown)"""
+        for websocket in list(self._clients):
+            self.disconnect(websocket)
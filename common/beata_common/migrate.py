@@ -0,0 +1,262 @@
+"""
+Versioned schema migrations.
+
+Every schema change is a numbered file in a backend's migrations directory,
+NNNN_<name>.py, defining upgrade(connection). Migrations are applied in
+order and recorded in `schema_version` together with the SHA-256 of the
+file. Don't edit a migration once it has shipped; add a new one. A file that
+no longer matches its recorded checksum is reported by `verify` and at
+startup.
+
+Both backends share the cafe_beata database and the schema_version table.
+Each one keeps its own migrations under its own component name ("inventory"
+in the inventory API's model/migrate.py, "cafe-beata" in the POS backend's
+utils/migrate.py) and drives them through a MigrationRunner, which also
+provides each backend's command line:
+
+    python -m model.migrate status|up [--to N]|verify    # inventory API
+    python -m utils.migrate status|up [--to N]|verify    # POS backend
+
+At startup check_schema() reads schema_version once. If migrations are
+pending and MIGRATE_ON_STARTUP is set (the default), it applies them;
+otherwise it logs the gap and the app keeps serving. Request handlers never
+run DDL.
+
+MySQL commits DDL implicitly, so a migration that fails half-way is not
+rolled back. Write upgrade() so it can be re-run safely (IF NOT EXISTS, or
+check information_schema first). A named lock keeps two processes from
+migrating the same component at once.
+"""
+import argparse
+import hashlib
+import importlib.util
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Callable, ContextManager, Dict, List, Optional
+
+from mysql.connector import Error, errorcode
+
+logger = logging.getLogger(__name__)
+
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "1").lower() not in ("0", "false", "no")
+LOCK_TIMEOUT = 60
+
+_FILENAME = re.compile(r"^(\d{4})_(\w+)\.py$")
+
+VERSION_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        component VARCHAR(32) NOT NULL,
+        version INT NOT NULL,
+        name VARCHAR(128) NOT NULL,
+        checksum CHAR(64) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (component, version)
+    )
+"""
+
+
+class MigrationError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    path: str
+    checksum: str
+
+    @property
+    def label(self) -> str:
+        return f"{self.version:04d}_{self.name}"
+
+    def load(self, component: str):
+        module_name = f"{component}_migration_{self.label}".replace("-", "_")
+        spec = importlib.util.spec_from_file_location(module_name, self.path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module.upgrade
+
+
+@dataclass
+class SchemaStatus:
+    current: int
+    latest: int
+    pending: List[Migration] = field(default_factory=list)
+    changed: List[int] = field(default_factory=list)    # Applied, but the file no longer matches
+    unknown: List[int] = field(default_factory=list)    # Applied, but no such file (newer code ran here)
+
+    @property
+    def up_to_date(self) -> bool:
+        return not self.pending
+
+
+def discover(directory: str) -> List[Migration]:
+    """Migration files in version order"""
+    migrations = {}
+    for filename in sorted(os.listdir(directory)):
+        match = _FILENAME.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise MigrationError(f"Two migrations share version {version}: {migrations[version].label}, {filename}")
+        path = os.path.join(directory, filename)
+        with open(path, "rb") as f:
+            checksum = hashlib.sha256(f.read()).hexdigest()
+        migrations[version] = Migration(version, match.group(2), path, checksum)
+    return [migrations[version] for version in sorted(migrations)]
+
+
+def applied_migrations(connection, component: str) -> Dict[int, str]:
+    """version -> checksum of every migration applied to this database"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT version, checksum FROM schema_version WHERE component = %s", (component,))
+        return {version: checksum for version, checksum in cursor.fetchall()}
+    except Error as e:
+        if e.errno == errorcode.ER_NO_SUCH_TABLE:
+            return {}
+        raise
+    finally:
+        cursor.close()
+
+
+def schema_status(connection, component: str, directory: str) -> SchemaStatus:
+    migrations = discover(directory)
+    applied = applied_migrations(connection, component)
+    known = {migration.version: migration for migration in migrations}
+    return SchemaStatus(
+        current=max(applied, default=0),
+        latest=migrations[-1].version if migrations else 0,
+        pending=[migration for migration in migrations if migration.version not in applied],
+        changed=[version for version in sorted(applied)
+                 if version in known and known[version].checksum != applied[version]],
+        unknown=[version for version in sorted(applied) if version not in known],
+    )
+
+
+def migrate(connection, component: str, directory: str,
+            target: Optional[int] = None) -> List[Migration]:
+    """Apply pending migrations up to `target` (all by default); returns the ones applied"""
+    lock_name = f"schema_migrate_{component}"
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (lock_name, LOCK_TIMEOUT))
+        if cursor.fetchone()[0] != 1:
+            raise MigrationError(f"Timed out waiting for the {component} migration lock")
+        try:
+            cursor.execute(VERSION_TABLE_DDL)
+            # Re-read under the lock: another process may have just migrated
+            status = schema_status(connection, component, directory)
+            if status.changed:
+                raise MigrationError(f"Applied {component} migrations were edited: {status.changed}")
+
+            applied = []
+            for migration in status.pending:
+                if target is not None and migration.version > target:
+                    break
+                logger.info(f"Applying {component} migration {migration.label}")
+                migration.load(component)(connection)
+                cursor.execute(
+                    "INSERT INTO schema_version (component, version, name, checksum) VALUES (%s, %s, %s, %s)",
+                    (component, migration.version, migration.name, migration.checksum)
+                )
+                connection.commit()
+                applied.append(migration)
+            return applied
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (lock_name,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+class MigrationRunner:
+    """
+    One backend's migrations: its component name, migrations directory, a
+    connection factory (a context manager yielding a connection) and the
+    module that runs the CLI, used in log hints.
+    """
+
+    def __init__(self, component: str, directory: str, connect: Callable[[], ContextManager],
+                 module: str, description: str = "schema"):
+        self.component = component
+        self.directory = directory
+        self.connect = connect
+        self.module = module
+        self.description = description
+
+    def discover(self) -> List[Migration]:
+        return discover(self.directory)
+
+    def schema_status(self, connection) -> SchemaStatus:
+        return schema_status(connection, self.component, self.directory)
+
+    def migrate(self, connection, target: Optional[int] = None) -> List[Migration]:
+        return migrate(connection, self.component, self.directory, target)
+
+    def check_schema(self, auto_migrate: bool = MIGRATE_ON_STARTUP) -> SchemaStatus:
+        """Startup check: one read of schema_version, migrating only if something is pending"""
+        with self.connect() as db:
+            status = self.schema_status(db)
+            if status.changed:
+                logger.error(f"Applied migrations {status.changed} no longer match their files")
+            if status.unknown:
+                logger.warning(f"Database has migrations {status.unknown} this code doesn't know about")
+            if status.pending:
+                if not auto_migrate:
+                    logger.error(
+                        f"Database schema is at version {status.current}, code expects {status.latest}; "
+                        f"run: python -m {self.module} up"
+                    )
+                    return status
+                self.migrate(db)
+                status = self.schema_status(db)
+            logger.info(f"Database schema at version {status.current}")
+        return status
+
+    def main(self, argv=None) -> int:
+        parser = argparse.ArgumentParser(description=f"Apply and inspect {self.description} migrations")
+        subparsers = parser.add_subparsers(dest="command", required=True)
+        subparsers.add_parser("status", help="List migrations and whether they are applied")
+        up = subparsers.add_parser("up", help="Apply pending migrations")
+        up.add_argument("--to", type=int, help="Stop after this version")
+        subparsers.add_parser("verify", help="Fail if applied migrations were edited or some are pending")
+        args = parser.parse_args(argv)
+
+        logging.basicConfig(level=logging.INFO)
+        with self.connect() as db:
+            if args.command == "up":
+                applied = self.migrate(db, target=args.to)
+                logger.info(f"Applied {len(applied)} migration(s)")
+                return 0
+
+            status = self.schema_status(db)
+            if args.command == "status":
+                applied = applied_migrations(db, self.component)
+                for migration in self.discover():
+                    if migration.version not in applied:
+                        state = "pending"
+                    elif migration.version in status.changed:
+                        state = "CHANGED"
+                    else:
+                        state = "applied"
+                    print(f"{migration.label:40} {state}")
+                for version in status.unknown:
+                    print(f"{version:04d}{'':36} unknown")
+                return 0
+
+            problems = []
+            if status.changed:
+                problems.append(f"edited after being applied: {status.changed}")
+            if status.pending:
+                problems.append(f"pending: {[migration.label for migration in status.pending]}")
+            for problem in problems:
+                logger.error(f"Migrations {problem}")
+            return 1 if problems else 0
@@ -0,0 +1,312 @@
+"""
+Counters, gauges and histograms rendered in the OpenMetrics text format for
+GET /metrics, so the service can be scraped by Prometheus-compatible tooling.
+
+Histograms use fixed cumulative buckets (the `le` series a scraper expects)
+kept in a preallocated array; observing is a bisect plus three increments.
+Label sets are capped per metric: anything past the cap is folded into
+"other" so a bad label (e.g. a raw URL) can't grow memory without bound.
+
+    REQUEST_LATENCY.labels("GET", "/api/inventory/{id}").observe(0.012)
+    with OUTBOUND_LATENCY.time("cafe-beata", "stock_webhook"):
+        requests.post(...)
+
+Gauges can also be backed by a callback read at scrape time, which is how
+connection counts and pool occupancy are exported without extra bookkeeping.
+
+Both backends import this module; each process has its own REGISTRY.
+"""
+import math
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Seconds; covers fast cached reads up to slow report queries and syncs
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+MAX_LABEL_SETS = 256
+OVERFLOW_LABEL = "other"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "unknown"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    if len(self._children) >= MAX_LABEL_SETS:
+                        key = (OVERFLOW_LABEL,) * len(self.labelnames)
+                        child = self._children.get(key)
+                    if child is None:
+                        child = self._new_child()
+                        self._children[key] = child
+        return child
+
+    def _items(self) -> List[Tuple[Tuple, object]]:
+        with self._lock:
+            return list(self._children.items())
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [
+            f"# TYPE {self.name} {self.kind}",
+            f"# HELP {self.name} {_escape(self.documentation)}",
+            *self._samples(),
+        ]
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """Monotonic counter; samples are exported as <name>_total"""
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def _samples(self):
+        return [
+            f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+            for key, child in self._items()
+        ]
+
+
+class _GaugeChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self.value -= amount
+
+
+class Gauge(_Metric):
+    """
+    Value that goes up and down. With `callback`, the value is read when the
+    metrics are scraped: the callback returns a number (no labels) or a dict
+    of label-value tuples to numbers.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable] = None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1):
+        self.labels().dec(amount)
+
+    def _samples(self):
+        if self.callback is None:
+            values = [(key, child.value) for key, child in self._items()]
+        else:
+            result = self.callback()
+            if isinstance(result, dict):
+                values = [(tuple(key) if isinstance(key, tuple) else (key,), value) for key, value in result.items()]
+            else:
+                values = [((), result)]
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+            if value is not None
+        ]
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # One slot per bound plus the +Inf bucket; cumulated at render time
+        self.counts = array("q", bytes(8 * (len(bounds) + 1)))
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self) -> Tuple[List[int], int, float]:
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        cumulative, running = [], 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, running, total
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram of seconds (or any other unit named in `name`)"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(float(bound) for bound in buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self, *values):
+        return self.labels(*values).time()
+
+    def _samples(self):
+        lines = []
+        edges = self.bounds + (math.inf,)
+        for key, child in self._items():
+            cumulative, count, total = child.snapshot()
+            for edge, running in zip(edges, cumulative):
+                le = 'le="' + _format_value(edge) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {running}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_count{labels} {count}")
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        # Unlabelled metrics report zero until first used instead of vanishing
+        if not metric.labelnames and getattr(metric, "callback", None) is None:
+            metric.labels()
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = (),
+          callback: Optional[Callable] = None) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames, callback))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# Metrics shared across modules. Callback gauges (WebSocket clients, pool
+# occupancy) are registered where their source lives.
+REQUEST_LATENCY = histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route"))
+REQUESTS_IN_FLIGHT = gauge("http_requests_in_flight", "HTTP requests currently being handled")
+REQUEST_ERRORS = counter(
+    "http_request_exceptions", "Requests that raised instead of returning a response", ("method", "route"))
+POOL_CHECKOUT_WAIT = histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a free pooled database connection")
+POOL_CHECKOUT_TIMEOUTS = counter(
+    "db_pool_checkout_timeouts", "Checkouts that gave up waiting for a pooled connection")
+BROADCAST_LATENCY = histogram(
+    "websocket_broadcast_duration_seconds", "Time to fan one message out to every WebSocket client")
+OUTBOUND_LATENCY = histogram(
+    "outbound_http_duration_seconds", "Latency of HTTP calls to the peer service", ("peer", "operation"))
+SYNC_DURATION = histogram(
+    "background_sync_duration_seconds", "Duration of background sync and maintenance runs", ("task",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0))